@@ -1,76 +1,376 @@
 # Custom assertion helpers for tests
+from collections.abc import Mapping
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from pymongo.errors import OperationFailure
 
+from src.framework.benchmark.harness import compare
+from src.framework.queries.batch import run_catalog
+from src.framework.queries import evaluator
+from src.framework.queries.equivalence import check_plan_equivalence
+from src.framework.queries.explain import explain_find, explain_aggregate
+from src.utils import events
+
 def assert_docs_not_empty(docs, msg="No documents returned"):
-    print("Log: Documents size = "+str(len(docs)))
+    events.emit("docs.count", "Documents size = {count}", count=len(docs))
     assert len(docs) > 0, msg
 
 def assert_field_exists(doc, field):
     assert field in doc, f"Missing field: {field}"
 
+# Streaming helpers
+#
+# Results are iterated batch by batch and counted, never collected into a list,
+# so memory stays flat however many documents match. With raw=True documents are
+# returned as RawBSONDocument and only the fields that are looked at get decoded.
+
+def raw_collection(collection):
+    """The same collection, returning undecoded RawBSONDocument results"""
+    return collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+def stream_documents(documents, max_docs=None):
+    """Yield from a cursor or iterable, stopping after `max_docs` (closing the cursor)"""
+    count = 0
+    try:
+        for doc in documents:
+            if max_docs is not None and count >= max_docs:
+                break
+            count += 1
+            yield doc
+    finally:
+        close = getattr(documents, "close", None)
+        if close is not None:
+            close()
+
+def consume(documents, max_docs=None):
+    """Exhaust a cursor (up to `max_docs`) and return how many documents it produced"""
+    count = 0
+    for _ in stream_documents(documents, max_docs):
+        count += 1
+    return count
+
+def _find_cursor(collection, query, batch_size=None, raw=False, projection=None):
+    if raw:
+        collection = raw_collection(collection)
+    return collection.find(query, projection, batch_size=batch_size or 0)
+
+def _aggregate_cursor(collection, pipeline, batch_size=None, raw=False):
+    if raw:
+        collection = raw_collection(collection)
+    kwargs = {"batchSize": batch_size} if batch_size else {}
+    return collection.aggregate(pipeline, **kwargs)
+
 # Parsing-specific assertions
 
-def assert_query_executes_successfully(collection, query, msg="Query should execute successfully"):
-    """Assert that a query executes without errors"""
+def assert_query_executes_successfully(collection, query, msg="Query should execute successfully",
+                                       batch_size=None, raw=False, max_docs=None):
+    """Assert that a query executes without errors, streaming (up to `max_docs`) results"""
     try:
-        print(f"Log: Executing query: {query}")
-        result = list(collection.find(query))
-        print(f"Log: Query executed successfully, returned {len(result)} documents")
+        events.emit("query.execute", "Executing query: {query}", query=query)
+        count = consume(_find_cursor(collection, query, batch_size, raw), max_docs)
+        events.emit("query.executed", "Query executed successfully, returned {count} documents",
+                    query=query, count=count)
     except Exception as e:
-        print(f"Log: Query failed: {query}")
+        events.error("query.failed", "Query failed: {query}", query=query, error=str(e))
         assert False, f"{msg}. Error: {str(e)}"
 
 def assert_query_fails_with_error(collection, query, expected_error_type=OperationFailure, msg="Query should fail"):
     """Assert that a query fails with expected error"""
     try:
-        print(f"Log: Executing query (expecting failure): {query}")
-        list(collection.find(query))
+        events.emit("query.execute", "Executing query (expecting failure): {query}", query=query)
+        consume(_find_cursor(collection, query, raw=True))
         assert False, f"{msg}. Query unexpectedly succeeded"
     except expected_error_type as e:
-        print(f"Log: Query failed as expected with error: {str(e)}")
+        events.emit("query.rejected", "Query failed as expected with error: {error}", query=query,
+                    error=str(e), code=getattr(e, "code", None))
     except Exception as e:
         assert False, f"{msg}. Got unexpected error type {type(e)}: {str(e)}"
 
-def assert_aggregation_executes_successfully(collection, pipeline, msg="Aggregation should execute successfully"):
-    """Assert that an aggregation pipeline executes without errors"""
+def assert_aggregation_executes_successfully(collection, pipeline, msg="Aggregation should execute successfully",
+                                             batch_size=None, raw=False, max_docs=None):
+    """Assert that an aggregation pipeline executes without errors, streaming (up to `max_docs`) results"""
     try:
-        print(f"Log: Executing aggregation pipeline: {pipeline}")
-        result = list(collection.aggregate(pipeline))
-        print(f"Log: Aggregation executed successfully, returned {len(result)} documents")
+        events.emit("aggregate.execute", "Executing aggregation pipeline: {pipeline}", pipeline=pipeline)
+        count = consume(_aggregate_cursor(collection, pipeline, batch_size, raw), max_docs)
+        events.emit("aggregate.executed", "Aggregation executed successfully, returned {count} documents",
+                    pipeline=pipeline, count=count)
     except Exception as e:
-        print(f"Log: Aggregation failed: {pipeline}")
+        events.error("aggregate.failed", "Aggregation failed: {pipeline}", pipeline=pipeline, error=str(e))
         assert False, f"{msg}. Error: {str(e)}"
 
 def assert_aggregation_fails_with_error(collection, pipeline, expected_error_type=OperationFailure, msg="Aggregation should fail"):
     """Assert that an aggregation pipeline fails with expected error"""
     try:
-        print(f"Log: Executing aggregation pipeline (expecting failure): {pipeline}")
-        list(collection.aggregate(pipeline))
+        events.emit("aggregate.execute", "Executing aggregation pipeline (expecting failure): {pipeline}",
+                    pipeline=pipeline)
+        consume(_aggregate_cursor(collection, pipeline, raw=True))
         assert False, f"{msg}. Aggregation unexpectedly succeeded"
     except expected_error_type as e:
-        print(f"Log: Aggregation failed as expected with error: {str(e)}")
+        events.emit("aggregate.rejected", "Aggregation failed as expected with error: {error}",
+                    pipeline=pipeline, error=str(e), code=getattr(e, "code", None))
     except Exception as e:
         assert False, f"{msg}. Got unexpected error type {type(e)}: {str(e)}"
 
-def assert_query_result_structure(docs, expected_fields, msg="Query result should have expected structure"):
-    """Assert that query results have expected field structure"""
-    assert len(docs) > 0, "No documents to validate structure"
-    
-    for doc in docs:
+def assert_query_result_structure(docs, expected_fields, msg="Query result should have expected structure",
+                                  max_docs=None):
+    """Assert that query results (a list or a cursor) have expected field structure
+
+    Documents are validated as they stream in; validation stops at the first
+    violation or after `max_docs` documents.
+    """
+    count = 0
+    for doc in stream_documents(docs, max_docs):
+        count += 1
         for field in expected_fields:
             assert field in doc, f"{msg}. Missing field '{field}' in document: {doc}"
+    assert count > 0, "No documents to validate structure"
     
-    print(f"Log: Validated structure of {len(docs)} documents with fields: {expected_fields}")
+    events.emit("results.structure", "Validated structure of {count} documents with fields: {fields}",
+                count=count, fields=expected_fields)
 
-def assert_data_types_correct(docs, field_types, msg="Query result should have correct data types"):
-    """Assert that query results have correct data types for specified fields"""
-    assert len(docs) > 0, "No documents to validate data types"
-    
-    for doc in docs:
+def _matches_type(value, expected_type):
+    if isinstance(value, expected_type):
+        return True
+    # Embedded documents of RawBSONDocument results are RawBSONDocuments, not dicts
+    expected = expected_type if isinstance(expected_type, tuple) else (expected_type,)
+    return isinstance(value, RawBSONDocument) and any(t is dict or t is Mapping for t in expected)
+
+def assert_data_types_correct(docs, field_types, msg="Query result should have correct data types",
+                              max_docs=None):
+    """Assert that query results (a list or a cursor) have correct data types for specified fields
+
+    Documents are validated as they stream in; validation stops at the first
+    violation or after `max_docs` documents.
+    """
+    count = 0
+    for doc in stream_documents(docs, max_docs):
+        count += 1
         for field, expected_type in field_types.items():
             if field in doc:
-                actual_type = type(doc[field])
-                assert isinstance(doc[field], expected_type), \
-                    f"{msg}. Field '{field}' should be {expected_type}, got {actual_type}: {doc[field]}"
+                value = doc[field]
+                assert _matches_type(value, expected_type), \
+                    f"{msg}. Field '{field}' should be {expected_type}, got {type(value)}: {value}"
+    assert count > 0, "No documents to validate data types"
     
-    print(f"Log: Validated data types for {len(docs)} documents")
+    events.emit("results.types", "Validated data types for {count} documents", count=count,
+                fields=events.lazy(lambda: {field: str(t) for field, t in field_types.items()}))
+
+# Catalog assertions: every entry runs concurrently and all failures are reported together
+
+def _emit_catalog_report(kind, report):
+    events.emit("catalog.report", "{kind} catalog: {summary}", kind=kind, summary=report.summary(),
+                failures=len(report.failures),
+                outcomes=events.lazy(lambda: [str(outcome) for outcome in report.outcomes]))
+
+def assert_catalog_executes_successfully(collection, catalog, kind="find", msg="Catalog entries should execute successfully",
+                                         max_workers=8, max_docs=None):
+    """Assert that every query (kind="find") or pipeline (kind="aggregate") in `catalog` executes"""
+    events.emit("catalog.execute", "Executing {kind} catalog of {entries} entries on {workers} workers",
+                kind=kind, entries=len(catalog), workers=max_workers)
+    report = run_catalog(collection, catalog, kind, max_workers=max_workers, max_docs=max_docs)
+    _emit_catalog_report(kind, report)
+    assert report.ok, f"{msg}. {len(report.failures)} of {len(catalog)} failed:\n{report.format(failures_only=True)}"
+    return report
+
+def assert_catalog_fails_with_error(collection, catalog, kind="find", msg="Catalog entries should be rejected",
+                                    max_workers=8):
+    """Assert that every entry in `catalog` is rejected by the server with an OperationFailure"""
+    events.emit("catalog.execute", "Executing {kind} catalog of {entries} entries (expecting failures)",
+                kind=kind, entries=len(catalog))
+    report = run_catalog(collection, catalog, kind, max_workers=max_workers, expect_failure=True)
+    _emit_catalog_report(kind, report)
+    assert report.ok, f"{msg}. {len(report.failures)} of {len(catalog)} were not rejected:\n{report.format(failures_only=True)}"
+    return report
+
+# Benchmark assertions
+
+def assert_significantly_faster(baseline, candidate, alpha=0.05, min_speedup=1.0, msg="Candidate should be significantly faster"):
+    """Assert that `candidate` beats `baseline` (BenchmarkResults) with statistical significance"""
+    comparison = compare(baseline, candidate, alpha)
+    events.emit("benchmark.compare", "{comparison}", comparison=str(comparison))
+    assert comparison.candidate_faster(min_speedup), \
+        f"{msg}. {comparison}; required speedup > {min_speedup}x"
+
+def assert_not_significantly_slower(baseline, candidate, alpha=0.05, tolerance=0.1, msg="Candidate should not be slower"):
+    """Assert that `candidate` is not significantly slower than `baseline` by more than `tolerance`"""
+    comparison = compare(baseline, candidate, alpha)
+    events.emit("benchmark.compare", "{comparison}", comparison=str(comparison))
+    assert not comparison.candidate_slower(tolerance), \
+        f"{msg}. {comparison}; allowed slowdown {tolerance:.0%}"
+
+# Execution-stats budgets
+#
+# A budget is a dict of hardware-independent limits checked against
+# explain("executionStats"); every key is optional:
+#   max_keys_examined_ratio  totalKeysExamined / nReturned (nReturned floored at 1)
+#   max_docs_examined_ratio  totalDocsExamined / nReturned (nReturned floored at 1)
+#   max_keys_examined        totalKeysExamined
+#   max_docs_examined        totalDocsExamined
+#   max_works                works reported by the root execution stage; SBE plans do
+#                            not report works, so the check fails on them with a
+#                            violation naming the engine rather than passing
+#   max_plans_evaluated      candidate plans considered by the planner
+#   allow_in_memory_sort     False forbids a blocking SORT stage
+#   allow_collscan           False forbids a COLLSCAN stage
+#   index                    name of the index the winning plan must use
+
+EXECUTION_BUDGET_KEYS = (
+    "max_keys_examined_ratio", "max_docs_examined_ratio", "max_keys_examined",
+    "max_docs_examined", "max_works", "max_plans_evaluated", "allow_in_memory_sort",
+    "allow_collscan", "index",
+)
+
+def execution_budget_violations(plan, budget):
+    """Return a list of human-readable budget violations for an executionStats ExplainResult"""
+    unknown = set(budget) - set(EXECUTION_BUDGET_KEYS)
+    assert not unknown, f"Unknown execution budget keys: {sorted(unknown)}"
+
+    stats = plan.execution_stats
+    assert stats, "Explain output has no executionStats; use verbosity='executionStats'"
+    returned = stats.get("nReturned", 0)
+    keys = stats.get("totalKeysExamined", 0)
+    docs = stats.get("totalDocsExamined", 0)
+    works = plan.execution_stages.works if plan.execution_stages else None
+
+    violations = []
+    def over(name, actual, limit):
+        if actual is None:
+            violations.append(f"{name} not reported (limit {limit})")
+        elif actual > limit:
+            violations.append(f"{name} {actual:g} exceeds {limit:g}")
+
+    if "max_keys_examined_ratio" in budget:
+        over("keysExamined/nReturned", keys / max(returned, 1), budget["max_keys_examined_ratio"])
+    if "max_docs_examined_ratio" in budget:
+        over("docsExamined/nReturned", docs / max(returned, 1), budget["max_docs_examined_ratio"])
+    if "max_keys_examined" in budget:
+        over("totalKeysExamined", keys, budget["max_keys_examined"])
+    if "max_docs_examined" in budget:
+        over("totalDocsExamined", docs, budget["max_docs_examined"])
+    if "max_works" in budget:
+        if works is None and plan.is_sbe:
+            violations.append(f"works not reported by the SBE engine (limit {budget['max_works']:g}); "
+                              "budget SBE plans with max_keys_examined/max_docs_examined")
+        else:
+            over("works", works, budget["max_works"])
+    if "max_plans_evaluated" in budget:
+        over("plans evaluated", plan.plans_evaluated, budget["max_plans_evaluated"])
+    if budget.get("allow_in_memory_sort") is False and plan.has_stage("SORT"):
+        violations.append("blocking in-memory SORT stage present")
+    if budget.get("allow_collscan") is False and plan.is_collscan():
+        violations.append("COLLSCAN stage present")
+    if "index" in budget and budget["index"] not in plan.indexes_used():
+        violations.append(f"index {budget['index']} not used (used: {plan.indexes_used()})")
+    return violations
+
+def assert_plan_within_budget(plan, budget, msg="Query should stay within its execution budget"):
+    """Assert that an executionStats ExplainResult satisfies `budget`"""
+    stats = plan.execution_stats
+    events.emit("plan.budget", "Plan {plan}: nReturned={returned}, keysExamined={keys}, "
+                "docsExamined={docs}, plansEvaluated={plans}", plan=plan.summary(),
+                returned=stats.get("nReturned"), keys=stats.get("totalKeysExamined"),
+                docs=stats.get("totalDocsExamined"), plans=plan.plans_evaluated, budget=budget)
+    violations = execution_budget_violations(plan, budget)
+    assert not violations, f"{msg}. Plan {plan.summary()} violated: {'; '.join(violations)}"
+
+def assert_query_within_budget(collection, query, budget, projection=None, sort=None, limit=None, hint=None,
+                               msg="Query should stay within its execution budget"):
+    """Run explain('executionStats') for a find and assert it satisfies `budget`"""
+    events.emit("plan.budget_check", "Checking execution budget for query: {query}", query=query)
+    plan = explain_find(collection, query, projection=projection, sort=sort, limit=limit, hint=hint,
+                        verbosity="executionStats")
+    assert_plan_within_budget(plan, budget, msg)
+
+def assert_aggregation_within_budget(collection, pipeline, budget,
+                                     msg="Aggregation should stay within its execution budget"):
+    """Run explain('executionStats') for a pipeline and assert it satisfies `budget`"""
+    events.emit("plan.budget_check", "Checking execution budget for pipeline: {pipeline}", pipeline=pipeline)
+    plan = explain_aggregate(collection, pipeline, verbosity="executionStats")
+    assert_plan_within_budget(plan, budget, msg)
+
+# Reference-evaluator oracle
+#
+# The server's result is checked against the pure-Python evaluator run over the
+# same documents. Results are compared as multisets (order-insensitive); when a
+# sort is given the server's order is also checked against it.
+
+def _assert_matches_reference(actual, expected, sort, msg):
+    missing, unexpected = evaluator.diff_results(expected, actual)
+    assert not missing and not unexpected, (
+        f"{msg}: server returned {len(actual)} documents, reference {len(expected)}; "
+        f"missing from server {missing[:5]}, not expected {unexpected[:5]}"
+    )
+    if sort:
+        ordered = evaluator.sort_documents(actual, sort)
+        assert [evaluator.canonical(d) for d in ordered] == [evaluator.canonical(d) for d in actual], \
+            f"{msg}: server results are not ordered by {sort}"
+
+def assert_query_matches_reference(collection, query, projection=None, sort=None, reference_docs=None,
+                                   msg="Query result should match the reference evaluator"):
+    """Assert a find returns exactly the documents the reference evaluator selects"""
+    if reference_docs is None:
+        reference_docs = list(collection.find())
+    expected = evaluator.find(reference_docs, query, projection=projection, sort=sort)
+    actual = list(collection.find(query, projection, sort=list(sort.items()) if sort else None))
+    events.emit("reference.check", "Reference check for query {query}: server={server}, reference={reference}",
+                query=query, server=len(actual), reference=len(expected))
+    _assert_matches_reference(actual, expected, sort, msg)
+
+def assert_aggregation_matches_reference(collection, pipeline, reference_docs=None,
+                                         msg="Aggregation result should match the reference evaluator"):
+    """Assert an aggregation returns exactly what the reference evaluator computes"""
+    if reference_docs is None:
+        reference_docs = list(collection.find())
+    expected = evaluator.aggregate(reference_docs, pipeline)
+    actual = list(collection.aggregate(pipeline))
+    events.emit("reference.check", "Reference check for pipeline {pipeline}: server={server}, "
+                "reference={reference}", pipeline=pipeline, server=len(actual), reference=len(expected))
+    sorts = [stage["$sort"] for stage in pipeline if "$sort" in stage]
+    # Only a trailing $sort fixes the output order
+    sort = sorts[-1] if sorts and "$sort" in pipeline[-1] else None
+    _assert_matches_reference(actual, expected, sort, msg)
+
+# Cross-plan equivalence
+
+def assert_plans_equivalent(collection, query, projection=None, hints=None, include_natural=True,
+                            msg="Query should return the same documents under every plan"):
+    """Assert a find returns identical results under each applicable index hint and $natural"""
+    report = check_plan_equivalence(collection, query, projection=projection, hints=hints,
+                                    include_natural=include_natural)
+    events.emit("plans.equivalence", "Plan equivalence for {query}: {plans} plans, equivalent={equivalent}",
+                query=query, plans=len(report.results), equivalent=report.equivalent,
+                report=events.lazy(lambda: report.format().splitlines()))
+    assert len(report.results) > 1, f"{msg}: only one plan applies to {query}"
+    assert report.equivalent, f"{msg}\n{report.format()}"
+    return report
+
+# Data-size scaling
+
+def assert_index_bounded(curve, metric="overhead", msg="Query work should not grow linearly with collection size"):
+    """Assert a ScalingCurve's `metric` grows at most logarithmically (O(1) or O(log n))"""
+    growth = curve.classify(metric)
+    events.emit("scaling.curve", "Scaling of {query}: {growth}", query=curve.name, growth=str(growth),
+                sizes=curve.sizes, values=curve.values(metric), plans=curve.plans(),
+                report=events.lazy(lambda: curve.format().splitlines()))
+    assert growth.sublinear, f"{msg}: {growth}\n{curve.format()}"
+    return growth
+
+# Sharded routing
+
+def assert_shard_routing(explain, single_shard=None, shards=None, max_merge_docs=None,
+                         msg="Query should be routed as expected"):
+    """Assert a ShardedExplain's routing stage, number of targeted shards and merge-side documents"""
+    events.emit("shard.routing", "Routing: {summary}", summary=explain.summary(),
+                shards=events.lazy(lambda: [str(plan) for plan in explain.shards]))
+    if single_shard is not None:
+        assert explain.is_single_shard == single_shard, \
+            f"{msg}: expected {'SINGLE_SHARD' if single_shard else 'a merging plan'}, got {explain.stage}\n" \
+            f"{explain.format()}"
+    if shards is not None:
+        assert explain.shard_count == shards, \
+            f"{msg}: expected {shards} shard(s), targeted {explain.targeted_shards}\n{explain.format()}"
+    if max_merge_docs is not None:
+        merged = explain.merge_docs_in
+        assert merged is not None and merged <= max_merge_docs, \
+            f"{msg}: merger received {merged} documents, budget {max_merge_docs}\n{explain.format()}"
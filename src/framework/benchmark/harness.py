@@ -0,0 +1,171 @@
+# Micro-benchmark harness for query timings
+#
+# A single time.time() measurement of one query run says very little. The
+# harness warms up, repeats the operation for a number of iterations or a time
+# budget, times each run with perf_counter_ns, drops outliers and summarises
+# the rest as percentiles with a bootstrap confidence interval for the median.
+# Two variants are compared with a Mann-Whitney U test, so a gate only fails
+# when the difference is both statistically significant and large enough to
+# matter.
+import time
+
+from src.framework.benchmark.stats import (
+    bootstrap_ci, mann_whitney_u, percentile, reject_outliers
+)
+
+MIN_SAMPLES = 8
+
+
+class BenchmarkResult:
+    """Timing samples (nanoseconds) for one benchmarked operation"""
+
+    def __init__(self, name, samples_ns, outliers_ns, warmup, confidence=0.95):
+        self.name = name
+        self.samples_ns = samples_ns
+        self.outliers_ns = outliers_ns
+        self.warmup = warmup
+        self.confidence = confidence
+
+    @property
+    def iterations(self):
+        return len(self.samples_ns) + len(self.outliers_ns)
+
+    def percentile_ms(self, q):
+        return percentile(self.samples_ns, q) / 1e6
+
+    @property
+    def p50_ms(self):
+        return self.percentile_ms(50)
+
+    @property
+    def p95_ms(self):
+        return self.percentile_ms(95)
+
+    @property
+    def p99_ms(self):
+        return self.percentile_ms(99)
+
+    @property
+    def median_ci_ms(self):
+        low, high = bootstrap_ci(self.samples_ns, confidence=self.confidence)
+        return low / 1e6, high / 1e6
+
+    def summary(self):
+        low, high = self.median_ci_ms
+        return {
+            "name": self.name,
+            "iterations": self.iterations,
+            "outliers": len(self.outliers_ns),
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "p99_ms": self.p99_ms,
+            "min_ms": min(self.samples_ns) / 1e6,
+            "max_ms": max(self.samples_ns) / 1e6,
+            "median_ci_ms": [low, high],
+            "confidence": self.confidence,
+        }
+
+    def __str__(self):
+        low, high = self.median_ci_ms
+        return (
+            f"{self.name}: p50={self.p50_ms:.3f}ms "
+            f"[{int(self.confidence * 100)}% CI {low:.3f}-{high:.3f}] "
+            f"p95={self.p95_ms:.3f}ms p99={self.p99_ms:.3f}ms "
+            f"n={len(self.samples_ns)} outliers={len(self.outliers_ns)}"
+        )
+
+
+class Comparison:
+    """Outcome of comparing a candidate variant against a baseline"""
+
+    def __init__(self, baseline, candidate, p_value, alpha):
+        self.baseline = baseline
+        self.candidate = candidate
+        self.p_value = p_value
+        self.alpha = alpha
+
+    @property
+    def significant(self):
+        return self.p_value < self.alpha
+
+    @property
+    def speedup(self):
+        """Baseline median / candidate median (>1 means the candidate is faster)"""
+        candidate = percentile(self.candidate.samples_ns, 50)
+        baseline = percentile(self.baseline.samples_ns, 50)
+        return baseline / candidate if candidate else float("inf")
+
+    def candidate_faster(self, min_speedup=1.0):
+        return self.significant and self.speedup > min_speedup
+
+    def candidate_slower(self, tolerance=0.0):
+        """True when the candidate is significantly slower by more than `tolerance`"""
+        return self.significant and self.speedup < 1.0 / (1.0 + tolerance)
+
+    def __str__(self):
+        return (
+            f"{self.candidate.name} vs {self.baseline.name}: "
+            f"{self.speedup:.2f}x (p={self.p_value:.4f}, "
+            f"{'significant' if self.significant else 'not significant'} at alpha={self.alpha})"
+        )
+
+
+def measure(fn, name=None, iterations=30, warmup=3, time_budget_s=None,
+            setup=None, outlier_k=1.5, confidence=0.95):
+    """Benchmark `fn()` and return a BenchmarkResult
+
+    Runs `warmup` untimed calls, then timed calls until `iterations` samples are
+    collected or `time_budget_s` elapses (whichever comes first, but never fewer
+    than MIN_SAMPLES). `setup()`, if given, runs untimed before every call.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    deadline = time.perf_counter_ns() + int(time_budget_s * 1e9) if time_budget_s else None
+    while True:
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+
+        if len(samples) < MIN_SAMPLES:
+            continue
+        if len(samples) >= iterations:
+            break
+        if deadline is not None and time.perf_counter_ns() >= deadline:
+            break
+
+    kept, rejected = reject_outliers(samples, k=outlier_k)
+    return BenchmarkResult(name or getattr(fn, "__name__", "benchmark"), kept, rejected,
+                           warmup, confidence)
+
+
+def compare(baseline, candidate, alpha=0.05):
+    """Mann-Whitney U comparison of two BenchmarkResults"""
+    _, p_value = mann_whitney_u(candidate.samples_ns, baseline.samples_ns)
+    return Comparison(baseline, candidate, p_value, alpha)
+
+
+# Runners for the common query shapes; results are consumed, never kept
+
+def find_runner(collection, query, projection=None, sort=None, limit=0, hint=None):
+    """Return a callable that runs the find and exhausts its cursor"""
+    def run():
+        cursor = collection.find(query, projection, sort=sort, limit=limit)
+        if hint is not None:
+            cursor = cursor.hint(hint)
+        for _ in cursor:
+            pass
+    return run
+
+
+def aggregate_runner(collection, pipeline, **kwargs):
+    """Return a callable that runs the pipeline and exhausts its cursor"""
+    def run():
+        for _ in collection.aggregate(pipeline, **kwargs):
+            pass
+    return run
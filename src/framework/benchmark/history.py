@@ -0,0 +1,273 @@
+# Persistent benchmark history and regression detection
+#
+# Every recorded benchmark becomes one line in an append-only JSONL file, keyed
+# by (test, benchmark name, query shape) and tagged with the run it belongs to
+# and the server version and host it ran on. Version and host are not part of
+# the key, so a server upgrade is compared against the old baseline (and the
+# change is shown next to the row) rather than reported as new/missing rows. A run can be pinned as the baseline; later runs are
+# compared against it, or two arbitrary runs are diffed from the command line:
+#
+#   python -m src.framework.benchmark.history runs
+#   python -m src.framework.benchmark.history diff <run-a> <run-b>
+#   python -m src.framework.benchmark.history pin <run>
+#   python -m src.framework.benchmark.history compare [--run <run>]
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from src.framework.database.client import PROJECT_ROOT, load_config
+
+DEFAULT_HISTORY_PATH = "reports/benchmarks/history.jsonl"
+DEFAULT_BASELINE_PATH = "reports/benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 0.10
+
+KEY_FIELDS = ("test", "name", "shape")
+ENVIRONMENT_FIELDS = ("server_version", "host")
+
+_write_lock = threading.Lock()
+
+
+def _settings():
+    return load_config().get("benchmark") or {}
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+def history_path():
+    return _resolve(os.environ.get("BENCHMARK_HISTORY") or
+                    _settings().get("history_path") or DEFAULT_HISTORY_PATH)
+
+
+def baseline_path():
+    return _resolve(_settings().get("baseline_path") or DEFAULT_BASELINE_PATH)
+
+
+def regression_threshold():
+    return float(_settings().get("regression_threshold", DEFAULT_THRESHOLD))
+
+
+def current_run_id():
+    """The id shared by every record of this test run (set once, inherited by workers)"""
+    run_id = os.environ.get("BENCHMARK_RUN_ID")
+    if not run_id:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        run_id = f"{stamp}-{uuid.uuid4().hex[:6]}"
+        os.environ["BENCHMARK_RUN_ID"] = run_id
+    return run_id
+
+
+def shape_of(query):
+    """Stable string form of a query or pipeline, used as the record's shape key"""
+    if query is None or isinstance(query, str):
+        return query
+    return json.dumps(query, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def current_test():
+    """The running pytest node id, if any"""
+    current = os.environ.get("PYTEST_CURRENT_TEST")
+    return current.rsplit(" ", 1)[0] if current else None
+
+
+def record(result, shape=None, test=None, server_version=None, host=None, extra=None, path=None):
+    """Append a BenchmarkResult to the history store and return the stored record"""
+    entry = {
+        "run_id": current_run_id(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "test": test or current_test(),
+        "name": result.name,
+        "shape": shape_of(shape),
+        "server_version": server_version,
+        "host": host or socket.gethostname(),
+    }
+    entry.update(result.summary())
+    if extra:
+        entry["extra"] = extra
+
+    path = path or history_path()
+    line = json.dumps(entry, default=str, separators=(",", ":")) + "\n"
+    with _write_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line)
+    return entry
+
+
+def load(path=None):
+    """Read every record in the history store"""
+    path = path or history_path()
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def runs(records):
+    """Run ids in first-seen order with their record counts"""
+    counts = {}
+    for entry in records:
+        counts[entry["run_id"]] = counts.get(entry["run_id"], 0) + 1
+    return counts
+
+
+def run_records(records, run_id):
+    return [entry for entry in records if entry["run_id"] == run_id]
+
+
+def record_key(entry):
+    return tuple(entry.get(field) for field in KEY_FIELDS)
+
+
+def pin_baseline(run_id, path=None):
+    path = path or baseline_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"run_id": run_id, "pinned_at": datetime.now(timezone.utc).isoformat()}, f)
+
+
+def pinned_baseline(path=None):
+    path = path or baseline_path()
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["run_id"]
+
+
+def _classify(base, cand, threshold, metric):
+    ratio = cand[metric] / base[metric] if base[metric] else float("inf")
+    # Only call it a change when the median confidence intervals do not overlap
+    base_ci, cand_ci = base.get("median_ci_ms"), cand.get("median_ci_ms")
+    if ratio > 1 + threshold and (not base_ci or not cand_ci or cand_ci[0] > base_ci[1]):
+        return ratio, "regression"
+    if ratio < 1 / (1 + threshold) and (not base_ci or not cand_ci or cand_ci[1] < base_ci[0]):
+        return ratio, "improvement"
+    return ratio, "unchanged"
+
+
+def compare_runs(baseline_records, candidate_records, threshold=None, metric="p50_ms"):
+    """Match records by key and classify each as regression/improvement/unchanged/new/missing
+
+    When a key was recorded several times in one run, the latest record wins.
+    A row's `environment` holds the server version/host changes between the two.
+    """
+    threshold = regression_threshold() if threshold is None else threshold
+    baseline = {record_key(e): e for e in baseline_records}
+    candidate = {record_key(e): e for e in candidate_records}
+
+    rows = []
+    for key in list(baseline) + [k for k in candidate if k not in baseline]:
+        base, cand = baseline.get(key), candidate.get(key)
+        row = {"key": dict(zip(KEY_FIELDS, key)), "baseline": None, "candidate": None,
+               "ratio": None, "status": None, "environment": {}}
+        if base is None:
+            row.update(candidate=cand[metric], status="new")
+        elif cand is None:
+            row.update(baseline=base[metric], status="missing")
+        else:
+            ratio, status = _classify(base, cand, threshold, metric)
+            row.update(baseline=base[metric], candidate=cand[metric], ratio=ratio, status=status,
+                       environment={field: (base.get(field), cand.get(field)) for field in ENVIRONMENT_FIELDS
+                                    if base.get(field) != cand.get(field)})
+        rows.append(row)
+    return rows
+
+
+def regressions(rows):
+    return [row for row in rows if row["status"] == "regression"]
+
+
+def format_rows(rows, metric="p50_ms"):
+    lines = []
+    for row in rows:
+        key = row["key"]
+        label = f"{key['test']} :: {key['name']}"
+        if key.get("shape"):
+            label += f" {key['shape']}"
+        base = "-" if row["baseline"] is None else f"{row['baseline']:.3f}"
+        cand = "-" if row["candidate"] is None else f"{row['candidate']:.3f}"
+        ratio = "" if row["ratio"] is None else f" ({row['ratio']:.2f}x)"
+        changed = "".join(f" [{field} {before} -> {after}]"
+                          for field, (before, after) in row.get("environment", {}).items())
+        lines.append(f"{row['status'].upper():<12} {label}: {metric} {base} -> {cand}{ratio}{changed}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.framework.benchmark.history",
+                                     description="Inspect and compare recorded benchmark runs")
+    parser.add_argument("--history", help="history file (default from config.yaml)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("runs", help="list recorded runs")
+
+    diff = sub.add_parser("diff", help="compare two runs")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+
+    pin = sub.add_parser("pin", help="pin a run as the baseline")
+    pin.add_argument("run_id")
+
+    cmp_ = sub.add_parser("compare", help="compare a run (default: latest) with the pinned baseline")
+    cmp_.add_argument("--run")
+
+    for command in (diff, cmp_):
+        command.add_argument("--threshold", type=float, default=None,
+                             help="relative slowdown that counts as a regression")
+        command.add_argument("--metric", default="p50_ms")
+
+    args = parser.parse_args(argv)
+    records = load(args.history)
+    known = runs(records)
+
+    if args.command == "runs":
+        baseline = pinned_baseline()
+        for run_id, count in known.items():
+            marker = "  (baseline)" if run_id == baseline else ""
+            print(f"{run_id}  {count} records{marker}")
+        return 0
+
+    if args.command == "pin":
+        if args.run_id not in known:
+            print(f"Unknown run: {args.run_id}", file=sys.stderr)
+            return 2
+        pin_baseline(args.run_id)
+        print(f"Pinned {args.run_id} as baseline")
+        return 0
+
+    if args.command == "diff":
+        baseline_id, candidate_id = args.baseline, args.candidate
+    else:
+        baseline_id = pinned_baseline()
+        candidate_id = args.run or (list(known)[-1] if known else None)
+        if baseline_id is None:
+            print("No baseline pinned; use the 'pin' command first", file=sys.stderr)
+            return 2
+
+    for run_id in (baseline_id, candidate_id):
+        if run_id not in known:
+            print(f"Unknown run: {run_id}", file=sys.stderr)
+            return 2
+
+    rows = compare_runs(run_records(records, baseline_id), run_records(records, candidate_id),
+                        threshold=args.threshold, metric=args.metric)
+    print(f"Baseline {baseline_id} vs candidate {candidate_id}")
+    print(format_rows(rows, args.metric))
+    found = regressions(rows)
+    print(f"{len(found)} regression(s)")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
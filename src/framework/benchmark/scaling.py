@@ -0,0 +1,211 @@
+# Data-size scaling curves
+#
+# One timing at one collection size cannot tell O(log n) from O(n). A scaling
+# run measures the same query or pipeline at each size of a geometric series
+# (the collection is grown between measurements) and records latency and the
+# executionStats work counters. Each metric's curve is then fitted against
+# the candidate models y = a + b*f(n), f in {1, log n, n, n log n, n^2}; the
+# simplest model whose normalized error is within `tolerance` of the best
+# fit is the classification.
+#
+# The gate for "index-bounded" uses wasted work, examined minus returned:
+# a range query that returns 10% of the collection legitimately examines
+# O(n) keys, but only a plan regression (collection scan, residual filter,
+# wrong index) makes the work beyond the result grow with n.
+import math
+
+from src.framework.benchmark.harness import aggregate_runner, find_runner, measure
+from src.framework.queries.explain import explain_aggregate, explain_find
+
+MODELS = (
+    ("O(1)", None),
+    ("O(log n)", math.log),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * math.log(n)),
+    ("O(n^2)", lambda n: n * n),
+)
+SUBLINEAR = ("O(1)", "O(log n)")
+
+METRICS = ("latency_ms", "keys_examined", "docs_examined", "n_returned", "overhead", "docs_overhead")
+
+# Work counters (every metric but latency) are flat when they vary by no more than
+# COUNT_NOISE keys/documents, or COUNT_NOISE_FRACTION of the largest collection size:
+# one key of jitter on a curve of zeros is not O(n^2) growth
+COUNT_NOISE = 1
+COUNT_NOISE_FRACTION = 1e-3
+
+
+def geometric_sizes(start, factor=4, steps=4):
+    """[start, start*factor, ...] with `steps` sizes"""
+    if start < 1 or factor <= 1 or steps < 2:
+        raise ValueError("need start >= 1, factor > 1 and at least 2 steps")
+    return [int(start * factor ** i) for i in range(steps)]
+
+
+def fit_model(xs, ys, transform):
+    """Least-squares fit of y = a + b*transform(x); returns (a, b, rmse)"""
+    n = len(xs)
+    if transform is None:
+        mean = sum(ys) / n
+        return mean, 0.0, math.sqrt(sum((y - mean) ** 2 for y in ys) / n)
+    fs = [transform(x) for x in xs]
+    mean_f, mean_y = sum(fs) / n, sum(ys) / n
+    var_f = sum((f - mean_f) ** 2 for f in fs)
+    b = sum((f - mean_f) * (y - mean_y) for f, y in zip(fs, ys)) / var_f if var_f else 0.0
+    a = mean_y - b * mean_f
+    rmse = math.sqrt(sum((a + b * f - y) ** 2 for f, y in zip(fs, ys)) / n)
+    return a, b, rmse
+
+
+def loglog_slope(xs, ys):
+    """Slope of log(y + 1) against log(x): ~0 constant, ~1 linear, ~2 quadratic"""
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(max(y, 0) + 1) for y in ys]
+    _, slope, _ = fit_model(lx, ly, lambda v: v)
+    return slope
+
+
+class Classification:
+    """Best-fitting growth model of one metric"""
+
+    def __init__(self, metric, model, slope, errors):
+        self.metric = metric
+        self.model = model
+        self.slope = slope
+        self.errors = errors
+
+    @property
+    def sublinear(self):
+        return self.model in SUBLINEAR
+
+    def __str__(self):
+        fits = ", ".join(f"{name}={error:.3f}" for name, error in self.errors.items())
+        return f"{self.metric}: {self.model} (log-log slope {self.slope:.2f}; errors {fits})"
+
+
+def classify_growth(sizes, values, metric="value", tolerance=0.02, flat=0.1, noise=0):
+    """Classify how `values` grow with `sizes`
+
+    A curve whose range is within `flat` of its largest value, or no more than
+    the absolute `noise` floor, is O(1). Models
+    whose fitted coefficient b is negative do not describe growth and are
+    skipped; errors are RMSEs normalized by the mean absolute value.
+    """
+    if len(sizes) != len(values) or len(sizes) < 3:
+        raise ValueError("need at least three (size, value) points")
+    slope = loglog_slope(sizes, values)
+    largest = max(abs(v) for v in values)
+    spread = max(values) - min(values)
+    if largest == 0 or spread <= flat * largest or spread <= noise:
+        return Classification(metric, "O(1)", slope, {})
+    scale = sum(abs(v) for v in values) / len(values)
+    errors = {}
+    for name, transform in MODELS:
+        _, b, rmse = fit_model(sizes, values, transform)
+        if b < 0:
+            continue
+        errors[name] = rmse / scale
+    best = min(errors.values())
+    model = next(name for name, _ in MODELS if name in errors and errors[name] <= best + tolerance)
+    return Classification(metric, model, slope, errors)
+
+
+class ScalingPoint:
+    """Measurements of one query at one collection size"""
+
+    __slots__ = ("size", "latency", "keys_examined", "docs_examined", "n_returned", "plan")
+
+    def __init__(self, size, latency, keys_examined, docs_examined, n_returned, plan):
+        self.size = size
+        self.latency = latency
+        self.keys_examined = keys_examined
+        self.docs_examined = docs_examined
+        self.n_returned = n_returned
+        self.plan = plan
+
+    @property
+    def latency_ms(self):
+        return self.latency.p50_ms if self.latency is not None else None
+
+    @property
+    def overhead(self):
+        """Work beyond the result: max(keys, docs examined) - nReturned"""
+        return max(self.keys_examined, self.docs_examined) - self.n_returned
+
+    @property
+    def docs_overhead(self):
+        """Documents fetched but not returned (ignores multikey duplicate keys)"""
+        return self.docs_examined - self.n_returned
+
+    def value(self, metric):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown scaling metric: {metric}")
+        return getattr(self, metric)
+
+
+class ScalingCurve:
+    """A query's measurements across collection sizes"""
+
+    def __init__(self, name, points):
+        self.name = name
+        self.points = sorted(points, key=lambda point: point.size)
+
+    @property
+    def sizes(self):
+        return [point.size for point in self.points]
+
+    def values(self, metric):
+        return [point.value(metric) for point in self.points]
+
+    def noise_floor(self, metric):
+        if metric == "latency_ms":
+            return 0
+        return max(COUNT_NOISE, COUNT_NOISE_FRACTION * max(self.sizes))
+
+    def classify(self, metric, tolerance=0.02):
+        return classify_growth(self.sizes, self.values(metric), metric, tolerance,
+                               noise=self.noise_floor(metric))
+
+    def plans(self):
+        return sorted({point.plan for point in self.points})
+
+    def format(self):
+        lines = [f"{self.name}: plans={self.plans()}"]
+        timed = all(point.latency is not None for point in self.points)
+        for point in self.points:
+            p50 = f" p50={point.latency_ms:.3f}ms" if point.latency is not None else ""
+            lines.append(f"  n={point.size:<9}{p50} keys={point.keys_examined} docs={point.docs_examined} "
+                         f"returned={point.n_returned} overhead={point.overhead}")
+        metrics = ("latency_ms", "keys_examined", "overhead") if timed else ("keys_examined", "overhead")
+        for metric in metrics:
+            lines.append(f"  {self.classify(metric)}")
+        return "\n".join(lines)
+
+
+def measure_point(collection, size, query=None, pipeline=None, projection=None, sort=None, limit=None,
+                  hint=None, iterations=10, time_budget_s=None):
+    """Time a find (or pipeline) and read its executionStats at the collection's current size"""
+    if pipeline is not None:
+        runner = aggregate_runner(collection, pipeline)
+        plan = explain_aggregate(collection, pipeline, verbosity="executionStats")
+    else:
+        runner = find_runner(collection, query, projection=projection, sort=sort, limit=limit or 0, hint=hint)
+        plan = explain_find(collection, query, projection=projection, sort=sort, limit=limit, hint=hint,
+                            verbosity="executionStats")
+    latency = measure(runner, name=f"n={size}", iterations=iterations, time_budget_s=time_budget_s)
+    stats = plan.execution_stats
+    return ScalingPoint(size, latency, stats.get("totalKeysExamined", 0), stats.get("totalDocsExamined", 0),
+                        stats.get("nReturned", 0), plan.plan_summary())
+
+
+def scaling_curve(collection, sizes, grow, name=None, **query):
+    """Grow `collection` through `sizes` (grow(size) adds the missing documents) and measure each
+
+    `query` holds the measure_point arguments: query= or pipeline=, plus projection, sort,
+    limit, hint, iterations and time_budget_s.
+    """
+    points = []
+    for size in sorted(sizes):
+        grow(size)
+        points.append(measure_point(collection, size, **query))
+    return ScalingCurve(name or str(query.get("query") or query.get("pipeline")), points)
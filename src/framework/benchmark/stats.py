@@ -0,0 +1,101 @@
+# Robust statistics for latency samples
+#
+# Latency distributions are skewed and heavy-tailed, so everything here is
+# rank based: medians and percentiles instead of means, Tukey fences for
+# outliers, bootstrap intervals and the Mann-Whitney U test for comparing
+# two variants. Only the standard library is used.
+import math
+import random
+from statistics import NormalDist
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile, `q` in [0, 100]"""
+    if not values:
+        raise ValueError("percentile() of an empty sample")
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    fraction = position - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+def median(values):
+    return percentile(values, 50)
+
+
+def reject_outliers(values, k=1.5):
+    """Split `values` into (kept, rejected) using Tukey fences at k * IQR"""
+    if len(values) < 4:
+        return list(values), []
+    q1 = percentile(values, 25)
+    q3 = percentile(values, 75)
+    iqr = q3 - q1
+    low, high = q1 - k * iqr, q3 + k * iqr
+    kept = [v for v in values if low <= v <= high]
+    rejected = [v for v in values if v < low or v > high]
+    return kept, rejected
+
+
+def bootstrap_ci(values, statistic=median, confidence=0.95, resamples=1000, seed=0):
+    """Percentile bootstrap confidence interval for `statistic` over `values`"""
+    if not values:
+        raise ValueError("bootstrap_ci() of an empty sample")
+    if len(values) == 1:
+        return values[0], values[0]
+    rng = random.Random(seed)
+    n = len(values)
+    estimates = sorted(
+        statistic([values[rng.randrange(n)] for _ in range(n)])
+        for _ in range(resamples)
+    )
+    alpha = (1 - confidence) / 2
+    return percentile(estimates, alpha * 100), percentile(estimates, (1 - alpha) * 100)
+
+
+def _ranks(values):
+    """Average ranks (1-based) with ties sharing the mean rank, plus tie groups"""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    ties = []
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        rank = (i + j) / 2.0 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = rank
+        if j > i:
+            ties.append(j - i + 1)
+        i = j + 1
+    return ranks, ties
+
+
+def mann_whitney_u(a, b):
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction)
+
+    Returns (U statistic for `a`, p-value). The approximation is reasonable
+    from roughly eight samples per side, which the benchmark harness enforces.
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        raise ValueError("mann_whitney_u() needs two non-empty samples")
+    ranks, ties = _ranks(list(a) + list(b))
+    r1 = sum(ranks[:n1])
+    u1 = r1 - n1 * (n1 + 1) / 2.0
+    mean_u = n1 * n2 / 2.0
+    n = n1 + n2
+    tie_term = sum(t ** 3 - t for t in ties) / (n * (n - 1)) if n > 1 else 0
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_term)
+    if variance <= 0:
+        return u1, 1.0
+    # Continuity correction towards the mean
+    z = (abs(u1 - mean_u) - 0.5) / math.sqrt(variance)
+    p_value = 2 * (1 - NormalDist().cdf(max(z, 0.0)))
+    return u1, min(p_value, 1.0)
@@ -0,0 +1,223 @@
+# Write-path throughput benchmarks
+#
+# Every secondary index that speeds up a read is maintained on every write:
+# one key per document for a scalar index, one per array element for a
+# multikey index (genres, cast). run_write_benchmark() measures that cost on a
+# scratch collection seeded with generated movies:
+#   - insert_many, bulk_write (ordered and unordered: inserts mixed with
+#     updates of indexed fields), update_many and upserts
+#   - with a chosen set of secondary indexes and write concern
+#   - per-batch latency recorded in a LatencyHistogram (no outlier
+#     rejection: checkpoint and journal stalls are what write tails are
+#     made of) and docs/sec over the whole timed run
+# write_matrix() runs operations x index sets x write concerns, so the read
+# side (plan tests) and the write side of each index live in one place.
+import random
+import time
+
+from pymongo import IndexModel, InsertOne, UpdateOne
+from pymongo.write_concern import WriteConcern
+
+from src.framework.benchmark.harness import BenchmarkResult
+from src.framework.data.movies import MovieSpec, object_id
+from src.framework.load.histogram import LatencyHistogram
+
+WRITE_CONCERNS = {
+    "w1": WriteConcern(w=1),
+    "journaled": WriteConcern(w=1, j=True),
+    "majority": WriteConcern(w="majority"),
+}
+
+# Secondary indexes in the order they are added: scalar, compound, then multikey
+SECONDARY_INDEXES = (
+    ("year_1", [("year", 1)]),
+    ("imdb.rating_-1", [("imdb.rating", -1)]),
+    ("year_1_imdb.rating_-1", [("year", 1), ("imdb.rating", -1)]),
+    ("genres_1", [("genres", 1)]),
+    ("cast_1", [("cast", 1)]),
+)
+MULTIKEY_INDEXES = ("genres_1", "cast_1")
+
+
+def index_levels(indexes=SECONDARY_INDEXES):
+    """{"0 indexes": (), "1 index": (...), ...}: each level adds the next index"""
+    return {f"{n} index{'' if n == 1 else 'es'}": tuple(indexes[:n]) for n in range(len(indexes) + 1)}
+
+
+# Operations: fn(collection, new_docs, existing_ids) -> documents written
+
+def insert_many(collection, new_docs, existing_ids):
+    collection.insert_many(new_docs)
+    return len(new_docs)
+
+
+def _mixed_requests(new_docs, existing_ids):
+    """Inserts of half the new documents interleaved with updates of indexed fields"""
+    half = len(new_docs) // 2
+    requests = []
+    for doc, _id in zip(new_docs[:half], existing_ids[:half]):
+        requests.append(InsertOne(doc))
+        requests.append(UpdateOne({"_id": _id}, {"$set": {"imdb.rating": doc["imdb"]["rating"]},
+                                                 "$addToSet": {"genres": doc["genres"][0]}}))
+    return requests
+
+
+def bulk_write_ordered(collection, new_docs, existing_ids):
+    result = collection.bulk_write(_mixed_requests(new_docs, existing_ids), ordered=True)
+    return result.inserted_count + result.matched_count
+
+
+def bulk_write_unordered(collection, new_docs, existing_ids):
+    result = collection.bulk_write(_mixed_requests(new_docs, existing_ids), ordered=False)
+    return result.inserted_count + result.matched_count
+
+
+def update_many(collection, new_docs, existing_ids):
+    """One update of indexed scalar and multikey fields over a batch of existing documents"""
+    result = collection.update_many({"_id": {"$in": existing_ids}},
+                                    {"$inc": {"imdb.rating": 0.1}, "$addToSet": {"cast": "Actor Benchmark"}})
+    return result.matched_count
+
+
+def upsert(collection, new_docs, existing_ids):
+    """Unordered upserts: half insert new documents, half replace the fields of existing ones"""
+    half = len(new_docs) // 2
+    requests = []
+    for i, doc in enumerate(new_docs):
+        _id = doc["_id"] if i < half else existing_ids[i - half]
+        fields = {key: value for key, value in doc.items() if key != "_id"}
+        requests.append(UpdateOne({"_id": _id}, {"$set": fields}, upsert=True))
+    result = collection.bulk_write(requests, ordered=False)
+    return result.upserted_count + result.matched_count
+
+
+WRITE_OPERATIONS = {
+    "insert_many": insert_many,
+    "bulk_write_ordered": bulk_write_ordered,
+    "bulk_write_unordered": bulk_write_unordered,
+    "update_many": update_many,
+    "upsert": upsert,
+}
+
+
+class WriteResult:
+    """Per-batch latencies and throughput of one write operation, index set and write concern"""
+
+    def __init__(self, name, operation, indexes, write_concern, batch_size, samples_ns, docs_written,
+                 warmup=0):
+        self.name = name
+        self.operation = operation
+        self.indexes = list(indexes)
+        self.write_concern = write_concern
+        self.batch_size = batch_size
+        self.samples_ns = samples_ns
+        self.docs_written = docs_written
+        self.warmup = warmup
+        self.latency = LatencyHistogram()
+        for sample in samples_ns:
+            self.latency.record(sample)
+
+    @property
+    def multikey_indexes(self):
+        return [name for name in self.indexes if name in MULTIKEY_INDEXES]
+
+    @property
+    def elapsed_s(self):
+        return sum(self.samples_ns) / 1e9
+
+    @property
+    def docs_per_sec(self):
+        return self.docs_written / self.elapsed_s if self.elapsed_s else 0.0
+
+    def as_benchmark(self):
+        """The batch latencies as a BenchmarkResult, for compare() and the significance assertions"""
+        return BenchmarkResult(self.name, list(self.samples_ns), [], self.warmup)
+
+    def summary(self):
+        summary = {
+            "name": self.name,
+            "operation": self.operation,
+            "indexes": len(self.indexes),
+            "multikey_indexes": len(self.multikey_indexes),
+            "write_concern": self.write_concern,
+            "batch_size": self.batch_size,
+            "batches": len(self.samples_ns),
+            "docs_written": self.docs_written,
+            "docs_per_sec": self.docs_per_sec,
+        }
+        summary.update(self.latency.summary())
+        return summary
+
+    def __str__(self):
+        return (f"{self.name}: {self.docs_per_sec:.0f} docs/s ({self.docs_written} docs) "
+                f"batch latency {self.latency}")
+
+
+def seed_collection(collection, count, seed=0, indexes=()):
+    """Drop `collection`, fill it with `count` generated movies and build `indexes`"""
+    collection.drop()
+    spec = MovieSpec(count, seed=seed)
+    for batch in range(spec.batches):
+        collection.insert_many(spec.generate_batch(batch), ordered=False)
+    if indexes:
+        collection.create_indexes([IndexModel(keys, name=name) for name, keys in indexes])
+    return [object_id(seed, index) for index in range(count)]
+
+
+def run_write_benchmark(collection, operation, indexes=(), write_concern="w1", batch_size=500, batches=10,
+                        warmup=1, seed_docs=10000, seed=0):
+    """Seed `collection`, build `indexes` and time `batches` batches of `operation`
+
+    New documents come from a second generated dataset (disjoint _ids); the
+    existing documents updated in each batch are drawn without replacement
+    per batch from the seeded ones. Documents are generated before timing.
+    """
+    if operation not in WRITE_OPERATIONS:
+        raise ValueError(f"Unknown write operation: {operation}")
+    if batch_size > seed_docs:
+        raise ValueError("batch_size cannot exceed seed_docs")
+    write = WRITE_OPERATIONS[operation]
+    existing = seed_collection(collection, seed_docs, seed=seed, indexes=indexes)
+    target = collection.with_options(write_concern=WRITE_CONCERNS[write_concern])
+    new_docs = MovieSpec((warmup + batches) * batch_size, seed=seed + 1, batch_size=batch_size)
+    rng = random.Random(f"writes:{seed}:{operation}")
+
+    samples, written = [], 0
+    for batch in range(warmup + batches):
+        documents = new_docs.generate_batch(batch)
+        ids = rng.sample(existing, batch_size)
+        started = time.perf_counter_ns()
+        count = write(target, documents, ids)
+        elapsed = time.perf_counter_ns() - started
+        if batch >= warmup:
+            samples.append(elapsed)
+            written += count
+    name = f"{operation} {len(indexes)}idx {write_concern}"
+    return WriteResult(name, operation, [index for index, _ in indexes], write_concern, batch_size,
+                       samples, written, warmup)
+
+
+def write_matrix(collection, operations=None, levels=None, write_concerns=("w1",), **options):
+    """run_write_benchmark() for every operation x index level x write concern"""
+    operations = operations or list(WRITE_OPERATIONS)
+    levels = levels or index_levels()
+    results = []
+    for operation in operations:
+        for write_concern in write_concerns:
+            for indexes in levels.values():
+                results.append(run_write_benchmark(collection, operation, indexes, write_concern, **options))
+    return results
+
+
+def format_matrix(results):
+    """Throughput table, with each row's slowdown against the same operation with no indexes"""
+    unindexed = {(r.operation, r.write_concern): r.docs_per_sec for r in results if not r.indexes}
+    lines = [f"{'operation':<22}{'concern':<11}{'indexes':>8}{'multikey':>9}{'docs/s':>11}"
+             f"{'p50 ms':>9}{'p99 ms':>9}{'vs 0 idx':>10}"]
+    for r in results:
+        base = unindexed.get((r.operation, r.write_concern))
+        ratio = f"x{base / r.docs_per_sec:.2f}" if base and r.docs_per_sec else "-"
+        lines.append(f"{r.operation:<22}{r.write_concern:<11}{len(r.indexes):>8}{len(r.multikey_indexes):>9}"
+                     f"{r.docs_per_sec:>11.0f}{r.latency.percentile_ms(50):>9.2f}"
+                     f"{r.latency.percentile_ms(99):>9.2f}{ratio:>10}")
+    return "\n".join(lines)
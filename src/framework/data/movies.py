@@ -0,0 +1,247 @@
+# Synthetic sample_mflix.movies generator
+#
+# Produces documents shaped like sample_mflix.movies (title, year, genres,
+# cast, imdb, awards, tomatoes.viewer, ...) at any scale, without downloading
+# sampledata.archive. Generation is deterministic: batch `b` of a run is built
+# from its own Random((seed, b)) stream, so any batch can be regenerated alone,
+# in any process, and the same seed always yields byte-identical data.
+# Categorical fields follow a Zipf distribution whose exponent (`skew`)
+# controls how lopsided the cardinalities are. Each field is generated a whole
+# batch at a time with rng.choices(k=...) and the documents are assembled at
+# the end, which keeps generation well ahead of the server's insert rate.
+import argparse
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import accumulate
+from random import Random
+
+from bson import ObjectId
+
+GENRES = (
+    "Drama", "Comedy", "Romance", "Crime", "Thriller", "Action", "Adventure", "Documentary",
+    "Horror", "Mystery", "Biography", "History", "Family", "Fantasy", "Sci-Fi", "Animation",
+    "War", "Music", "Sport", "Short", "Musical", "Western", "Film-Noir", "News",
+)
+RATED = ("R", "PG-13", "PG", "NOT RATED", "APPROVED", "G", "UNRATED", "PASSED", "TV-MA", "TV-14")
+COUNTRIES = ("USA", "UK", "France", "Germany", "Canada", "Italy", "Japan", "India", "Spain",
+             "Australia", "Sweden", "Hong Kong", "South Korea", "Mexico", "Brazil")
+LANGUAGES = ("English", "French", "Spanish", "German", "Italian", "Japanese", "Hindi",
+             "Mandarin", "Korean", "Swedish", "Portuguese", "Russian")
+_TITLE_WORDS = (
+    "Night", "Love", "Last", "Man", "Life", "Story", "Day", "City", "Time", "House", "Dark",
+    "Girl", "World", "Blood", "Heart", "King", "Dead", "Lost", "Secret", "River", "Summer",
+    "Road", "War", "Dream", "Shadow", "Home", "Game", "Queen", "Fire", "Moon", "Winter", "Star",
+)
+
+MIN_YEAR = 1900
+MAX_YEAR = 2024
+# ObjectId timestamp of generated documents (2020-01-01T00:00:00Z)
+_OID_EPOCH = 1577836800
+
+
+def zipf_cum_weights(n, skew):
+    """Cumulative Zipf weights for ranks 1..n; skew=0 is uniform"""
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** skew
+        cum_weights.append(total)
+    return cum_weights
+
+
+def cast_pool_size(count):
+    """Distinct cast members for a dataset of `count` movies (grows sub-linearly)"""
+    return max(1000, int(count ** 0.75))
+
+
+def object_id(seed, index):
+    """Deterministic ObjectId of document `index`: fixed timestamp, seed, index"""
+    return ObjectId(struct.pack(">III", _OID_EPOCH, seed & 0xFFFFFFFF, index))
+
+
+def batch_rng(seed, batch):
+    return Random(f"movies:{seed}:{batch}")
+
+
+class MovieSpec:
+    """Scale and skew of a generated dataset; precomputes the weight tables"""
+
+    def __init__(self, count, seed=0, skew=1.1, batch_size=10000):
+        if count < 1 or batch_size < 1:
+            raise ValueError("count and batch_size must be positive")
+        self.count = count
+        self.seed = seed
+        self.skew = skew
+        self.batch_size = batch_size
+        self.cast_pool = cast_pool_size(count)
+        self._genre_weights = zipf_cum_weights(len(GENRES), skew)
+        self._rated_weights = zipf_cum_weights(len(RATED), skew)
+        self._country_weights = zipf_cum_weights(len(COUNTRIES), skew)
+        self._language_weights = zipf_cum_weights(len(LANGUAGES), skew)
+        self._cast_weights = zipf_cum_weights(self.cast_pool, skew)
+        # More films were made in recent years: weight grows linearly with year
+        self._years = list(range(MIN_YEAR, MAX_YEAR + 1))
+        self._year_weights = list(accumulate(1 + i / 10 for i in range(len(self._years))))
+
+    @property
+    def batches(self):
+        return (self.count + self.batch_size - 1) // self.batch_size
+
+    def batch_bounds(self, batch):
+        start = batch * self.batch_size
+        return start, min(start + self.batch_size, self.count)
+
+    def generate_batch(self, batch):
+        """Documents of batch `batch`, identical for every call with the same spec"""
+        start, stop = self.batch_bounds(batch)
+        n = stop - start
+        if n <= 0:
+            return []
+        rng = batch_rng(self.seed, batch)
+        choices = rng.choices
+
+        years = choices(self._years, cum_weights=self._year_weights, k=n)
+        genre_counts = choices((1, 2, 3), weights=(5, 3, 2), k=n)
+        genres = choices(GENRES, cum_weights=self._genre_weights, k=sum(genre_counts))
+        cast_counts = choices((1, 2, 3, 4), weights=(1, 2, 3, 4), k=n)
+        cast = choices(range(self.cast_pool), cum_weights=self._cast_weights, k=sum(cast_counts))
+        rated = choices(RATED, cum_weights=self._rated_weights, k=n)
+        countries = choices(COUNTRIES, cum_weights=self._country_weights, k=n)
+        languages = choices(LANGUAGES, cum_weights=self._language_weights, k=n)
+        words = choices(_TITLE_WORDS, k=2 * n)
+        gauss, randint, random = rng.gauss, rng.randint, rng.random
+
+        documents = []
+        g = c = 0
+        for i in range(n):
+            index = start + i
+            movie_genres = list(dict.fromkeys(genres[g:g + genre_counts[i]]))
+            g += genre_counts[i]
+            movie_cast = [f"Actor {member:07d}" for member in dict.fromkeys(cast[c:c + cast_counts[i]])]
+            c += cast_counts[i]
+            rating = round(min(10.0, max(1.0, gauss(6.6, 1.1))), 1)
+            votes = int(10 ** (1 + 4 * random()))
+            nominations = int(random() ** 4 * 30)
+            wins = randint(0, nominations)
+            viewer_rating = round(min(5.0, max(0.0, rating / 2 + gauss(0, 0.4))), 1)
+            documents.append({
+                "_id": object_id(self.seed, index),
+                "title": f"The {words[2 * i]} {words[2 * i + 1]} {index}",
+                "year": years[i],
+                "runtime": randint(60, 200),
+                "rated": rated[i],
+                "type": "movie",
+                "genres": movie_genres,
+                "cast": movie_cast,
+                "countries": [countries[i]],
+                "languages": [languages[i]],
+                "num_mflix_comments": randint(0, 20),
+                "imdb": {"rating": rating, "votes": votes, "id": index + 1},
+                "awards": {"wins": wins, "nominations": nominations,
+                           "text": f"{wins} wins & {nominations} nominations."},
+                "tomatoes": {"viewer": {"rating": viewer_rating, "numReviews": votes // 10,
+                                        "meter": int(viewer_rating * 20)}},
+            })
+        return documents
+
+    def generate(self):
+        """Every document of the dataset, batch by batch"""
+        for batch in range(self.batches):
+            yield from self.generate_batch(batch)
+
+
+# The worker process's MovieSpec, built once by _init_worker from the spec's arguments
+# (pickling the spec would ship its cumulative weight tables with every task)
+_worker_spec = None
+
+
+def _init_worker(count, seed, skew, batch_size):
+    """Process-pool initializer: rebuild the MovieSpec in this worker"""
+    global _worker_spec
+    _worker_spec = MovieSpec(count, seed=seed, skew=skew, batch_size=batch_size)
+
+
+def _load_batches(batches, database, collection):
+    """Process-pool task: generate and insert `batches` with unordered insert_many"""
+    from src.framework.database.client import get_db
+
+    target = get_db(database)[collection]
+    inserted = 0
+    for batch in batches:
+        inserted += len(target.insert_many(_worker_spec.generate_batch(batch), ordered=False).inserted_ids)
+    return inserted
+
+
+def load_movies(spec, database=None, collection="movies", processes=None, drop=False, chunk=4):
+    """Generate `spec` and bulk-load it across a process pool; returns documents inserted"""
+    from src.framework.database.client import get_db
+
+    if drop:
+        get_db(database).drop_collection(collection)
+    processes = processes or os.cpu_count() or 1
+    batches = list(range(spec.batches))
+    tasks = [batches[i:i + chunk] for i in range(0, len(batches), chunk)]
+    started = time.perf_counter()
+    inserted = 0
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(spec.count, spec.seed, spec.skew, spec.batch_size)) as executor:
+        futures = [executor.submit(_load_batches, task, database, collection) for task in tasks]
+        for future in as_completed(futures):
+            inserted += future.result()
+    elapsed = time.perf_counter() - started
+    print(f"Log: Loaded {inserted} documents into {collection} in {elapsed:.1f}s "
+          f"({inserted / elapsed if elapsed else 0:.0f} docs/s, {processes} processes)")
+    return inserted
+
+
+class GrowingDataset:
+    """Grows a collection to ever larger sizes with the documents of one MovieSpec
+
+    Calling it with a size inserts only the documents still missing, so a
+    scaling run measures every size of a geometric series on one collection,
+    with its indexes maintained as it grows.
+    """
+
+    def __init__(self, collection, max_size, seed=0, skew=1.1, batch_size=10000, drop=True):
+        self.collection = collection
+        self.spec = MovieSpec(max_size, seed=seed, skew=skew, batch_size=batch_size)
+        self.size = 0
+        if drop:
+            collection.drop()
+
+    def __call__(self, size):
+        if size > self.spec.count:
+            raise ValueError(f"size {size} exceeds the dataset's {self.spec.count} documents")
+        while self.size < size:
+            batch = self.size // self.spec.batch_size
+            start, _ = self.spec.batch_bounds(batch)
+            documents = self.spec.generate_batch(batch)[self.size - start:size - start]
+            self.collection.insert_many(documents, ordered=False)
+            self.size += len(documents)
+        return self.size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.framework.data.movies",
+                                     description="Generate and load a synthetic movies collection")
+    parser.add_argument("--count", type=int, default=100000, help="number of documents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of categorical fields")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--processes", type=int, help="loader processes (default: CPU count)")
+    parser.add_argument("--db", help="target database (default: configured)")
+    parser.add_argument("--collection", default="movies")
+    parser.add_argument("--drop", action="store_true", help="drop the collection first")
+    args = parser.parse_args(argv)
+
+    spec = MovieSpec(args.count, seed=args.seed, skew=args.skew, batch_size=args.batch_size)
+    inserted = load_movies(spec, database=args.db, collection=args.collection,
+                           processes=args.processes, drop=args.drop)
+    return 0 if inserted == args.count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,252 @@
-from pymongo import MongoClient
+# MongoDB connection management
+#
+# Nothing here touches the network or the config file at import time. The
+# client is created on first use and cached per process, so every pytest-xdist
+# worker (and every forked loader process) gets exactly one pooled client that
+# is shared by all tests running in it.
+from pymongo import MongoClient, monitoring
 import yaml
 import os
+import threading
 
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 
-config_path = os.path.join(PROJECT_ROOT, "config", "config.yaml")
-# Load config
-with open(config_path) as f:
-    config = yaml.safe_load(f)
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "config", "config.yaml")
 
-client = MongoClient(config["mongo_uri"])
-db = client[config["database"]]
+# Environment overrides, in the same units as the matching config.yaml keys
+ENV_OVERRIDES = {
+    "MONGODB_URI": "mongo_uri",
+    "MONGODB_DATABASE": "database",
+}
+CLIENT_ENV_OVERRIDES = {
+    "MONGODB_MAX_POOL_SIZE": ("max_pool_size", int),
+    "MONGODB_MIN_POOL_SIZE": ("min_pool_size", int),
+    "MONGODB_SERVER_SELECTION_TIMEOUT_MS": ("server_selection_timeout_ms", int),
+    "MONGODB_CONNECT_TIMEOUT_MS": ("connect_timeout_ms", int),
+    "MONGODB_WAIT_QUEUE_TIMEOUT_MS": ("wait_queue_timeout_ms", int),
+    "MONGODB_COMPRESSORS": ("compressors", str),
+}
+
+# config.yaml `client:` keys -> MongoClient keyword arguments
+CLIENT_OPTIONS = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "compressors": "compressors",
+}
+
+_lock = threading.Lock()
+_config = None
+_client = None
+_client_pid = None
+_pool_monitor = None
+
+
+def load_config(reload=False):
+    """Return config.yaml merged with environment overrides (read once)"""
+    global _config
+    if _config is not None and not reload:
+        return _config
+
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f) or {}
+
+    for env_name, key in ENV_OVERRIDES.items():
+        if os.environ.get(env_name):
+            config[key] = os.environ[env_name]
+
+    client_config = dict(config.get("client") or {})
+    for env_name, (key, cast) in CLIENT_ENV_OVERRIDES.items():
+        if os.environ.get(env_name):
+            client_config[key] = cast(os.environ[env_name])
+    config["client"] = client_config
+
+    _config = config
+    return _config
+
+
+def client_options(config=None):
+    """Translate the `client:` config section into MongoClient keyword arguments"""
+    config = config or load_config()
+    options = {}
+    for key, value in (config.get("client") or {}).items():
+        if key not in CLIENT_OPTIONS:
+            raise ValueError(f"Unknown client option in config.yaml: {key}")
+        if value is None or value == "" or value == []:
+            continue
+        if key == "compressors" and isinstance(value, (list, tuple)):
+            value = ",".join(value)
+        options[CLIENT_OPTIONS[key]] = value
+    return options
+
+
+class PoolCheckoutMonitor(monitoring.ConnectionPoolListener):
+    """Records how long operations wait to check a connection out of the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.waits_ms = []
+            self.failures = 0
+
+    def connection_checked_out(self, event):
+        if event.duration is not None:
+            with self._lock:
+                self.waits_ms.append(event.duration * 1000)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures += 1
+            if event.duration is not None:
+                self.waits_ms.append(event.duration * 1000)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self.waits_ms)
+            failures = self.failures
+        if not waits:
+            return {"checkouts": 0, "failures": failures}
+        return {
+            "checkouts": len(waits),
+            "failures": failures,
+            "mean_ms": sum(waits) / len(waits),
+            "p50_ms": waits[int(0.50 * (len(waits) - 1))],
+            "p95_ms": waits[int(0.95 * (len(waits) - 1))],
+            "max_ms": waits[-1],
+        }
+
+    # The remaining pool events are not needed for wait-time accounting
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _client, _client_pid, _pool_monitor
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            # A client inherited through fork() must not be reused by the child
+            config = load_config()
+            _pool_monitor = PoolCheckoutMonitor()
+            _client = MongoClient(
+                config["mongo_uri"],
+                event_listeners=[_pool_monitor],
+                **client_options(config)
+            )
+            _client_pid = pid
+    return _client
+
+
+def worker_id():
+    """The pytest-xdist worker id ("gw0", "gw1", ...) or None for serial runs"""
+    return os.environ.get("PYTEST_XDIST_WORKER")
+
+
+def source_database_name():
+    """The configured database that holds the reference test data"""
+    return load_config()["database"]
+
+
+def test_database_name():
+    """The database tests should use: a per-worker copy in parallel runs"""
+    config = load_config()
+    worker = worker_id()
+    if worker and (config.get("parallel") or {}).get("isolate_workers", True):
+        return f"{config['database']}_{worker}"
+    return config["database"]
+
+
+def get_db(name=None):
+    """Return the test database (or `name`) on the shared client"""
+    return get_client()[name or test_database_name()]
+
+
+def pool_stats():
+    """Checkout wait statistics for the current process's pool"""
+    if _pool_monitor is None or _client_pid != os.getpid():
+        return {"checkouts": 0, "failures": 0}
+    return _pool_monitor.stats()
+
+
+def reset_pool_stats():
+    if _pool_monitor is not None:
+        _pool_monitor.reset()
+
+
+def close_client():
+    """Close the shared client; the next get_client() call opens a new one"""
+    global _client, _client_pid, _pool_monitor
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _pool_monitor = None
+
+
+class _LazyProxy:
+    """Stands in for an object that is only created when first used"""
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+    def __getitem__(self, key):
+        return self._factory()[key]
+
+    def __eq__(self, other):
+        return self._factory() == other
+
+    def __hash__(self):
+        return hash(self._factory())
+
+    def __repr__(self):
+        return f"<lazy {self._factory.__name__}()>"
+
+
+# Backwards-compatible module attributes: `from ...client import db` still works,
+# but the connection is only opened when a collection is first touched.
+client = _LazyProxy(get_client)
+db = _LazyProxy(get_db)
+
+
+def __getattr__(name):
+    if name == "config":
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,224 @@
+# Local sharded cluster
+#
+# Production clusters are sharded, and whether mongos can target one shard or
+# must scatter to all of them decides a query's cost more than the plan each
+# shard picks. LocalShardedCluster starts a throwaway cluster on one machine:
+#   - a one-member config server replica set
+#   - `shards` one-member shard replica sets
+#   - one mongos, with every shard added
+# from the mongod/mongos binaries on PATH (or `topology.bin_dir`), each with
+# its own dbpath and log file under a temporary directory. shard_collection()
+# then shards a collection on a configurable key and, for ranged keys, splits
+# it at given points and moves the chunks so every shard owns a range.
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.framework.database.client import load_config
+
+CONFIG_REPLICA_SET = "configRS"
+
+
+def topology_config():
+    """The `topology:` config section with defaults; SHARDED_MONGOS_URI and MONGODB_BIN_DIR override it"""
+    section = load_config().get("topology") or {}
+    return {
+        "mongos_uri": os.environ.get("SHARDED_MONGOS_URI") or section.get("mongos_uri") or None,
+        "bin_dir": os.environ.get("MONGODB_BIN_DIR") or section.get("bin_dir") or None,
+        "base_port": int(section.get("base_port", 28017)),
+        "shards": int(section.get("shards", 2)),
+        "data_dir": section.get("data_dir") or None,
+        "startup_timeout_s": float(section.get("startup_timeout_s", 60)),
+        "collections": section.get("collections") or {"movies": {"key": {"year": 1}}},
+    }
+
+
+def find_binary(name, bin_dir=None):
+    """Path of the `name` executable in `bin_dir`, or on PATH when bin_dir is None"""
+    if bin_dir:
+        path = os.path.join(bin_dir, name)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(name)
+
+
+def missing_binaries(bin_dir=None):
+    return [name for name in ("mongod", "mongos") if find_binary(name, bin_dir) is None]
+
+
+def _direct_client(port, timeout_ms=1000):
+    return MongoClient(f"mongodb://localhost:{port}", directConnection=True,
+                       serverSelectionTimeoutMS=timeout_ms, connectTimeoutMS=timeout_ms)
+
+
+class LocalShardedCluster:
+    """Config server replica set, `shards` shard replica sets and a mongos on consecutive ports
+
+        with LocalShardedCluster(shards=2) as cluster:
+            client = MongoClient(cluster.uri)
+    """
+
+    def __init__(self, shards=2, base_port=28017, bin_dir=None, data_dir=None, startup_timeout_s=60):
+        missing = missing_binaries(bin_dir)
+        if missing:
+            raise FileNotFoundError(f"MongoDB binaries not found: {missing}")
+        self.shards = shards
+        self.base_port = base_port
+        self.bin_dir = bin_dir
+        self.startup_timeout_s = startup_timeout_s
+        self._owns_data_dir = data_dir is None
+        self.data_dir = data_dir
+        self.mongos_port = base_port + shards + 1
+        self.shard_names = [f"shard{i}" for i in range(shards)]
+        self._processes = []
+
+    @property
+    def uri(self):
+        return f"mongodb://localhost:{self.mongos_port}"
+
+    def _spawn(self, name, binary, port, args):
+        log_path = os.path.join(self.data_dir, f"{name}.log")
+        command = [find_binary(binary, self.bin_dir), "--port", str(port), "--bind_ip", "127.0.0.1",
+                   "--logpath", log_path] + args
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        self._processes.append((name, process, log_path))
+        self._wait_ready(name, process, port, log_path)
+
+    def _start_mongod(self, name, port, args):
+        dbpath = os.path.join(self.data_dir, name)
+        os.makedirs(dbpath, exist_ok=True)
+        self._spawn(name, "mongod", port, ["--dbpath", dbpath] + args)
+
+    def _wait_ready(self, name, process, port, log_path):
+        deadline = time.monotonic() + self.startup_timeout_s
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} exited with code {process.returncode}; see {log_path}")
+            try:
+                with _direct_client(port) as client:
+                    client.admin.command("ping")
+                return
+            except PyMongoError:
+                time.sleep(0.2)
+        raise RuntimeError(f"{name} did not accept connections within {self.startup_timeout_s}s; see {log_path}")
+
+    def _initiate(self, port, replica_set, configsvr=False):
+        """Initiate a one-member replica set and wait for it to elect itself"""
+        config = {"_id": replica_set, "members": [{"_id": 0, "host": f"localhost:{port}"}]}
+        if configsvr:
+            config["configsvr"] = True
+        deadline = time.monotonic() + self.startup_timeout_s
+        with _direct_client(port) as client:
+            client.admin.command("replSetInitiate", config)
+            while time.monotonic() < deadline:
+                if client.admin.command("hello").get("isWritablePrimary"):
+                    return
+                time.sleep(0.2)
+        raise RuntimeError(f"{replica_set} elected no primary within {self.startup_timeout_s}s")
+
+    def start(self):
+        if self._owns_data_dir:
+            self.data_dir = tempfile.mkdtemp(prefix="queryengine-cluster-")
+        print(f"Log: Starting a {self.shards}-shard cluster in {self.data_dir}, mongos on {self.mongos_port}")
+        try:
+            self._start_mongod("config", self.base_port, ["--configsvr", "--replSet", CONFIG_REPLICA_SET])
+            self._initiate(self.base_port, CONFIG_REPLICA_SET, configsvr=True)
+            for i, name in enumerate(self.shard_names):
+                port = self.base_port + 1 + i
+                self._start_mongod(name, port, ["--shardsvr", "--replSet", name])
+                self._initiate(port, name)
+            self._spawn("mongos", "mongos", self.mongos_port,
+                        ["--configdb", f"{CONFIG_REPLICA_SET}/localhost:{self.base_port}"])
+            with MongoClient(self.uri, serverSelectionTimeoutMS=10000) as client:
+                for i, name in enumerate(self.shard_names):
+                    client.admin.command("addShard", f"{name}/localhost:{self.base_port + 1 + i}", name=name)
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def stop(self):
+        """Stop mongos, then the shards, then the config server; remove a temporary data dir"""
+        for name, process, _ in reversed(self._processes):
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    print(f"Log: {name} did not stop in 30s, killing it")
+                    process.kill()
+                    process.wait()
+        self._processes = []
+        if self._owns_data_dir and self.data_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+            self.data_dir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def shard_names(client):
+    return [shard["_id"] for shard in client.admin.command("listShards")["shards"]]
+
+
+def primary_shard(client, database):
+    """The shard holding `database`'s unsharded data, and every chunk of a newly sharded collection"""
+    entry = client["config"]["databases"].find_one({"_id": database}) or {}
+    return entry.get("primary")
+
+
+def shard_collection(client, namespace, key, split_points=None):
+    """Shard `namespace` on `key`; split ranged keys at `split_points` and spread the chunks
+
+    Shards are ordered starting at the database's primary shard, where every
+    chunk starts out. Chunk 0 stays there and chunk i+1 (the range starting at
+    split_points[i]) moves to shard (i+1) % shards in that order, so with one
+    split point on two shards each shard owns one range.
+    """
+    database = namespace.split(".", 1)[0]
+    try:
+        client.admin.command("enableSharding", database)
+    except OperationFailure as e:
+        # Already enabled (older servers) is fine
+        if e.code != 23:
+            raise
+    client.admin.command("shardCollection", namespace, key=key)
+    shards = shard_names(client)
+    primary = primary_shard(client, database)
+    if primary in shards:
+        start = shards.index(primary)
+        shards = shards[start:] + shards[:start]
+    for i, middle in enumerate(split_points or ()):
+        client.admin.command("split", namespace, middle=middle)
+        target = shards[(i + 1) % len(shards)]
+        try:
+            client.admin.command("moveChunk", namespace, find=middle, to=target, _waitForDelete=True)
+        except OperationFailure as e:
+            # The chunk may already live on the target shard
+            if "already" not in str(e):
+                raise
+    print(f"Log: Sharded {namespace} on {key} at {list(split_points or [])} across {shards}")
+
+
+def copy_documents(source, target, batch_size=1000):
+    """Copy every document of `source` into `target` (e.g. from a standalone into mongos)"""
+    copied = 0
+    batch = []
+    for document in source.find(batch_size=batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            target.insert_many(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+    if batch:
+        target.insert_many(batch, ordered=False)
+        copied += len(batch)
+    return copied
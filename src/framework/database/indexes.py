@@ -0,0 +1,195 @@
+# Index lifecycle manager
+#
+# Plan comparisons ("with" vs "without" an index) used to drop and rebuild
+# the index, a full index build each time on large collections. IndexManager
+# builds each index at most once (ensure() is idempotent) and switches plans
+# by hiding and unhiding it with collMod, which takes effect immediately and
+# clears the collection's plan cache. Indexes a manager creates are recorded in
+# a module registry and removed on exit, including when the test fails.
+# Listeners are told about every catalog change, so caches keyed on the index
+# catalog (e.g. explain caches) can invalidate themselves.
+from contextlib import contextmanager
+
+from pymongo.errors import OperationFailure
+
+# Server error code for dropping or modifying an index that does not exist
+_INDEX_NOT_FOUND = 27
+
+# Indexes created by live IndexManagers: {namespace: {name: key}}
+_registry = {}
+_listeners = []
+
+
+def add_index_listener(callback):
+    """Call `callback(event, collection, name)` on created/dropped/hidden/unhidden"""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_index_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _notify(event, collection, name):
+    for callback in list(_listeners):
+        callback(event, collection, name)
+
+
+def owned_indexes(namespace=None):
+    """Indexes currently owned by managers, as {namespace: {name: key}}"""
+    if namespace is not None:
+        return {namespace: dict(_registry.get(namespace, {}))}
+    return {ns: dict(indexes) for ns, indexes in _registry.items()}
+
+
+def normalize_keys(keys):
+    """Key pattern as a list of (field, direction) pairs, whatever form it was given in"""
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    if hasattr(keys, "items"):
+        return list(keys.items())
+    return [tuple(pair) for pair in keys]
+
+
+# Catalog fields that do not define an index: two indexes differing only in these are the same index
+_NON_DEFINING_FIELDS = ("v", "key", "name", "ns", "hidden", "background")
+
+
+def _defining_options(options):
+    return {k: v for k, v in options.items() if k not in _NON_DEFINING_FIELDS}
+
+
+def default_index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in normalize_keys(keys))
+
+
+class IndexManager:
+    """Creates, hides and drops indexes on one collection, undoing it all on exit
+
+        with IndexManager(db.movies) as indexes:
+            name = indexes.ensure([("year", 1)], name="test_year_idx")
+            with indexes.hidden(name):
+                ...  # plans as if the index did not exist
+    """
+
+    def __init__(self, collection, keep=False):
+        self.collection = collection
+        self.namespace = collection.full_name
+        self.keep = keep
+        self.created = []
+        # Indexes this manager hid, with the hidden flag they had before
+        self._hidden = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Don't let a teardown error mask the test failure that got us here
+        self.close(raise_errors=exc_type is None)
+        return False
+
+    def catalog(self):
+        """Current indexes of the collection, keyed by name"""
+        return {index["name"]: index for index in self.collection.list_indexes()}
+
+    def ensure(self, keys, name=None, **options):
+        """Create the index unless an identical one exists; returns its name
+
+        An index with the same key and options under another name is reused
+        (the server would refuse to build a second one) and its name returned,
+        so callers must use the returned name rather than the one they asked for.
+        """
+        keys = normalize_keys(keys)
+        name = name or default_index_name(keys)
+        catalog = self.catalog()
+        existing = catalog.get(name)
+        if existing is not None:
+            if list(existing["key"].items()) != keys:
+                raise ValueError(f"Index {name} already exists with key {dict(existing['key'])}, "
+                                 f"not {dict(keys)}")
+        else:
+            existing = next((index for index in catalog.values()
+                             if list(index["key"].items()) == keys
+                             and _defining_options(index) == _defining_options(options)), None)
+        if existing is not None:
+            if existing.get("hidden") and not options.get("hidden"):
+                self.unhide(existing["name"])
+            return existing["name"]
+        print(f"Log: Creating index {name} on {self.namespace}: {dict(keys)}")
+        self.collection.create_index(keys, name=name, **options)
+        self.created.append(name)
+        _registry.setdefault(self.namespace, {})[name] = keys
+        _notify("created", self.collection, name)
+        return name
+
+    def _set_hidden(self, name, hidden):
+        self.collection.database.command("collMod", self.collection.name,
+                                         index={"name": name, "hidden": hidden})
+        _notify("hidden" if hidden else "unhidden", self.collection, name)
+
+    def is_hidden(self, name):
+        index = self.catalog().get(name)
+        if index is None:
+            raise KeyError(f"No index {name} on {self.namespace}")
+        return bool(index.get("hidden", False))
+
+    def hide(self, name):
+        """Hide an index from the planner without dropping it"""
+        if name not in self._hidden:
+            self._hidden[name] = self.is_hidden(name)
+        self._set_hidden(name, True)
+
+    def unhide(self, name):
+        if name not in self._hidden:
+            self._hidden[name] = self.is_hidden(name)
+        self._set_hidden(name, False)
+
+    @contextmanager
+    def hidden(self, *names):
+        """Hide `names` for the duration of the block, then restore their previous state"""
+        previous = {name: self.is_hidden(name) for name in names}
+        for name in names:
+            self.hide(name)
+        try:
+            yield
+        finally:
+            for name, was_hidden in previous.items():
+                if not was_hidden:
+                    self._set_hidden(name, False)
+
+    def drop(self, name):
+        """Drop an index now; a no-op if it is already gone"""
+        try:
+            self.collection.drop_index(name)
+        except OperationFailure as e:
+            if e.code != _INDEX_NOT_FOUND:
+                raise
+        if name in self.created:
+            self.created.remove(name)
+        _registry.get(self.namespace, {}).pop(name, None)
+        self._hidden.pop(name, None)
+        _notify("dropped", self.collection, name)
+
+    def close(self, raise_errors=True):
+        """Restore hidden flags and drop created indexes, continuing past individual failures"""
+        errors = []
+        for name, was_hidden in list(self._hidden.items()):
+            if name in self.created:
+                continue
+            try:
+                if self.is_hidden(name) != was_hidden:
+                    self._set_hidden(name, was_hidden)
+            except (KeyError, OperationFailure) as e:
+                errors.append(f"{name}: {e}")
+        self._hidden.clear()
+        if not self.keep:
+            for name in reversed(list(self.created)):
+                try:
+                    self.drop(name)
+                except OperationFailure as e:
+                    errors.append(f"{name}: {e}")
+        if errors and not raise_errors:
+            print(f"Log: Index teardown on {self.namespace} failed: {'; '.join(errors)}")
+        elif errors:
+            raise RuntimeError(f"Index teardown on {self.namespace} failed: {'; '.join(errors)}")
@@ -0,0 +1,308 @@
+# Per-test server-side resource instrumentation
+#
+# A client-side timing says a query was slow, not why. ServerInstrumentation
+# snapshots the server around a block (usually one test) and reports deltas:
+#   - serverStatus: opcounters, WiredTiger cache reads/writes, block-manager
+#     bytes read, execution tickets in use, lock acquisition waits, documents
+#     and keys scanned
+#   - dbStats and $collStats storageStats: data/index sizes and, per
+#     collection and per index, bytes read into the WiredTiger cache
+#   - profiler entries for the block's operations: time, keys/docs examined,
+#     yields, lock waits and storage bytes/time read from disk, per operation
+# diagnosis() turns the deltas into short findings ("cold cache: 48.0 MB read
+# into cache", "lock waits: 12.3 ms") so a slow index scan can be traced to a
+# cold cache, disk I/O or lock contention.
+#
+# serverStatus is server-wide, so with parallel workers its deltas include the
+# other workers' traffic; dbStats, $collStats and the profiler are per database.
+import os
+
+from pymongo.errors import OperationFailure
+
+from src.framework.database.client import load_config
+from src.framework.database.profiler import profile_entries, profiling
+
+# serverStatus paths that count events (reported as deltas)
+SERVER_COUNTERS = {
+    "opcounters.query": ("opcounters", "query"),
+    "opcounters.getmore": ("opcounters", "getmore"),
+    "opcounters.command": ("opcounters", "command"),
+    "opcounters.insert": ("opcounters", "insert"),
+    "opcounters.update": ("opcounters", "update"),
+    "opcounters.delete": ("opcounters", "delete"),
+    "cache.bytes_read_into": ("wiredTiger", "cache", "bytes read into cache"),
+    "cache.bytes_written_from": ("wiredTiger", "cache", "bytes written from cache"),
+    "cache.pages_read_into": ("wiredTiger", "cache", "pages read into cache"),
+    "cache.pages_requested": ("wiredTiger", "cache", "pages requested from the cache"),
+    "cache.pages_evicted_app_threads": ("wiredTiger", "cache", "pages evicted by application threads"),
+    "disk.bytes_read": ("wiredTiger", "block-manager", "bytes read"),
+    "disk.bytes_written": ("wiredTiger", "block-manager", "bytes written"),
+    "scan.keys": ("metrics", "queryExecutor", "scanned"),
+    "scan.docs": ("metrics", "queryExecutor", "scannedObjects"),
+    "documents.returned": ("metrics", "document", "returned"),
+}
+
+# serverStatus paths that are levels rather than counts (reported before/after)
+SERVER_GAUGES = {
+    "cache.bytes_in_cache": ("wiredTiger", "cache", "bytes currently in the cache"),
+    "cache.max_bytes": ("wiredTiger", "cache", "maximum bytes configured"),
+    "cache.dirty_bytes": ("wiredTiger", "cache", "tracked dirty bytes in the cache"),
+    # 7.0+ reports execution tickets under queues.execution, older servers under
+    # wiredTiger.concurrentTransactions
+    "tickets.read_out": ("queues", "execution", "read", "out"),
+    "tickets.read_available": ("queues", "execution", "read", "available"),
+    "tickets.write_out": ("queues", "execution", "write", "out"),
+    "tickets.write_available": ("queues", "execution", "write", "available"),
+    "tickets.legacy_read_out": ("wiredTiger", "concurrentTransactions", "read", "out"),
+    "tickets.legacy_read_available": ("wiredTiger", "concurrentTransactions", "read", "available"),
+    "tickets.legacy_write_out": ("wiredTiger", "concurrentTransactions", "write", "out"),
+    "tickets.legacy_write_available": ("wiredTiger", "concurrentTransactions", "write", "available"),
+    "queue.waiting": ("globalLock", "currentQueue", "total"),
+}
+
+# Lock resources whose acquisition waits are summed
+LOCK_RESOURCES = ("Global", "Database", "Collection")
+
+# Findings are only reported above these deltas
+COLD_CACHE_BYTES = 1024 * 1024
+DISK_READ_BYTES = 1024 * 1024
+LOCK_WAIT_MICROS = 1000
+
+
+def instrumentation_config():
+    """The `instrumentation:` config section with defaults; INSTRUMENT_TESTS=0 turns it off"""
+    config = load_config()
+    section = config.get("instrumentation") or {}
+    enabled = bool(section.get("enabled", True))
+    if os.environ.get("INSTRUMENT_TESTS"):
+        enabled = os.environ["INSTRUMENT_TESTS"].lower() not in ("0", "false", "no")
+    return {
+        "enabled": enabled,
+        "profile": bool(section.get("profile", False)),
+        "collections": section.get("collections") or (config.get("snapshot") or {}).get("collections")
+        or ["movies"],
+    }
+
+
+def _lookup(document, path):
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return None
+        document = document[key]
+    return document if isinstance(document, (int, float)) and not isinstance(document, bool) else None
+
+
+def server_metrics(status):
+    """Selected counters and gauges from a serverStatus document, as flat dicts"""
+    counters = {name: _lookup(status, path) for name, path in SERVER_COUNTERS.items()}
+    gauges = {name: _lookup(status, path) for name, path in SERVER_GAUGES.items()}
+    wait_micros = wait_count = 0
+    for resource in LOCK_RESOURCES:
+        lock = (status.get("locks") or {}).get(resource) or {}
+        wait_micros += sum((lock.get("timeAcquiringMicros") or {}).values())
+        wait_count += sum((lock.get("acquireWaitCount") or {}).values())
+    counters["locks.wait_micros"] = wait_micros
+    counters["locks.wait_count"] = wait_count
+    return ({k: v for k, v in counters.items() if v is not None},
+            {k: v for k, v in gauges.items() if v is not None})
+
+
+def storage_stats(db, collections):
+    """dbStats sizes plus per-collection and per-index cache reads from $collStats"""
+    db_stats = db.command("dbStats")
+    stats = {"db": {key: db_stats.get(key) for key in
+                    ("objects", "dataSize", "storageSize", "indexSize")}, "collections": {}}
+    for name in collections:
+        try:
+            entry = next(iter(db[name].aggregate([{"$collStats": {"storageStats": {}}}])), None)
+        except OperationFailure:
+            entry = None
+        if entry is None:
+            continue
+        storage = entry.get("storageStats") or {}
+        indexes = {}
+        for index_name, details in (storage.get("indexDetails") or {}).items():
+            indexes[index_name] = (details.get("cache") or {}).get("bytes read into cache", 0)
+        stats["collections"][name] = {
+            "count": storage.get("count"),
+            "size": storage.get("size"),
+            "storageSize": storage.get("storageSize"),
+            "totalIndexSize": storage.get("totalIndexSize"),
+            "bytes_read_into_cache": ((storage.get("wiredTiger") or {}).get("cache") or {})
+            .get("bytes read into cache", 0),
+            "index_bytes_read_into_cache": indexes,
+        }
+    return stats
+
+
+def storage_deltas(before, after):
+    """dbStats size changes, and cache reads and size changes per collection and index"""
+    deltas = {"db": {key: (value or 0) - (before["db"].get(key) or 0) for key, value in after["db"].items()},
+              "collections": {}}
+    for name, stats in after["collections"].items():
+        old = before["collections"].get(name)
+        if old is None:
+            continue
+        indexes = {index: reads - old["index_bytes_read_into_cache"].get(index, 0)
+                   for index, reads in stats["index_bytes_read_into_cache"].items()}
+        deltas["collections"][name] = {
+            "bytes_read_into_cache": stats["bytes_read_into_cache"] - old["bytes_read_into_cache"],
+            "index_bytes_read_into_cache": {k: v for k, v in indexes.items() if v},
+            "count": (stats["count"] or 0) - (old["count"] or 0),
+            "totalIndexSize": (stats["totalIndexSize"] or 0) - (old["totalIndexSize"] or 0),
+        }
+    return deltas
+
+
+def summarize_profile(entries):
+    """Totals over profiler entries, plus a compact per-operation list"""
+    totals = {"operations": 0, "millis": 0, "keys_examined": 0, "docs_examined": 0,
+              "n_returned": 0, "yields": 0, "lock_wait_micros": 0,
+              "storage_bytes_read": 0, "storage_read_micros": 0}
+    operations = []
+    plans = set()
+    for entry in entries:
+        totals["operations"] += 1
+        totals["millis"] += entry.get("millis") or 0
+        totals["keys_examined"] += entry.get("keysExamined") or 0
+        totals["docs_examined"] += entry.get("docsExamined") or 0
+        totals["n_returned"] += entry.get("nreturned") or 0
+        totals["yields"] += entry.get("numYield") or 0
+        lock_wait = 0
+        for lock in (entry.get("locks") or {}).values():
+            lock_wait += sum((lock.get("timeAcquiringMicros") or {}).values())
+        totals["lock_wait_micros"] += lock_wait
+        data = (entry.get("storage") or {}).get("data") or {}
+        totals["storage_bytes_read"] += data.get("bytesRead") or 0
+        totals["storage_read_micros"] += data.get("timeReadingMicros") or 0
+        if entry.get("planSummary"):
+            plans.add(entry["planSummary"])
+        operations.append({
+            "op": entry.get("op"), "ns": entry.get("ns"), "millis": entry.get("millis"),
+            "plan": entry.get("planSummary"), "keys_examined": entry.get("keysExamined"),
+            "docs_examined": entry.get("docsExamined"), "n_returned": entry.get("nreturned"),
+            "lock_wait_micros": lock_wait, "bytes_read": data.get("bytesRead"),
+        })
+    totals["plans"] = sorted(plans)
+    return totals, operations
+
+
+def _mb(value):
+    return f"{value / (1024 * 1024):.1f} MB"
+
+
+class ResourceReport:
+    """Server-side resource deltas for one instrumented block"""
+
+    def __init__(self, counters, gauges_before, gauges_after, storage, profile, operations):
+        self.counters = counters
+        self.gauges_before = gauges_before
+        self.gauges_after = gauges_after
+        self.storage = storage
+        self.profile = profile
+        self.operations = operations
+
+    def diagnosis(self):
+        """Short findings pointing at cold cache, disk I/O, lock contention or ticket exhaustion"""
+        findings = []
+        cache_reads = self.counters.get("cache.bytes_read_into", 0)
+        if cache_reads >= COLD_CACHE_BYTES:
+            findings.append(f"cold cache: {_mb(cache_reads)} read into cache")
+        for name, stats in self.storage["collections"].items():
+            for index, reads in stats["index_bytes_read_into_cache"].items():
+                if reads >= COLD_CACHE_BYTES:
+                    findings.append(f"cold index {name}.{index}: {_mb(reads)} read into cache")
+        disk_reads = max(self.counters.get("disk.bytes_read", 0), self.profile.get("storage_bytes_read", 0))
+        if disk_reads >= DISK_READ_BYTES:
+            findings.append(f"disk I/O: {_mb(disk_reads)} read"
+                            + (f" in {self.profile['storage_read_micros'] / 1000:.1f} ms"
+                               if self.profile.get("storage_read_micros") else ""))
+        lock_wait = max(self.counters.get("locks.wait_micros", 0), self.profile.get("lock_wait_micros", 0))
+        if lock_wait >= LOCK_WAIT_MICROS:
+            findings.append(f"lock waits: {lock_wait / 1000:.1f} ms "
+                            f"({self.counters.get('locks.wait_count', 0)} waits)")
+        for kind in ("read", "write"):
+            available = self.gauges_after.get(f"tickets.{kind}_available",
+                                              self.gauges_after.get(f"tickets.legacy_{kind}_available"))
+            if available == 0:
+                findings.append(f"{kind} tickets exhausted")
+        if self.gauges_after.get("queue.waiting"):
+            findings.append(f"{self.gauges_after['queue.waiting']} operations queued for locks")
+        return findings
+
+    def as_dict(self):
+        return {
+            "counters": self.counters,
+            "gauges": {name: {"before": self.gauges_before.get(name), "after": value}
+                       for name, value in self.gauges_after.items()},
+            "storage": self.storage,
+            "profile": self.profile,
+            "diagnosis": self.diagnosis(),
+        }
+
+    def format(self, max_operations=10):
+        lines = []
+        changed = {name: value for name, value in sorted(self.counters.items()) if value}
+        lines.append("server: " + (", ".join(f"{name}={value:+g}" for name, value in changed.items())
+                                   or "no change"))
+        if self.gauges_after:
+            lines.append("gauges: " + ", ".join(
+                f"{name}={self.gauges_before.get(name)}->{value}" for name, value in sorted(self.gauges_after.items())))
+        changed_db = {key: value for key, value in self.storage["db"].items() if value}
+        if changed_db:
+            lines.append("dbStats: " + ", ".join(f"{key}={value:+g}" for key, value in changed_db.items()))
+        for name, stats in self.storage["collections"].items():
+            lines.append(f"collection {name}: bytes_read_into_cache={stats['bytes_read_into_cache']:+} "
+                         f"index_reads={stats['index_bytes_read_into_cache'] or '{}'}")
+        if self.profile.get("operations"):
+            p = self.profile
+            lines.append(f"profile: ops={p['operations']} millis={p['millis']} keys={p['keys_examined']} "
+                         f"docs={p['docs_examined']} returned={p['n_returned']} yields={p['yields']} "
+                         f"lock_wait_us={p['lock_wait_micros']} bytes_read={p['storage_bytes_read']} "
+                         f"plans={p['plans']}")
+            slowest = sorted(self.operations, key=lambda op: -(op["millis"] or 0))[:max_operations]
+            for op in slowest:
+                lines.append(f"  {op['millis']}ms {op['op']} {op['ns']} {op['plan']} "
+                             f"keys={op['keys_examined']} docs={op['docs_examined']} "
+                             f"returned={op['n_returned']} bytes_read={op['bytes_read']}")
+        lines.append("diagnosis: " + ("; ".join(self.diagnosis()) or "nothing notable"))
+        return "\n".join(lines)
+
+
+class ServerInstrumentation:
+    """Context manager that snapshots server resources around a block
+
+        with ServerInstrumentation(db, ["movies"]) as instrumentation:
+            run_query()
+        print(instrumentation.report.format())
+    """
+
+    def __init__(self, db, collections=(), profile=True):
+        self.db = db
+        self.collections = list(collections)
+        self.profile = profile
+        self.report = None
+        self._profiling = None
+        self._started = None
+
+    def __enter__(self):
+        self._status_before = server_metrics(self.db.command("serverStatus"))
+        self._storage_before = storage_stats(self.db, self.collections)
+        if self.profile:
+            self._profiling = profiling(self.db, level=2)
+            self._started = self._profiling.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        entries = []
+        if self._profiling is not None:
+            self._profiling.__exit__(exc_type, exc, tb)
+            namespaces = [f"{self.db.name}.{name}" for name in self.collections] or None
+            entries = list(profile_entries(self.db, since=self._started, namespaces=namespaces))
+        counters_before, gauges_before = self._status_before
+        counters_after, gauges_after = server_metrics(self.db.command("serverStatus"))
+        counters = {name: value - counters_before.get(name, 0) for name, value in counters_after.items()}
+        storage = storage_deltas(self._storage_before, storage_stats(self.db, self.collections))
+        profile, operations = summarize_profile(entries)
+        self.report = ResourceReport(counters, gauges_before, gauges_after, storage, profile, operations)
+        return False
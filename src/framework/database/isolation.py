@@ -0,0 +1,72 @@
+# Per-worker database isolation for parallel (pytest-xdist) runs
+#
+# Tests create, hide and drop indexes on the collections they use, so two
+# workers sharing `sample_mflix.movies` would corrupt each other's index
+# catalog. Each worker instead gets its own database with a server-side copy
+# of the collections it needs; the documents never travel through the client.
+from src.framework.database.client import (
+    get_client, load_config, source_database_name, test_database_name
+)
+
+# Index options that describe an existing index rather than how to build one
+_INDEX_SPEC_READ_ONLY_FIELDS = ("v", "ns")
+
+
+def index_specs(collection):
+    """Return createIndexes-ready specs for every secondary index on `collection`"""
+    specs = []
+    for index in collection.list_indexes():
+        if index["name"] == "_id_":
+            continue
+        spec = {k: v for k, v in index.items() if k not in _INDEX_SPEC_READ_ONLY_FIELDS}
+        specs.append(spec)
+    return specs
+
+
+def create_indexes_from_specs(collection, specs):
+    """Build indexes from raw specs (text and wildcard indexes included)"""
+    if specs:
+        collection.database.command("createIndexes", collection.name, indexes=specs)
+
+
+def clone_collection(source, target_db, name=None, with_indexes=True):
+    """Copy `source` into `target_db` server-side with $out, then copy its indexes"""
+    name = name or source.name
+    source.aggregate([{"$out": {"db": target_db.name, "coll": name}}])
+    if with_indexes:
+        create_indexes_from_specs(target_db[name], index_specs(source))
+    return target_db[name]
+
+
+def prepare_worker_database(collections=None):
+    """Clone the configured collections into this worker's private database
+
+    Returns the worker database, or the shared database unchanged when the run
+    is serial or worker isolation is disabled.
+    """
+    target_name = test_database_name()
+    source_name = source_database_name()
+    client = get_client()
+    if target_name == source_name:
+        return client[source_name]
+
+    config = load_config().get("parallel") or {}
+    if collections is None:
+        collections = config.get("collections") or ["movies"]
+
+    source_db = client[source_name]
+    target_db = client[target_name]
+    client.drop_database(target_name)
+    for name in collections:
+        print(f"Log: Cloning {source_name}.{name} into {target_name}.{name}")
+        clone_collection(source_db[name], target_db)
+    return target_db
+
+
+def cleanup_worker_database():
+    """Drop this worker's private database, if the config asks for it"""
+    target_name = test_database_name()
+    if target_name == source_database_name():
+        return
+    if (load_config().get("parallel") or {}).get("drop_on_exit", True):
+        get_client().drop_database(target_name)
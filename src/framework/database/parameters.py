@@ -0,0 +1,47 @@
+# Temporary server parameter changes
+#
+# Some behaviour can only be provoked by lowering server limits, e.g. making
+# $group and $sort spill to disk on a small collection. server_parameters()
+# sets parameters with setParameter for the duration of a block and restores
+# the previous values afterwards. Parameters the server does not know (they
+# differ between versions and engines) are skipped rather than failing.
+from contextlib import contextmanager
+
+from pymongo.errors import OperationFailure
+
+# Memory limits after which $group and blocking $sort spill (or fail without allowDiskUse)
+SPILL_PARAMETERS = (
+    "internalDocumentSourceGroupMaxMemoryBytes",
+    "internalQuerySlotBasedExecutionHashAggApproxMemoryUseInBytesBeforeSpill",
+    "internalQueryMaxBlockingSortMemoryUsageBytes",
+)
+
+
+def get_parameter(client, name):
+    """Current value of server parameter `name`, or None if the server does not know it"""
+    try:
+        return client.admin.command("getParameter", 1, **{name: 1}).get(name)
+    except OperationFailure:
+        return None
+
+
+@contextmanager
+def server_parameters(client, **parameters):
+    """Set server parameters for the block; yields the names that were actually applied"""
+    previous = {}
+    try:
+        for name, value in parameters.items():
+            current = get_parameter(client, name)
+            if current is None:
+                continue
+            client.admin.command("setParameter", 1, **{name: value})
+            previous[name] = current
+        yield list(previous)
+    finally:
+        for name, value in previous.items():
+            client.admin.command("setParameter", 1, **{name: value})
+
+
+def low_memory_limits(client, limit_bytes=1024):
+    """server_parameters() lowering every known $group/$sort memory limit to `limit_bytes`"""
+    return server_parameters(client, **{name: limit_bytes for name in SPILL_PARAMETERS})
@@ -0,0 +1,84 @@
+# Database profiler helpers
+#
+# Several tools read operations back from system.profile (workload capture,
+# plan-cache hit accounting, per-test instrumentation). They all go through
+# profiling(), which restores the previous level, slowms and sample rate on exit
+# so nested or concurrent users don't leave the profiler switched on.
+from contextlib import contextmanager
+from datetime import timezone
+
+# Size of the capped system.profile collection the server creates on demand
+DEFAULT_PROFILE_SIZE_BYTES = 1024 * 1024
+
+# Namespaces whose operations are bookkeeping rather than workload
+_INTERNAL_COLLECTIONS = ("system.profile", "system.indexes", "$cmd")
+
+
+def profiling_status(db):
+    """Current {"was", "slowms", "sampleRate"} profiler settings of `db`"""
+    status = db.command("profile", -1)
+    return {"was": status.get("was", 0), "slowms": status.get("slowms", 100),
+            "sampleRate": status.get("sampleRate", 1.0)}
+
+
+def server_time(db):
+    """The server's clock (hello.localTime), as an aware UTC datetime
+
+    Profile entry timestamps come from the server, so windows over
+    system.profile must not start from the client's clock.
+    """
+    local_time = db.command("hello")["localTime"]
+    return local_time if local_time.tzinfo else local_time.replace(tzinfo=timezone.utc)
+
+
+@contextmanager
+def profiling(db, level=2, slowms=None, sample_rate=None):
+    """Enable the profiler on `db` for the duration of the block"""
+    previous = profiling_status(db)
+    options = {}
+    if slowms is not None:
+        options["slowms"] = slowms
+    if sample_rate is not None:
+        options["sampleRate"] = sample_rate
+    db.command("profile", level, **options)
+    started = server_time(db)
+    try:
+        yield started
+    finally:
+        db.command("profile", previous["was"], slowms=previous["slowms"],
+                   sampleRate=previous["sampleRate"])
+
+
+def profile_collection_size(db):
+    """Capped size of system.profile in bytes (the server default when it does not exist yet)"""
+    return db["system.profile"].options().get("size") or DEFAULT_PROFILE_SIZE_BYTES
+
+
+def resize_profile_collection(db, size_bytes):
+    """Recreate system.profile as a capped collection of `size_bytes` (profiler must be off)"""
+    status = profiling_status(db)
+    db.command("profile", 0)
+    try:
+        db.drop_collection("system.profile")
+        db.create_collection("system.profile", capped=True, size=size_bytes)
+    finally:
+        db.command("profile", status["was"], slowms=status["slowms"], sampleRate=status["sampleRate"])
+
+
+def profile_entries(db, since=None, until=None, namespaces=None, ops=None, extra_filter=None):
+    """Profiler entries in timestamp order, optionally restricted by time, namespace and op type"""
+    query = dict(extra_filter or {})
+    if since is not None or until is not None:
+        query["ts"] = {}
+        if since is not None:
+            query["ts"]["$gte"] = since
+        if until is not None:
+            query["ts"]["$lte"] = until
+    if namespaces:
+        query["ns"] = {"$in": list(namespaces)}
+    else:
+        query["ns"] = {"$not": {"$regex": r"\.(" + "|".join(
+            name.replace(".", r"\.").replace("$", r"\$") for name in _INTERNAL_COLLECTIONS) + ")$"}}
+    if ops:
+        query["op"] = {"$in": list(ops)}
+    return db["system.profile"].find(query).sort("ts", 1)
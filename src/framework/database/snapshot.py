@@ -0,0 +1,138 @@
+# Database state snapshots for test isolation
+#
+# A snapshot records the index catalog of each fixture collection plus a
+# fingerprint of its data. After a test, restore() compares the live state
+# with the snapshot and undoes only the differences: indexes the test created
+# are dropped, indexes it dropped are rebuilt, hidden flags are flipped back
+# with collMod, and untouched indexes are never rebuilt. A collection whose
+# data changed is reset from a cached server-side copy ($out), which is far
+# cheaper than reloading the dataset from the client.
+from src.framework.database.client import load_config
+from src.framework.database.isolation import create_indexes_from_specs, index_specs
+
+# Spec fields that collMod can change in place instead of rebuilding the index
+_COLLMOD_FIELDS = ("hidden",)
+
+
+def snapshot_config():
+    """The `snapshot:` config section with defaults filled in"""
+    config = load_config()
+    section = config.get("snapshot") or {}
+    return {
+        "collections": section.get("collections") or (config.get("parallel") or {}).get("collections")
+        or ["movies"],
+        "hash_data": bool(section.get("hash_data", False)),
+        "cache_data": bool(section.get("cache_data", True)),
+    }
+
+
+def data_fingerprint(collection, hash_data=False):
+    """Document count, plus the dbHash md5 when `hash_data` (scans the whole collection)"""
+    fingerprint = {"count": collection.estimated_document_count()}
+    if hash_data:
+        result = collection.database.command("dbHash", collections=[collection.name])
+        fingerprint["md5"] = result["collections"].get(collection.name)
+    return fingerprint
+
+
+def _without_collmod_fields(spec):
+    return {k: v for k, v in spec.items() if k not in _COLLMOD_FIELDS}
+
+
+def diff_indexes(before, after):
+    """Changes that turn the catalog `after` back into `before` (both keyed by index name)
+
+    Returns (names to drop, specs to create, {name: hidden} to collMod).
+    """
+    to_drop, to_create, to_modify = [], [], {}
+    for name in after:
+        if name not in before:
+            to_drop.append(name)
+    for name, spec in before.items():
+        current = after.get(name)
+        if current is None:
+            to_create.append(spec)
+            continue
+        if current == spec:
+            continue
+        if _without_collmod_fields(current) == _without_collmod_fields(spec):
+            to_modify[name] = bool(spec.get("hidden", False))
+        else:
+            to_drop.append(name)
+            to_create.append(spec)
+    return to_drop, to_create, to_modify
+
+
+class CollectionState:
+    """Index catalog and data fingerprint of one collection at a point in time"""
+
+    def __init__(self, collection, hash_data=False):
+        self.name = collection.name
+        self.indexes = {spec["name"]: spec for spec in index_specs(collection)}
+        self.fingerprint = data_fingerprint(collection, hash_data)
+
+
+class DataCache:
+    """Server-side copies of fixture collections, taken once and reused for resets"""
+
+    def __init__(self, db, cache_db_name=None):
+        self.db = db
+        self.cache_db = db.client[cache_db_name or f"{db.name}__snapshot"]
+        self.cached = set()
+
+    def take(self, name):
+        """Copy `db[name]` into the cache database (documents only)"""
+        print(f"Log: Caching {self.db.name}.{name} for fast resets")
+        self.db[name].aggregate([{"$out": {"db": self.cache_db.name, "coll": name}}])
+        self.cached.add(name)
+
+    def restore(self, name, index_specs_to_build):
+        """Replace `db[name]` with the cached copy and rebuild the given indexes
+
+        $out keeps the indexes of an existing target, so the collection is
+        dropped first and the snapshot's catalog is rebuilt from scratch.
+        """
+        if name not in self.cached:
+            raise KeyError(f"No cached copy of {name}")
+        print(f"Log: Resetting {self.db.name}.{name} from cached snapshot")
+        self.db[name].drop()
+        self.cache_db[name].aggregate([{"$out": {"db": self.db.name, "coll": name}}])
+        create_indexes_from_specs(self.db[name], index_specs_to_build)
+
+    def drop(self):
+        self.db.client.drop_database(self.cache_db.name)
+        self.cached.clear()
+
+
+class DatabaseSnapshot:
+    """Snapshot of the fixture collections of `db`, restorable by difference"""
+
+    def __init__(self, db, collections, hash_data=False, data_cache=None):
+        self.db = db
+        self.hash_data = hash_data
+        self.data_cache = data_cache
+        self.states = {name: CollectionState(db[name], hash_data) for name in collections}
+
+    def restore(self):
+        """Undo every change since the snapshot; returns a {collection: changes} summary"""
+        changes = {}
+        for name, state in self.states.items():
+            collection = self.db[name]
+            if data_fingerprint(collection, self.hash_data) != state.fingerprint:
+                if self.data_cache is None or name not in self.data_cache.cached:
+                    raise AssertionError(f"{self.db.name}.{name} was modified and no cached copy exists")
+                self.data_cache.restore(name, list(state.indexes.values()))
+                changes[name] = {"data": "reset"}
+                continue
+
+            current = {spec["name"]: spec for spec in index_specs(collection)}
+            to_drop, to_create, to_modify = diff_indexes(state.indexes, current)
+            for index_name in to_drop:
+                collection.drop_index(index_name)
+            create_indexes_from_specs(collection, to_create)
+            for index_name, hidden in to_modify.items():
+                self.db.command("collMod", name, index={"name": index_name, "hidden": hidden})
+            if to_drop or to_create or to_modify:
+                changes[name] = {"dropped": to_drop, "created": [s["name"] for s in to_create],
+                                 "modified": sorted(to_modify)}
+        return changes
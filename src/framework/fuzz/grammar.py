@@ -0,0 +1,309 @@
+# MQL grammar for fuzzing
+#
+# Random find filters and aggregation pipelines are built from an operator
+# grammar over the sample_mflix.movies schema: comparison, logical, array,
+# $elemMatch, $regex, $expr and dotted paths, with fields drawn in proportion
+# to how often real queries touch them. Invalid cases start from a valid one
+# and inject exactly one defect that the server must reject, so every
+# generated case has a known expected outcome. Everything is driven by one
+# Random(seed): the same seed always yields the same cases.
+import re
+from copy import deepcopy
+from random import Random
+
+from bson.int64 import Int64
+
+# field path -> (BSON type, relative weight)
+MOVIES_FIELDS = {
+    "year": ("int", 8),
+    "imdb.rating": ("double", 8),
+    "genres": ("array<string>", 8),
+    "title": ("string", 4),
+    "cast": ("array<string>", 4),
+    "rated": ("string", 3),
+    "runtime": ("int", 3),
+    "awards.wins": ("int", 2),
+    "awards.nominations": ("int", 2),
+    "imdb.votes": ("int", 2),
+    "tomatoes.viewer.rating": ("double", 2),
+    "countries": ("array<string>", 2),
+    "languages": ("array<string>", 1),
+    "num_mflix_comments": ("int", 1),
+}
+
+_STRINGS = {
+    "genres": ("Drama", "Comedy", "Action", "Romance", "Crime", "Documentary", "Horror", "Sci-Fi"),
+    "cast": ("Tom Hanks", "Meryl Streep", "Robert De Niro", "Al Pacino", "Cate Blanchett"),
+    "countries": ("USA", "UK", "France", "Japan", "India", "Italy"),
+    "languages": ("English", "French", "Spanish", "Japanese", "Hindi"),
+    "rated": ("R", "PG-13", "PG", "G", "NOT RATED", "UNRATED"),
+    "title": ("The Godfather", "Casablanca", "Jaws", "Alien", "Heat", "Up"),
+}
+_NUMERIC_RANGES = {
+    "year": (1900, 2025), "runtime": (1, 300), "awards.wins": (0, 50),
+    "awards.nominations": (0, 80), "imdb.votes": (0, 2000000), "num_mflix_comments": (0, 200),
+    "imdb.rating": (0.0, 10.0), "tomatoes.viewer.rating": (0.0, 5.0),
+}
+_COMPARISON = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte")
+_TYPE_ALIASES = ("string", "int", "double", "array", "object", "null", "bool", "long", "number")
+_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$first", "$last", "$addToSet", "$push")
+
+# One defect per entry: (name, function(rng, field) -> invalid predicate for `field`)
+INVALID_PREDICATES = (
+    ("unknown_operator", lambda rng, field: {"$fuzzUnknown": 1}),
+    ("in_not_array", lambda rng, field: {"$in": rng.choice((1, "Drama", {"a": 1}))}),
+    ("nin_not_array", lambda rng, field: {"$nin": rng.choice((2, "Comedy"))}),
+    ("size_not_number", lambda rng, field: {"$size": rng.choice(("three", {"n": 1}))}),
+    ("size_negative", lambda rng, field: {"$size": -rng.randint(1, 5)}),
+    ("elem_match_not_object", lambda rng, field: {"$elemMatch": rng.choice((5, "x", [1]))}),
+    ("not_scalar", lambda rng, field: {"$not": rng.choice((5, "x", True))}),
+    ("bad_regex", lambda rng, field: {"$regex": rng.choice(("(", "[a-", "*x"))}),
+    ("all_not_array", lambda rng, field: {"$all": rng.choice((1, "Drama"))}),
+    ("type_unknown_alias", lambda rng, field: {"$type": "fuzzType"}),
+)
+INVALID_LOGICAL = (
+    ("and_empty", lambda rng, filters: {"$and": []}),
+    ("or_not_array", lambda rng, filters: {"$or": filters[0] if filters else {"year": 1}}),
+    ("nor_scalar", lambda rng, filters: {"$nor": rng.choice((1, "x"))}),
+    ("top_level_unknown", lambda rng, filters: {"$fuzzTop": filters}),
+)
+INVALID_STAGES = (
+    ("limit_zero", lambda rng: {"$limit": 0}),
+    ("limit_negative", lambda rng: {"$limit": -rng.randint(1, 100)}),
+    ("skip_negative", lambda rng: {"$skip": -rng.randint(1, 100)}),
+    ("group_without_id", lambda rng: {"$group": {"total": {"$sum": 1}}}),
+    ("unknown_stage", lambda rng: {"$fuzzStage": {}}),
+    ("sort_empty", lambda rng: {"$sort": {}}),
+    ("unwind_without_dollar", lambda rng: {"$unwind": "genres"}),
+    ("project_empty", lambda rng: {"$project": {}}),
+)
+
+
+def _is_operator_document(value):
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _contains(spec, fragment):
+    """True when `fragment` is a node of `spec`, or a dict node of `spec` has all its items"""
+    if spec == fragment:
+        return True
+    if isinstance(spec, dict):
+        if isinstance(fragment, dict) and fragment and all(k in spec and spec[k] == v for k, v in fragment.items()):
+            return True
+        return any(_contains(value, fragment) for value in spec.values())
+    if isinstance(spec, list):
+        return any(_contains(value, fragment) for value in spec)
+    return False
+
+
+class FuzzCase:
+    """One generated find filter or pipeline and the outcome the server should produce
+
+    Invalid cases carry the name of their defect and the injected fragment
+    (the invalid predicate, logical clause or stage).
+    """
+
+    __slots__ = ("kind", "spec", "valid", "defect", "fragment")
+
+    def __init__(self, kind, spec, valid=True, defect=None, fragment=None):
+        self.kind = kind
+        self.spec = spec
+        self.valid = valid
+        self.defect = defect
+        self.fragment = fragment
+
+    def has_defect(self, spec):
+        """Whether `spec` (e.g. a shrunk variant of this case) still holds the injected defect"""
+        return self.fragment is None or _contains(spec, self.fragment)
+
+    def to_dict(self):
+        return {"kind": self.kind, "spec": self.spec, "valid": self.valid, "defect": self.defect}
+
+    def __repr__(self):
+        return f"<FuzzCase {self.kind} {'valid' if self.valid else self.defect} {self.spec}>"
+
+
+class QueryGrammar:
+    """Random generator of valid and invalid MQL find filters and pipelines"""
+
+    def __init__(self, seed=0, max_depth=3, fields=None):
+        self.rng = Random(seed)
+        self.max_depth = max_depth
+        self.fields = fields or MOVIES_FIELDS
+        self._names = list(self.fields)
+        self._weights = [weight for _, weight in self.fields.values()]
+
+    # Values
+
+    def field(self):
+        return self.rng.choices(self._names, self._weights)[0]
+
+    def value(self, field):
+        """A value of the field's type, occasionally of the wrong type or null"""
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.05:
+            return None
+        if roll < 0.10:
+            return rng.choice((True, "fuzz", 42, 3.5, Int64(7), [1, "a"], {"nested": 1}))
+        bson_type = self.fields[field][0]
+        if bson_type in ("string", "array<string>"):
+            return rng.choice(_STRINGS.get(field, ("fuzz",)))
+        low, high = _NUMERIC_RANGES.get(field, (0, 100))
+        if bson_type == "double":
+            return round(rng.uniform(low, high), 1)
+        return rng.randint(low, high)
+
+    def values(self, field, low=1, high=4):
+        return [self.value(field) for _ in range(self.rng.randint(low, high))]
+
+    # Predicates on one field
+
+    def predicate(self, field, depth=0):
+        rng = self.rng
+        is_array = self.fields[field][0].startswith("array")
+        choices = ["equality", "comparison", "range", "in", "nin", "exists", "type", "not"]
+        if self.fields[field][0] in ("string", "array<string>"):
+            choices.append("regex")
+        if is_array:
+            choices += ["all", "size", "elem_match", "elem_match"]
+        kind = rng.choice(choices)
+        if kind == "equality":
+            return self.value(field)
+        if kind == "comparison":
+            return {rng.choice(_COMPARISON): self.value(field)}
+        if kind == "range":
+            return {rng.choice(("$gt", "$gte")): self.value(field),
+                    rng.choice(("$lt", "$lte")): self.value(field)}
+        if kind == "in":
+            return {"$in": self.values(field)}
+        if kind == "nin":
+            return {"$nin": self.values(field)}
+        if kind == "exists":
+            return {"$exists": rng.random() < 0.8}
+        if kind == "type":
+            return {"$type": rng.choice(_TYPE_ALIASES)}
+        if kind == "regex":
+            text = str(self.value(field) or "a")
+            return {"$regex": "^" + re.escape(text[:rng.randint(1, 4)]), "$options": rng.choice(("", "i"))}
+        if kind == "all":
+            return {"$all": self.values(field, 1, 3)}
+        if kind == "size":
+            return {"$size": rng.randint(0, 4)}
+        if kind == "elem_match":
+            if rng.random() < 0.5 or depth >= self.max_depth:
+                return {"$elemMatch": {"$in": self.values(field)}}
+            return {"$elemMatch": {"$eq": self.value(field)}}
+        # $not takes an operator document (or a regex); wrap plain values in $eq
+        inner = self.predicate(field, depth + 1)
+        if not _is_operator_document(inner) or "$not" in inner:
+            inner = {"$eq": inner}
+        return {"$not": inner}
+
+    # Expressions for $expr
+
+    def expression(self, depth=0):
+        rng = self.rng
+        if depth < self.max_depth and rng.random() < 0.3:
+            operator = rng.choice(("$and", "$or"))
+            return {operator: [self.expression(depth + 1) for _ in range(rng.randint(1, 3))]}
+        field = rng.choice([f for f in self._names if not self.fields[f][0].startswith("array")])
+        operator = rng.choice(("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"))
+        if rng.random() < 0.3:
+            other = rng.choice([f for f in self._names if self.fields[f][0] == self.fields[field][0]])
+            return {operator: [f"${field}", f"${other}"]}
+        return {operator: [f"${field}", self.value(field)]}
+
+    # Filters
+
+    def filter(self, depth=0):
+        """A valid find filter"""
+        rng = self.rng
+        clauses = {}
+        for _ in range(rng.randint(1, 3)):
+            roll = rng.random()
+            if depth < self.max_depth and roll < 0.15:
+                operator = rng.choice(("$and", "$or", "$nor"))
+                clauses[operator] = [self.filter(depth + 1) for _ in range(rng.randint(1, 3))]
+            elif depth == 0 and roll < 0.22:
+                clauses["$expr"] = self.expression()
+            else:
+                field = self.field()
+                clauses[field] = self.predicate(field, depth)
+        return clauses
+
+    def invalid_filter(self):
+        """A filter with exactly one defect the server must reject; returns (filter, defect, fragment)"""
+        rng = self.rng
+        query = self.filter()
+        if rng.random() < 0.7:
+            name, make = rng.choice(INVALID_PREDICATES)
+            field = self.field()
+            fragment = {field: make(rng, field)}
+        else:
+            name, make = rng.choice(INVALID_LOGICAL)
+            fragment = make(rng, [self.filter(1)])
+        query.update(deepcopy(fragment))
+        return query, name, fragment
+
+    # Pipelines
+
+    def stage(self):
+        rng = self.rng
+        kind = rng.choice(("match", "match", "project", "sort", "limit", "skip", "group",
+                           "unwind", "add_fields", "count"))
+        if kind == "match":
+            return {"$match": self.filter(1)}
+        if kind == "project":
+            fields = rng.sample(self._names, rng.randint(1, 4))
+            return {"$project": {field: 1 for field in fields}}
+        if kind == "sort":
+            fields = rng.sample(self._names, rng.randint(1, 2))
+            # The server rejects sorting on two array fields ("parallel arrays")
+            if len(fields) > 1 and all(self.fields[field][0].startswith("array") for field in fields):
+                fields = fields[:1]
+            return {"$sort": {field: rng.choice((1, -1)) for field in fields}}
+        if kind == "limit":
+            return {"$limit": rng.randint(1, 500)}
+        if kind == "skip":
+            return {"$skip": rng.randint(0, 100)}
+        if kind == "group":
+            key = rng.choice([None] + [f"${f}" for f in self._names])
+            accumulator = rng.choice(_ACCUMULATORS)
+            return {"$group": {"_id": key, "value": {accumulator: f"${self.field()}"}}}
+        if kind == "unwind":
+            field = rng.choice([f for f in self._names if self.fields[f][0].startswith("array")])
+            return {"$unwind": f"${field}"}
+        if kind == "add_fields":
+            return {"$addFields": {"fuzzFlag": self.expression()}}
+        return {"$count": "total"}
+
+    def pipeline(self, max_stages=5):
+        """A valid aggregation pipeline ($count, if present, ends it)"""
+        stages = []
+        for _ in range(self.rng.randint(1, max_stages)):
+            stage = self.stage()
+            stages.append(stage)
+            if "$count" in stage:
+                break
+        return stages
+
+    def invalid_pipeline(self):
+        """A pipeline with exactly one invalid stage; returns (pipeline, defect, stage)"""
+        rng = self.rng
+        stages = [s for s in self.pipeline() if "$count" not in s]
+        name, make = rng.choice(INVALID_STAGES)
+        stage = make(rng)
+        stages.insert(rng.randint(0, len(stages)), deepcopy(stage))
+        return stages, name, stage
+
+    def case(self, invalid_ratio=0.2, aggregate_ratio=0.3):
+        """One FuzzCase, picking find vs aggregate and valid vs invalid at random"""
+        kind = "aggregate" if self.rng.random() < aggregate_ratio else "find"
+        if self.rng.random() < invalid_ratio:
+            spec, defect, fragment = self.invalid_pipeline() if kind == "aggregate" else self.invalid_filter()
+            return FuzzCase(kind, spec, valid=False, defect=defect, fragment=fragment)
+        return FuzzCase(kind, self.pipeline() if kind == "aggregate" else self.filter())
+
+    def cases(self, count, invalid_ratio=0.2, aggregate_ratio=0.3):
+        return [self.case(invalid_ratio, aggregate_ratio) for _ in range(count)]
@@ -0,0 +1,195 @@
+# Fuzz runner
+#
+# Generates cases from QueryGrammar in batches and executes each batch
+# concurrently through run_catalog() until the time budget is spent. Every
+# outcome is classified against the case's expected result:
+#   crash             the connection failed (server crash, hang-up, timeout)
+#   unexpected_error  a valid case was rejected
+#   accepted_invalid  an invalid case was accepted
+#   slow              a valid case whose latency is beyond the Tukey fence of the run
+# Findings other than "slow" are shrunk to a minimal reproducer by re-running
+# candidate specs and checking they still fail the same way: same category,
+# same exception type and server error code, and (for accepted_invalid) the
+# injected defect still present.
+import json
+import os
+import time
+
+from bson import json_util
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+from src.framework.benchmark.stats import percentile
+from src.framework.fuzz.grammar import FuzzCase, QueryGrammar
+from src.framework.fuzz.shrink import shrink
+from src.framework.queries.batch import AGGREGATE, FIND, run_catalog
+
+CRASH = "crash"
+UNEXPECTED_ERROR = "unexpected_error"
+ACCEPTED_INVALID = "accepted_invalid"
+SLOW = "slow"
+
+
+def classify(case, outcome):
+    """Finding category of one executed case, or None when it behaved as expected"""
+    error = outcome.error
+    if isinstance(error, ConnectionFailure):
+        return CRASH
+    if case.valid:
+        return None if error is None else UNEXPECTED_ERROR
+    if isinstance(error, OperationFailure):
+        return None
+    if isinstance(error, AssertionError):
+        return ACCEPTED_INVALID
+    return UNEXPECTED_ERROR
+
+
+def error_signature(error):
+    """(exception type, server error code) of an outcome's error; code is None for non-server errors"""
+    if error is None:
+        return None
+    return type(error).__name__, getattr(error, "code", None)
+
+
+def _execute(collection, cases, max_workers, max_docs):
+    """Run `cases` concurrently; returns outcomes in case order"""
+    outcomes = [None] * len(cases)
+    for kind in (FIND, AGGREGATE):
+        for expect_failure in (False, True):
+            positions = [i for i, case in enumerate(cases)
+                         if case.kind == kind and case.valid != expect_failure]
+            if not positions:
+                continue
+            report = run_catalog(collection, [cases[i].spec for i in positions], kind=kind,
+                                 max_workers=max_workers, expect_failure=expect_failure,
+                                 max_docs=max_docs)
+            for position, outcome in zip(positions, report.outcomes):
+                outcomes[position] = outcome
+    return outcomes
+
+
+class FuzzFinding:
+    """A case that misbehaved, with its shrunk reproducer"""
+
+    def __init__(self, case, category, error, latency_ms, signature=None):
+        self.case = case
+        self.category = category
+        self.error = error
+        self.latency_ms = latency_ms
+        self.signature = signature
+        self.minimal = None
+
+    def to_dict(self):
+        return {"category": self.category, "error": self.error, "latency_ms": self.latency_ms,
+                "case": self.case.to_dict(), "minimal": self.minimal}
+
+    def __str__(self):
+        spec = self.minimal if self.minimal is not None else self.case.spec
+        return f"{self.category} ({self.latency_ms:.1f}ms) {self.case.kind} {spec}: {self.error}"
+
+
+class FuzzReport:
+    """Counts, throughput and findings of one fuzzing session"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.executed = 0
+        self.valid = 0
+        self.invalid = 0
+        self.elapsed_s = 0.0
+        self.latencies_ms = []
+        self.findings = []
+
+    @property
+    def throughput(self):
+        return self.executed / self.elapsed_s if self.elapsed_s else 0.0
+
+    def by_category(self, category):
+        return [f for f in self.findings if f.category == category]
+
+    def summary(self):
+        counts = {}
+        for finding in self.findings:
+            counts[finding.category] = counts.get(finding.category, 0) + 1
+        return (
+            f"seed={self.seed} executed={self.executed} (valid={self.valid}, invalid={self.invalid}) "
+            f"in {self.elapsed_s:.1f}s, {self.throughput:.0f} cases/s, "
+            f"p50={percentile(self.latencies_ms, 50) if self.latencies_ms else 0:.2f}ms, "
+            f"findings={counts or 'none'}"
+        )
+
+    def format(self):
+        return "\n".join([self.summary()] + [f"  {finding}" for finding in self.findings])
+
+    def write(self, path):
+        """Append findings as JSON lines (relaxed extended JSON)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            for finding in self.findings:
+                f.write(json.dumps(dict(finding.to_dict(), seed=self.seed),
+                                   default=json_util.default) + "\n")
+
+
+def shrink_finding(collection, finding, max_attempts=200):
+    """Minimise a finding's spec against the server, keeping its category and error
+
+    A candidate that fails differently (another exception type or error code,
+    or an accepted_invalid case that lost its defect) is a different bug.
+    """
+    case = finding.case
+
+    def still_fails(spec):
+        if finding.category == ACCEPTED_INVALID and not case.has_defect(spec):
+            return False
+        candidate = FuzzCase(case.kind, spec, case.valid, case.defect, case.fragment)
+        outcome = _execute(collection, [candidate], 1, 1)[0]
+        if classify(candidate, outcome) != finding.category:
+            return False
+        return finding.signature is None or error_signature(outcome.error) == finding.signature
+
+    finding.minimal, attempts = shrink(case.spec, still_fails, max_attempts)
+    return attempts
+
+
+def run_fuzzer(collection, seed=0, time_budget_s=30.0, batch_size=64, max_workers=8,
+               invalid_ratio=0.2, aggregate_ratio=0.3, max_docs=1000, outlier_k=3.0,
+               min_outlier_ms=50.0, shrink_findings=True, max_cases=None):
+    """Fuzz `collection` until the time budget (or max_cases) is spent; returns a FuzzReport"""
+    grammar = QueryGrammar(seed)
+    report = FuzzReport(seed)
+    executed = []
+    started = time.perf_counter()
+    deadline = started + time_budget_s
+    while time.perf_counter() < deadline:
+        if max_cases is not None and report.executed >= max_cases:
+            break
+        cases = grammar.cases(batch_size, invalid_ratio, aggregate_ratio)
+        for case, outcome in zip(cases, _execute(collection, cases, max_workers, max_docs)):
+            report.executed += 1
+            if case.valid:
+                report.valid += 1
+            else:
+                report.invalid += 1
+            category = classify(case, outcome)
+            if category is not None:
+                report.findings.append(FuzzFinding(case, category, str(outcome.error), outcome.latency_ms,
+                                                   error_signature(outcome.error)))
+            elif case.valid:
+                report.latencies_ms.append(outcome.latency_ms)
+                executed.append((case, outcome))
+    report.elapsed_s = time.perf_counter() - started
+
+    # Latency outliers among the cases that behaved correctly
+    if len(report.latencies_ms) >= 4:
+        q1 = percentile(report.latencies_ms, 25)
+        q3 = percentile(report.latencies_ms, 75)
+        fence = max(q3 + outlier_k * (q3 - q1), min_outlier_ms)
+        for case, outcome in executed:
+            if outcome.latency_ms > fence:
+                report.findings.append(FuzzFinding(case, SLOW, f"latency above {fence:.1f}ms fence",
+                                                   outcome.latency_ms))
+
+    if shrink_findings:
+        for finding in report.findings:
+            if finding.category != SLOW:
+                shrink_finding(collection, finding)
+    return report
@@ -0,0 +1,100 @@
+# Test-case shrinking
+#
+# A failing fuzz case is usually mostly noise. shrink() repeatedly tries
+# smaller variants of the spec -- dropping chunks of list elements (ddmin
+# style, halves first), dropping dict keys, replacing a container with one of
+# its children and simplifying scalars -- and keeps any variant for which
+# `still_fails(variant)` is true, until no single step makes progress.
+from copy import deepcopy
+
+_SIMPLE_VALUES = (0, "", None)
+
+
+def _size(spec):
+    if isinstance(spec, dict):
+        return 1 + sum(1 + _size(v) for v in spec.values())
+    if isinstance(spec, list):
+        return 1 + sum(_size(v) for v in spec)
+    # Simple scalars count less, so simplifying a leaf is progress
+    return 1 if spec in _SIMPLE_VALUES and type(spec) is not bool else 2
+
+
+def _paths(spec, prefix=()):
+    """Every container path in `spec`, outermost first"""
+    yield prefix
+    children = spec.items() if isinstance(spec, dict) else enumerate(spec) if isinstance(spec, list) else ()
+    for key, value in children:
+        if isinstance(value, (dict, list)):
+            yield from _paths(value, prefix + (key,))
+
+
+def _get(spec, path):
+    for key in path:
+        spec = spec[key]
+    return spec
+
+
+def _replace(spec, path, value):
+    if not path:
+        return value
+    copy = deepcopy(spec)
+    _get(copy, path[:-1])[path[-1]] = value
+    return copy
+
+
+def _list_reductions(items):
+    """Sublists of `items` with chunks removed, largest chunks first"""
+    n = len(items)
+    chunk = n // 2
+    while chunk >= 1:
+        for start in range(0, n, chunk):
+            candidate = items[:start] + items[start + chunk:]
+            if candidate != items:
+                yield candidate
+        chunk //= 2
+
+
+def _candidates(spec):
+    """Smaller variants of `spec`, each differing from it in one place"""
+    for path in _paths(spec):
+        node = _get(spec, path)
+        if isinstance(node, list):
+            for reduced in _list_reductions(node):
+                yield _replace(spec, path, reduced)
+            children = node
+        else:
+            for key in list(node):
+                yield _replace(spec, path, {k: v for k, v in node.items() if k != key})
+            children = node.values()
+        # Hoist a child container into its parent's place
+        for child in children:
+            if isinstance(child, type(node)):
+                yield _replace(spec, path, deepcopy(child))
+        # Simplify scalar leaves
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, value in items:
+            if isinstance(value, (dict, list)):
+                continue
+            for simple in _SIMPLE_VALUES:
+                if value != simple and type(value) is not bool:
+                    yield _replace(spec, path + (key,), simple)
+
+
+def shrink(spec, still_fails, max_attempts=2000):
+    """Minimise `spec` while `still_fails(candidate)` holds; returns (spec, attempts)"""
+    current = deepcopy(spec)
+    attempts = 0
+    progress = True
+    while progress and attempts < max_attempts:
+        progress = False
+        for candidate in _candidates(current):
+            if _size(candidate) >= _size(current):
+                continue
+            attempts += 1
+            if still_fails(candidate):
+                current = candidate
+                progress = True
+                break
+            if attempts >= max_attempts:
+                break
+    return current, attempts
@@ -0,0 +1,281 @@
+# Index churn under concurrent reads
+#
+# Every index build, hide, unhide or drop clears the collection's plan cache,
+# so each one makes the next execution of every shape replan. Under traffic
+# that shows up as a latency spike after each catalog change, not in any
+# single-threaded test. run_contention() drives N closed-loop reader threads
+# through a fixed set of query shapes while the calling thread cycles an
+# index through create -> hide -> unhide -> drop, then measures:
+#   - the baseline latency before the first catalog change
+#   - per change: p99 and max latency until the next change, their ratio to
+#     the baseline p99, and the recovery time (end of the last time slot whose
+#     p99 stayed above recovery_factor x baseline p99; None = never recovered)
+#   - replans and plan cache entry changes, through PlanCacheMonitor
+#   - errors by kind; queries killed because their index was dropped under
+#     them (QueryPlanKilled) are counted separately as `killed`
+import threading
+import time
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.framework.database.indexes import IndexManager
+from src.framework.load.histogram import LatencyHistogram
+from src.framework.queries.plan_cache import PlanCacheMonitor
+
+QUERY_PLAN_KILLED = 175
+
+CREATE = "create"
+HIDE = "hide"
+UNHIDE = "unhide"
+DROP = "drop"
+CHURN_CYCLE = (CREATE, HIDE, UNHIDE, DROP)
+
+
+class ChurnEvent:
+    """One catalog change made while readers were running"""
+
+    __slots__ = ("action", "index", "at_ns", "elapsed_ns", "error")
+
+    def __init__(self, action, index, at_ns, elapsed_ns, error=None):
+        self.action = action
+        self.index = index
+        self.at_ns = at_ns
+        self.elapsed_ns = elapsed_ns
+        self.error = error
+
+    def __str__(self):
+        text = f"{self.action} {self.index} at {self.at_ns / 1e9:.2f}s ({self.elapsed_ns / 1e6:.1f}ms)"
+        return text + (f" FAILED: {self.error}" if self.error else "")
+
+
+class IndexChurn:
+    """Cycles one index through create, hide, unhide and drop on an IndexManager"""
+
+    def __init__(self, keys, name, actions=CHURN_CYCLE):
+        for action in actions:
+            if action not in CHURN_CYCLE:
+                raise ValueError(f"Unknown churn action: {action}")
+        self.keys = keys
+        self.name = name
+        self.actions = actions
+        self._next = 0
+
+    def next_action(self):
+        action = self.actions[self._next % len(self.actions)]
+        self._next += 1
+        return action
+
+    def apply(self, indexes, action):
+        if action == CREATE:
+            name = indexes.ensure(self.keys, name=self.name)
+            if name != self.name:
+                # Hiding or dropping someone else's index is not churn we may undo
+                raise ValueError(f"Index {name} already has key {dict(self.keys)}; churn needs its own index")
+        elif action == HIDE:
+            indexes.hide(self.name)
+        elif action == UNHIDE:
+            indexes.unhide(self.name)
+        else:
+            indexes.drop(self.name)
+
+
+class EventImpact:
+    """Latency seen by readers between one catalog change and the next"""
+
+    __slots__ = ("event", "latency", "spike_ratio", "recovery_ms")
+
+    def __init__(self, event, latency, spike_ratio, recovery_ms):
+        self.event = event
+        self.latency = latency
+        self.spike_ratio = spike_ratio
+        self.recovery_ms = recovery_ms
+
+    @property
+    def recovered(self):
+        return self.recovery_ms is not None
+
+    def __str__(self):
+        recovery = f"{self.recovery_ms:.0f}ms" if self.recovered else "never"
+        return (f"{self.event.action:<6} p99={self.latency.percentile_ms(99):.2f}ms "
+                f"max={(self.latency.max_ns or 0) / 1e6:.2f}ms spike=x{self.spike_ratio:.1f} "
+                f"recovery={recovery}")
+
+
+def event_impacts(samples, events, baseline_p99_ns, end_ns, slot_ns=100_000_000, recovery_factor=2.0):
+    """EventImpacts of `events` from reader `samples` [(completed_at_ns, latency_ns)]
+
+    Each event's window runs until the next event (or `end_ns`) and is cut into
+    `slot_ns` slots. Recovery is the end of the last slot whose p99 exceeded
+    recovery_factor x baseline p99: 0 when no slot did, None when the final
+    slot still did.
+    """
+    threshold_ns = baseline_p99_ns * recovery_factor
+    impacts = []
+    for i, event in enumerate(events):
+        stop_ns = events[i + 1].at_ns if i + 1 < len(events) else end_ns
+        latency = LatencyHistogram()
+        slots = {}
+        for done_ns, latency_ns in samples:
+            if event.at_ns <= done_ns < stop_ns:
+                latency.record(latency_ns)
+                slots.setdefault((done_ns - event.at_ns) // slot_ns, LatencyHistogram()).record(latency_ns)
+        last_slot = (stop_ns - event.at_ns - 1) // slot_ns
+        slow = [slot for slot, histogram in slots.items() if histogram.value_at_percentile(99) > threshold_ns]
+        if not slow:
+            recovery_ms = 0.0
+        elif max(slow) >= last_slot:
+            recovery_ms = None
+        else:
+            recovery_ms = (max(slow) + 1) * slot_ns / 1e6
+        spike = latency.value_at_percentile(99) / baseline_p99_ns if baseline_p99_ns else 0.0
+        impacts.append(EventImpact(event, latency, spike, recovery_ms))
+    return impacts
+
+
+class ContentionResult:
+    """Reader latency before and during index churn, per-change impact and plan cache activity"""
+
+    def __init__(self, name, readers, samples, events, errors, killed, elapsed_s, plan_cache=None,
+                 slot_s=0.1, recovery_factor=2.0):
+        self.name = name
+        self.readers = readers
+        self.events = events
+        self.errors = errors
+        self.killed = killed
+        self.elapsed_s = elapsed_s
+        self.plan_cache = plan_cache
+        self.baseline = LatencyHistogram()
+        self.during = LatencyHistogram()
+        churn_start = events[0].at_ns if events else None
+        for done_ns, latency_ns in samples:
+            if churn_start is None or done_ns < churn_start:
+                self.baseline.record(latency_ns)
+            else:
+                self.during.record(latency_ns)
+        self.impacts = event_impacts(samples, events, self.baseline.value_at_percentile(99),
+                                     int(elapsed_s * 1e9), int(slot_s * 1e9), recovery_factor)
+
+    @property
+    def completed(self):
+        return self.baseline.total + self.during.total
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    @property
+    def replans(self):
+        return self.plan_cache.replans if self.plan_cache is not None else None
+
+    @property
+    def max_spike_ratio(self):
+        return max((impact.spike_ratio for impact in self.impacts), default=0.0)
+
+    @property
+    def max_recovery_ms(self):
+        """Slowest recovery over all changes; None if any change never recovered"""
+        if any(not impact.recovered for impact in self.impacts):
+            return None
+        return max((impact.recovery_ms for impact in self.impacts), default=0.0)
+
+    def summary(self):
+        summary = {
+            "name": self.name,
+            "readers": self.readers,
+            "completed": self.completed,
+            "errors": self.error_count,
+            "killed": self.killed,
+            "churn_events": len(self.events),
+            "baseline_p99_ms": self.baseline.percentile_ms(99),
+            "max_spike_ratio": self.max_spike_ratio,
+            "max_recovery_ms": self.max_recovery_ms,
+            "replans": self.replans,
+        }
+        summary.update(self.during.summary())
+        return summary
+
+    def format(self):
+        lines = [
+            f"{self.name}: readers={self.readers} completed={self.completed} errors={self.error_count} "
+            f"killed={self.killed} churn_events={len(self.events)} replans={self.replans}",
+            f"  baseline:     {self.baseline}",
+            f"  during churn: {self.during}",
+        ]
+        for impact in self.impacts:
+            lines.append(f"  {impact}")
+        for event in self.events:
+            if event.error:
+                lines.append(f"  {event}")
+        for kind, count in sorted(self.errors.items()):
+            lines.append(f"  error {kind}: {count}")
+        if self.plan_cache is not None:
+            lines.extend(f"  {line}" for line in self.plan_cache.format().splitlines())
+        return "\n".join(lines)
+
+
+def run_contention(collection, queries, churn, readers=8, duration_s=10.0, baseline_s=2.0, interval_s=1.0,
+                   limit=0, slot_s=0.1, recovery_factor=2.0, profile=True, name="index_churn"):
+    """Run `queries` on `readers` threads for `duration_s` while `churn` changes the index catalog
+
+    The first catalog change happens after `baseline_s`, then one every
+    `interval_s`. Indexes the churn created are dropped again on exit.
+    """
+    raw = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    stop = threading.Event()
+    samples = [[] for _ in range(readers)]
+    errors = [{} for _ in range(readers)]
+
+    def read(reader):
+        own_samples, own_errors = samples[reader], errors[reader]
+        i = reader
+        while not stop.is_set():
+            query = queries[i % len(queries)]
+            i += 1
+            started = time.perf_counter_ns()
+            try:
+                for _ in raw.find(query, limit=limit):
+                    pass
+            except PyMongoError as e:
+                kind = f"{type(e).__name__}:{getattr(e, 'code', None)}"
+                own_errors[kind] = own_errors.get(kind, 0) + 1
+                continue
+            done = time.perf_counter_ns()
+            own_samples.append((done - t0, done - started))
+
+    events = []
+    with PlanCacheMonitor(collection, profile=profile) as monitor, IndexManager(collection) as indexes:
+        t0 = time.perf_counter_ns()
+        threads = [threading.Thread(target=read, args=(reader,), name=f"{name}-reader-{reader}", daemon=True)
+                   for reader in range(readers)]
+        for thread in threads:
+            thread.start()
+        try:
+            next_change = baseline_s
+            while next_change < duration_s:
+                time.sleep(max(0.0, next_change - (time.perf_counter_ns() - t0) / 1e9))
+                action, error = churn.next_action(), None
+                started = time.perf_counter_ns()
+                try:
+                    churn.apply(indexes, action)
+                except OperationFailure as e:
+                    error = e
+                events.append(ChurnEvent(action, churn.name, started - t0,
+                                         time.perf_counter_ns() - started, error))
+                next_change += interval_s
+            time.sleep(max(0.0, duration_s - (time.perf_counter_ns() - t0) / 1e9))
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed_s = (time.perf_counter_ns() - t0) / 1e9
+
+    merged_errors = {}
+    for reader_errors in errors:
+        for kind, count in reader_errors.items():
+            merged_errors[kind] = merged_errors.get(kind, 0) + count
+    killed = merged_errors.pop(f"OperationFailure:{QUERY_PLAN_KILLED}", 0)
+    all_samples = sorted(sample for reader_samples in samples for sample in reader_samples)
+    return ContentionResult(name, readers, all_samples, events, merged_errors, killed, elapsed_s,
+                            monitor.report, slot_s, recovery_factor)
@@ -0,0 +1,188 @@
+# Open-loop load generator
+#
+# Requests are scheduled on an asyncio loop at a fixed target rate (constant or
+# Poisson inter-arrival times), independently of how fast earlier requests
+# complete. Each request runs a weighted-random workload on a bounded thread
+# pool over the framework's pooled client (pymongo 4.7 has no native asyncio
+# API). Latency is measured from the request's *intended* start time, so
+# queueing behind a slow server shows up in the tail instead of silently
+# lowering the offered load (no coordinated omission).
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from src.framework.load.histogram import LatencyHistogram, ThroughputTimeline
+from src.framework.queries.utils import (
+    aggregation_avg_rating_by_year, basic_find_queries, drama_movies_query
+)
+
+FIND = "find"
+AGGREGATE = "aggregate"
+
+
+class Workload:
+    """A named find filter or aggregation pipeline with a relative weight"""
+
+    __slots__ = ("name", "kind", "spec", "weight", "limit")
+
+    def __init__(self, name, kind, spec, weight=1.0, limit=0):
+        if kind not in (FIND, AGGREGATE):
+            raise ValueError(f"Unknown workload kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.spec = spec
+        self.weight = weight
+        self.limit = limit
+
+    def run(self, collection):
+        if self.kind == FIND:
+            cursor = collection.find(self.spec, limit=self.limit)
+        else:
+            cursor = collection.aggregate(self.spec)
+        for _ in cursor:
+            pass
+
+
+def default_workload_mix():
+    """Mixed read workload built from the query builders in queries/utils.py"""
+    mix = [
+        Workload("drama_top_rated", FIND, drama_movies_query(), weight=4, limit=50),
+        Workload("avg_rating_by_year", AGGREGATE, aggregation_avg_rating_by_year(), weight=1),
+    ]
+    for i, query in enumerate(basic_find_queries()):
+        mix.append(Workload(f"basic_find_{i + 1}", FIND, query, weight=1, limit=100))
+    return mix
+
+
+class LoadResult:
+    """Latency histograms (overall and per workload) plus a throughput timeline"""
+
+    def __init__(self, name, target_rate, duration_s, concurrency):
+        self.name = name
+        self.target_rate = target_rate
+        self.duration_s = duration_s
+        self.concurrency = concurrency
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.by_workload = {}
+        self.errors = {}
+        self.timeline = None
+        self.issued = 0
+        self.elapsed_s = 0.0
+
+    @property
+    def completed(self):
+        return self.latency.total
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    @property
+    def achieved_rate(self):
+        return self.completed / self.elapsed_s if self.elapsed_s else 0.0
+
+    def summary(self):
+        summary = {
+            "name": self.name,
+            "target_rate": self.target_rate,
+            "achieved_rate": self.achieved_rate,
+            "concurrency": self.concurrency,
+            "issued": self.issued,
+            "completed": self.completed,
+            "errors": self.error_count,
+        }
+        summary.update(self.latency.summary())
+        summary["service_p99_ms"] = self.service.percentile_ms(99)
+        return summary
+
+    def format(self):
+        lines = [
+            f"{self.name}: issued={self.issued} completed={self.completed} errors={self.error_count} "
+            f"target={self.target_rate:.0f}/s achieved={self.achieved_rate:.1f}/s "
+            f"concurrency={self.concurrency}",
+            f"  latency (from intended start): {self.latency}",
+            f"  service time:                  {self.service}",
+        ]
+        for name, histogram in sorted(self.by_workload.items()):
+            lines.append(f"  {name}: {histogram}")
+        for kind, count in sorted(self.errors.items()):
+            lines.append(f"  error {kind}: {count}")
+        lines.append("  timeline (s, ops/s, errors/s): " + ", ".join(
+            f"({t:.0f}, {ops:.0f}, {err:.0f})" for t, ops, err in self.timeline.rows()))
+        return "\n".join(lines)
+
+
+def _arrival_offsets_ns(rate, duration_s, poisson, rng):
+    """Intended start offsets (ns from t0) of every request in the run"""
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+        if offset >= duration_s:
+            return
+        yield int(offset * 1e9)
+
+
+async def run_load(collection, workloads=None, rate=100.0, duration_s=10.0, concurrency=16,
+                   poisson=True, seed=0, name="load"):
+    """Drive `workloads` against `collection` at `rate` requests/sec for `duration_s`"""
+    workloads = workloads or default_workload_mix()
+    rng = random.Random(seed)
+    weights = [w.weight for w in workloads]
+    raw = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+    result = LoadResult(name, rate, duration_s, concurrency)
+    for workload in workloads:
+        result.by_workload[workload.name] = LatencyHistogram()
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    t0 = time.perf_counter_ns()
+    result.timeline = ThroughputTimeline(t0)
+
+    def execute(workload):
+        started = time.perf_counter_ns()
+        workload.run(raw)
+        return started
+
+    async def issue(workload, intended_ns):
+        try:
+            started = await loop.run_in_executor(executor, execute, workload)
+        except Exception as e:
+            kind = type(e).__name__
+            result.errors[kind] = result.errors.get(kind, 0) + 1
+            result.timeline.record(time.perf_counter_ns(), error=True)
+            return
+        done = time.perf_counter_ns()
+        result.latency.record(done - intended_ns)
+        result.service.record(done - started)
+        result.by_workload[workload.name].record(done - intended_ns)
+        result.timeline.record(done)
+
+    pending = set()
+    try:
+        for offset_ns in _arrival_offsets_ns(rate, duration_s, poisson, rng):
+            intended_ns = t0 + offset_ns
+            delay = (intended_ns - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+            workload = rng.choices(workloads, weights)[0]
+            task = asyncio.ensure_future(issue(workload, intended_ns))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            result.issued += 1
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        executor.shutdown(wait=True)
+    result.elapsed_s = (time.perf_counter_ns() - t0) / 1e9
+    return result
+
+
+def generate_load(collection, **kwargs):
+    """Synchronous wrapper around run_load()"""
+    return asyncio.run(run_load(collection, **kwargs))
@@ -0,0 +1,117 @@
+# HDR-style latency histogram and throughput timeline
+#
+# Values are bucketed log-linearly: exact below 2**sub_bucket_bits units, and
+# above that with a constant relative precision set by `significant_digits`.
+# Memory depends on the dynamic range, not on how many values were recorded,
+# so millions of samples cost a few kilobytes and histograms merge cheaply.
+import math
+
+
+class LatencyHistogram:
+    """Records latencies in nanoseconds with bounded relative error"""
+
+    def __init__(self, significant_digits=3, unit_ns=1000):
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+        self.significant_digits = significant_digits
+        self.unit_ns = unit_ns
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.counts = {}
+        self.total = 0
+        self.min_ns = None
+        self.max_ns = None
+        self.sum_ns = 0
+
+    def _bucket(self, units):
+        shift = max(0, units.bit_length() - self.sub_bucket_bits)
+        return shift, units >> shift
+
+    def record(self, value_ns, count=1):
+        value_ns = max(0, int(value_ns))
+        key = self._bucket(value_ns // self.unit_ns)
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.total += count
+        self.sum_ns += value_ns * count
+        self.min_ns = value_ns if self.min_ns is None else min(self.min_ns, value_ns)
+        self.max_ns = value_ns if self.max_ns is None else max(self.max_ns, value_ns)
+
+    def merge(self, other):
+        if (other.significant_digits, other.unit_ns) != (self.significant_digits, self.unit_ns):
+            raise ValueError("Cannot merge histograms with different precision")
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum_ns += other.sum_ns
+        if other.total:
+            self.min_ns = other.min_ns if self.min_ns is None else min(self.min_ns, other.min_ns)
+            self.max_ns = other.max_ns if self.max_ns is None else max(self.max_ns, other.max_ns)
+        return self
+
+    def _representative_ns(self, key):
+        shift, sub_bucket = key
+        low = sub_bucket << shift
+        return (low + ((1 << shift) - 1) / 2.0) * self.unit_ns
+
+    def value_at_percentile(self, q):
+        """Latency (ns) at or below which `q` percent of recorded values fall"""
+        if not self.total:
+            return 0.0
+        if q >= 100:
+            return float(self.max_ns)
+        target = max(1, math.ceil(self.total * q / 100.0))
+        seen = 0
+        for key in sorted(self.counts, key=lambda k: k[1] << k[0]):
+            seen += self.counts[key]
+            if seen >= target:
+                value = self._representative_ns(key)
+                return min(max(value, self.min_ns), self.max_ns)
+        return float(self.max_ns)
+
+    def percentile_ms(self, q):
+        return self.value_at_percentile(q) / 1e6
+
+    @property
+    def mean_ms(self):
+        return self.sum_ns / self.total / 1e6 if self.total else 0.0
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.mean_ms,
+            "p50_ms": self.percentile_ms(50),
+            "p90_ms": self.percentile_ms(90),
+            "p99_ms": self.percentile_ms(99),
+            "p999_ms": self.percentile_ms(99.9),
+            "max_ms": (self.max_ns or 0) / 1e6,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return (f"n={s['count']} p50={s['p50_ms']:.2f}ms p90={s['p90_ms']:.2f}ms "
+                f"p99={s['p99_ms']:.2f}ms p99.9={s['p999_ms']:.2f}ms max={s['max_ms']:.2f}ms")
+
+
+class ThroughputTimeline:
+    """Completed operations and errors per fixed-width time slot"""
+
+    def __init__(self, start_ns, slot_s=1.0):
+        self.start_ns = start_ns
+        self.slot_ns = int(slot_s * 1e9)
+        self.slot_s = slot_s
+        self.completed = {}
+        self.errors = {}
+
+    def record(self, at_ns, error=False):
+        slot = max(0, (at_ns - self.start_ns) // self.slot_ns)
+        target = self.errors if error else self.completed
+        target[slot] = target.get(slot, 0) + 1
+
+    def rows(self):
+        """[(slot start seconds, ops/sec, errors/sec)] for every slot up to the last one used"""
+        last = max(list(self.completed) + list(self.errors), default=-1)
+        return [
+            (slot * self.slot_s,
+             self.completed.get(slot, 0) / self.slot_s,
+             self.errors.get(slot, 0) / self.slot_s)
+            for slot in range(last + 1)
+        ]
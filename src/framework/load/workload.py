@@ -0,0 +1,380 @@
+# Workload capture and timed replay
+#
+# Real query traffic is captured from system.profile (or from a JSONL file of
+# profiler documents or "Slow query" log lines) into a portable workload file:
+# one JSON header line, then one line per find/aggregate with its offset from
+# the first operation, its command, and what the server reported for it
+# (duration, planSummary, queryHash). Values use relaxed Extended JSON, so
+# ObjectIds and dates survive the round trip.
+#
+# Replay re-issues the operations against a test mongod, preserving the
+# original inter-arrival times (optionally sped up N times) on a bounded
+# thread pool. Each replayed operation carries a "replay:<n>" comment and the
+# profiler is on during replay, so the comparison uses the server's own
+# duration and planSummary on both sides, grouped per query shape.
+#
+#   python -m src.framework.load.workload capture --db sample_mflix --duration 60 -o w.jsonl
+#   python -m src.framework.load.workload capture --from-file slow.log.jsonl -o w.jsonl
+#   python -m src.framework.load.workload replay w.jsonl --db sample_mflix_copy --speed 4
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import json_util
+
+from src.framework.benchmark.stats import percentile
+from src.framework.database.profiler import profile_entries, profiling
+from src.framework.queries.shape import operation_shape, shape_hash
+
+WORKLOAD_FORMAT = "mongodb-queryengine-workload"
+WORKLOAD_VERSION = 1
+
+# find command fields carried into the workload file
+FIND_FIELDS = ("filter", "projection", "sort", "limit", "skip", "hint", "collation")
+AGGREGATE_FIELDS = ("pipeline", "hint", "collation", "allowDiskUse")
+
+REPLAY_COMMENT_PREFIX = "replay:"
+
+_JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+# =============================================================================
+# Capture
+# =============================================================================
+
+def _operation(ts, ns, command, duration_ms, plan_summary, query_hash, details):
+    if "find" in command:
+        op, fields = "find", FIND_FIELDS
+    elif "aggregate" in command and isinstance(command.get("pipeline"), list):
+        op, fields = "aggregate", AGGREGATE_FIELDS
+    else:
+        return None
+    return {
+        "ts": ts,
+        "ns": ns,
+        "op": op,
+        "command": {k: command[k] for k in fields if k in command},
+        "duration_ms": duration_ms,
+        "plan_summary": plan_summary,
+        "query_hash": query_hash,
+        "n_returned": details.get("nreturned"),
+        "keys_examined": details.get("keysExamined"),
+        "docs_examined": details.get("docsExamined"),
+    }
+
+
+def operation_from_profile_entry(entry):
+    """Workload operation for a system.profile document, or None if it isn't a find/aggregate"""
+    return _operation(entry.get("ts"), entry.get("ns"), entry.get("command") or {},
+                      entry.get("millis"), entry.get("planSummary"), entry.get("queryHash"), entry)
+
+
+def operation_from_log_entry(entry):
+    """Workload operation for a structured "Slow query" log line, or None"""
+    attr = entry.get("attr") or {}
+    ts = entry.get("t")
+    if isinstance(ts, dict) and "$date" in ts:
+        ts = json_util.loads(json.dumps(ts))
+    return _operation(ts, attr.get("ns"), attr.get("command") or {}, attr.get("durationMillis"),
+                      attr.get("planSummary"), attr.get("queryHash"), attr)
+
+
+def _epoch_ms(ts):
+    if ts is None:
+        return 0.0
+    # The driver returns naive UTC datetimes unless the client is tz_aware
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp() * 1000
+
+
+def _with_offsets(operations):
+    operations = [op for op in operations if op is not None]
+    operations.sort(key=lambda op: _epoch_ms(op["ts"]))
+    first = _epoch_ms(operations[0]["ts"]) if operations else 0.0
+    for op in operations:
+        op["offset_ms"] = _epoch_ms(op["ts"]) - first if op["ts"] else 0.0
+    return operations
+
+
+def capture_from_profiler(db, since=None, until=None, namespaces=None):
+    """Read find/aggregate operations recorded in `db`'s system.profile"""
+    entries = profile_entries(db, since=since, until=until, namespaces=namespaces,
+                              ops=("query", "command"))
+    return _with_offsets(operation_from_profile_entry(entry) for entry in entries)
+
+
+def capture_live(db, duration_s, namespaces=None):
+    """Turn on the profiler for `duration_s` seconds and capture what ran meanwhile"""
+    with profiling(db, level=2) as started:
+        time.sleep(duration_s)
+        return capture_from_profiler(db, since=started, namespaces=namespaces)
+
+
+def capture_from_jsonl(path):
+    """Read operations from a JSONL file of profiler documents or structured log lines"""
+    operations = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json_util.loads(line)
+            if "attr" in entry:
+                operations.append(operation_from_log_entry(entry))
+            else:
+                operations.append(operation_from_profile_entry(entry))
+    return _with_offsets(operations)
+
+
+def write_workload(path, operations, source=None):
+    header = {
+        "format": WORKLOAD_FORMAT,
+        "version": WORKLOAD_VERSION,
+        "source": source,
+        "captured_at": datetime.now(timezone.utc),
+        "operations": len(operations),
+    }
+    with open(path, "w") as f:
+        f.write(json_util.dumps(header, json_options=_JSON_OPTIONS) + "\n")
+        for op in operations:
+            f.write(json_util.dumps(op, json_options=_JSON_OPTIONS) + "\n")
+
+
+def read_workload(path):
+    """Return (header, operations) from a workload file"""
+    with open(path) as f:
+        header = json_util.loads(f.readline())
+        if header.get("format") != WORKLOAD_FORMAT:
+            raise ValueError(f"{path} is not a workload file")
+        if header.get("version") != WORKLOAD_VERSION:
+            raise ValueError(f"Unsupported workload version {header.get('version')}")
+        operations = [json_util.loads(line) for line in f if line.strip()]
+    return header, operations
+
+
+def shape_key(op):
+    """Grouping key for an operation: the server's queryHash, else its literal-free shape"""
+    if op.get("query_hash"):
+        return op["query_hash"]
+    return f"{op['ns']}:{op['op']}:" + shape_hash(operation_shape(op))
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+
+def replay_schedule_ms(operations, speed=1.0, preserve_timing=True):
+    """Offsets (ms from replay start) at which each operation should be issued"""
+    if not preserve_timing:
+        return [0.0] * len(operations)
+    return [op.get("offset_ms", 0.0) / speed for op in operations]
+
+
+def _execute(client, op, index, database):
+    db_name, _, coll_name = op["ns"].partition(".")
+    collection = client[database or db_name][coll_name]
+    command = op["command"]
+    comment = f"{REPLAY_COMMENT_PREFIX}{index}"
+    if op["op"] == "find":
+        sort = command.get("sort")
+        cursor = collection.find(
+            command.get("filter", {}), command.get("projection"),
+            sort=list(sort.items()) if sort else None,
+            limit=command.get("limit", 0), skip=command.get("skip", 0),
+            hint=command.get("hint"), collation=command.get("collation"), comment=comment,
+        )
+    else:
+        options = {k: command[k] for k in ("hint", "collation", "allowDiskUse") if k in command}
+        cursor = collection.aggregate(command["pipeline"], comment=comment, **options)
+    for _ in cursor:
+        pass
+
+
+class ReplayResult:
+    """Client latency and server-side profile entries of one replay"""
+
+    def __init__(self, operations):
+        self.operations = operations
+        self.client_latency_ms = [None] * len(operations)
+        self.errors = {}
+        self.server = {}
+        self.elapsed_s = 0.0
+
+
+def replay_workload(client, operations, database=None, speed=1.0, preserve_timing=True,
+                    concurrency=16):
+    """Replay `operations`, optionally into `database` instead of their original one"""
+    result = ReplayResult(operations)
+    schedule = replay_schedule_ms(operations, speed, preserve_timing)
+    databases = sorted({database or op["ns"].partition(".")[0] for op in operations})
+    lock = threading.Lock()
+
+    def run(index, op):
+        start = time.perf_counter_ns()
+        try:
+            _execute(client, op, index, database)
+        except Exception as e:
+            with lock:
+                result.errors[index] = f"{type(e).__name__}: {e}"
+            return
+        result.client_latency_ms[index] = (time.perf_counter_ns() - start) / 1e6
+
+    profilers = [profiling(client[name], level=2) for name in databases]
+    starts = [p.__enter__() for p in profilers]
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for index, (op, at_ms) in enumerate(zip(operations, schedule)):
+                delay = t0 + at_ms / 1000 - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(run, index, op)
+        result.elapsed_s = time.perf_counter() - t0
+    finally:
+        for p in reversed(profilers):
+            p.__exit__(None, None, None)
+
+    for name, started in zip(databases, starts):
+        entries = profile_entries(client[name], since=started, ops=("query", "command"),
+                                  extra_filter={"command.comment": {"$regex": f"^{REPLAY_COMMENT_PREFIX}"}})
+        for entry in entries:
+            index = int(entry["command"]["comment"][len(REPLAY_COMMENT_PREFIX):])
+            result.server[index] = {"duration_ms": entry.get("millis"),
+                                    "plan_summary": entry.get("planSummary"),
+                                    "query_hash": entry.get("queryHash")}
+    return result
+
+
+# =============================================================================
+# Comparison
+# =============================================================================
+
+def _most_common(values):
+    values = [v for v in values if v]
+    return max(set(values), key=values.count) if values else None
+
+
+def compare_replay(result, latency_threshold=0.5):
+    """Per-shape capture vs replay latency and plan choice
+
+    A shape is flagged when its winning plan changed, or when its replay p50
+    exceeds the captured p50 by more than `latency_threshold` (relative).
+    """
+    groups = {}
+    for index, op in enumerate(result.operations):
+        groups.setdefault(shape_key(op), []).append(index)
+
+    rows = []
+    for key, indexes in groups.items():
+        ops = [result.operations[i] for i in indexes]
+        server = [result.server.get(i) or {} for i in indexes]
+        captured = [op["duration_ms"] for op in ops if op.get("duration_ms") is not None]
+        replayed = [s["duration_ms"] for s in server if s.get("duration_ms") is not None]
+        plan_capture = _most_common(op.get("plan_summary") for op in ops)
+        plan_replay = _most_common(s.get("plan_summary") for s in server)
+
+        row = {
+            "shape": key,
+            "ns": ops[0]["ns"],
+            "op": ops[0]["op"],
+            "example": ops[0]["command"],
+            "count": len(ops),
+            "errors": sum(1 for i in indexes if i in result.errors),
+            "capture_p50_ms": percentile(captured, 50) if captured else None,
+            "capture_p95_ms": percentile(captured, 95) if captured else None,
+            "replay_p50_ms": percentile(replayed, 50) if replayed else None,
+            "replay_p95_ms": percentile(replayed, 95) if replayed else None,
+            "plan_capture": plan_capture,
+            "plan_replay": plan_replay,
+        }
+        row["plan_changed"] = bool(plan_capture and plan_replay and plan_capture != plan_replay)
+        # Profiler durations are whole milliseconds; +1ms keeps sub-millisecond shapes comparable
+        if row["capture_p50_ms"] is not None and row["replay_p50_ms"] is not None:
+            row["latency_ratio"] = (row["replay_p50_ms"] + 1) / (row["capture_p50_ms"] + 1)
+        else:
+            row["latency_ratio"] = None
+        row["slower"] = row["latency_ratio"] is not None and row["latency_ratio"] > 1 + latency_threshold
+        rows.append(row)
+    rows.sort(key=lambda r: -r["count"])
+    return rows
+
+
+def format_comparison(rows):
+    def ms(value):
+        return "-" if value is None else f"{value:.0f}"
+    lines = []
+    for row in rows:
+        flags = [flag for flag, on in (("PLAN CHANGED", row["plan_changed"]), ("SLOWER", row["slower"]),
+                                       ("ERRORS", row["errors"])) if on]
+        lines.append(
+            f"{row['ns']} {row['op']} x{row['count']} [{row['shape']}] "
+            f"p50 {ms(row['capture_p50_ms'])}->{ms(row['replay_p50_ms'])}ms "
+            f"p95 {ms(row['capture_p95_ms'])}->{ms(row['replay_p95_ms'])}ms "
+            f"plan {row['plan_capture']} -> {row['plan_replay']}"
+            + (f"  {' '.join(flags)}" if flags else "")
+        )
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Command line
+# =============================================================================
+
+def main(argv=None):
+    from src.framework.database.client import get_client, get_db
+
+    parser = argparse.ArgumentParser(prog="python -m src.framework.load.workload",
+                                     description="Capture and replay query workloads")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    capture = sub.add_parser("capture", help="capture a workload file")
+    capture.add_argument("-o", "--output", required=True)
+    capture.add_argument("--db", help="database whose profiler to read (default: configured)")
+    capture.add_argument("--from-file", help="JSONL of profiler documents or slow-query log lines")
+    capture.add_argument("--duration", type=float, help="enable the profiler and capture for N seconds")
+    capture.add_argument("--ns", action="append", help="restrict to namespace (repeatable)")
+
+    replay = sub.add_parser("replay", help="replay a workload file and compare")
+    replay.add_argument("workload")
+    replay.add_argument("--db", help="replay into this database instead of the captured one")
+    replay.add_argument("--speed", type=float, default=1.0, help="time compression factor")
+    replay.add_argument("--as-fast-as-possible", action="store_true", help="ignore captured timing")
+    replay.add_argument("--concurrency", type=int, default=16)
+    replay.add_argument("--latency-threshold", type=float, default=0.5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "capture":
+        if args.from_file:
+            operations = capture_from_jsonl(args.from_file)
+            source = args.from_file
+        else:
+            db = get_db(args.db)
+            if args.duration:
+                operations = capture_live(db, args.duration, args.ns)
+            else:
+                operations = capture_from_profiler(db, namespaces=args.ns)
+            source = f"{db.name}.system.profile"
+        write_workload(args.output, operations, source)
+        print(f"Captured {len(operations)} operations into {args.output}")
+        return 0
+
+    _, operations = read_workload(args.workload)
+    result = replay_workload(get_client(), operations, database=args.db, speed=args.speed,
+                             preserve_timing=not args.as_fast_as_possible,
+                             concurrency=args.concurrency)
+    rows = compare_replay(result, args.latency_threshold)
+    print(f"Replayed {len(operations)} operations in {result.elapsed_s:.1f}s, "
+          f"{len(result.errors)} errors")
+    print(format_comparison(rows))
+    flagged = [r for r in rows if r["plan_changed"] or r["slower"] or r["errors"]]
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
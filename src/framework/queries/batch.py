@@ -0,0 +1,118 @@
+# Concurrent execution of query and pipeline catalogs
+#
+# A catalog is a list of find filters or aggregation pipelines (typically one
+# of the builders in queries/utils.py). Every entry runs on a bounded thread
+# pool sharing the framework's pooled client; nothing stops at the first
+# failure, and the report lists each outcome with its latency.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import OperationFailure
+
+from src.framework.benchmark.stats import percentile
+
+FIND = "find"
+AGGREGATE = "aggregate"
+DEFAULT_MAX_WORKERS = 8
+
+
+class QueryOutcome:
+    """Result of running one catalog entry"""
+
+    __slots__ = ("index", "kind", "spec", "ok", "count", "latency_ms", "error")
+
+    def __init__(self, index, kind, spec, ok, count, latency_ms, error=None):
+        self.index = index
+        self.kind = kind
+        self.spec = spec
+        self.ok = ok
+        self.count = count
+        self.latency_ms = latency_ms
+        self.error = error
+
+    def __str__(self):
+        status = "ok" if self.ok else "FAILED"
+        detail = f"{self.count} documents" if self.error is None else f"{type(self.error).__name__}: {self.error}"
+        return f"#{self.index + 1} {status} {self.latency_ms:.2f}ms {self.kind} {self.spec} -> {detail}"
+
+
+class BatchReport:
+    """Aggregated outcomes of a catalog run, in catalog order"""
+
+    def __init__(self, outcomes, wall_ms):
+        self.outcomes = outcomes
+        self.wall_ms = wall_ms
+
+    @property
+    def failures(self):
+        return [o for o in self.outcomes if not o.ok]
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def latency_ms(self, q):
+        return percentile([o.latency_ms for o in self.outcomes], q) if self.outcomes else 0.0
+
+    def summary(self):
+        return (
+            f"{len(self.outcomes)} entries, {len(self.failures)} failed, wall {self.wall_ms:.1f}ms, "
+            f"latency p50={self.latency_ms(50):.2f}ms p95={self.latency_ms(95):.2f}ms "
+            f"max={self.latency_ms(100):.2f}ms"
+        )
+
+    def format(self, failures_only=False):
+        outcomes = self.failures if failures_only else self.outcomes
+        return "\n".join([self.summary()] + [str(o) for o in outcomes])
+
+
+def _run_one(collection, kind, index, spec, expect_failure, max_docs):
+    start = time.perf_counter_ns()
+    count, error = 0, None
+    try:
+        cursor = collection.find(spec) if kind == FIND else collection.aggregate(spec)
+        try:
+            for _ in cursor:
+                count += 1
+                if max_docs is not None and count >= max_docs:
+                    break
+        finally:
+            cursor.close()
+    except Exception as e:
+        error = e
+    latency_ms = (time.perf_counter_ns() - start) / 1e6
+
+    if expect_failure:
+        ok = isinstance(error, OperationFailure)
+        if error is None:
+            error = AssertionError("succeeded but was expected to fail")
+    else:
+        ok = error is None
+    return QueryOutcome(index, kind, spec, ok, count, latency_ms, error)
+
+
+def run_catalog(collection, catalog, kind=FIND, max_workers=DEFAULT_MAX_WORKERS,
+                expect_failure=False, max_docs=None):
+    """Run every find filter (kind="find") or pipeline (kind="aggregate") concurrently
+
+    Results are streamed as undecoded RawBSONDocuments and only counted. With
+    expect_failure=True an entry passes only if the server rejects it with an
+    OperationFailure.
+    """
+    if kind not in (FIND, AGGREGATE):
+        raise ValueError(f"Unknown catalog kind: {kind}")
+    catalog = list(catalog)
+    raw = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+    start = time.perf_counter_ns()
+    if not catalog:
+        return BatchReport([], 0.0)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(catalog)))) as pool:
+        futures = [
+            pool.submit(_run_one, raw, kind, index, spec, expect_failure, max_docs)
+            for index, spec in enumerate(catalog)
+        ]
+        outcomes = [future.result() for future in futures]
+    return BatchReport(outcomes, (time.perf_counter_ns() - start) / 1e6)
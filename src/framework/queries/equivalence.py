@@ -0,0 +1,206 @@
+# Cross-plan result equivalence
+#
+# The same query must return the same documents whichever plan answers it.
+# check_plan_equivalence() runs a find under every applicable plan -- each
+# usable index via hint, plus a $natural collection scan -- and reduces each
+# result stream to an order-insensitive digest: the count, and the sum (mod
+# 2**128) of a 128-bit hash of every document's raw BSON. Documents are never
+# decoded or collected, so memory stays flat for any result size. Only when
+# two digests differ are the plans re-run sorted by _id and merged pairwise to
+# name the documents that diverge.
+import hashlib
+import time
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from src.framework.queries.evaluator import compare_values
+from src.framework.queries.explain import explain_find
+
+NATURAL = {"$natural": 1}
+_MODULUS = 2 ** 128
+
+
+def filter_fields(query):
+    """Field paths referenced anywhere in a filter (inside $and/$or/$nor too)"""
+    fields = []
+    stack = [query]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        for key, value in node.items():
+            if key in ("$and", "$or", "$nor"):
+                stack.append(value)
+            elif not key.startswith("$") and key not in fields:
+                fields.append(key)
+    return fields
+
+
+def applicable_indexes(collection, query):
+    """Names of indexes whose leading field the filter references and that can be hinted safely
+
+    Sparse, partial, hidden, text, geo and wildcard indexes are skipped: hinting
+    them may legitimately change the result or is rejected by the server.
+    """
+    fields = filter_fields(query)
+    names = []
+    for index in collection.list_indexes():
+        if index["name"] == "_id_" and "_id" not in fields:
+            continue
+        if index.get("sparse") or index.get("partialFilterExpression") or index.get("hidden"):
+            continue
+        keys = list(index["key"].items())
+        if any(not isinstance(direction, (int, float)) or "$**" in field for field, direction in keys):
+            continue
+        if keys[0][0] in fields:
+            names.append(index["name"])
+    return names
+
+
+def _raw(collection):
+    return collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+
+def _id_of(document):
+    value = document["_id"]
+    return bson.decode(value.raw) if isinstance(value, RawBSONDocument) else value
+
+
+def _canonical_bytes(document):
+    """BSON of `document` with keys sorted at every level (field order independent)"""
+    def sort_keys(value):
+        if isinstance(value, dict):
+            return {k: sort_keys(value[k]) for k in sorted(value)}
+        if isinstance(value, list):
+            return [sort_keys(v) for v in value]
+        return value
+    return bson.encode(sort_keys(bson.decode(document.raw)))
+
+
+def _document_hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), "big")
+
+
+class PlanResult:
+    """Digest of the results of one query under one forced plan"""
+
+    __slots__ = ("label", "hint", "count", "digest", "plan_summary", "elapsed_ms")
+
+    def __init__(self, label, hint, count, digest, plan_summary, elapsed_ms):
+        self.label = label
+        self.hint = hint
+        self.count = count
+        self.digest = digest
+        self.plan_summary = plan_summary
+        self.elapsed_ms = elapsed_ms
+
+    def __str__(self):
+        return (f"{self.label}: {self.count} documents, digest {self.digest:032x}, "
+                f"{self.elapsed_ms:.1f}ms, plan {self.plan_summary}")
+
+
+class EquivalenceReport:
+    """Digests of every plan, plus document-level divergences when they disagree"""
+
+    def __init__(self, query, results):
+        self.query = query
+        self.results = results
+        self.divergences = []
+
+    @property
+    def equivalent(self):
+        return len({(r.count, r.digest) for r in self.results}) <= 1
+
+    def format(self):
+        lines = [f"{'equivalent' if self.equivalent else 'DIVERGENT'} results for {self.query} "
+                 f"across {len(self.results)} plans"]
+        lines += [f"  {result}" for result in self.results]
+        for baseline, other, kind, document in self.divergences:
+            lines.append(f"  {kind} ({baseline} vs {other}): {document}")
+        return "\n".join(lines)
+
+
+def stream_digest(documents, canonical=False):
+    """(count, order-insensitive digest) of an iterable of RawBSONDocuments"""
+    count, digest = 0, 0
+    for document in documents:
+        data = _canonical_bytes(document) if canonical else document.raw
+        digest = (digest + _document_hash(data)) % _MODULUS
+        count += 1
+    return count, digest
+
+
+def digest_plan(collection, query, hint, projection=None, label=None):
+    """Run `query` forced onto `hint` and reduce its results to (count, digest)"""
+    raw = _raw(collection)
+    plan = explain_find(collection, query, projection=projection, hint=hint)
+    started = time.perf_counter_ns()
+    cursor = raw.find(query, projection, hint=hint if hint != NATURAL else list(NATURAL.items()))
+    try:
+        count, digest = stream_digest(cursor, canonical=projection is not None)
+    finally:
+        cursor.close()
+    elapsed_ms = (time.perf_counter_ns() - started) / 1e6
+    label = label or (hint if isinstance(hint, str) else "$natural")
+    return PlanResult(label, hint, count, digest, plan.plan_summary(), elapsed_ms)
+
+
+def _sorted_by_id(collection, query, hint, projection):
+    cursor = _raw(collection).find(query, projection, hint=hint if hint != NATURAL else
+                                             list(NATURAL.items()))
+    return cursor.sort("_id", 1).allow_disk_use(True)
+
+
+def diff_plans(collection, query, baseline, other, projection=None, max_divergences=10):
+    """Merge both plans' results in _id order; returns up to `max_divergences` differences
+
+    Each difference is (baseline label, other label, kind, document) where kind is
+    "only_in_baseline", "only_in_other" or "different".
+    """
+    divergences = []
+    left = _sorted_by_id(collection, query, baseline.hint, projection)
+    right = _sorted_by_id(collection, query, other.hint, projection)
+    encode = _canonical_bytes if projection is not None else (lambda document: document.raw)
+    try:
+        a, b = next(left, None), next(right, None)
+        while (a is not None or b is not None) and len(divergences) < max_divergences:
+            order = -1 if b is None else 1 if a is None else compare_values(_id_of(a), _id_of(b))
+            if order < 0:
+                divergences.append((baseline.label, other.label, "only_in_baseline", bson.decode(a.raw)))
+                a = next(left, None)
+            elif order > 0:
+                divergences.append((baseline.label, other.label, "only_in_other", bson.decode(b.raw)))
+                b = next(right, None)
+            else:
+                if encode(a) != encode(b):
+                    divergences.append((baseline.label, other.label, "different",
+                                        {"baseline": bson.decode(a.raw), "other": bson.decode(b.raw)}))
+                a, b = next(left, None), next(right, None)
+    finally:
+        left.close()
+        right.close()
+    return divergences
+
+
+def check_plan_equivalence(collection, query, projection=None, hints=None, include_natural=True,
+                           max_divergences=10):
+    """Run `query` under every applicable plan and compare their result digests"""
+    if hints is None:
+        hints = applicable_indexes(collection, query)
+    hints = list(hints)
+    if include_natural:
+        hints.append(NATURAL)
+    results = [digest_plan(collection, query, hint, projection) for hint in hints]
+    report = EquivalenceReport(query, results)
+    if not report.equivalent:
+        baseline = results[-1] if include_natural else results[0]
+        for result in results:
+            if result is not baseline and (result.count, result.digest) != (baseline.count, baseline.digest):
+                report.divergences += diff_plans(collection, query, baseline, result, projection,
+                                                 max_divergences)
+    return report
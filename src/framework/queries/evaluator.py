@@ -0,0 +1,1128 @@
+# In-memory reference MQL evaluator
+#
+# A pure-Python implementation of the MQL subset the suite exercises, used
+# both offline (unit tests, no mongod) and as a correctness oracle for what
+# the server returns. Filters and expressions are compiled once into nested
+# closures, so evaluating a document is a chain of direct calls with no
+# re-parsing of the query.
+#
+# Supported: comparison ($eq $ne $gt $gte $lt $lte $in $nin), logical ($and
+# $or $nor $not), element ($exists $type), evaluation ($regex $mod $expr),
+# array ($all $size $elemMatch) operators on dotted paths with implicit array
+# traversal; pipeline stages $match $group $sort $project $addFields/$set
+# $unset $limit $skip $unwind $count; and the common expression operators.
+# Values compare in BSON canonical type order (numbers across int/long/double
+# compare by value). Anything outside the subset raises NotImplementedError;
+# specs the server would reject raise ValueError.
+import datetime
+import math
+import re
+from functools import cmp_to_key
+
+from bson import ObjectId
+from bson.int64 import Int64
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+
+class _Missing:
+    """Marker for a path that does not exist (distinct from an explicit null)"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+# =============================================================================
+# BSON type order and comparison
+# =============================================================================
+
+_RE_TYPE = type(re.compile(""))
+
+
+def type_rank(value):
+    """Position of `value`'s type in the BSON canonical sort order"""
+    if value is None or value is MISSING:
+        return 2
+    if isinstance(value, MinKey):
+        return 1
+    if isinstance(value, MaxKey):
+        return 13
+    if isinstance(value, bool):
+        return 9
+    if isinstance(value, (int, float)):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, dict):
+        return 5
+    if isinstance(value, (list, tuple)):
+        return 6
+    if isinstance(value, bytes):
+        return 7
+    if isinstance(value, ObjectId):
+        return 8
+    if isinstance(value, datetime.datetime):
+        return 10
+    if isinstance(value, Timestamp):
+        return 11
+    if isinstance(value, (Regex, _RE_TYPE)):
+        return 12
+    raise NotImplementedError(f"Unsupported BSON value: {value!r}")
+
+
+def _cmp(a, b):
+    return (a > b) - (a < b)
+
+
+def compare_values(a, b):
+    """-1, 0 or 1 ordering `a` and `b` the way the server does"""
+    rank_a, rank_b = type_rank(a), type_rank(b)
+    if rank_a != rank_b:
+        return _cmp(rank_a, rank_b)
+    if rank_a in (1, 2, 13):
+        return 0
+    if rank_a == 3:
+        # NaN sorts below every other number and equals itself
+        nan_a, nan_b = isinstance(a, float) and math.isnan(a), isinstance(b, float) and math.isnan(b)
+        if nan_a or nan_b:
+            return _cmp(not nan_a, not nan_b)
+        return _cmp(a, b)
+    if rank_a == 4:
+        return _cmp(a.encode("utf-8"), b.encode("utf-8"))
+    if rank_a == 5:
+        items_a, items_b = list(a.items()), list(b.items())
+        for (key_a, value_a), (key_b, value_b) in zip(items_a, items_b):
+            result = _cmp(type_rank(value_a), type_rank(value_b)) or _cmp(key_a, key_b) \
+                or compare_values(value_a, value_b)
+            if result:
+                return result
+        return _cmp(len(items_a), len(items_b))
+    if rank_a == 6:
+        for value_a, value_b in zip(a, b):
+            result = compare_values(value_a, value_b)
+            if result:
+                return result
+        return _cmp(len(a), len(b))
+    if rank_a == 8:
+        return _cmp(a.binary, b.binary)
+    if rank_a == 11:
+        return _cmp((a.time, a.inc), (b.time, b.inc))
+    if rank_a == 12:
+        return _cmp(str(a.pattern), str(b.pattern))
+    return _cmp(a, b)
+
+
+def values_equal(a, b):
+    return compare_values(a, b) == 0
+
+
+sort_key = cmp_to_key(compare_values)
+
+# $type names and numeric codes
+_TYPE_CODES = {
+    "double": 1, "string": 2, "object": 3, "array": 4, "binData": 5, "objectId": 7, "bool": 8,
+    "date": 9, "null": 10, "regex": 11, "int": 16, "timestamp": 17, "long": 18, "decimal": 19,
+}
+
+
+def bson_type_code(value):
+    if value is None:
+        return 10
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, Int64):
+        return 18
+    if isinstance(value, int):
+        return 16 if -2 ** 31 <= value < 2 ** 31 else 18
+    if isinstance(value, float):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (list, tuple)):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    if isinstance(value, (Regex, _RE_TYPE)):
+        return 11
+    if isinstance(value, Timestamp):
+        return 17
+    raise NotImplementedError(f"Unsupported BSON value: {value!r}")
+
+
+def _type_matcher(spec):
+    codes = set()
+    numbers = False
+    for alias in spec if isinstance(spec, list) else [spec]:
+        if alias == "number":
+            numbers = True
+        elif isinstance(alias, str):
+            if alias not in _TYPE_CODES:
+                raise ValueError(f"Unknown type name alias: {alias}")
+            codes.add(_TYPE_CODES[alias])
+        elif isinstance(alias, (int, float)) and not isinstance(alias, bool):
+            codes.add(int(alias))
+        else:
+            raise ValueError(f"type must be represented as a number or a string: {alias!r}")
+
+    def matches(value):
+        code = bson_type_code(value)
+        return code in codes or (numbers and code in (1, 16, 18, 19))
+    return matches
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compile_regex(pattern, options=""):
+    if isinstance(pattern, _RE_TYPE):
+        return pattern
+    if isinstance(pattern, Regex):
+        pattern, options = pattern.pattern, pattern.flags
+    flags = 0
+    if isinstance(options, int):
+        flags = options
+    else:
+        for option in options or "":
+            if option not in "imsx":
+                raise ValueError(f"invalid flag in regex options: {option}")
+            flags |= {"i": re.I, "m": re.M, "s": re.S, "x": re.X}[option]
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"Regular expression is invalid: {e}") from None
+
+
+def _is_regex(value):
+    return isinstance(value, (Regex, _RE_TYPE))
+
+# =============================================================================
+# Paths
+# =============================================================================
+
+def path_values(document, path):
+    """Values reachable at a dotted `path`, traversing arrays like the query engine
+
+    Returns a list; MISSING stands for a branch where the path does not exist.
+    """
+    return _values_at(document, path.split("."))
+
+
+def _values_at(document, parts):
+    results = []
+    _collect(document, parts, 0, results)
+    return results
+
+
+def _collect(value, parts, i, results):
+    if i == len(parts):
+        results.append(value)
+        return
+    part = parts[i]
+    if isinstance(value, dict):
+        if part in value:
+            _collect(value[part], parts, i + 1, results)
+        else:
+            results.append(MISSING)
+    elif isinstance(value, list):
+        if part.isdigit() and int(part) < len(value):
+            _collect(value[int(part)], parts, i + 1, results)
+        found = False
+        for element in value:
+            if isinstance(element, dict):
+                found = True
+                _collect(element, parts, i, results)
+        if not found and not part.isdigit():
+            results.append(MISSING)
+    else:
+        results.append(MISSING)
+
+
+def get_path(document, path):
+    """Value of a dotted field path as an aggregation expression sees it ("$a.b")"""
+    return _get_parts(document, path.split("."))
+
+
+def _get_parts(value, parts):
+    for i, part in enumerate(parts):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list):
+            # Arrays of documents yield the array of each element's value
+            rest = parts[i:]
+            return [v for v in (_get_parts(e, rest) for e in value if isinstance(e, (dict, list)))
+                    if v is not MISSING]
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def set_path(document, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        child = document.get(part)
+        if not isinstance(child, dict):
+            child = document[part] = {}
+        document = child
+    document[parts[-1]] = value
+
+
+def unset_path(document, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+# =============================================================================
+# Filters
+# =============================================================================
+
+def _leaf(predicate):
+    """Match when any reachable value, or any element of a reachable array, satisfies `predicate`"""
+    def matches(values):
+        for value in values:
+            if predicate(value):
+                return True
+            if isinstance(value, list) and any(predicate(element) for element in value):
+                return True
+        return False
+    return matches
+
+
+def _eq_predicate(operand, regex_match=True):
+    """Equality with `operand`; a regex operand matches strings unless used with $eq"""
+    if regex_match and _is_regex(operand):
+        regex = _compile_regex(operand)
+        return lambda v: isinstance(v, str) and regex.search(v) is not None or \
+            (_is_regex(v) and str(v.pattern) == str(operand.pattern))
+    if operand is None:
+        return lambda v: v is None or v is MISSING
+    return lambda v: v is not MISSING and values_equal(v, operand)
+
+
+def _comparison_predicate(operator, operand):
+    rank = type_rank(operand)
+    accept = {"$gt": (1,), "$gte": (0, 1), "$lt": (-1,), "$lte": (-1, 0)}[operator]
+    if operand is None:
+        # Only $gte/$lte null match (null and missing); nothing is greater or less than null
+        return (lambda v: v is None or v is MISSING) if 0 in accept else (lambda v: False)
+
+    def predicate(value):
+        if value is MISSING or type_rank(value) != rank:
+            return False
+        return compare_values(value, operand) in accept
+    return predicate
+
+
+def _in_predicate(operand, operator="$in"):
+    if not isinstance(operand, list):
+        raise ValueError(f"{operator} needs an array")
+    predicates = [_eq_predicate(item) for item in operand]
+    return lambda v: any(p(v) for p in predicates)
+
+
+def _is_operator_document(spec):
+    return isinstance(spec, dict) and bool(spec) and all(key.startswith("$") for key in spec)
+
+
+def _compile_operator(operator, operand, spec):
+    """Compile one field operator into a function over the list of path values"""
+    if operator == "$eq":
+        return _leaf(_eq_predicate(operand, regex_match=False))
+    if operator == "$ne":
+        inner = _leaf(_eq_predicate(operand))
+        return lambda values: not inner(values)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        return _leaf(_comparison_predicate(operator, operand))
+    if operator == "$in":
+        return _leaf(_in_predicate(operand))
+    if operator == "$nin":
+        inner = _leaf(_in_predicate(operand, "$nin"))
+        return lambda values: not inner(values)
+    if operator == "$exists":
+        exists = bool(operand)
+        return lambda values: any(v is not MISSING for v in values) == exists
+    if operator == "$type":
+        matcher = _type_matcher(operand)
+        return _leaf(lambda v: v is not MISSING and matcher(v))
+    if operator == "$regex":
+        regex = _compile_regex(operand, spec.get("$options", ""))
+        return _leaf(lambda v: isinstance(v, str) and regex.search(v) is not None)
+    if operator == "$options":
+        if "$regex" not in spec:
+            raise ValueError("$options needs a $regex")
+        return None
+    if operator == "$mod":
+        if not isinstance(operand, list) or len(operand) != 2:
+            raise ValueError("malformed mod, needs to be an array of [divisor, remainder]")
+        divisor, remainder = int(operand[0]), int(operand[1])
+        if divisor == 0:
+            raise ValueError("divisor cannot be 0")
+        return _leaf(lambda v: _is_number(v) and math.fmod(int(v), divisor) == remainder)
+    if operator == "$size":
+        if not _is_number(operand) or operand != int(operand):
+            raise ValueError("$size needs a number")
+        if operand < 0:
+            raise ValueError("$size may not be negative")
+        size = int(operand)
+        return lambda values: any(isinstance(v, list) and len(v) == size for v in values)
+    if operator == "$all":
+        if not isinstance(operand, list):
+            raise ValueError("$all needs an array")
+        if not operand:
+            return lambda values: False
+        matchers = [_compile_operator("$elemMatch", item["$elemMatch"], item)
+                    if isinstance(item, dict) and "$elemMatch" in item else _leaf(_eq_predicate(item))
+                    for item in operand]
+        return lambda values: all(m(values) for m in matchers)
+    if operator == "$elemMatch":
+        if not isinstance(operand, dict):
+            raise ValueError("$elemMatch needs an Object")
+        if _is_operator_document(operand) and not any(k in _LOGICAL for k in operand):
+            element_matches = _compile_field_spec(operand)
+            matches = lambda element: element_matches([element])
+        else:
+            document_matches = compile_filter(operand)
+            matches = lambda element: isinstance(element, dict) and document_matches(element)
+        return lambda values: any(isinstance(v, list) and any(matches(e) for e in v) for v in values)
+    if operator == "$not":
+        if _is_regex(operand):
+            inner = _leaf(_eq_predicate(operand))
+        elif isinstance(operand, dict):
+            if not operand:
+                raise ValueError("$not cannot be empty")
+            inner = _compile_field_spec(operand)
+        else:
+            raise ValueError("$not needs a regex or a document")
+        return lambda values: not inner(values)
+    if operator in _KNOWN_UNSUPPORTED:
+        raise NotImplementedError(f"Query operator {operator}")
+    raise ValueError(f"unknown operator: {operator}")
+
+
+# Valid server operators the evaluator does not implement
+_KNOWN_UNSUPPORTED = ("$bitsAllSet", "$bitsAnySet", "$bitsAllClear", "$bitsAnyClear", "$geoWithin",
+                      "$geoIntersects", "$near", "$nearSphere", "$text", "$where", "$jsonSchema")
+
+
+def _compile_field_spec(spec):
+    """Compile the value of one field in a filter into a function over path values"""
+    if _is_operator_document(spec):
+        matchers = [m for m in (_compile_operator(op, operand, spec) for op, operand in spec.items())
+                    if m is not None]
+        return lambda values: all(m(values) for m in matchers)
+    if isinstance(spec, dict) and any(key.startswith("$") for key in spec):
+        raise ValueError(f"unknown operator: {next(k for k in spec if k.startswith('$'))}")
+    return _leaf(_eq_predicate(spec))
+
+
+def _compile_logical(operator, operand):
+    if not isinstance(operand, list):
+        raise ValueError(f"{operator} must be an array")
+    if not operand:
+        raise ValueError("$and/$or/$nor must be a nonempty array")
+    clauses = [compile_filter(clause) for clause in operand]
+    if operator == "$and":
+        return lambda doc: all(c(doc) for c in clauses)
+    if operator == "$or":
+        return lambda doc: any(c(doc) for c in clauses)
+    return lambda doc: not any(c(doc) for c in clauses)
+
+
+_LOGICAL = ("$and", "$or", "$nor")
+
+
+def compile_filter(query):
+    """Compile a find filter once into a predicate `fn(document) -> bool`"""
+    if not isinstance(query, dict):
+        raise ValueError("filter must be an object")
+    predicates = []
+    for key, spec in query.items():
+        if key in _LOGICAL:
+            predicates.append(_compile_logical(key, spec))
+        elif key == "$expr":
+            expression = compile_expression(spec)
+            predicates.append(lambda doc, expression=expression: is_truthy(expression(doc, doc)))
+        elif key == "$comment":
+            continue
+        elif key.startswith("$"):
+            raise ValueError(f"unknown top level operator: {key}")
+        elif key == "":
+            raise ValueError("field name cannot be empty")
+        else:
+            field_matches = _compile_field_spec(spec)
+            predicates.append(lambda doc, parts=key.split("."), m=field_matches: m(_values_at(doc, parts)))
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda doc: all(p(doc) for p in predicates)
+
+# =============================================================================
+# Aggregation expressions
+# =============================================================================
+
+def is_truthy(value):
+    """Aggregation truthiness: false, null, missing and zero are false"""
+    if value is MISSING or value is None or value is False:
+        return False
+    if _is_number(value):
+        return value != 0
+    return True
+
+
+def _arithmetic(name, function):
+    def compile_operator(args):
+        args = [compile_expression(a) for a in (args if isinstance(args, list) else [args])]
+
+        def evaluate(doc, root):
+            values = [a(doc, root) for a in args]
+            if any(v is None or v is MISSING for v in values):
+                return None
+            if not all(_is_number(v) for v in values):
+                raise ValueError(f"{name} only supports numeric types")
+            return function(values)
+        return evaluate
+    return compile_operator
+
+
+def _divide(values):
+    if values[1] == 0:
+        raise ValueError("can't $divide by zero")
+    return values[0] / values[1]
+
+
+def _mod(values):
+    if values[1] == 0:
+        raise ValueError("can't $mod by zero")
+    return math.fmod(values[0], values[1]) if any(isinstance(v, float) for v in values) \
+        else int(math.fmod(values[0], values[1]))
+
+
+def _round(values):
+    value, places = values[0], int(values[1]) if len(values) > 1 else 0
+    # Server rounds half to even, like Python's round()
+    result = round(value, places)
+    return float(result) if isinstance(value, float) else result
+
+
+def _comparison_expression(operator):
+    accept = {"$eq": (0,), "$ne": (-1, 1), "$gt": (1,), "$gte": (0, 1), "$lt": (-1,), "$lte": (-1, 0)}
+
+    def compile_operator(args):
+        if not isinstance(args, list) or len(args) != 2:
+            raise ValueError(f"Expression {operator} takes exactly 2 arguments")
+        left, right = compile_expression(args[0]), compile_expression(args[1])
+        if operator == "$cmp":
+            return lambda doc, root: _expression_compare(left(doc, root), right(doc, root))
+        return lambda doc, root: _expression_compare(left(doc, root), right(doc, root)) in accept[operator]
+    return compile_operator
+
+
+def _expression_compare(a, b):
+    """compare_values() for aggregation expressions, where missing is its own type
+
+    Unlike query-language $eq/$in, expressions do not equate missing with
+    null: missing sorts above MinKey and below null.
+    """
+    if a is MISSING or b is MISSING:
+        rank_a = 1.5 if a is MISSING else type_rank(a)
+        rank_b = 1.5 if b is MISSING else type_rank(b)
+        return _cmp(rank_a, rank_b)
+    return compare_values(a, b)
+
+
+def _null_if_missing(value):
+    return None if value is MISSING else value
+
+
+def _variadic(function):
+    def compile_operator(args):
+        args = [compile_expression(a) for a in (args if isinstance(args, list) else [args])]
+        return lambda doc, root: function([a(doc, root) for a in args])
+    return compile_operator
+
+
+def _compile_cond(args):
+    if isinstance(args, dict):
+        args = [args.get("if"), args.get("then"), args.get("else")]
+    if len(args) != 3:
+        raise ValueError("Expression $cond takes exactly 3 arguments")
+    condition, then, otherwise = (compile_expression(a) for a in args)
+    return lambda doc, root: then(doc, root) if is_truthy(condition(doc, root)) else otherwise(doc, root)
+
+
+def _compile_if_null(args):
+    args = [compile_expression(a) for a in args]
+
+    def evaluate(doc, root):
+        for arg in args[:-1]:
+            value = arg(doc, root)
+            if value is not None and value is not MISSING:
+                return value
+        return args[-1](doc, root)
+    return evaluate
+
+
+def _unary(name, function, null_on_missing=True):
+    def compile_operator(args):
+        if isinstance(args, list):
+            if len(args) != 1:
+                raise ValueError(f"Expression {name} takes exactly 1 argument")
+            args = args[0]
+        arg = compile_expression(args)
+
+        def evaluate(doc, root):
+            value = arg(doc, root)
+            if null_on_missing and (value is None or value is MISSING):
+                return None
+            return function(value)
+        return evaluate
+    return compile_operator
+
+
+def _size(value):
+    if not isinstance(value, list):
+        raise ValueError("The argument to $size must be an array")
+    return len(value)
+
+
+def _array_values(values):
+    """Accumulator-style operators ($sum, $avg, $min, $max) in expressions: one array arg is unpacked"""
+    if len(values) == 1 and isinstance(values[0], list):
+        return values[0]
+    return values
+
+
+def _sum(values):
+    return sum(v for v in _array_values(values) if _is_number(v))
+
+
+def _avg(values):
+    numbers = [v for v in _array_values(values) if _is_number(v)]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+def _extreme(sign):
+    def function(values):
+        candidates = [v for v in _array_values(values) if v is not None and v is not MISSING]
+        if not candidates:
+            return None
+        best = candidates[0]
+        for value in candidates[1:]:
+            if compare_values(value, best) == sign:
+                best = value
+        return best
+    return function
+
+
+def _concat(values):
+    if any(v is None or v is MISSING for v in values):
+        return None
+    if not all(isinstance(v, str) for v in values):
+        raise ValueError("$concat only supports strings")
+    return "".join(values)
+
+
+def _in_expression(values):
+    item, array = values
+    if not isinstance(array, list):
+        raise ValueError("$in requires an array as a second argument")
+    return any(values_equal(_null_if_missing(item), element) for element in array)
+
+
+def _array_elem_at(values):
+    array, index = values
+    if array is None or array is MISSING:
+        return None
+    if not isinstance(array, list):
+        raise ValueError("$arrayElemAt's first argument must be an array")
+    index = int(index)
+    return array[index] if -len(array) <= index < len(array) else MISSING
+
+
+_EXPRESSION_OPERATORS = {
+    "$add": _arithmetic("$add", lambda v: sum(v[1:], v[0]) if v else 0),
+    "$subtract": _arithmetic("$subtract", lambda v: v[0] - v[1]),
+    "$multiply": _arithmetic("$multiply", lambda v: math.prod(v)),
+    "$divide": _arithmetic("$divide", _divide),
+    "$mod": _arithmetic("$mod", _mod),
+    "$round": _arithmetic("$round", _round),
+    "$abs": _unary("$abs", abs),
+    "$toLower": _unary("$toLower", lambda v: str(v).lower()),
+    "$toUpper": _unary("$toUpper", lambda v: str(v).upper()),
+    "$size": _unary("$size", _size, null_on_missing=False),
+    "$not": _unary("$not", lambda v: not is_truthy(v), null_on_missing=False),
+    "$and": _variadic(lambda v: all(is_truthy(x) for x in v)),
+    "$or": _variadic(lambda v: any(is_truthy(x) for x in v)),
+    "$sum": _variadic(_sum),
+    "$avg": _variadic(_avg),
+    "$min": _variadic(_extreme(-1)),
+    "$max": _variadic(_extreme(1)),
+    "$concat": _variadic(_concat),
+    "$in": _variadic(_in_expression),
+    "$arrayElemAt": _variadic(_array_elem_at),
+    "$cond": _compile_cond,
+    "$ifNull": _compile_if_null,
+}
+for _operator in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$cmp"):
+    _EXPRESSION_OPERATORS[_operator] = _comparison_expression(_operator)
+
+
+def compile_expression(expression):
+    """Compile an aggregation expression into `fn(document, root) -> value`"""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        if name not in ("ROOT", "CURRENT"):
+            raise NotImplementedError(f"Variable $${name}")
+        if path:
+            parts = path.split(".")
+            return lambda doc, root: _get_parts(root if name == "ROOT" else doc, parts)
+        return lambda doc, root: root if name == "ROOT" else doc
+    if isinstance(expression, str) and expression.startswith("$"):
+        parts = expression[1:].split(".")
+        return lambda doc, root: _get_parts(doc, parts)
+    if isinstance(expression, list):
+        items = [compile_expression(e) for e in expression]
+        return lambda doc, root: [_null_if_missing(item(doc, root)) for item in items]
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            (operator, args), = expression.items()
+            if operator == "$literal":
+                return lambda doc, root: args
+            if operator.startswith("$"):
+                if operator not in _EXPRESSION_OPERATORS:
+                    raise NotImplementedError(f"Expression operator {operator}")
+                return _EXPRESSION_OPERATORS[operator](args)
+        if any(key.startswith("$") for key in expression):
+            raise ValueError("an expression specification must contain exactly one field")
+        fields = [(key, compile_expression(value)) for key, value in expression.items()]
+
+        def evaluate(doc, root):
+            result = {}
+            for key, field in fields:
+                value = field(doc, root)
+                if value is not MISSING:
+                    result[key] = value
+            return result
+        return evaluate
+    return lambda doc, root: expression
+
+# =============================================================================
+# Accumulators
+# =============================================================================
+
+class _Accumulator:
+    __slots__ = ("operator", "values")
+
+    def __init__(self, operator):
+        self.operator = operator
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    def result(self):
+        operator, values = self.operator, self.values
+        if operator == "$sum":
+            return sum(v for v in values if _is_number(v))
+        if operator == "$avg":
+            return _avg(values)
+        if operator == "$min":
+            return _extreme(-1)(values)
+        if operator == "$max":
+            return _extreme(1)(values)
+        if operator == "$first":
+            return _null_if_missing(values[0]) if values else None
+        if operator == "$last":
+            return _null_if_missing(values[-1]) if values else None
+        if operator == "$push":
+            return [v for v in values if v is not MISSING]
+        if operator == "$addToSet":
+            unique = []
+            for value in values:
+                if value is not MISSING and not any(values_equal(value, u) for u in unique):
+                    unique.append(value)
+            return unique
+        if operator == "$count":
+            return len(values)
+        raise ValueError(f"unknown group operator '{operator}'")
+
+
+_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$count")
+
+# =============================================================================
+# Pipeline stages
+# =============================================================================
+
+def _stage_match(spec):
+    predicate = compile_filter(spec)
+    return lambda docs: (doc for doc in docs if predicate(doc))
+
+
+def _stage_limit(spec):
+    if not _is_number(spec) or spec <= 0:
+        raise ValueError("the limit must be positive")
+    limit = int(spec)
+
+    def run(docs):
+        for i, doc in enumerate(docs):
+            if i >= limit:
+                return
+            yield doc
+    return run
+
+
+def _stage_skip(spec):
+    if not _is_number(spec) or spec < 0:
+        raise ValueError("invalid argument to $skip stage: Expected a non-negative number")
+    skip = int(spec)
+    return lambda docs: (doc for i, doc in enumerate(docs) if i >= skip)
+
+
+def _sort_value(document, path, direction):
+    """Sort key of one field: arrays sort by their smallest (asc) or largest (desc) element"""
+    value = get_path(document, path)
+    if value is MISSING:
+        return None
+    if isinstance(value, list):
+        # An empty array sorts before null
+        if not value:
+            return MinKey()
+        return _extreme(-1 if direction > 0 else 1)(value)
+    return value
+
+
+def sort_documents(documents, spec):
+    """Stable sort by a {field: 1 | -1} spec using BSON ordering"""
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("$sort stage must have at least one sort key")
+    keys = list(spec.items())
+    for _, direction in keys:
+        if direction not in (1, -1):
+            raise NotImplementedError(f"sort direction {direction!r}")
+
+    def compare(a, b):
+        for path, direction in keys:
+            result = compare_values(_sort_value(a, path, direction), _sort_value(b, path, direction))
+            if result:
+                return result * direction
+        return 0
+    return sorted(documents, key=cmp_to_key(compare))
+
+
+def _stage_sort(spec):
+    sort_documents([], spec)
+    return lambda docs: iter(sort_documents(list(docs), spec))
+
+
+def _stage_group(spec):
+    if not isinstance(spec, dict) or "_id" not in spec:
+        raise ValueError("a group specification must include an _id")
+    key_expression = compile_expression(spec["_id"])
+    fields = []
+    for name, accumulator in spec.items():
+        if name == "_id":
+            continue
+        if not isinstance(accumulator, dict) or len(accumulator) != 1:
+            raise ValueError(f"The field '{name}' must be an accumulator object")
+        (operator, argument), = accumulator.items()
+        if operator not in _ACCUMULATORS:
+            raise ValueError(f"unknown group operator '{operator}'")
+        fields.append((name, operator, compile_expression(argument if operator != "$count" else 1)))
+
+    def run(docs):
+        groups = {}
+        for doc in docs:
+            key = _null_if_missing(key_expression(doc, doc))
+            group_key = canonical(key)
+            if group_key not in groups:
+                groups[group_key] = (key, [_Accumulator(operator) for _, operator, _ in fields])
+            accumulators = groups[group_key][1]
+            for accumulator, (_, _, argument) in zip(accumulators, fields):
+                accumulator.add(argument(doc, doc))
+        for key, accumulators in groups.values():
+            result = {"_id": key}
+            for accumulator, (name, _, _) in zip(accumulators, fields):
+                result[name] = accumulator.result()
+            yield result
+    return run
+
+
+def _project_inclusion(document, tree):
+    result = {}
+    for key, value in document.items():
+        if key not in tree:
+            continue
+        sub = tree[key]
+        if sub is True:
+            result[key] = value
+        elif isinstance(value, dict):
+            result[key] = _project_inclusion(value, sub)
+        elif isinstance(value, list):
+            result[key] = [_project_inclusion(e, sub) for e in value if isinstance(e, dict)]
+    return result
+
+
+def _project_exclusion(document, tree):
+    result = {}
+    for key, value in document.items():
+        sub = tree.get(key)
+        if sub is True:
+            continue
+        if sub is None:
+            result[key] = value
+        elif isinstance(value, dict):
+            result[key] = _project_exclusion(value, sub)
+        elif isinstance(value, list):
+            result[key] = [_project_exclusion(e, sub) if isinstance(e, dict) else e for e in value]
+        else:
+            result[key] = value
+    return result
+
+
+def _path_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def compile_projection(spec):
+    """Compile a find projection or $project spec into `fn(document) -> document`"""
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("projection specification must have at least one field")
+    include_id = None
+    included, excluded, computed = [], [], []
+    for path, value in spec.items():
+        flag = isinstance(value, bool) or _is_number(value)
+        if path == "_id" and flag:
+            include_id = bool(value)
+        elif flag:
+            (included if value else excluded).append(path)
+        else:
+            computed.append((path, compile_expression(value)))
+    if excluded and (included or computed):
+        raise ValueError("Cannot do exclusion on field in inclusion projection")
+
+    # {_id: 0} alone is an exclusion projection; {_id: 1} alone includes only _id
+    if excluded or (not included and not computed and include_id is False):
+        tree = _path_tree(excluded + ([] if include_id else ["_id"]))
+        return lambda doc: _project_exclusion(doc, tree)
+
+    tree = _path_tree(included + (["_id"] if include_id is not False else []))
+
+    def project(doc):
+        result = _project_inclusion(doc, tree)
+        for path, expression in computed:
+            value = expression(doc, doc)
+            if value is not MISSING:
+                set_path(result, path, value)
+        return result
+    return project
+
+
+def _stage_project(spec):
+    project = compile_projection(spec)
+    return lambda docs: (project(doc) for doc in docs)
+
+
+def _stage_add_fields(spec):
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("$addFields specification must have at least one field")
+    fields = [(path, compile_expression(value)) for path, value in spec.items()]
+
+    def add(doc):
+        result = _copy(doc)
+        for path, expression in fields:
+            value = expression(doc, doc)
+            if value is MISSING:
+                unset_path(result, path)
+            else:
+                set_path(result, path, value)
+        return result
+    return lambda docs: (add(doc) for doc in docs)
+
+
+def _stage_unset(spec):
+    paths = [spec] if isinstance(spec, str) else spec
+
+    def unset(doc):
+        result = _copy(doc)
+        for path in paths:
+            unset_path(result, path)
+        return result
+    return lambda docs: (unset(doc) for doc in docs)
+
+
+def _stage_unwind(spec):
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec.get("path")
+    if not isinstance(path, str) or not path.startswith("$"):
+        raise ValueError("path option to $unwind stage should be prefixed with a '$'")
+    path = path[1:]
+    preserve = spec.get("preserveNullAndEmptyArrays", False)
+    index_field = spec.get("includeArrayIndex")
+
+    def run(docs):
+        for doc in docs:
+            value = get_path(doc, path)
+            if isinstance(value, list) and value:
+                for i, element in enumerate(value):
+                    result = _copy(doc)
+                    set_path(result, path, element)
+                    if index_field:
+                        set_path(result, index_field, i)
+                    yield result
+            elif isinstance(value, list) or value is None or value is MISSING:
+                if preserve:
+                    result = _copy(doc)
+                    if isinstance(value, list):
+                        unset_path(result, path)
+                    if index_field:
+                        set_path(result, index_field, None)
+                    yield result
+            else:
+                result = _copy(doc)
+                if index_field:
+                    set_path(result, index_field, None)
+                yield result
+    return run
+
+
+def _stage_count(spec):
+    if not isinstance(spec, str) or not spec or spec.startswith("$") or "." in spec:
+        raise ValueError("the count field must be a non-empty string, not start with '$' or contain '.'")
+
+    def run(docs):
+        count = sum(1 for _ in docs)
+        if count:
+            yield {spec: count}
+    return run
+
+
+_STAGES = {
+    "$match": _stage_match,
+    "$limit": _stage_limit,
+    "$skip": _stage_skip,
+    "$sort": _stage_sort,
+    "$group": _stage_group,
+    "$project": _stage_project,
+    "$addFields": _stage_add_fields,
+    "$set": _stage_add_fields,
+    "$unset": _stage_unset,
+    "$unwind": _stage_unwind,
+    "$count": _stage_count,
+}
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def compile_pipeline(pipeline):
+    """Compile a pipeline once into `fn(documents) -> iterator of documents`"""
+    if not isinstance(pipeline, list):
+        raise ValueError("pipeline must be an array")
+    stages = []
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise ValueError("A pipeline stage specification object must contain exactly one field")
+        (name, spec), = stage.items()
+        if name not in _STAGES:
+            if name.startswith("$"):
+                raise NotImplementedError(f"Stage {name}")
+            raise ValueError(f"Unrecognized pipeline stage name: '{name}'")
+        stages.append(_STAGES[name](spec))
+
+    def run(documents):
+        docs = iter(documents)
+        for stage in stages:
+            docs = stage(docs)
+        return docs
+    return run
+
+
+def aggregate(documents, pipeline):
+    """Run `pipeline` over an iterable of documents; returns a list"""
+    return list(compile_pipeline(pipeline)(documents))
+
+
+def find(documents, filter=None, projection=None, sort=None, skip=0, limit=0):
+    """Evaluate a find command over an iterable of documents; returns a list"""
+    predicate = compile_filter(filter or {}) if filter else (lambda doc: True)
+    results = [doc for doc in documents if predicate(doc)]
+    if sort:
+        results = sort_documents(results, sort)
+    if skip:
+        results = results[skip:]
+    if limit:
+        results = results[:abs(limit)]
+    if projection:
+        project = compile_projection(projection)
+        results = [project(doc) for doc in results]
+    return results
+
+# =============================================================================
+# Result comparison
+# =============================================================================
+
+def canonical(value):
+    """Hashable, order-insensitive form of a value, for comparing result sets"""
+    if value is MISSING or value is None:
+        return (2, None)
+    if isinstance(value, bool):
+        return (9, value)
+    if _is_number(value):
+        # Cross-type numeric equality; tolerate float summation-order noise
+        return (3, float(f"{float(value):.12g}"))
+    if isinstance(value, dict):
+        return (5, tuple(sorted((k, canonical(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (6, tuple(canonical(v) for v in value))
+    if _is_regex(value):
+        return (12, str(value.pattern))
+    return (type_rank(value), value)
+
+
+def diff_results(expected, actual):
+    """(missing, unexpected): documents only in `expected`, documents only in `actual`"""
+    remaining = {}
+    for doc in actual:
+        remaining.setdefault(canonical(doc), []).append(doc)
+    missing = []
+    for doc in expected:
+        bucket = remaining.get(canonical(doc))
+        if bucket:
+            bucket.pop()
+        else:
+            missing.append(doc)
+    unexpected = [doc for bucket in remaining.values() for doc in bucket]
+    return missing, unexpected
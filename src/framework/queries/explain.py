@@ -0,0 +1,263 @@
+# Explain-plan model
+#
+# Explain output is parsed once into a tree of small __slots__ PlanNode
+# objects; tests then ask questions of the tree ("which indexes", "is it
+# covered", "find every SORT stage") instead of walking raw dicts by hand.
+# Classic plans, SBE plans (winningPlan.queryPlan), aggregate explains
+# ($cursor stage), executionStats trees and mongos find explains (one child
+# per shard under SINGLE_SHARD/SHARD_MERGE) are all handled. Traversal is
+# iterative, so plans with hundreds of $or branches cost nothing extra.
+
+# Keys under which a stage nests its children, in classic and SBE explain output
+_SINGLE_CHILD_KEYS = ("inputStage", "innerStage", "outerStage", "thenStage", "elseStage")
+_MULTI_CHILD_KEYS = ("inputStages",)
+
+# Stages that read index keys without touching documents
+INDEX_SCAN_STAGES = ("IXSCAN", "DISTINCT_SCAN", "COUNT_SCAN", "IDHACK", "EXPRESS_IXSCAN")
+
+# Stages that appear in the server's planSummary (profiler and slow-query log)
+_SUMMARY_STAGES = INDEX_SCAN_STAGES + ("COLLSCAN", "EOF", "EXPRESS_IDHACK", "EXPRESS_CLUSTERED_IXSCAN")
+
+
+def format_key_pattern(key_pattern):
+    """Render a key pattern the way planSummary does: { year: 1, genres: -1 }"""
+    return "{ " + ", ".join(f"{field}: {value}" for field, value in key_pattern.items()) + " }"
+
+
+class PlanNode:
+    """One stage of a query plan"""
+
+    __slots__ = (
+        "stage", "index_name", "key_pattern", "index_bounds", "is_multikey",
+        "direction", "filter", "n_returned", "works", "keys_examined",
+        "docs_examined", "execution_time_ms", "children", "raw",
+    )
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.stage = raw.get("stage")
+        self.index_name = raw.get("indexName")
+        self.key_pattern = raw.get("keyPattern")
+        self.index_bounds = raw.get("indexBounds")
+        self.is_multikey = raw.get("isMultiKey")
+        self.direction = raw.get("direction")
+        self.filter = raw.get("filter")
+        # Only present in executionStats trees
+        self.n_returned = raw.get("nReturned")
+        self.works = raw.get("works")
+        self.keys_examined = raw.get("keysExamined")
+        self.docs_examined = raw.get("docsExamined")
+        self.execution_time_ms = raw.get("executionTimeMillisEstimate")
+        self.children = []
+
+    def walk(self):
+        """Yield this node and every descendant, depth first (pre-order)"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def find_stages(self, *stages):
+        """All nodes whose stage is one of `stages`"""
+        return [node for node in self.walk() if node.stage in stages]
+
+    def has_stage(self, *stages):
+        return any(node.stage in stages for node in self.walk())
+
+    def stages(self):
+        """Stage names in pre-order"""
+        return [node.stage for node in self.walk()]
+
+    def indexes_used(self):
+        """Names of the indexes scanned by this plan, in plan order, without duplicates"""
+        names = []
+        for node in self.walk():
+            if node.index_name and node.index_name not in names:
+                names.append(node.index_name)
+        return names
+
+    def is_collscan(self):
+        return self.has_stage("COLLSCAN")
+
+    def is_covered(self):
+        """True when the plan is answered from index keys alone"""
+        has_index_scan = False
+        for node in self.walk():
+            if node.stage in ("FETCH", "COLLSCAN"):
+                return False
+            if node.stage in INDEX_SCAN_STAGES and node.stage != "IDHACK":
+                has_index_scan = True
+        return has_index_scan
+
+    def plan_summary(self):
+        """The server's planSummary format, e.g. "IXSCAN { year: 1 }" or "COLLSCAN" """
+        parts = []
+        for node in self.walk():
+            if node.stage in _SUMMARY_STAGES:
+                if node.key_pattern:
+                    part = f"{node.stage} {format_key_pattern(node.key_pattern)}"
+                else:
+                    part = node.stage
+                if part not in parts:
+                    parts.append(part)
+        return ", ".join(parts) if parts else (self.stage or "")
+
+    def summary(self):
+        """Compact one-line rendering, e.g. FETCH(IXSCAN[year_1])"""
+        label = self.stage or "?"
+        if self.index_name:
+            label += f"[{self.index_name}]"
+        if self.children:
+            label += "(" + ", ".join(child.summary() for child in self.children) + ")"
+        return label
+
+    def __repr__(self):
+        return f"<PlanNode {self.summary()}>"
+
+
+def _unwrap(raw):
+    # SBE explain wraps the plan tree: {"queryPlan": {...}, "slotBasedPlan": {...}}
+    if "queryPlan" in raw and "stage" not in raw:
+        return raw["queryPlan"]
+    return raw
+
+
+def parse_plan(raw):
+    """Build a PlanNode tree from a raw plan/stage dict (iteratively)"""
+    if raw is None:
+        return None
+    root = PlanNode(_unwrap(raw))
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for key in _SINGLE_CHILD_KEYS:
+            child_raw = node.raw.get(key)
+            if child_raw:
+                child = PlanNode(child_raw)
+                node.children.append(child)
+                stack.append(child)
+        for key in _MULTI_CHILD_KEYS:
+            for child_raw in node.raw.get(key) or ():
+                child = PlanNode(child_raw)
+                node.children.append(child)
+                stack.append(child)
+        # mongos SINGLE_SHARD/SHARD_MERGE stages: each shard's plan becomes a child
+        for shard in node.raw.get("shards") or ():
+            child_raw = shard.get("winningPlan") or shard.get("executionStages")
+            if child_raw:
+                child = PlanNode(_unwrap(child_raw))
+                node.children.append(child)
+                stack.append(child)
+    return root
+
+
+class ExplainResult:
+    """Parsed explain output for a find or an aggregation"""
+
+    __slots__ = (
+        "raw", "query_planner", "execution_stats", "winning_plan",
+        "rejected_plans", "execution_stages", "pipeline_stages",
+    )
+
+    def __init__(self, raw):
+        self.raw = raw
+        query_planner = raw.get("queryPlanner")
+        execution_stats = raw.get("executionStats")
+        # Classic aggregate explain: the find layer lives in the leading $cursor stage
+        self.pipeline_stages = raw.get("stages") or []
+        if query_planner is None and self.pipeline_stages:
+            cursor = self.pipeline_stages[0].get("$cursor") or {}
+            query_planner = cursor.get("queryPlanner")
+            execution_stats = cursor.get("executionStats")
+        self.query_planner = query_planner or {}
+        self.execution_stats = execution_stats or {}
+
+        self.winning_plan = parse_plan(self.query_planner.get("winningPlan"))
+        self.rejected_plans = [parse_plan(p) for p in self.query_planner.get("rejectedPlans") or []]
+        self.execution_stages = parse_plan(self.execution_stats.get("executionStages"))
+
+    @property
+    def plan_cache_key(self):
+        return self.query_planner.get("planCacheKey")
+
+    @property
+    def query_hash(self):
+        return self.query_planner.get("queryHash")
+
+    @property
+    def namespace(self):
+        return self.query_planner.get("namespace")
+
+    @property
+    def is_sbe(self):
+        """True when the slot-based execution engine produced the plan"""
+        winning = self.query_planner.get("winningPlan") or {}
+        return self.raw.get("explainVersion") == "2" or "slotBasedPlan" in winning
+
+    @property
+    def plans_evaluated(self):
+        return 1 + len(self.rejected_plans) if self.winning_plan else 0
+
+    # Convenience delegation to the winning plan
+
+    def find_stages(self, *stages):
+        return self.winning_plan.find_stages(*stages)
+
+    def has_stage(self, *stages):
+        return self.winning_plan.has_stage(*stages)
+
+    def indexes_used(self):
+        return self.winning_plan.indexes_used()
+
+    def is_collscan(self):
+        return self.winning_plan.is_collscan()
+
+    def is_covered(self):
+        return self.winning_plan.is_covered()
+
+    def plan_summary(self):
+        return self.winning_plan.plan_summary() if self.winning_plan else ""
+
+    def summary(self):
+        return self.winning_plan.summary() if self.winning_plan else "<no plan>"
+
+    def __repr__(self):
+        return f"<ExplainResult {self.summary()}>"
+
+
+def parse_explain(raw):
+    """Parse raw explain output (a dict) once into an ExplainResult"""
+    return ExplainResult(raw)
+
+
+def _key_document(spec):
+    """A sort/hint spec as a document: [(field, direction), ...] pairs encode as a BSON array"""
+    if isinstance(spec, (list, tuple)):
+        return dict(spec)
+    return spec
+
+
+def explain_find(collection, filter=None, projection=None, sort=None, limit=None,
+                 hint=None, verbosity="queryPlanner"):
+    """Explain a find command at the given verbosity and return an ExplainResult"""
+    command = {"find": collection.name, "filter": filter or {}}
+    if projection is not None:
+        command["projection"] = projection
+    if sort is not None:
+        command["sort"] = _key_document(sort)
+    if limit:
+        command["limit"] = limit
+    if hint is not None:
+        command["hint"] = _key_document(hint)
+    raw = collection.database.command("explain", command, verbosity=verbosity)
+    return ExplainResult(raw)
+
+
+def explain_aggregate(collection, pipeline, verbosity="queryPlanner", allow_disk_use=None):
+    """Explain an aggregate command at the given verbosity and return an ExplainResult"""
+    command = {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}}
+    if allow_disk_use is not None:
+        command["allowDiskUse"] = allow_disk_use
+    raw = collection.database.command("explain", command, verbosity=verbosity)
+    return ExplainResult(raw)
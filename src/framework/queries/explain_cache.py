@@ -0,0 +1,156 @@
+# Explain-result cache
+#
+# Queries that differ only in their literals get the same plan, so explaining
+# each of them costs a planning round trip for nothing. ExplainCache keys
+# queryPlanner explains on (namespace, query shape, index catalog fingerprint,
+# server version): a repeated shape is answered locally, while a new index, a
+# dropped or hidden one, or a different server gets a fresh explain.
+#
+# Index changes made through an IndexManager invalidate the collection's
+# entries straight away (via the index listeners). Indexes changed any other
+# way (create_index in a test, snapshot restores) are caught by re-reading the
+# catalog fingerprint on each lookup; pass verify_catalog=False to trust the
+# listeners alone and skip that listIndexes round trip.
+#
+# A cached result is the explain of the first query seen with that shape: its
+# indexBounds and parsedQuery carry that query's literals. Use the cache for
+# plan-shape questions (stages, indexes, covering), not for bounds. Only
+# queryPlanner verbosity is cached; executionStats depend on the literals and
+# always go to the server.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from src.framework.database.indexes import add_index_listener, remove_index_listener
+from src.framework.database.isolation import index_specs
+from src.framework.queries import explain
+from src.framework.queries.shape import aggregate_shape, find_shape, shape_hash
+
+
+def catalog_fingerprint(collection):
+    """Digest of a collection's secondary index specs (keys, options and hidden flags)"""
+    specs = sorted(index_specs(collection), key=lambda spec: spec["name"])
+    encoded = json.dumps(specs, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode()).hexdigest()
+
+
+class ExplainCache:
+    """LRU cache of parsed queryPlanner explains keyed on query shape and index catalog
+
+        cache = ExplainCache()
+        cache.explain_find(db.movies, {"genres": "Drama"})   # server round trip
+        cache.explain_find(db.movies, {"genres": "Action"})  # same shape: cached
+    """
+
+    def __init__(self, max_entries=1024, verify_catalog=True):
+        self.max_entries = max_entries
+        self.verify_catalog = verify_catalog
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._server_versions = {}
+        self._lock = threading.Lock()
+        add_index_listener(self.invalidate)
+
+    def close(self):
+        """Stop listening for index changes and drop every entry"""
+        remove_index_listener(self.invalidate)
+        self.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+
+    def invalidate(self, event=None, collection=None, name=None):
+        """Drop entries for `collection` (every entry when None); also an index listener"""
+        with self._lock:
+            if collection is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._fingerprints.clear()
+            else:
+                namespace = collection.full_name
+                stale = [key for key in self._entries if key[0] == namespace]
+                for key in stale:
+                    del self._entries[key]
+                self._fingerprints.pop(namespace, None)
+                removed = len(stale)
+            if removed:
+                self.invalidations += 1
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "bypassed": self.bypassed, "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def server_version(self, collection):
+        client = collection.database.client
+        if client not in self._server_versions:
+            self._server_versions[client] = client.server_info()["version"]
+        return self._server_versions[client]
+
+    def fingerprint(self, collection):
+        """Index catalog fingerprint, re-read unless verify_catalog is off"""
+        namespace = collection.full_name
+        if self.verify_catalog or namespace not in self._fingerprints:
+            self._fingerprints[namespace] = catalog_fingerprint(collection)
+        return self._fingerprints[namespace]
+
+    def key(self, collection, shape):
+        return (collection.full_name, shape_hash(shape), self.fingerprint(collection),
+                self.server_version(collection))
+
+    def _lookup(self, collection, shape, run):
+        key = self.key(collection, shape)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = run()
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def explain_find(self, collection, filter=None, projection=None, sort=None, limit=None,
+                     hint=None, verbosity="queryPlanner"):
+        """explain.explain_find, answered from the cache for a known shape"""
+        def run():
+            return explain.explain_find(collection, filter, projection, sort, limit, hint, verbosity)
+        if verbosity != "queryPlanner":
+            self.bypassed += 1
+            return run()
+        return self._lookup(collection, find_shape(filter, projection, sort, limit, hint=hint), run)
+
+    def explain_aggregate(self, collection, pipeline, verbosity="queryPlanner", allow_disk_use=None):
+        """explain.explain_aggregate, answered from the cache for a known shape"""
+        def run():
+            return explain.explain_aggregate(collection, pipeline, verbosity, allow_disk_use)
+        if verbosity != "queryPlanner":
+            self.bypassed += 1
+            return run()
+        shape = aggregate_shape(pipeline)
+        if allow_disk_use is not None:
+            shape["allowDiskUse"] = allow_disk_use
+        return self._lookup(collection, shape, run)
@@ -0,0 +1,264 @@
+# Aggregation pipeline profiling
+#
+# profile_pipeline() explains a pipeline with executionStats and breaks the
+# result down per stage, whichever engine ran it:
+#   - find-layer stages (the $cursor part, or the whole pipeline when it was
+#     pushed down into SBE) come from the executionStages tree
+#   - the remaining stages come from the aggregate explain's `stages` list
+# Each stage gets docs in/out, exclusive time (explain times are cumulative,
+# so upstream time is subtracted), memory use and spill counters. Pipeline
+# stages missing from the remaining list were absorbed: pushed into the find
+# layer ($match, $sort, SBE $group) or coalesced with a neighbour ($limit
+# into $sort).
+#
+# compare_disk_use() runs the same pipeline with allowDiskUse on and off, to
+# show what spilling costs and whether the pipeline fits in memory at all.
+from collections import Counter
+
+from pymongo.errors import OperationFailure
+
+from src.framework.queries.explain import explain_aggregate
+
+# Memory figures reported by $group/$sort (classic) and group/sort (SBE), preferred first
+MEMORY_FIELDS = ("peakTrackedMemBytes", "maxAccumulatorMemoryUsageBytes", "totalDataSizeSortedBytesEstimate",
+                 "totalDataSizeSorted", "memUsage")
+SPILLED_BYTES_FIELDS = ("spilledBytes", "spilledDataStorageSize", "numBytesSpilledEstimate")
+
+FIND_LAYER = "find"
+PIPELINE_LAYER = "pipeline"
+
+
+def _memory_bytes(raw):
+    for field in MEMORY_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, dict):
+            # maxAccumulatorMemoryUsageBytes is reported per accumulator
+            return sum(value.values())
+        if value is not None:
+            return value
+    return None
+
+
+def _spilled_bytes(raw):
+    for field in SPILLED_BYTES_FIELDS:
+        if raw.get(field) is not None:
+            return raw[field]
+    return 0
+
+
+def _stage_name(raw):
+    return next((key for key in raw if key.startswith("$")), None)
+
+
+def normalize_stage_name(name):
+    """"$group", "GROUP" and "group" all become "group" """
+    return (name or "").lstrip("$").lower()
+
+
+class StageStats:
+    """Execution statistics of one pipeline or find-layer stage"""
+
+    __slots__ = ("name", "layer", "docs_in", "docs_out", "time_ms", "cumulative_ms", "memory_bytes",
+                 "used_disk", "spills", "spilled_bytes", "raw")
+
+    def __init__(self, name, layer, raw, docs_in, docs_out, time_ms, cumulative_ms):
+        self.name = name
+        self.layer = layer
+        self.raw = raw
+        self.docs_in = docs_in
+        self.docs_out = docs_out
+        self.time_ms = time_ms
+        self.cumulative_ms = cumulative_ms
+        self.memory_bytes = _memory_bytes(raw)
+        self.used_disk = bool(raw.get("usedDisk"))
+        self.spills = raw.get("spills") or (1 if self.used_disk else 0)
+        self.spilled_bytes = _spilled_bytes(raw)
+
+    def __str__(self):
+        text = (f"{self.layer:<8} {self.name:<14} in={self.docs_in if self.docs_in is not None else '-'} "
+                f"out={self.docs_out if self.docs_out is not None else '-'} time={self.time_ms}ms")
+        if self.memory_bytes is not None:
+            text += f" mem={self.memory_bytes}B"
+        if self.used_disk:
+            text += f" SPILLED spills={self.spills} bytes={self.spilled_bytes}"
+        return text
+
+
+def _find_layer_stages(plan):
+    """StageStats for every node of an executionStages tree, in pre-order"""
+    if plan.execution_stages is None:
+        return []
+    stages = []
+    for node in plan.execution_stages.walk():
+        cumulative = node.execution_time_ms or 0
+        children = sum(child.execution_time_ms or 0 for child in node.children)
+        if node.children:
+            docs_in = sum(child.n_returned or 0 for child in node.children)
+        else:
+            docs_in = node.docs_examined if node.docs_examined is not None else node.keys_examined
+        stages.append(StageStats(node.stage, FIND_LAYER, node.raw, docs_in, node.n_returned,
+                                 max(cumulative - children, 0), cumulative))
+    return stages
+
+
+def _pipeline_layer_stages(plan):
+    """StageStats for the stages after $cursor, with upstream time subtracted"""
+    stages = []
+    previous_out, previous_ms = None, 0
+    for raw in plan.pipeline_stages:
+        name = _stage_name(raw)
+        cumulative = raw.get("executionTimeMillisEstimate") or 0
+        docs_out = raw.get("nReturned")
+        if name == "$cursor":
+            previous_out, previous_ms = docs_out, cumulative
+            continue
+        # Stats are siblings of the stage spec: {"$group": {...}, "usedDisk": ..., "nReturned": ...}
+        stages.append(StageStats(name, PIPELINE_LAYER, raw, previous_out, docs_out,
+                                 max(cumulative - previous_ms, 0), cumulative))
+        previous_out, previous_ms = docs_out, cumulative
+    return stages
+
+
+def absorbed_stages(pipeline, remaining):
+    """Names of pipeline stages that no longer appear in the explained `remaining` stage names"""
+    left = Counter(remaining)
+    absorbed = []
+    for stage in pipeline:
+        name = next(iter(stage))
+        if left[name]:
+            left[name] -= 1
+        else:
+            absorbed.append(name)
+    return absorbed
+
+
+class PipelineProfile:
+    """Per-stage executionStats of one aggregation, plus pushdown and engine facts"""
+
+    def __init__(self, pipeline, plan, allow_disk_use=None):
+        self.pipeline = pipeline
+        self.plan = plan
+        self.allow_disk_use = allow_disk_use
+        self.find_stages = _find_layer_stages(plan)
+        self.pipeline_stages = _pipeline_layer_stages(plan)
+        self.absorbed = absorbed_stages(pipeline, [stage.name for stage in self.pipeline_stages])
+
+    @property
+    def stages(self):
+        return self.find_stages + self.pipeline_stages
+
+    @property
+    def is_sbe(self):
+        return self.plan.is_sbe
+
+    def _absorbed(self, name):
+        return name in self.absorbed
+
+    @property
+    def match_pushed_down(self):
+        return self._absorbed("$match")
+
+    @property
+    def sort_pushed_down(self):
+        return self._absorbed("$sort")
+
+    @property
+    def group_pushed_down(self):
+        return self._absorbed("$group")
+
+    @property
+    def sort_uses_index(self):
+        """True when a pushed-down $sort needed no blocking SORT stage (an index gave the order)"""
+        return self.sort_pushed_down and self.plan.winning_plan is not None \
+            and not self.plan.has_stage("SORT", "SORT_KEY_GENERATOR")
+
+    @property
+    def used_disk(self):
+        return any(stage.used_disk for stage in self.stages)
+
+    @property
+    def spills(self):
+        return sum(stage.spills for stage in self.stages)
+
+    @property
+    def peak_memory_bytes(self):
+        values = [stage.memory_bytes for stage in self.stages if stage.memory_bytes is not None]
+        return max(values) if values else None
+
+    @property
+    def total_time_ms(self):
+        if self.pipeline_stages:
+            return self.pipeline_stages[-1].cumulative_ms
+        return self.plan.execution_stats.get("executionTimeMillis", 0)
+
+    @property
+    def docs_returned(self):
+        if self.pipeline_stages:
+            return self.pipeline_stages[-1].docs_out
+        return self.plan.execution_stats.get("nReturned")
+
+    def stage(self, name):
+        """First stage called `name` in either layer ("$group", "group" and "GROUP" are the same)"""
+        wanted = normalize_stage_name(name)
+        for stage in self.stages:
+            if normalize_stage_name(stage.name) == wanted:
+                return stage
+        return None
+
+    def summary(self):
+        return (f"engine={'SBE' if self.is_sbe else 'classic'} allowDiskUse={self.allow_disk_use} "
+                f"time={self.total_time_ms}ms returned={self.docs_returned} "
+                f"peak_mem={self.peak_memory_bytes}B spills={self.spills} "
+                f"absorbed={self.absorbed or '[]'}")
+
+    def format(self):
+        return "\n".join([self.summary()] + [f"  {stage}" for stage in self.stages])
+
+
+def profile_pipeline(collection, pipeline, allow_disk_use=None):
+    """Explain `pipeline` with executionStats and return its PipelineProfile"""
+    plan = explain_aggregate(collection, pipeline, verbosity="executionStats", allow_disk_use=allow_disk_use)
+    return PipelineProfile(pipeline, plan, allow_disk_use)
+
+
+class DiskUseComparison:
+    """The same pipeline profiled with allowDiskUse on and off"""
+
+    def __init__(self, pipeline, profiles, errors):
+        self.pipeline = pipeline
+        self.profiles = profiles
+        self.errors = errors
+
+    @property
+    def with_disk(self):
+        return self.profiles.get(True)
+
+    @property
+    def without_disk(self):
+        return self.profiles.get(False)
+
+    @property
+    def fits_in_memory(self):
+        """True when the pipeline completed without allowDiskUse"""
+        return False not in self.errors
+
+    def format(self):
+        lines = []
+        for allow in (True, False):
+            if allow in self.errors:
+                error = self.errors[allow]
+                lines.append(f"allowDiskUse={allow}: failed with code {getattr(error, 'code', None)}: {error}")
+            else:
+                lines.append(self.profiles[allow].format())
+        return "\n".join(lines)
+
+
+def compare_disk_use(collection, pipeline):
+    """Profile `pipeline` with allowDiskUse true and false; memory-limit failures are recorded"""
+    profiles, errors = {}, {}
+    for allow in (True, False):
+        try:
+            profiles[allow] = profile_pipeline(collection, pipeline, allow_disk_use=allow)
+        except OperationFailure as error:
+            errors[allow] = error
+    return DiskUseComparison(pipeline, profiles, errors)
@@ -0,0 +1,170 @@
+# Plan cache observability
+#
+# Matching planCacheKey values between two explains only shows that two
+# queries *would* share a cache entry. PlanCacheMonitor shows what the cache
+# actually did during a workload:
+#   - $planCacheStats snapshots before and after: entries created, evicted,
+#     activated (isActive false -> true) and changes in their `works` values
+#   - serverStatus metrics.query plan-cache counters (hits, misses, replans)
+#     where the server version reports them
+#   - profiler entries for the workload, which carry fromPlanCache, replanned
+#     and replanReason per operation, giving hit rates per query shape
+from src.framework.database.profiler import profile_entries, profiling
+
+
+def plan_cache_entries(collection):
+    """Current $planCacheStats entries of `collection`, keyed by planCacheKey"""
+    entries = {}
+    for entry in collection.aggregate([{"$planCacheStats": {}}]):
+        key = entry.get("planCacheKey") or entry.get("queryHash")
+        entries[key] = {
+            "query_hash": entry.get("queryHash"),
+            "plan_cache_key": entry.get("planCacheKey"),
+            "is_active": entry.get("isActive"),
+            "works": entry.get("works"),
+            "version": entry.get("version"),
+            "estimated_size_bytes": entry.get("estimatedSizeBytes"),
+            "shape": entry.get("createdFromQuery") or entry.get("cachedPlan", {}).get("stage"),
+        }
+    return entries
+
+
+def _numeric_leaves(document, prefix=""):
+    leaves = {}
+    for key, value in (document or {}).items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            leaves.update(_numeric_leaves(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            leaves[path] = value
+    return leaves
+
+
+def plan_cache_counters(db):
+    """Numeric serverStatus metrics.query counters related to planning and the plan cache"""
+    status = db.command("serverStatus")
+    query_metrics = (status.get("metrics") or {}).get("query") or {}
+    counters = _numeric_leaves(query_metrics.get("planCache"), "planCache.")
+    counters.update(_numeric_leaves(query_metrics.get("multiPlanner"), "multiPlanner."))
+    return counters
+
+
+def diff_entries(before, after):
+    """Classify cache entries as created, evicted, activated, deactivated or re-worked"""
+    created = [after[key] for key in after if key not in before]
+    evicted = [before[key] for key in before if key not in after]
+    activated, deactivated, works_changed = [], [], []
+    for key in after:
+        if key not in before:
+            continue
+        old, new = before[key], after[key]
+        if not old["is_active"] and new["is_active"]:
+            activated.append(new)
+        elif old["is_active"] and not new["is_active"]:
+            deactivated.append(new)
+        if old["works"] != new["works"]:
+            works_changed.append({"plan_cache_key": key, "before": old["works"], "after": new["works"]})
+    return {"created": created, "evicted": evicted, "activated": activated,
+            "deactivated": deactivated, "works_changed": works_changed}
+
+
+def shape_hit_rates(entries):
+    """Per-queryHash executions, plan cache hits, replans and hit rate from profiler entries"""
+    shapes = {}
+    for entry in entries:
+        query_hash = entry.get("queryHash")
+        if not query_hash:
+            continue
+        shape = shapes.setdefault(query_hash, {"executions": 0, "hits": 0, "replans": 0,
+                                               "replan_reasons": [], "plans": set()})
+        shape["executions"] += 1
+        if entry.get("fromPlanCache"):
+            shape["hits"] += 1
+        if entry.get("replanned"):
+            shape["replans"] += 1
+            if entry.get("replanReason"):
+                shape["replan_reasons"].append(entry["replanReason"])
+        if entry.get("planSummary"):
+            shape["plans"].add(entry["planSummary"])
+    for shape in shapes.values():
+        shape["hit_rate"] = shape["hits"] / shape["executions"]
+        shape["plans"] = sorted(shape["plans"])
+    return shapes
+
+
+class PlanCacheReport:
+    """What the plan cache did while a PlanCacheMonitor was active"""
+
+    def __init__(self, entries, counters, shapes):
+        self.entries = entries
+        self.counters = counters
+        self.shapes = shapes
+
+    @property
+    def replans(self):
+        return sum(shape["replans"] for shape in self.shapes.values())
+
+    def hit_rate(self, query_hash=None):
+        """Plan cache hit rate for one shape, or across every profiled shape"""
+        if query_hash is not None:
+            return self.shapes[query_hash]["hit_rate"]
+        executions = sum(s["executions"] for s in self.shapes.values())
+        return sum(s["hits"] for s in self.shapes.values()) / executions if executions else 0.0
+
+    def format(self):
+        lines = [
+            "entries: " + ", ".join(f"{name}={len(items)}" for name, items in self.entries.items()),
+            "counters: " + (", ".join(f"{k}={v:+g}" for k, v in sorted(self.counters.items()) if v)
+                            or "no change"),
+        ]
+        for query_hash, shape in sorted(self.shapes.items()):
+            lines.append(
+                f"shape {query_hash}: executions={shape['executions']} hits={shape['hits']} "
+                f"hit_rate={shape['hit_rate']:.0%} replans={shape['replans']} plans={shape['plans']}"
+                + (f" reasons={shape['replan_reasons']}" if shape["replan_reasons"] else "")
+            )
+        return "\n".join(lines)
+
+
+class PlanCacheMonitor:
+    """Context manager that observes the plan cache of one collection during a workload
+
+        with PlanCacheMonitor(db.movies) as monitor:
+            run_workload()
+        print(monitor.report.format())
+    """
+
+    def __init__(self, collection, clear=False, profile=True):
+        self.collection = collection
+        self.db = collection.database
+        self.clear = clear
+        self.profile = profile
+        self.report = None
+        self._profiling = None
+
+    def __enter__(self):
+        if self.clear:
+            self.db.command("planCacheClear", self.collection.name)
+        self._entries_before = plan_cache_entries(self.collection)
+        self._counters_before = plan_cache_counters(self.db)
+        self._started = None
+        if self.profile:
+            self._profiling = profiling(self.db, level=2)
+            self._started = self._profiling.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        entries = []
+        if self._profiling is not None:
+            self._profiling.__exit__(exc_type, exc, tb)
+            entries = list(profile_entries(self.db, since=self._started,
+                                           namespaces=[self.collection.full_name],
+                                           ops=("query", "command")))
+        counters_after = plan_cache_counters(self.db)
+        counters = {key: counters_after[key] - self._counters_before.get(key, 0) for key in counters_after}
+        self.report = PlanCacheReport(
+            diff_entries(self._entries_before, plan_cache_entries(self.collection)),
+            counters,
+            shape_hit_rates(entries),
+        )
+        return False
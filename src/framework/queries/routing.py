@@ -0,0 +1,177 @@
+# Sharded query routing
+#
+# Through mongos, a query's cost is decided first by routing: a filter on the
+# shard key lets mongos target one shard (SINGLE_SHARD), anything else is
+# broadcast to every shard and the results are merged (SHARD_MERGE, or
+# SHARD_MERGE_SORT when a sort must be merged). ShardedExplain parses a
+# mongos explain into:
+#   - the routing stage and the shards that were targeted
+#   - one ShardPlan per shard: that shard's ExplainResult plus its nReturned,
+#     keys/docs examined and time
+#   - the merge-side work: documents the merger received from the shards,
+#     what it returned, and (for aggregations) the pipeline part that ran on
+#     the merger and where it ran (mergeType)
+from src.framework.queries.explain import ExplainResult, explain_aggregate, explain_find
+
+FIND = "find"
+AGGREGATE = "aggregate"
+
+SINGLE_SHARD = "SINGLE_SHARD"
+MERGE_STAGES = ("SHARD_MERGE", "SHARD_MERGE_SORT")
+
+
+class ShardPlan:
+    """One shard's part of a sharded query"""
+
+    __slots__ = ("shard", "plan", "n_returned", "keys_examined", "docs_examined", "time_ms")
+
+    def __init__(self, shard, plan, n_returned=None, keys_examined=None, docs_examined=None, time_ms=None):
+        self.shard = shard
+        self.plan = plan
+        self.n_returned = n_returned
+        self.keys_examined = keys_examined
+        self.docs_examined = docs_examined
+        self.time_ms = time_ms
+
+    def __str__(self):
+        return (f"{self.shard}: {self.plan.summary()} returned={self.n_returned} "
+                f"keys={self.keys_examined} docs={self.docs_examined} time={self.time_ms}ms")
+
+
+def _routing_node(winning):
+    """The mongos stage holding the per-shard plans (it may sit under a mongos LIMIT/SKIP)"""
+    node = winning
+    while node is not None and "shards" not in node:
+        node = node.get("inputStage")
+    return node or {}
+
+
+def _find_shard_plans(raw):
+    winning = (raw.get("queryPlanner") or {}).get("winningPlan") or {}
+    routing = _routing_node(winning)
+    execution = _routing_node((raw.get("executionStats") or {}).get("executionStages") or {})
+    executed = {shard.get("shardName"): shard for shard in execution.get("shards") or ()}
+    plans = []
+    for planned in routing.get("shards") or ():
+        name = planned.get("shardName")
+        stats = executed.get(name) or {}
+        plan = ExplainResult({"queryPlanner": planned, "executionStats": stats or None})
+        plans.append(ShardPlan(name, plan, stats.get("nReturned"), stats.get("totalKeysExamined"),
+                               stats.get("totalDocsExamined"), stats.get("executionTimeMillis")))
+    return routing.get("stage") or winning.get("stage"), plans
+
+
+def _aggregate_shard_plans(raw):
+    plans = []
+    for name, shard in (raw.get("shards") or {}).items():
+        plan = ExplainResult(shard)
+        stats = plan.execution_stats
+        if plan.pipeline_stages and "nReturned" in plan.pipeline_stages[-1]:
+            returned = plan.pipeline_stages[-1]["nReturned"]
+        else:
+            returned = stats.get("nReturned")
+        plans.append(ShardPlan(name, plan, returned, stats.get("totalKeysExamined"),
+                               stats.get("totalDocsExamined"), stats.get("executionTimeMillis")))
+    split = raw.get("splitPipeline")
+    stage = SINGLE_SHARD if split is None and len(plans) == 1 else "SHARD_MERGE"
+    return stage, plans, split
+
+
+class ShardedExplain:
+    """A mongos explain: routing stage, per-shard plans and merge-side work"""
+
+    def __init__(self, raw, kind=FIND):
+        if kind not in (FIND, AGGREGATE):
+            raise ValueError(f"Unknown explain kind: {kind}")
+        self.raw = raw
+        self.kind = kind
+        self.split_pipeline = None
+        if kind == FIND:
+            self.stage, self.shards = _find_shard_plans(raw)
+            self.n_returned = (raw.get("executionStats") or {}).get("nReturned")
+        else:
+            self.stage, self.shards, self.split_pipeline = _aggregate_shard_plans(raw)
+            self.n_returned = None
+        self.merge_type = raw.get("mergeType")
+
+    @property
+    def targeted_shards(self):
+        return [plan.shard for plan in self.shards]
+
+    @property
+    def shard_count(self):
+        return len(self.shards)
+
+    @property
+    def is_single_shard(self):
+        return self.stage == SINGLE_SHARD
+
+    @property
+    def is_scatter_gather(self):
+        return self.stage in MERGE_STAGES
+
+    @property
+    def merger_part(self):
+        """Aggregation stages run on the merger after the shards' part"""
+        return (self.split_pipeline or {}).get("mergerPart") or []
+
+    @property
+    def shards_part(self):
+        return (self.split_pipeline or {}).get("shardsPart") or []
+
+    def _total(self, field):
+        values = [getattr(plan, field) for plan in self.shards]
+        return sum(values) if values and None not in values else None
+
+    @property
+    def keys_examined(self):
+        return self._total("keys_examined")
+
+    @property
+    def docs_examined(self):
+        return self._total("docs_examined")
+
+    @property
+    def merge_docs_in(self):
+        """Documents the shards sent to the merger (executionStats only)"""
+        if self.is_single_shard:
+            return 0
+        return self._total("n_returned")
+
+    def merge_work(self):
+        return {
+            "stage": self.stage,
+            "merge_type": self.merge_type,
+            "docs_in": self.merge_docs_in,
+            "docs_out": self.n_returned,
+            "merger_stages": [next(iter(stage)) for stage in self.merger_part],
+        }
+
+    def indexes_used(self):
+        """Indexes used by any shard"""
+        names = []
+        for plan in self.shards:
+            for name in plan.plan.indexes_used() if plan.plan.winning_plan else ():
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def summary(self):
+        return (f"{self.stage} shards={self.targeted_shards} keys={self.keys_examined} "
+                f"docs={self.docs_examined} merge={self.merge_work()}")
+
+    def format(self):
+        return "\n".join([self.summary()] + [f"  {plan}" for plan in self.shards])
+
+
+def explain_sharded_find(collection, filter=None, projection=None, sort=None, limit=None, hint=None,
+                         verbosity="executionStats"):
+    """Explain a find through mongos and return a ShardedExplain"""
+    plan = explain_find(collection, filter, projection=projection, sort=sort, limit=limit, hint=hint,
+                        verbosity=verbosity)
+    return ShardedExplain(plan.raw, FIND)
+
+
+def explain_sharded_aggregate(collection, pipeline, verbosity="executionStats"):
+    """Explain an aggregation through mongos and return a ShardedExplain"""
+    return ShardedExplain(explain_aggregate(collection, pipeline, verbosity=verbosity).raw, AGGREGATE)
@@ -0,0 +1,267 @@
+# Query-shape canonicalization
+#
+# Two queries have the same shape when they differ only in their literal
+# values: {"genres": "Drama"} and {"genres": "Action"} plan identically and
+# share one plan cache entry. The canonicalizer follows the server's
+# $queryStats representation: field paths, operators, sort and projection
+# specs are kept, every literal becomes "?<type>" ("?string", "?number",
+# "?date", ...), arrays become "?array<?type>" ("?array<>" when empty or
+# mixed), and implicit equality is spelled out as {"$eq": ...}. Field order
+# is significant, as it is for the server.
+#
+# Shapes are plain dicts, so they can be compared, hashed with shape_hash()
+# and grouped offline, e.g. over a captured workload:
+#
+#   python -m src.framework.queries.shape workload.jsonl
+import argparse
+import datetime
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+from bson import Binary, Decimal128, Int64, ObjectId, Regex, Timestamp
+
+_LOGICAL = ("$and", "$or", "$nor")
+
+# Top-level filter keys that carry no query semantics and are not part of the shape
+_IGNORED_FILTER_KEYS = ("$comment",)
+
+# Stages whose arguments are field names or specs rather than expressions
+_VERBATIM_STAGES = ("$sort", "$count", "$unwind", "$sortByCount", "$unset", "$replaceRoot",
+                    "$replaceWith", "$out", "$merge")
+
+
+def literal_type(value):
+    """The $queryStats type name of a literal"""
+    if isinstance(value, bool):
+        return "bool"
+    if value is None:
+        return "null"
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, (Regex, re.Pattern)):
+        return "regex"
+    if isinstance(value, (bytes, Binary)):
+        return "binData"
+    if isinstance(value, Timestamp):
+        return "timestamp"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def literal(value):
+    """Placeholder for a literal: "?string", "?array<?number>", "?array<>", ..."""
+    if isinstance(value, (list, tuple)):
+        element_types = {literal_type(element) for element in value}
+        if len(element_types) == 1:
+            return f"?array<?{element_types.pop()}>"
+        return "?array<>"
+    return "?" + literal_type(value)
+
+
+def _is_operator_object(value):
+    return isinstance(value, dict) and bool(value) and all(str(k).startswith("$") for k in value)
+
+
+def _predicate_shape(value):
+    if not _is_operator_object(value):
+        return {"$eq": literal(value)}
+    shape = {}
+    for operator, argument in value.items():
+        if operator == "$not" and isinstance(argument, dict):
+            shape[operator] = _predicate_shape(argument)
+        elif operator == "$elemMatch" and isinstance(argument, dict):
+            if _is_operator_object(argument):
+                shape[operator] = _predicate_shape(argument)
+            else:
+                shape[operator] = filter_shape(argument)
+        else:
+            shape[operator] = literal(argument)
+    return shape
+
+
+def filter_shape(filter):
+    """Literal-free shape of a find filter or $match spec"""
+    shape = {}
+    for key, value in (filter or {}).items():
+        if key in _IGNORED_FILTER_KEYS:
+            continue
+        if key in _LOGICAL:
+            shape[key] = [filter_shape(clause) for clause in value]
+        elif key == "$expr":
+            shape[key] = expression_shape(value)
+        elif key.startswith("$"):
+            # $text, $where, $jsonSchema, ...: the argument is a literal as a whole
+            shape[key] = literal(value)
+        else:
+            shape[key] = _predicate_shape(value)
+    return shape
+
+
+def expression_shape(value):
+    """Literal-free shape of an aggregation expression; "$path" and "$$var" are kept"""
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    if isinstance(value, dict):
+        if len(value) == 1 and "$literal" in value:
+            return literal(value["$literal"])
+        return {key: expression_shape(argument) for key, argument in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [expression_shape(argument) for argument in value]
+    return literal(value)
+
+
+def projection_shape(projection):
+    """Inclusions and exclusions become true/false; computed fields become expression shapes"""
+    if projection is None:
+        return None
+    shape = {}
+    for field, value in projection.items():
+        if isinstance(value, (bool, int, float)):
+            shape[field] = bool(value)
+        else:
+            shape[field] = expression_shape(value)
+    return shape
+
+
+def sort_shape(sort):
+    """Sort spec as a dict, whether given as a dict or as (field, direction) pairs"""
+    if sort is None:
+        return None
+    if hasattr(sort, "items"):
+        return dict(sort)
+    return {field: direction for field, direction in sort}
+
+
+def _stage_shape(stage):
+    name, spec = next(iter(stage.items()))
+    if name == "$match":
+        return {name: filter_shape(spec)}
+    if name in ("$limit", "$skip"):
+        return {name: literal(spec)}
+    if name == "$sample":
+        return {name: {"size": literal(spec.get("size"))}}
+    if name in ("$project", "$addFields", "$set"):
+        return {name: projection_shape(spec)}
+    if name == "$lookup":
+        shape = {key: value for key, value in spec.items() if key not in ("pipeline", "let")}
+        if "let" in spec:
+            shape["let"] = expression_shape(spec["let"])
+        if "pipeline" in spec:
+            shape["pipeline"] = pipeline_shape(spec["pipeline"])
+        return {name: shape}
+    if name in _VERBATIM_STAGES:
+        return {name: spec}
+    return {name: expression_shape(spec)}
+
+
+def pipeline_shape(pipeline):
+    """Literal-free shape of an aggregation pipeline, stage by stage"""
+    return [_stage_shape(stage) for stage in pipeline]
+
+
+def find_shape(filter=None, projection=None, sort=None, limit=None, skip=None, hint=None,
+               collection=None):
+    """Shape of a find command; limit and skip values are literals, hints are kept"""
+    shape = {"command": "find"}
+    if collection is not None:
+        shape["collection"] = collection
+    shape["filter"] = filter_shape(filter)
+    if projection is not None:
+        shape["projection"] = projection_shape(projection)
+    if sort is not None:
+        shape["sort"] = sort_shape(sort)
+    if limit:
+        shape["limit"] = literal(limit)
+    if skip:
+        shape["skip"] = literal(skip)
+    if hint is not None:
+        shape["hint"] = hint if isinstance(hint, str) else sort_shape(hint)
+    return shape
+
+
+def aggregate_shape(pipeline, collection=None):
+    """Shape of an aggregate command"""
+    shape = {"command": "aggregate"}
+    if collection is not None:
+        shape["collection"] = collection
+    shape["pipeline"] = pipeline_shape(pipeline)
+    return shape
+
+
+def shape_hash(shape):
+    """Stable 16-hex-digit digest of a shape (field order included)"""
+    encoded = json.dumps(shape, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16].upper()
+
+
+# =============================================================================
+# Offline grouping of captured workloads
+# =============================================================================
+
+def operation_shape(op):
+    """Shape of a captured workload operation (see src.framework.load.workload)"""
+    command = op["command"]
+    collection = op["ns"].split(".", 1)[-1]
+    if op["op"] == "aggregate":
+        return aggregate_shape(command.get("pipeline") or [], collection=collection)
+    return find_shape(command.get("filter"), command.get("projection"), command.get("sort"),
+                      command.get("limit"), command.get("skip"), command.get("hint"),
+                      collection=collection)
+
+
+def group_by_shape(operations):
+    """Group workload operations by shape, most frequent shape first
+
+    Returns {shape_hash: {"shape", "count", "namespaces", "query_hashes", "total_ms"}}.
+    """
+    groups = {}
+    for op in operations:
+        shape = operation_shape(op)
+        group = groups.setdefault(shape_hash(shape), {
+            "shape": shape, "count": 0, "namespaces": set(), "query_hashes": set(), "total_ms": 0.0,
+        })
+        group["count"] += 1
+        group["namespaces"].add(op["ns"])
+        if op.get("query_hash"):
+            group["query_hashes"].add(op["query_hash"])
+        group["total_ms"] += op.get("duration_ms") or 0.0
+    ordered = OrderedDict()
+    for key, group in sorted(groups.items(), key=lambda item: -item[1]["count"]):
+        group["namespaces"] = sorted(group["namespaces"])
+        group["query_hashes"] = sorted(group["query_hashes"])
+        ordered[key] = group
+    return ordered
+
+
+def main(argv=None):
+    # Imported here: the workload module depends on this one for its shape keys
+    from src.framework.load.workload import read_workload
+
+    parser = argparse.ArgumentParser(description="Group a captured workload by query shape")
+    parser.add_argument("workload", help="workload JSONL file written by workload capture")
+    parser.add_argument("--top", type=int, default=20, help="number of shapes to print")
+    args = parser.parse_args(argv)
+
+    _, operations = read_workload(args.workload)
+    groups = group_by_shape(operations)
+    print(f"Log: {len(operations)} operations, {len(groups)} shapes")
+    for key, group in list(groups.items())[:args.top]:
+        print(f"{key} count={group['count']} total_ms={group['total_ms']:.1f} "
+              f"ns={','.join(group['namespaces'])} queryHash={','.join(group['query_hashes']) or '-'}")
+        print(f"    {json.dumps(group['shape'], default=str)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
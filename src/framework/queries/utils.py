@@ -13,6 +13,14 @@ def aggregation_avg_rating_by_year(min_year=2000):
         {"$sort": {"avgRating": -1}}
     ]
 
+def genre_shape_queries():
+    """Equality queries on genres that differ only in their literal: one query shape"""
+    return [
+        {"genres": "Drama"},
+        {"genres": "Action"},
+        {"genres": "Comedy"}
+    ]
+
 # Query parsing test utilities
 
 def basic_find_queries():
@@ -98,3 +106,82 @@ def invalid_aggregation_pipelines():
         # Invalid stage structure
         [{"$match": "invalid_structure"}]
     ]
+
+# Aggregation performance pipelines
+
+def reporting_pipelines():
+    """Returns named $group-heavy reporting pipelines for the aggregation performance suite"""
+    return {
+        "avg_rating_by_year": aggregation_avg_rating_by_year(),
+        "drama_rating_stats_by_year": [
+            {"$match": {"genres": "Drama", "imdb.rating": {"$exists": True}}},
+            {"$group": {
+                "_id": "$year",
+                "avgRating": {"$avg": "$imdb.rating"},
+                "count": {"$sum": 1},
+                "maxRating": {"$max": "$imdb.rating"}
+            }},
+            {"$sort": {"avgRating": -1}},
+            {"$limit": 3}
+        ],
+        "movies_per_genre": [
+            {"$unwind": "$genres"},
+            {"$group": {"_id": "$genres", "count": {"$sum": 1}, "avgRuntime": {"$avg": "$runtime"}}},
+            {"$sort": {"count": -1}}
+        ],
+        "top_cast_by_rating": [
+            {"$match": {"imdb.rating": {"$gte": 7}}},
+            {"$unwind": "$cast"},
+            {"$group": {"_id": "$cast", "films": {"$sum": 1}, "avgRating": {"$avg": "$imdb.rating"},
+                        "titles": {"$push": "$title"}}},
+            {"$match": {"films": {"$gte": 5}}},
+            {"$sort": {"avgRating": -1}},
+            {"$limit": 20}
+        ],
+    }
+
+# Execution-stats budget cases
+
+def execution_budget_cases():
+    """Returns indexed queries with declarative executionStats budgets
+
+    Each case lists the index it needs, the find arguments and the budget; see
+    assertions.utils.EXECUTION_BUDGET_KEYS for the budget keys.
+    """
+    return [
+        {
+            "name": "range_on_year",
+            "index": [("year", 1)],
+            "query": {"year": {"$gte": 2000, "$lte": 2010}},
+            "budget": {
+                "max_keys_examined_ratio": 1.05,
+                "max_docs_examined_ratio": 1.0,
+                "allow_collscan": False,
+                "allow_in_memory_sort": False,
+                "max_plans_evaluated": 1,
+            },
+        },
+        {
+            "name": "equality_with_indexed_sort",
+            "index": [("genres", 1), ("year", -1)],
+            "query": {"genres": "Drama"},
+            "sort": {"year": -1},
+            "budget": {
+                "max_keys_examined_ratio": 1.05,
+                "max_docs_examined_ratio": 1.0,
+                "allow_collscan": False,
+                "allow_in_memory_sort": False,
+            },
+        },
+        {
+            "name": "covered_rating_projection",
+            "index": [("imdb.rating", 1)],
+            "query": {"imdb.rating": {"$gte": 9.0}},
+            "projection": {"imdb.rating": 1, "_id": 0},
+            "budget": {
+                "max_keys_examined_ratio": 1.05,
+                "max_docs_examined": 0,
+                "allow_collscan": False,
+            },
+        },
+    ]
@@ -0,0 +1,159 @@
+# Shared pytest fixtures and hooks for the test suites
+import json
+
+import pytest
+
+from src.framework.benchmark import history
+from src.framework.database.client import close_client, get_db, pool_stats
+from src.framework.database.instrumentation import ServerInstrumentation, instrumentation_config
+from src.framework.database.isolation import cleanup_worker_database, prepare_worker_database
+from src.framework.database.snapshot import DataCache, DatabaseSnapshot, snapshot_config
+from src.framework.queries.explain_cache import ExplainCache
+from src.utils import events
+
+try:
+    import pytest_html
+except ImportError:
+    pytest_html = None
+
+# Resource report of the test, read back when its teardown report is built
+_RESOURCES = pytest.StashKey()
+
+
+def pytest_configure(config):
+    # Fix the run id before xdist workers start so they all inherit the same one
+    history.current_run_id()
+
+
+@pytest.fixture(scope="session")
+def mongo_db():
+    """The test database on the shared, lazily created client"""
+    return get_db()
+
+
+@pytest.fixture(scope="session")
+def worker_database():
+    """This worker's private copy of the test collections (shared db when serial)"""
+    database = prepare_worker_database()
+    yield database
+    cleanup_worker_database()
+
+
+@pytest.fixture(scope="session")
+def data_cache(worker_database):
+    """Cached server-side copies of the fixture collections, for fast data resets"""
+    config = snapshot_config()
+    if not config["cache_data"]:
+        yield None
+        return
+    cache = DataCache(worker_database)
+    for name in config["collections"]:
+        cache.take(name)
+    yield cache
+    cache.drop()
+
+
+@pytest.fixture
+def database_state(worker_database, data_cache):
+    """Snapshot the fixture collections before the test and undo any changes after it
+
+    Data changes are detected by document count unless `snapshot.hash_data` is
+    on: a test that updates documents in place must enable it (or restore the
+    documents itself), or the modified data leaks into later tests.
+    """
+    config = snapshot_config()
+    snapshot = DatabaseSnapshot(worker_database, config["collections"],
+                                hash_data=config["hash_data"], data_cache=data_cache)
+    yield snapshot
+    changes = snapshot.restore()
+    for name, change in changes.items():
+        print(f"Log: Restored {worker_database.name}.{name}: {change}")
+
+
+@pytest.fixture(scope="session")
+def explain_cache():
+    """queryPlanner explains shared across the session, keyed on query shape and index catalog"""
+    cache = ExplainCache()
+    yield cache
+    print(f"\nLog: Explain cache: {cache.stats()}")
+    cache.close()
+
+
+@pytest.fixture
+def server_resources(request, worker_database):
+    """Server-side resource deltas around the test, attached to its report"""
+    config = instrumentation_config()
+    if not config["enabled"]:
+        yield None
+        return
+    # Benchmarks are never profiled: each profiled operation also writes to system.profile
+    profile = (config["profile"] or request.node.get_closest_marker("profiled") is not None) \
+        and "benchmark_history" not in request.fixturenames
+    with ServerInstrumentation(worker_database, config["collections"], profile=profile) as instrumentation:
+        yield instrumentation
+    report = instrumentation.report
+    request.node.stash[_RESOURCES] = report
+    request.node.user_properties.append(("server_resources", json.dumps(report.as_dict(), default=str)))
+    events.emit("test.resources", "Server resources: {diagnosis}",
+                diagnosis="; ".join(report.diagnosis()) or "nothing notable",
+                counters=report.counters, profile=report.profile)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    if call.when != "teardown":
+        return
+    resources = item.stash.get(_RESOURCES, None)
+    if resources is None:
+        return
+    report = outcome.get_result()
+    text = resources.format()
+    report.sections.append(("Server resources", text))
+    if pytest_html is not None:
+        extras = getattr(report, "extras", [])
+        extras.append(pytest_html.extras.text(text, name="Server resources"))
+        extras.append(pytest_html.extras.json(resources.as_dict(), name="Server resources (JSON)"))
+        report.extras = extras
+
+
+@pytest.fixture(scope="session")
+def server_version(mongo_db):
+    return mongo_db.client.server_info()["version"]
+
+
+@pytest.fixture
+def benchmark_history(request, server_version):
+    """Record BenchmarkResults for this test in the persistent history store"""
+    def record(result, shape=None, **extra):
+        return history.record(result, shape=shape, test=request.node.nodeid,
+                              server_version=server_version, extra=extra or None)
+    return record
+
+
+def _report_against_baseline():
+    baseline_id = history.pinned_baseline()
+    if baseline_id is None:
+        return
+    records = history.load()
+    current = history.run_records(records, history.current_run_id())
+    if not current:
+        return
+    rows = history.compare_runs(history.run_records(records, baseline_id), current)
+    found = history.regressions(rows)
+    print(f"\nLog: Benchmarks vs baseline {baseline_id}: {len(found)} regression(s)")
+    if found:
+        print(history.format_rows(found))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not hasattr(session.config, "workerinput"):
+        _report_against_baseline()
+    stats = pool_stats()
+    if stats["checkouts"]:
+        print(
+            f"\nLog: Connection pool checkouts: {stats['checkouts']}, "
+            f"wait p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms "
+            f"max={stats['max_ms']:.3f}ms, failures={stats['failures']}"
+        )
+    close_client()
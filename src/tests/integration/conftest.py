@@ -0,0 +1,19 @@
+# Integration tests modify index catalogs, so parallel workers each use their own database
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_database(worker_database):
+    yield worker_database
+
+
+@pytest.fixture(autouse=True)
+def restored_state(database_state):
+    """Undo index and data changes made by each test, whatever its outcome"""
+    yield database_state
+
+
+@pytest.fixture(autouse=True)
+def instrumented(server_resources):
+    """serverStatus, storage and profiler deltas for each test, attached to its report"""
+    yield server_resources
@@ -0,0 +1,31 @@
+from src.framework.database.client import db, PROJECT_ROOT
+from src.framework.fuzz.runner import ACCEPTED_INVALID, CRASH, SLOW, UNEXPECTED_ERROR, run_fuzzer
+import os
+
+# A fixed seed makes every run reproducible; raise the budget for dedicated runs,
+# e.g. FUZZ_TIME_BUDGET_S=600 FUZZ_SEED=$RANDOM
+FUZZ_SEED = int(os.environ.get("FUZZ_SEED", "0"))
+FUZZ_TIME_BUDGET_S = float(os.environ.get("FUZZ_TIME_BUDGET_S", "10"))
+FUZZ_FINDINGS_PATH = os.path.join(PROJECT_ROOT, "reports", "fuzz", "findings.jsonl")
+
+# =============================================================================
+# Grammar-based Query Fuzzing
+# =============================================================================
+
+def test_fuzzed_queries_behave_as_expected():
+    """Test that generated valid queries succeed and generated invalid queries are rejected"""
+    print(f"Log: Fuzzing find filters and pipelines for {FUZZ_TIME_BUDGET_S:.0f}s, seed {FUZZ_SEED}")
+    
+    report = run_fuzzer(db.movies, seed=FUZZ_SEED, time_budget_s=FUZZ_TIME_BUDGET_S)
+    print(f"Log: {report.format()}")
+    if report.findings:
+        report.write(FUZZ_FINDINGS_PATH)
+        print(f"Log: Findings written to {FUZZ_FINDINGS_PATH}")
+    
+    assert report.executed > 0, "Fuzzer should execute cases within the time budget"
+    assert not report.by_category(CRASH), f"Server connection failures: {report.by_category(CRASH)}"
+    assert not report.by_category(UNEXPECTED_ERROR), \
+        f"Valid queries were rejected: {[str(f) for f in report.by_category(UNEXPECTED_ERROR)]}"
+    assert not report.by_category(ACCEPTED_INVALID), \
+        f"Invalid queries were accepted: {[str(f) for f in report.by_category(ACCEPTED_INVALID)]}"
+    print(f"Log: {len(report.by_category(SLOW))} latency outliers (reported, not failed)")
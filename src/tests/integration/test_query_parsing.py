@@ -1,13 +1,16 @@
 from src.framework.database.client import db
 from src.framework.queries.utils import (
-    drama_movies_query, basic_find_queries, invalid_find_queries, 
+    aggregation_avg_rating_by_year, drama_movies_query, basic_find_queries, invalid_find_queries, 
     complex_nested_query, valid_aggregation_pipelines, invalid_aggregation_pipelines
 )
 from src.framework.assertions.utils import (
     assert_docs_not_empty, assert_query_executes_successfully, assert_query_fails_with_error,
     assert_aggregation_executes_successfully, assert_aggregation_fails_with_error,
-    assert_query_result_structure, assert_data_types_correct
+    assert_query_result_structure, assert_data_types_correct, raw_collection,
+    assert_catalog_executes_successfully, assert_query_matches_reference,
+    assert_aggregation_matches_reference
 )
+from src.framework.fuzz.grammar import QueryGrammar
 import pytest
 from pymongo.errors import OperationFailure
 from datetime import datetime
@@ -27,10 +30,7 @@ def test_drama_movies_basic():
 def test_basic_valid_find_queries():
     """Test basic valid find query syntax parsing"""
     queries = basic_find_queries()
-    
-    for i, query in enumerate(queries):
-        print(f"Testing valid query {i+1}: {query}")
-        assert_query_executes_successfully(db.movies, query, f"Valid query {i+1} should parse and execute")
+    assert_catalog_executes_successfully(db.movies, queries, "find", "Valid queries should parse and execute")
 
 def test_comparison_operators():
     """Test all comparison operators parse correctly"""
@@ -43,10 +43,9 @@ def test_comparison_operators():
         {"imdb.rating": {"$lte": 8.5}}
     ]
     
-    for query in comparison_queries:
-        operator = list(query["imdb.rating"].keys())[0]
-        print(f"Testing comparison operator: {operator}")
-        assert_query_executes_successfully(db.movies, query, f"Comparison operator {operator} should parse correctly")
+    print(f"Testing comparison operators: {[list(q['imdb.rating'])[0] for q in comparison_queries]}")
+    assert_catalog_executes_successfully(db.movies, comparison_queries, "find",
+                                         "Comparison operators should parse correctly")
 
 def test_logical_operators():
     """Test logical operators parse correctly"""
@@ -187,6 +186,23 @@ def test_query_result_structure_validation():
     }
     assert_data_types_correct(docs, field_types, "Complex query results should have correct data types")
 
+def test_streaming_raw_result_validation():
+    """Test structure and type validation streamed over raw BSON cursors"""
+    query = {"genres": "Drama", "imdb.rating": {"$gte": 8.0}}
+    projection = {"title": 1, "imdb": 1, "genres": 1, "_id": 0}
+    print(f"Log: Streaming raw BSON results for query: {query}")
+    
+    assert_query_executes_successfully(db.movies, query, "Streaming raw query should execute",
+                                       batch_size=200, raw=True)
+    
+    cursor = raw_collection(db.movies).find(query, projection, batch_size=200)
+    assert_query_result_structure(cursor, ["title", "imdb", "genres"],
+                                  "Streamed results should have expected structure")
+    
+    cursor = raw_collection(db.movies).find(query, projection, batch_size=200)
+    assert_data_types_correct(cursor, {"imdb": dict, "genres": list},
+                              "Streamed results should have correct data types", max_docs=1000)
+
 # =============================================================================
 # QP-003: Aggregation Pipeline Syntax Validation (Priority P1)
 # =============================================================================
@@ -210,10 +226,9 @@ def test_aggregation_stage_validation():
         [{"$project": {"title": 1, "rating": "$imdb.rating", "_id": 0}}]
     ]
     
-    for stage_pipeline in individual_stages:
-        stage_name = list(stage_pipeline[0].keys())[0]
-        print(f"Testing aggregation stage: {stage_name}")
-        assert_aggregation_executes_successfully(db.movies, stage_pipeline, f"Stage {stage_name} should parse correctly")
+    print(f"Testing aggregation stages: {[list(p[0])[0] for p in individual_stages]}")
+    assert_catalog_executes_successfully(db.movies, individual_stages, "aggregate",
+                                         "Aggregation stages should parse correctly")
 
 
 def test_invalid_aggregation_syntax():
@@ -256,3 +271,35 @@ def test_aggregation_result_validation():
         "maxRating": (int, float)
     }
     assert_data_types_correct(docs, field_types, "Aggregation results should have correct data types")
+
+# =============================================================================
+# Reference Evaluator Oracle
+# =============================================================================
+
+@pytest.fixture(scope="module")
+def reference_movies():
+    """Every movie, fetched once and evaluated in memory by the reference evaluator"""
+    return list(db.movies.find())
+
+@pytest.mark.parametrize("query", basic_find_queries() + [drama_movies_query(), complex_nested_query()],
+                         ids=lambda query: str(query))
+def test_find_matches_reference_evaluator(query, reference_movies):
+    """Test that server find results match the reference evaluator"""
+    assert_query_matches_reference(db.movies, query, reference_docs=reference_movies)
+
+def test_sorted_find_matches_reference_evaluator(reference_movies):
+    """Test that a sorted, projected find matches the reference evaluator in content and order"""
+    assert_query_matches_reference(db.movies, {"year": {"$gte": 2010}}, projection={"title": 1, "year": 1},
+                                   sort={"year": 1, "_id": 1}, reference_docs=reference_movies)
+
+def test_aggregation_matches_reference_evaluator(reference_movies):
+    """Test that a match/group/sort pipeline matches the reference evaluator"""
+    assert_aggregation_matches_reference(db.movies, aggregation_avg_rating_by_year(),
+                                         reference_docs=reference_movies)
+
+def test_fuzzed_filters_match_reference_evaluator(reference_movies):
+    """Test that generated filters select the same documents on the server and in the evaluator"""
+    grammar = QueryGrammar(seed=2024)
+    for _ in range(50):
+        assert_query_matches_reference(db.movies, grammar.filter(), projection={"_id": 1},
+                                       reference_docs=reference_movies)
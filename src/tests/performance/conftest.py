@@ -0,0 +1,7 @@
+# Performance tests share the integration isolation rules: one database per parallel worker
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_database(worker_database):
+    yield worker_database
@@ -0,0 +1,109 @@
+from src.framework.database.client import db
+from src.framework.database.indexes import IndexManager
+from src.framework.database.parameters import get_parameter, low_memory_limits
+from src.framework.benchmark.harness import measure, aggregate_runner
+from src.framework.assertions.utils import consume
+from src.framework.queries.pipeline_profile import profile_pipeline, compare_disk_use
+from src.framework.queries.utils import reporting_pipelines
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# Server error code for a $group/$sort over its memory limit without allowDiskUse
+EXCEEDED_MEMORY_NO_DISK_USE = 292
+
+REPORTING_PIPELINES = reporting_pipelines()
+
+# =============================================================================
+# Per-stage Profiles of Reporting Pipelines
+# =============================================================================
+
+@pytest.mark.parametrize("name", list(REPORTING_PIPELINES))
+def test_reporting_pipeline_stage_profile(name, benchmark_history):
+    """Test that reporting pipelines report per-stage time, document flow and memory"""
+    pipeline = REPORTING_PIPELINES[name]
+    print(f"Log: Profiling pipeline {name}")
+
+    profile = profile_pipeline(db.movies, pipeline)
+    print(f"Log: {name}:\n{profile.format()}")
+
+    group = profile.stage("$group")
+    assert group is not None, f"{name} should show a $group stage in either layer: {profile.summary()}"
+    assert group.docs_out is not None and group.docs_in is not None, \
+        f"$group should report documents in and out: {group}"
+    assert group.docs_out <= group.docs_in, f"$group cannot emit more groups than inputs: {group}"
+    assert all(stage.time_ms >= 0 for stage in profile.stages), profile.format()
+
+    returned = consume(db.movies.aggregate(pipeline))
+    assert profile.docs_returned == returned, \
+        f"Explain reported {profile.docs_returned} results, the pipeline returned {returned}"
+
+    result = measure(aggregate_runner(db.movies, pipeline), name=f"aggregate {name}", iterations=10)
+    print(f"Log: {result}")
+    benchmark_history(result, shape=pipeline, engine="SBE" if profile.is_sbe else "classic",
+                      peak_memory_bytes=profile.peak_memory_bytes, absorbed=profile.absorbed)
+
+# =============================================================================
+# Pushdown and Engine Selection
+# =============================================================================
+
+def test_match_and_sort_pushed_down_into_find_layer():
+    """Test that a leading $match/$sort on an indexed field runs in the find layer off the index"""
+    pipeline = [
+        {"$match": {"year": {"$gte": 1990, "$lte": 2000}}},
+        {"$sort": {"year": 1}},
+        {"$project": {"title": 1, "year": 1, "_id": 0}},
+    ]
+    with IndexManager(db.movies) as indexes:
+        year_idx = indexes.ensure([("year", 1)], name="test_agg_year_idx")
+        profile = profile_pipeline(db.movies, pipeline)
+    print(f"Log: {profile.format()}")
+
+    assert profile.match_pushed_down, f"$match should be pushed into the find layer: {profile.summary()}"
+    assert profile.sort_pushed_down, f"$sort should be pushed into the find layer: {profile.summary()}"
+    assert profile.sort_uses_index, f"$sort should be satisfied by the index: {profile.plan.summary()}"
+    assert year_idx in profile.plan.indexes_used()
+
+
+def test_sbe_engine_used_for_pushed_down_group():
+    """Test that an eligible $match + $group pipeline is pushed down and runs in SBE"""
+    framework = get_parameter(db.client, "internalQueryFrameworkControl")
+    if framework in (None, "forceClassicEngine"):
+        pytest.skip(f"Slot-based engine not enabled (internalQueryFrameworkControl={framework})")
+
+    pipeline = [{"$match": {"genres": "Drama"}}, {"$group": {"_id": "$year", "count": {"$sum": 1}}}]
+    profile = profile_pipeline(db.movies, pipeline)
+    print(f"Log: {profile.format()}")
+
+    assert profile.is_sbe, f"Pipeline should run in SBE ({framework}): {profile.summary()}"
+    assert profile.group_pushed_down, f"$group should be pushed into the find layer: {profile.summary()}"
+
+# =============================================================================
+# Memory Limits and Disk Spills
+# =============================================================================
+
+def test_group_spills_only_with_allow_disk_use(benchmark_history):
+    """Test that an over-limit $group spills with allowDiskUse and fails without it"""
+    pipeline = REPORTING_PIPELINES["movies_per_genre"]
+    in_memory = measure(aggregate_runner(db.movies, pipeline, allowDiskUse=True),
+                        name="movies_per_genre in memory", iterations=10)
+
+    with low_memory_limits(db.client, limit_bytes=1024) as applied:
+        if not applied:
+            pytest.skip("Server exposes no $group/$sort memory limit parameters")
+        print(f"Log: Lowered memory limits: {applied}")
+        comparison = compare_disk_use(db.movies, pipeline)
+        spilled = measure(aggregate_runner(db.movies, pipeline, allowDiskUse=True),
+                          name="movies_per_genre spilled", iterations=10)
+    print(f"Log: allowDiskUse comparison:\n{comparison.format()}")
+    print(f"Log: {in_memory}")
+    print(f"Log: {spilled}")
+    benchmark_history(in_memory, shape=pipeline)
+    benchmark_history(spilled, shape=pipeline, memory_limit_bytes=1024)
+
+    with_disk = comparison.with_disk
+    assert with_disk is not None, f"Pipeline should succeed with allowDiskUse: {comparison.errors}"
+    assert with_disk.used_disk and with_disk.spills > 0, \
+        f"$group over its memory limit should spill: {with_disk.format()}"
+    assert not comparison.fits_in_memory, "Pipeline should fail over its memory limit without allowDiskUse"
+    assert comparison.errors[False].code == EXCEEDED_MEMORY_NO_DISK_USE, comparison.format()
@@ -0,0 +1,58 @@
+from src.framework.database.client import db
+from src.framework.database.indexes import IndexManager
+from src.framework.database.profiler import profile_collection_size, resize_profile_collection
+from src.framework.load.contention import IndexChurn, run_contention
+from src.framework.queries.utils import genre_shape_queries
+import os
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# Dedicated runs can raise these, e.g. CONTENTION_READERS=64 CONTENTION_DURATION_S=60
+CONTENTION_READERS = int(os.environ.get("CONTENTION_READERS", "8"))
+CONTENTION_DURATION_S = float(os.environ.get("CONTENTION_DURATION_S", "10"))
+CONTENTION_INTERVAL_S = float(os.environ.get("CONTENTION_INTERVAL_S", "1"))
+# How long reader p99 may stay above 2x its baseline after each catalog change
+CONTENTION_RECOVERY_MS = float(os.environ.get("CONTENTION_RECOVERY_MS", "500"))
+
+# Room for every profiled read of the run, so replans are not lost to the capped collection
+PROFILE_SIZE_BYTES = 64 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def large_profile():
+    previous = profile_collection_size(db)
+    resize_profile_collection(db, PROFILE_SIZE_BYTES)
+    yield
+    resize_profile_collection(db, previous)
+
+# =============================================================================
+# Plan Cache Invalidation Under Index Churn
+# =============================================================================
+
+def test_shape_queries_recover_from_index_churn(large_profile, benchmark_history):
+    """Test that same-shape readers recover quickly from every index create, hide, unhide and drop"""
+    queries = genre_shape_queries()
+    print(f"Log: {CONTENTION_READERS} readers on {queries} for {CONTENTION_DURATION_S:.0f}s, "
+          f"index change every {CONTENTION_INTERVAL_S:.1f}s")
+
+    # The stable index keeps the shape indexed; the churned compound index competes with it,
+    # so every catalog change invalidates a multi-planned cache entry
+    with IndexManager(db.movies) as indexes:
+        indexes.ensure([("genres", 1)], name="test_shape_idx")
+        churn = IndexChurn([("genres", 1), ("year", 1)], name="test_churn_idx")
+        result = run_contention(db.movies, queries, churn, readers=CONTENTION_READERS,
+                                duration_s=CONTENTION_DURATION_S, interval_s=CONTENTION_INTERVAL_S,
+                                limit=100)
+    print(f"Log: {result.format()}")
+    benchmark_history(result, shape=queries[0], readers=CONTENTION_READERS, replans=result.replans,
+                      max_spike_ratio=result.max_spike_ratio, max_recovery_ms=result.max_recovery_ms)
+
+    assert all(event.error is None for event in result.events), \
+        f"Every index change should succeed: {[str(event) for event in result.events if event.error]}"
+    assert result.error_count == 0, f"Readers should only fail with QueryPlanKilled: {result.errors}"
+    assert result.baseline.total and result.during.total, "Readers should complete queries in both phases"
+    slow = [str(impact) for impact in result.impacts
+            if not impact.recovered or impact.recovery_ms > CONTENTION_RECOVERY_MS]
+    assert not slow, f"Reader p99 should recover within {CONTENTION_RECOVERY_MS:.0f}ms of each change:\n" \
+        + "\n".join(slow)
@@ -0,0 +1,32 @@
+from src.framework.database.client import db
+from src.framework.load.generator import generate_load, default_workload_mix
+import os
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# Offered load can be raised for dedicated runs, e.g. LOAD_RATE=5000 LOAD_CONCURRENCY=64
+LOAD_RATE = float(os.environ.get("LOAD_RATE", "200"))
+LOAD_DURATION_S = float(os.environ.get("LOAD_DURATION_S", "10"))
+LOAD_CONCURRENCY = int(os.environ.get("LOAD_CONCURRENCY", "16"))
+
+# =============================================================================
+# Sustained Mixed Read Load
+# =============================================================================
+
+def test_sustained_mixed_read_load(benchmark_history):
+    """Test that the query engine sustains the target open-loop rate for the mixed workload"""
+    print(f"Log: Driving mixed load at {LOAD_RATE:.0f} ops/s for {LOAD_DURATION_S:.0f}s, "
+          f"concurrency {LOAD_CONCURRENCY}")
+    
+    result = generate_load(db.movies, workloads=default_workload_mix(), rate=LOAD_RATE,
+                           duration_s=LOAD_DURATION_S, concurrency=LOAD_CONCURRENCY,
+                           name="mixed_read_load")
+    print(f"Log: {result.format()}")
+    benchmark_history(result, shape="default_workload_mix", target_rate=LOAD_RATE,
+                      concurrency=LOAD_CONCURRENCY)
+    
+    assert result.error_count == 0, f"Load run should not produce errors: {result.errors}"
+    assert result.completed == result.issued, "Every issued request should complete"
+    assert result.achieved_rate >= 0.9 * LOAD_RATE, \
+        f"Achieved {result.achieved_rate:.1f} ops/s, below 90% of the {LOAD_RATE:.0f} ops/s target"
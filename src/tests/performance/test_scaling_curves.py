@@ -0,0 +1,70 @@
+from src.framework.database.client import db
+from src.framework.database.indexes import IndexManager
+from src.framework.data.movies import GrowingDataset
+from src.framework.benchmark.scaling import scaling_curve
+from src.framework.assertions.utils import assert_index_bounded
+import os
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# Geometric series of collection sizes, e.g. SCALING_SIZES=10000,100000,1000000 for dedicated runs
+SCALING_SIZES = [int(size) for size in os.environ.get("SCALING_SIZES", "1000,4000,16000,64000").split(",")]
+SCALING_COLLECTION = "movies_scaling"
+
+YEAR_RANGE = {"year": {"$gte": 2000, "$lte": 2010}}
+GENRES_IN = {"genres": {"$in": ["Film-Noir", "Western"]}}
+
+
+@pytest.fixture
+def scaling_collection():
+    """A scratch collection grown through SCALING_SIZES by a GrowingDataset"""
+    collection = db[SCALING_COLLECTION]
+    grow = GrowingDataset(collection, max(SCALING_SIZES))
+    yield collection, grow
+    collection.drop()
+
+# =============================================================================
+# Index-bounded Queries
+# =============================================================================
+
+def test_year_range_scan_is_index_bounded(scaling_collection, benchmark_history):
+    """Test that an indexed range query examines no more than it returns at every size"""
+    collection, grow = scaling_collection
+    with IndexManager(collection) as indexes:
+        year_idx = indexes.ensure([("year", 1)], name="test_scaling_year_idx")
+        curve = scaling_curve(collection, SCALING_SIZES, grow, name="year range", query=YEAR_RANGE)
+    print(f"Log: {curve.format()}")
+
+    assert all(year_idx in plan for plan in curve.plans()), \
+        f"Every size should use the year index: {curve.plans()}"
+    assert_index_bounded(curve, metric="overhead")
+    benchmark_history(curve.points[-1].latency, shape=YEAR_RANGE, collection_size=curve.sizes[-1],
+                      growth=curve.classify("latency_ms").model)
+
+
+def test_multikey_in_query_is_index_bounded(scaling_collection):
+    """Test that a multikey $in query fetches only the documents it returns at every size"""
+    collection, grow = scaling_collection
+    with IndexManager(collection) as indexes:
+        indexes.ensure([("genres", 1)], name="test_scaling_genres_idx")
+        curve = scaling_curve(collection, SCALING_SIZES, grow, name="genres $in", query=GENRES_IN)
+    print(f"Log: {curve.format()}")
+
+    # Keys examined include one key per matching array element, which grows with n
+    # for legitimate reasons; documents fetched beyond the result must not
+    assert_index_bounded(curve, metric="docs_overhead")
+
+# =============================================================================
+# Detector Sanity: a Collection Scan Must Be Flagged
+# =============================================================================
+
+def test_collection_scan_is_classified_linear(scaling_collection):
+    """Test that the growth classifier flags the same range query forced onto a collection scan"""
+    collection, grow = scaling_collection
+    curve = scaling_curve(collection, SCALING_SIZES, grow, name="year range collscan",
+                          query=YEAR_RANGE, hint={"$natural": 1})
+    print(f"Log: {curve.format()}")
+
+    growth = curve.classify("overhead")
+    assert not growth.sublinear, f"A collection scan should grow linearly: {growth}"
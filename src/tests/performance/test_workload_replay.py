@@ -0,0 +1,46 @@
+from src.framework.database.client import db
+from src.framework.database.profiler import profiling
+from src.framework.load.workload import (
+    capture_from_profiler, write_workload, read_workload, replay_workload, compare_replay,
+    format_comparison
+)
+from src.framework.queries.utils import basic_find_queries, drama_movies_query, aggregation_avg_rating_by_year
+import time
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# =============================================================================
+# Capture and Replay
+# =============================================================================
+
+def test_capture_and_replay_preserves_plans(tmp_path):
+    """Test that a captured workload replays with the same per-shape plan choice"""
+    print("Log: Capturing workload from the profiler")
+    
+    db.movies.create_index([("year", 1)], name="test_replay_year_idx")
+    try:
+        with profiling(db, level=2) as started:
+            for _ in range(3):
+                for query in basic_find_queries() + [drama_movies_query()]:
+                    list(db.movies.find(query).limit(20))
+                list(db.movies.aggregate(aggregation_avg_rating_by_year()))
+                time.sleep(0.05)
+        operations = capture_from_profiler(db, since=started, namespaces=[db.movies.full_name])
+        print(f"Log: Captured {len(operations)} operations")
+        assert len(operations) >= 18, "Profiler should capture every find and aggregate"
+        
+        path = str(tmp_path / "workload.jsonl")
+        write_workload(path, operations, source="test")
+        _, loaded = read_workload(path)
+        
+        result = replay_workload(db.client, loaded, database=db.name, speed=10.0, concurrency=4)
+        rows = compare_replay(result)
+        print(f"Log: Replay comparison:\n{format_comparison(rows)}")
+        
+        assert not result.errors, f"Replay should not fail: {result.errors}"
+        assert len(result.server) == len(loaded), "Every replayed operation should be profiled"
+        changed = [row for row in rows if row["plan_changed"]]
+        assert not changed, f"Plans should not change on an identical server: {changed}"
+    finally:
+        db.movies.drop_index("test_replay_year_idx")
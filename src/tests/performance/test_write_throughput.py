@@ -0,0 +1,68 @@
+from src.framework.database.client import db
+from src.framework.benchmark.writes import (
+    SECONDARY_INDEXES, WRITE_OPERATIONS, format_matrix, run_write_benchmark, write_matrix
+)
+from src.framework.assertions.utils import assert_significantly_faster
+from src.framework.queries.explain import explain_find
+import os
+import pytest
+
+pytestmark = pytest.mark.performance
+
+# Dedicated runs can raise these, e.g. WRITE_BATCHES=100 WRITE_SEED_DOCS=1000000
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "500"))
+WRITE_BATCHES = int(os.environ.get("WRITE_BATCHES", "10"))
+WRITE_SEED_DOCS = int(os.environ.get("WRITE_SEED_DOCS", "10000"))
+WRITE_CONCERN_LEVELS = os.environ.get("WRITE_CONCERNS", "w1,journaled,majority").split(",")
+WRITE_COLLECTION = "movies_writes"
+
+
+@pytest.fixture
+def write_collection():
+    """A scratch collection, reseeded by every benchmark run"""
+    collection = db[WRITE_COLLECTION]
+    yield collection
+    collection.drop()
+
+# =============================================================================
+# Throughput by Index Count and Write Concern
+# =============================================================================
+
+@pytest.mark.parametrize("operation", list(WRITE_OPERATIONS))
+def test_write_throughput_by_index_count(operation, write_collection, benchmark_history):
+    """Test each write operation with 0..N secondary indexes under every write concern"""
+    print(f"Log: Benchmarking {operation}: {WRITE_BATCHES} batches of {WRITE_BATCH_SIZE}, "
+          f"write concerns {WRITE_CONCERN_LEVELS}")
+
+    results = write_matrix(write_collection, [operation], write_concerns=WRITE_CONCERN_LEVELS,
+                           batch_size=WRITE_BATCH_SIZE, batches=WRITE_BATCHES, seed_docs=WRITE_SEED_DOCS)
+    print(f"Log: {operation} throughput:\n{format_matrix(results)}")
+    for result in results:
+        benchmark_history(result, shape=operation, indexes=result.indexes, write_concern=result.write_concern,
+                          docs_per_sec=result.docs_per_sec)
+
+    for result in results:
+        assert result.docs_written == WRITE_BATCH_SIZE * WRITE_BATCHES, \
+            f"{result.name} should write every document of every batch: {result.docs_written}"
+    assert {len(result.indexes) for result in results} == set(range(len(SECONDARY_INDEXES) + 1))
+
+# =============================================================================
+# Index Maintenance Cost
+# =============================================================================
+
+def test_multikey_indexes_slow_down_inserts(write_collection, benchmark_history):
+    """Test that maintaining scalar and multikey genres/cast indexes measurably costs insert latency"""
+    options = dict(batch_size=WRITE_BATCH_SIZE, batches=max(WRITE_BATCHES, 10), seed_docs=WRITE_SEED_DOCS)
+    unindexed = run_write_benchmark(write_collection, "insert_many", (), **options)
+    indexed = run_write_benchmark(write_collection, "insert_many", SECONDARY_INDEXES, **options)
+    print(f"Log: {unindexed}")
+    print(f"Log: {indexed}")
+    benchmark_history(unindexed, shape="insert_many", indexes=[])
+    benchmark_history(indexed, shape="insert_many", indexes=indexed.indexes)
+
+    for name in indexed.multikey_indexes:
+        field = name.rsplit("_", 1)[0]
+        scan = explain_find(write_collection, {field: "x"}, hint=name).find_stages("IXSCAN")
+        assert scan and scan[0].is_multikey, f"{name} should be multikey: {[node.raw for node in scan]}"
+    assert_significantly_faster(indexed.as_benchmark(), unindexed.as_benchmark(),
+                                msg="Inserts without secondary indexes should beat inserts maintaining them")
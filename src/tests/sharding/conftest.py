@@ -0,0 +1,56 @@
+# Sharded routing tests run through mongos: a local cluster started for the session,
+# or the running cluster at topology.mongos_uri
+from pymongo import MongoClient
+import pytest
+
+from src.framework.database.client import get_db, source_database_name, worker_id
+from src.framework.database.cluster import (
+    LocalShardedCluster, copy_documents, missing_binaries, shard_collection, topology_config
+)
+
+# Each parallel worker starts its own cluster on its own block of ports
+PORTS_PER_WORKER = 10
+
+
+@pytest.fixture(scope="session")
+def mongos_client():
+    """A client connected to mongos"""
+    config = topology_config()
+    if config["mongos_uri"]:
+        client = MongoClient(config["mongos_uri"])
+        yield client
+        client.close()
+        return
+
+    missing = missing_binaries(config["bin_dir"])
+    if missing:
+        pytest.skip(f"Sharded tests need {missing}: put them on PATH, set topology.bin_dir "
+                    f"(MONGODB_BIN_DIR) or point topology.mongos_uri (SHARDED_MONGOS_URI) at a cluster")
+    worker = worker_id()
+    base_port = config["base_port"] + (int(worker[2:]) * PORTS_PER_WORKER if worker else 0)
+    with LocalShardedCluster(shards=config["shards"], base_port=base_port, bin_dir=config["bin_dir"],
+                             data_dir=config["data_dir"],
+                             startup_timeout_s=config["startup_timeout_s"]) as cluster:
+        client = MongoClient(cluster.uri)
+        yield client
+        client.close()
+
+
+@pytest.fixture(scope="session")
+def sharded_db(mongos_client):
+    """Copies of the configured collections, sharded on their configured keys
+
+    Documents come from the source database, which exists in serial and
+    parallel runs alike (per-worker copies are only made for integration tests).
+    """
+    config = topology_config()
+    source = get_db(source_database_name())
+    name = f"{source_database_name()}_sharded" + (f"_{worker_id()}" if worker_id() else "")
+    mongos_client.drop_database(name)
+    database = mongos_client[name]
+    for collection, spec in config["collections"].items():
+        shard_collection(mongos_client, f"{name}.{collection}", spec["key"], spec.get("split_points"))
+        copied = copy_documents(source[collection], database[collection])
+        print(f"Log: Copied {copied} documents into sharded {name}.{collection}")
+    yield database
+    mongos_client.drop_database(name)
@@ -0,0 +1,98 @@
+from src.framework.database.indexes import IndexManager
+from src.framework.assertions.utils import assert_shard_routing
+from src.framework.queries.explain import explain_find
+from src.framework.queries.routing import explain_sharded_aggregate, explain_sharded_find
+from src.framework.queries.utils import aggregation_avg_rating_by_year, reporting_pipelines
+import pytest
+
+pytestmark = pytest.mark.sharded
+
+# movies is sharded on {year: 1} and split at 1995 (config.yaml `topology:`), one range per shard
+
+# =============================================================================
+# Targeted Queries (Shard Key in the Filter)
+# =============================================================================
+
+@pytest.mark.parametrize("query", [
+    {"year": 2000},
+    {"year": {"$gte": 2000, "$lte": 2010}},
+    {"year": {"$lt": 1950}, "genres": "Drama"},
+], ids=["equality", "range_within_chunk", "range_and_filter"])
+def test_shard_key_query_targets_one_shard(sharded_db, query):
+    """Test that a filter confined to one chunk range is routed to a single shard"""
+    explain = explain_sharded_find(sharded_db.movies, query)
+    print(f"Log: {query}: {explain.format()}")
+
+    assert_shard_routing(explain, single_shard=True, shards=1, max_merge_docs=0)
+    assert explain.n_returned == sharded_db.movies.count_documents(query)
+
+
+def test_range_across_chunks_targets_both_shards(sharded_db):
+    """Test that a shard-key range spanning the split point is merged from both shards"""
+    query = {"year": {"$gte": 1990, "$lte": 2000}}
+    explain = explain_sharded_find(sharded_db.movies, query)
+    print(f"Log: {explain.format()}")
+
+    assert_shard_routing(explain, single_shard=False, shards=2)
+    assert all(plan.n_returned > 0 for plan in explain.shards), \
+        f"Both shards own part of the range: {explain.format()}"
+
+# =============================================================================
+# Scatter-gather Queries (No Shard Key)
+# =============================================================================
+
+def test_plan_selection_query_scatters_to_all_shards(sharded_db):
+    """Test that the basic plan-selection query is broadcast and every shard picks the index"""
+    query = {"genres": "Drama"}
+    with IndexManager(sharded_db.movies) as indexes:
+        genres_idx = indexes.ensure([("genres", 1)], name="test_genres_idx")
+        explain = explain_sharded_find(sharded_db.movies, query)
+        # The unsharded explain model still answers plan questions through mongos
+        plan = explain_find(sharded_db.movies, query)
+    print(f"Log: {explain.format()}")
+
+    assert_shard_routing(explain, single_shard=False, shards=2)
+    assert explain.stage == "SHARD_MERGE", f"Unsorted results need no merge sort: {explain.stage}"
+    assert all(shard.plan.indexes_used() == [genres_idx] for shard in explain.shards), \
+        f"Every shard should use {genres_idx}: {explain.format()}"
+    assert plan.has_stage("IXSCAN") and plan.indexes_used() == [genres_idx], plan.summary()
+    # Without sort or limit the merger passes every shard result straight through
+    assert explain.merge_docs_in == explain.n_returned
+
+
+def test_sorted_limit_merges_at_most_limit_per_shard(sharded_db):
+    """Test that a sorted, limited scatter query sends each shard's top documents to a merge sort"""
+    query, sort, limit = {"genres": "Drama"}, {"imdb.rating": -1}, 10
+    with IndexManager(sharded_db.movies) as indexes:
+        indexes.ensure([("genres", 1), ("imdb.rating", -1)], name="test_genres_rating_idx")
+        explain = explain_sharded_find(sharded_db.movies, query, sort=sort, limit=limit)
+    print(f"Log: {explain.format()}")
+
+    assert explain.stage == "SHARD_MERGE_SORT", f"Sorted scatter should merge-sort: {explain.format()}"
+    assert_shard_routing(explain, shards=2, max_merge_docs=explain.shard_count * limit)
+    assert explain.n_returned == limit
+
+# =============================================================================
+# Aggregations: Shards Part and Merger Part
+# =============================================================================
+
+def test_shard_key_match_pipeline_runs_on_one_shard(sharded_db):
+    """Test that a pipeline whose $match is on the shard key runs entirely on one shard"""
+    explain = explain_sharded_aggregate(sharded_db.movies, aggregation_avg_rating_by_year(min_year=2000))
+    print(f"Log: {explain.format()}")
+
+    assert_shard_routing(explain, single_shard=True, shards=1)
+    assert explain.merger_part == [], f"Nothing should be left to merge: {explain.merge_work()}"
+
+
+def test_group_is_split_between_shards_and_merger(sharded_db):
+    """Test that a scatter $group runs partial groups on the shards and merges them"""
+    pipeline = reporting_pipelines()["movies_per_genre"]
+    explain = explain_sharded_aggregate(sharded_db.movies, pipeline)
+    genres = len(list(sharded_db.movies.aggregate(pipeline)))
+    print(f"Log: {explain.format()}")
+
+    assert_shard_routing(explain, single_shard=False, shards=2, max_merge_docs=explain.shard_count * genres)
+    work = explain.merge_work()
+    assert "$group" in work["merger_stages"], f"Partial groups should be merged: {work}"
+    assert any("$group" in stage for stage in explain.shards_part), f"Shards should pre-group: {work}"
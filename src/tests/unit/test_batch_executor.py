@@ -0,0 +1,73 @@
+from src.framework.queries.batch import run_catalog
+from pymongo.errors import OperationFailure
+import threading
+import time
+import pytest
+
+
+class FakeCollection:
+    """Minimal stand-in for a pymongo Collection: '$fail' filters raise, others return `n` docs"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def with_options(self, **kwargs):
+        return self
+
+    def _run(self, spec):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if "$fail" in str(spec):
+                raise OperationFailure("unknown operator: $fail")
+            return FakeCursor(range(spec.get("n", 1) if isinstance(spec, dict) else len(spec)))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    find = _run
+    aggregate = _run
+
+
+class FakeCursor(list):
+    def close(self):
+        pass
+
+
+def test_all_failures_are_collected():
+    catalog = [{"n": 3}, {"x": {"$fail": 1}}, {"n": 2}, {"y": {"$fail": 2}}]
+    report = run_catalog(FakeCollection(), catalog)
+    assert [o.ok for o in report.outcomes] == [True, False, True, False]
+    assert [o.count for o in report.outcomes] == [3, 0, 2, 0]
+    assert len(report.failures) == 2
+    assert "unknown operator" in report.format(failures_only=True)
+
+
+def test_runs_concurrently_on_bounded_pool():
+    collection = FakeCollection(delay=0.05)
+    report = run_catalog(collection, [{"n": 1}] * 8, max_workers=4)
+    assert report.ok
+    assert collection.peak == 4
+    assert report.wall_ms < 8 * 50
+
+
+def test_expect_failure_mode():
+    report = run_catalog(FakeCollection(), [[{"$fail": 1}], [{"$match": {}}]], kind="aggregate",
+                         expect_failure=True)
+    assert [o.ok for o in report.outcomes] == [True, False]
+    assert "expected to fail" in str(report.failures[0])
+
+
+def test_max_docs_caps_iteration():
+    report = run_catalog(FakeCollection(), [{"n": 100}], max_docs=10)
+    assert report.outcomes[0].count == 10
+
+
+def test_unknown_kind_rejected():
+    with pytest.raises(ValueError):
+        run_catalog(FakeCollection(), [{}], kind="update")
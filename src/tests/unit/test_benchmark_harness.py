@@ -0,0 +1,70 @@
+from src.framework.benchmark.stats import (
+    percentile, reject_outliers, bootstrap_ci, mann_whitney_u
+)
+from src.framework.benchmark.harness import measure, compare, BenchmarkResult
+import random
+
+# =============================================================================
+# Statistics
+# =============================================================================
+
+def test_percentile_interpolates():
+    values = [10, 20, 30, 40]
+    assert percentile(values, 0) == 10
+    assert percentile(values, 100) == 40
+    assert percentile(values, 50) == 25
+
+def test_reject_outliers_uses_tukey_fences():
+    values = [100, 101, 99, 102, 98, 100, 5000]
+    kept, rejected = reject_outliers(values)
+    assert rejected == [5000]
+    assert 5000 not in kept and len(kept) == 6
+
+def test_bootstrap_ci_brackets_median():
+    rng = random.Random(1)
+    values = [rng.gauss(100, 5) for _ in range(200)]
+    low, high = bootstrap_ci(values)
+    assert low <= percentile(values, 50) <= high
+    assert high - low < 5
+
+def test_mann_whitney_detects_shift():
+    rng = random.Random(2)
+    a = [rng.gauss(100, 5) for _ in range(40)]
+    b = [rng.gauss(130, 5) for _ in range(40)]
+    _, p_value = mann_whitney_u(a, b)
+    assert p_value < 0.001
+
+def test_mann_whitney_same_distribution_not_significant():
+    rng = random.Random(3)
+    a = [rng.gauss(100, 5) for _ in range(40)]
+    b = [rng.gauss(100, 5) for _ in range(40)]
+    _, p_value = mann_whitney_u(a, b)
+    assert p_value > 0.05
+
+def test_mann_whitney_identical_samples():
+    _, p_value = mann_whitney_u([5] * 10, [5] * 10)
+    assert p_value == 1.0
+
+# =============================================================================
+# Harness
+# =============================================================================
+
+def test_measure_runs_warmup_and_iterations():
+    calls = []
+    result = measure(lambda: calls.append(1), name="noop", iterations=20, warmup=3)
+    assert len(calls) == 23
+    assert result.iterations == 20
+    assert result.p50_ms <= result.p95_ms <= result.p99_ms
+
+def test_measure_respects_time_budget_with_minimum_samples():
+    result = measure(lambda: None, iterations=10**9, warmup=0, time_budget_s=0.01)
+    assert result.iterations >= 8
+
+def test_compare_reports_speedup():
+    slow = BenchmarkResult("slow", [2_000_000 + i for i in range(30)], [], 0)
+    fast = BenchmarkResult("fast", [1_000_000 + i for i in range(30)], [], 0)
+    comparison = compare(slow, fast)
+    assert comparison.significant
+    assert comparison.candidate_faster(min_speedup=1.5)
+    assert not comparison.candidate_slower()
+    assert compare(fast, slow).candidate_slower(tolerance=0.2)
@@ -0,0 +1,71 @@
+from src.framework.benchmark import history
+from src.framework.benchmark.harness import BenchmarkResult
+import os
+
+
+def _result(name, base_ns):
+    return BenchmarkResult(name, [base_ns + i * 1000 for i in range(30)], [], 0)
+
+
+def _record_run(path, run_id, ixscan_ns, monkeypatch, server_version="7.0.0"):
+    monkeypatch.setenv("BENCHMARK_RUN_ID", run_id)
+    history.record(_result("IXSCAN", ixscan_ns), shape={"year": {"$gte": 2000}},
+                   test="test_a", server_version=server_version, host="ci", path=path)
+    history.record(_result("COLLSCAN", 5_000_000), shape={"year": {"$gte": 2000}},
+                   test="test_a", server_version=server_version, host="ci", path=path)
+
+
+def test_records_are_appended_and_grouped_by_run(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.jsonl")
+    _record_run(path, "run-1", 1_000_000, monkeypatch)
+    _record_run(path, "run-2", 1_000_000, monkeypatch)
+
+    records = history.load(path)
+    assert len(records) == 4
+    assert history.runs(records) == {"run-1": 2, "run-2": 2}
+    assert records[0]["shape"] == '{"year":{"$gte":2000}}'
+    assert records[0]["p50_ms"] > 0
+
+
+def test_compare_runs_flags_regressions_beyond_threshold(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.jsonl")
+    _record_run(path, "base", 1_000_000, monkeypatch)
+    _record_run(path, "slow", 2_000_000, monkeypatch)
+    records = history.load(path)
+
+    rows = history.compare_runs(history.run_records(records, "base"),
+                                history.run_records(records, "slow"), threshold=0.10)
+    statuses = {row["key"]["name"]: row["status"] for row in rows}
+    assert statuses == {"IXSCAN": "regression", "COLLSCAN": "unchanged"}
+
+    rows = history.compare_runs(history.run_records(records, "slow"),
+                                history.run_records(records, "base"), threshold=0.10)
+    assert {row["key"]["name"]: row["status"] for row in rows}["IXSCAN"] == "improvement"
+
+
+def test_server_upgrade_is_compared_against_the_old_baseline(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.jsonl")
+    _record_run(path, "base", 1_000_000, monkeypatch, server_version="7.0.0")
+    _record_run(path, "upgraded", 2_000_000, monkeypatch, server_version="8.0.0")
+    records = history.load(path)
+
+    rows = history.compare_runs(history.run_records(records, "base"),
+                                history.run_records(records, "upgraded"), threshold=0.10)
+    statuses = {row["key"]["name"]: row["status"] for row in rows}
+    assert statuses == {"IXSCAN": "regression", "COLLSCAN": "unchanged"}
+    assert rows[0]["environment"] == {"server_version": ("7.0.0", "8.0.0")}
+    assert "[server_version 7.0.0 -> 8.0.0]" in history.format_rows(history.regressions(rows))
+
+
+def test_cli_compare_against_pinned_baseline(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "history.jsonl")
+    baseline = str(tmp_path / "baseline.json")
+    monkeypatch.setattr(history, "baseline_path", lambda: baseline)
+    _record_run(path, "base", 1_000_000, monkeypatch)
+    _record_run(path, "next", 3_000_000, monkeypatch)
+
+    assert history.main(["--history", path, "pin", "base"]) == 0
+    assert os.path.exists(baseline)
+    assert history.main(["--history", path, "compare"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert history.main(["--history", path, "diff", "base", "base"]) == 0
@@ -0,0 +1,110 @@
+from src.framework.database.snapshot import DatabaseSnapshot, DataCache, diff_indexes
+
+# =============================================================================
+# Index catalog diffs
+# =============================================================================
+
+def spec(name, key, **options):
+    return dict({"name": name, "key": key}, **options)
+
+
+def test_untouched_catalog_needs_no_changes():
+    catalog = {"year_1": spec("year_1", {"year": 1}), "genres_1": spec("genres_1", {"genres": 1})}
+    assert diff_indexes(catalog, dict(catalog)) == ([], [], {})
+
+
+def test_created_indexes_are_dropped_and_dropped_indexes_rebuilt():
+    before = {"year_1": spec("year_1", {"year": 1}), "genres_1": spec("genres_1", {"genres": 1})}
+    after = {"year_1": spec("year_1", {"year": 1}), "test_idx": spec("test_idx", {"cast": 1})}
+    to_drop, to_create, to_modify = diff_indexes(before, after)
+    assert to_drop == ["test_idx"]
+    assert to_create == [spec("genres_1", {"genres": 1})]
+    assert to_modify == {}
+
+
+def test_hidden_flag_is_restored_without_rebuild():
+    before = {"year_1": spec("year_1", {"year": 1})}
+    hidden = {"year_1": spec("year_1", {"year": 1}, hidden=True)}
+    assert diff_indexes(before, hidden) == ([], [], {"year_1": False})
+    assert diff_indexes(hidden, before) == ([], [], {"year_1": True})
+
+
+def test_redefined_index_is_rebuilt():
+    before = {"year_1": spec("year_1", {"year": 1})}
+    after = {"year_1": spec("year_1", {"year": 1}, sparse=True)}
+    assert diff_indexes(before, after) == (["year_1"], [spec("year_1", {"year": 1})], {})
+
+# =============================================================================
+# Data reset from the cached copy
+# =============================================================================
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = 0
+        self.indexes = []
+
+    def estimated_document_count(self):
+        return self.documents
+
+    def list_indexes(self):
+        return [{"v": 2, "name": "_id_", "key": {"_id": 1}}] + [dict(index, v=2) for index in self.indexes]
+
+    def drop(self):
+        self.database.log.append(("drop", self.database.name, self.name))
+        self.documents, self.indexes = 0, []
+
+    def aggregate(self, pipeline):
+        target = pipeline[0]["$out"]
+        out = self.database.client[target["db"]][target["coll"]]
+        self.database.log.append(("out", target["db"], target["coll"]))
+        # Like $out: documents are replaced, the target's existing indexes are kept
+        out.documents = self.documents
+
+
+class FakeDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.log = client.log
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(self, name))
+
+    def command(self, name, target, indexes=None):
+        assert name == "createIndexes"
+        collection = self[target]
+        for index in indexes:
+            assert index["name"] not in [i["name"] for i in collection.indexes], "index already exists"
+            collection.indexes.append(index)
+
+
+class FakeClient:
+    def __init__(self):
+        self.log = []
+        self.databases = {}
+
+    def __getitem__(self, name):
+        return self.databases.setdefault(name, FakeDatabase(self, name))
+
+
+def test_modified_collection_is_reset_from_cache_with_snapshot_indexes():
+    client = FakeClient()
+    db = client["sample_mflix"]
+    movies = db["movies"]
+    movies.documents = 100
+    movies.indexes = [spec("year_1", {"year": 1})]
+    cache = DataCache(db)
+    cache.take("movies")
+    snapshot = DatabaseSnapshot(db, ["movies"], data_cache=cache)
+
+    movies.documents = 90
+    movies.indexes.append(spec("genres_1", {"genres": 1}))
+    client.log.clear()
+    assert snapshot.restore() == {"movies": {"data": "reset"}}
+
+    assert client.log == [("drop", "sample_mflix", "movies"), ("out", "sample_mflix", "movies")]
+    assert movies.documents == 100
+    assert [index["name"] for index in movies.indexes] == ["year_1"]
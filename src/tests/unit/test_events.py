@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from src.framework.assertions.utils import assert_query_result_structure
+from src.utils import events
+
+
+@pytest.fixture
+def sink(tmp_path):
+    path = tmp_path / "events.jsonl"
+    events.configure(level="INFO", console_level="INFO", path=str(path))
+    yield path
+    events.reset()
+
+# =============================================================================
+# Summaries
+# =============================================================================
+
+def test_summarize_truncates_strings_lists_and_depth():
+    summary = events.summarize({"title": "x" * 50, "cast": list(range(30)),
+                                "a": {"b": {"c": {"d": 1}}}}, max_chars=10, max_items=5, max_depth=3)
+    assert summary["title"] == "x" * 10 + "...(+40 chars)"
+    assert summary["cast"] == [0, 1, 2, 3, 4, "... 25 more items"]
+    assert summary["a"] == {"b": {"c": "{...1 fields}"}}
+    assert json.dumps(summary)
+
+
+def test_format_event_renders_template_over_compact_fields():
+    config = dict(events.settings(), console_max_items=2, console_max_line=80)
+    line = events.format_event("query.executed", "Returned {count} for {query}",
+                               {"count": 3, "query": {"genres": {"$in": ["a", "b", "c"]}}}, config)
+    assert line == 'Returned 3 for {"genres": {"$in": ["a", "b", "... 1 more items"]}}'
+    assert events.format_event("x", "{ratio:.1f}", {"ratio": 0.25}, config) == "0.2"
+    assert events.format_event("plain", None, {"n": 1}, config) == "plain n=1"
+    assert len(events.format_event("long", "{text}", {"text": "y" * 500}, config)) < 100
+
+# =============================================================================
+# Levels, laziness and the sink
+# =============================================================================
+
+def test_events_below_level_are_dropped_without_evaluating_fields(sink):
+    calls = []
+    events.debug("noisy", "never {value}", value=events.lazy(lambda: calls.append(1)))
+    assert calls == []
+    assert not events.enabled(events.DEBUG) and events.enabled(events.WARNING)
+    events.info("kept", "value {value}", value=events.lazy(lambda: calls.append(1) or 42))
+    assert calls == [1]
+    events.close()
+    [record] = events.read_events(str(sink))
+    assert record["event"] == "kept" and record["message"] == "value 42"
+    assert record["fields"] == {"value": 42} and record["level"] == "INFO"
+
+
+def test_console_level_only_affects_printing(sink, capsys):
+    events.configure(console_level="WARNING")
+    events.info("quiet", "not printed")
+    events.error("loud", "printed {code}", code=2)
+    assert capsys.readouterr().out == "Log: printed 2\n"
+    assert [r["event"] for r in events.read_events(str(sink))] == ["quiet", "loud"]
+
+
+def test_sink_rotates_past_max_bytes(sink):
+    events.configure(max_bytes=300)
+    for i in range(10):
+        events.info("tick", None, i=i, padding="z" * 50)
+    events.close()
+    rotated = sink.parent / (sink.name + ".1")
+    assert rotated.exists()
+    assert sink.stat().st_size <= 300 + 400
+
+
+def test_assertion_helpers_emit_bounded_events(sink):
+    docs = [{"title": "t" * 5000, "imdb": {}}] * 3
+    assert_query_result_structure(docs, ["title", "imdb"])
+    events.close()
+    [record] = events.read_events(str(sink))
+    assert record["event"] == "results.structure"
+    assert record["fields"] == {"count": 3, "fields": ["title", "imdb"]}
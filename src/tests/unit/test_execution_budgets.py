@@ -0,0 +1,62 @@
+from src.framework.assertions.utils import execution_budget_violations, assert_plan_within_budget
+from src.framework.queries.explain import parse_explain
+import pytest
+
+
+def stats_explain(winning_plan, returned, keys, docs, works, rejected=0):
+    return parse_explain({
+        "queryPlanner": {"winningPlan": winning_plan,
+                         "rejectedPlans": [{"stage": "COLLSCAN"}] * rejected},
+        "executionStats": {"nReturned": returned, "totalKeysExamined": keys,
+                           "totalDocsExamined": docs,
+                           "executionStages": dict(winning_plan, works=works)},
+    })
+
+
+def indexed_plan(**stats):
+    plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "year_1"}}
+    return stats_explain(plan, **stats)
+
+
+def test_efficient_plan_has_no_violations():
+    plan = indexed_plan(returned=100, keys=101, docs=100, works=102)
+    budget = {"max_keys_examined_ratio": 1.05, "max_docs_examined_ratio": 1.0,
+              "max_works": 200, "allow_collscan": False, "allow_in_memory_sort": False,
+              "max_plans_evaluated": 1, "index": "year_1"}
+    assert execution_budget_violations(plan, budget) == []
+    assert_plan_within_budget(plan, budget)
+
+
+def test_each_budget_limit_is_reported():
+    plan = stats_explain({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}},
+                         returned=10, keys=0, docs=20000, works=20012, rejected=2)
+    budget = {"max_docs_examined_ratio": 1.0, "max_docs_examined": 1000, "max_works": 500,
+              "allow_collscan": False, "allow_in_memory_sort": False,
+              "max_plans_evaluated": 1, "index": "year_1"}
+    violations = execution_budget_violations(plan, budget)
+    assert len(violations) == 7
+    with pytest.raises(AssertionError, match="COLLSCAN stage present"):
+        assert_plan_within_budget(plan, budget)
+
+
+def test_zero_results_ratio_uses_floor_of_one():
+    plan = indexed_plan(returned=0, keys=1, docs=0, works=2)
+    assert execution_budget_violations(plan, {"max_keys_examined_ratio": 1.0}) == []
+
+
+def test_unknown_budget_key_is_rejected():
+    plan = indexed_plan(returned=1, keys=1, docs=1, works=2)
+    with pytest.raises(AssertionError, match="Unknown execution budget keys"):
+        execution_budget_violations(plan, {"max_latency_ms": 5})
+
+
+def test_max_works_on_sbe_plan_is_reported_not_skipped():
+    plan = parse_explain({
+        "explainVersion": "2",
+        "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "IXSCAN", "indexName": "year_1"},
+                                         "slotBasedPlan": {}}},
+        "executionStats": {"nReturned": 10, "totalKeysExamined": 10, "totalDocsExamined": 10,
+                           "executionStages": {"stage": "ixseek", "nReturned": 10}},
+    })
+    violations = execution_budget_violations(plan, {"max_works": 100})
+    assert len(violations) == 1 and "SBE" in violations[0]
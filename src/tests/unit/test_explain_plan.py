@@ -0,0 +1,116 @@
+from src.framework.queries.explain import explain_find, parse_explain, parse_plan
+
+# =============================================================================
+# Sample explain outputs
+# =============================================================================
+
+def ixscan(index_name, key_pattern):
+    return {"stage": "IXSCAN", "indexName": index_name, "keyPattern": key_pattern,
+            "indexBounds": {list(key_pattern)[0]: ["[2000, 2010]"]}, "isMultiKey": False}
+
+def classic_fetch_explain():
+    return {
+        "queryPlanner": {
+            "namespace": "sample_mflix.movies",
+            "queryHash": "ABCD1234",
+            "planCacheKey": "EF567890",
+            "winningPlan": {"stage": "FETCH", "inputStage": ixscan("year_1", {"year": 1})},
+            "rejectedPlans": [{"stage": "COLLSCAN", "direction": "forward"}],
+        },
+        "executionStats": {
+            "nReturned": 10, "totalKeysExamined": 10, "totalDocsExamined": 10,
+            "executionStages": {"stage": "FETCH", "nReturned": 10, "works": 11, "docsExamined": 10,
+                                "inputStage": dict(ixscan("year_1", {"year": 1}), keysExamined=10)},
+        },
+    }
+
+# =============================================================================
+# Parsing and traversal
+# =============================================================================
+
+def test_classic_fetch_over_ixscan():
+    plan = parse_explain(classic_fetch_explain())
+    assert plan.summary() == "FETCH(IXSCAN[year_1])"
+    assert plan.indexes_used() == ["year_1"]
+    assert plan.has_stage("IXSCAN") and not plan.is_collscan()
+    assert not plan.is_covered()
+    assert plan.query_hash == "ABCD1234" and plan.plan_cache_key == "EF567890"
+    assert plan.plans_evaluated == 2
+    assert plan.rejected_plans[0].is_collscan()
+    assert plan.find_stages("IXSCAN")[0].index_bounds == {"year": ["[2000, 2010]"]}
+
+def test_execution_stages_are_parsed():
+    plan = parse_explain(classic_fetch_explain())
+    stages = plan.execution_stages
+    assert stages.works == 11
+    assert stages.find_stages("IXSCAN")[0].keys_examined == 10
+
+def test_covered_projection():
+    raw = {"queryPlanner": {"winningPlan": {"stage": "PROJECTION_COVERED",
+                                            "inputStage": ixscan("year_1", {"year": 1})}}}
+    assert parse_explain(raw).is_covered()
+
+def test_or_with_many_branches_is_walked_iteratively():
+    branches = [ixscan(f"idx_{i}", {f"f{i}": 1}) for i in range(500)]
+    raw = {"queryPlanner": {"winningPlan": {"stage": "FETCH",
+                                            "inputStage": {"stage": "OR", "inputStages": branches}}}}
+    plan = parse_explain(raw)
+    assert len(plan.find_stages("IXSCAN")) == 500
+    assert plan.indexes_used()[:3] == ["idx_0", "idx_1", "idx_2"]
+
+def test_deeply_nested_plan_does_not_recurse():
+    raw = {"stage": "IXSCAN", "indexName": "leaf"}
+    for _ in range(5000):
+        raw = {"stage": "LIMIT", "inputStage": raw}
+    node = parse_plan(raw)
+    assert node.indexes_used() == ["leaf"]
+    assert len(node.stages()) == 5001
+
+def test_sort_merge_and_sbe_query_plan():
+    raw = {
+        "explainVersion": "2",
+        "queryPlanner": {"winningPlan": {
+            "queryPlan": {"stage": "SORT_MERGE", "inputStages": [
+                ixscan("a_1", {"a": 1}), ixscan("b_1", {"b": 1})]},
+            "slotBasedPlan": {"slots": "...", "stages": "..."},
+        }},
+    }
+    plan = parse_explain(raw)
+    assert plan.is_sbe
+    assert plan.winning_plan.stage == "SORT_MERGE"
+    assert plan.indexes_used() == ["a_1", "b_1"]
+
+def test_aggregate_explain_uses_cursor_stage():
+    raw = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}},
+        {"$group": {"_id": "$year"}},
+    ]}
+    plan = parse_explain(raw)
+    assert plan.is_collscan()
+    assert len(plan.pipeline_stages) == 2
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.commands = []
+
+    def command(self, name, target, verbosity=None):
+        self.commands.append(target)
+        return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+
+
+class RecordingCollection:
+    name = "movies"
+
+    def __init__(self):
+        self.database = RecordingDatabase()
+
+
+def test_explain_find_sends_sort_and_hint_pairs_as_documents():
+    collection = RecordingCollection()
+    explain_find(collection, {"genres": "Drama"}, sort=[("year", -1), ("title", 1)], hint=[("genres", 1)])
+    explain_find(collection, {}, sort={"year": 1}, hint="year_1")
+    first, second = collection.database.commands
+    assert first["sort"] == {"year": -1, "title": 1} and list(first["sort"]) == ["year", "title"]
+    assert first["hint"] == {"genres": 1}
+    assert second["sort"] == {"year": 1} and second["hint"] == "year_1"
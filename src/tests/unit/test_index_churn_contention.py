@@ -0,0 +1,84 @@
+import pytest
+
+from src.framework.load.contention import (
+    ChurnEvent, ContentionResult, IndexChurn, event_impacts
+)
+
+MS = 1_000_000
+
+# =============================================================================
+# Churn cycle
+# =============================================================================
+
+class FakeIndexManager:
+    def __init__(self, existing=None):
+        self.calls = []
+        self.existing = existing
+
+    def ensure(self, keys, name=None):
+        self.calls.append(("ensure", name))
+        return self.existing or name
+
+    def hide(self, name):
+        self.calls.append(("hide", name))
+
+    def unhide(self, name):
+        self.calls.append(("unhide", name))
+
+    def drop(self, name):
+        self.calls.append(("drop", name))
+
+
+def test_index_churn_cycles_through_actions():
+    churn = IndexChurn([("genres", 1), ("year", 1)], name="churn_idx")
+    indexes = FakeIndexManager()
+    actions = []
+    for _ in range(5):
+        action = churn.next_action()
+        churn.apply(indexes, action)
+        actions.append(action)
+    assert actions == ["create", "hide", "unhide", "drop", "create"]
+    assert indexes.calls[0] == ("ensure", "churn_idx") and indexes.calls[3] == ("drop", "churn_idx")
+    with pytest.raises(ValueError):
+        IndexChurn([("year", 1)], name="x", actions=("rebuild",))
+
+
+def test_index_churn_refuses_to_churn_an_existing_same_key_index():
+    churn = IndexChurn([("genres", 1), ("year", 1)], name="churn_idx")
+    with pytest.raises(ValueError, match="genres_1_year_1"):
+        churn.apply(FakeIndexManager(existing="genres_1_year_1"), "create")
+
+# =============================================================================
+# Spike and recovery analysis
+# =============================================================================
+
+def steady(start_ms, stop_ms, latency_ms, every_ms=5):
+    return [(t * MS, latency_ms * MS) for t in range(start_ms, stop_ms, every_ms)]
+
+
+def test_recovery_ends_with_last_slow_slot():
+    # Baseline 1ms; after the change at 1000ms reads take 20ms for 250ms, then 1ms again
+    samples = steady(0, 1000, 1) + steady(1000, 1250, 20) + steady(1250, 2000, 1)
+    events = [ChurnEvent("drop", "idx", 1000 * MS, 3 * MS)]
+    impact, = event_impacts(samples, events, baseline_p99_ns=1 * MS, end_ns=2000 * MS)
+    assert impact.recovery_ms == 300.0
+    assert impact.spike_ratio == pytest.approx(20, rel=0.01)
+
+
+def test_unaffected_and_unrecovered_changes():
+    samples = steady(0, 1000, 1) + steady(1000, 2000, 1) + steady(2000, 3000, 30)
+    events = [ChurnEvent("create", "idx", 1000 * MS, 0), ChurnEvent("hide", "idx", 2000 * MS, 0)]
+    quiet, stuck = event_impacts(samples, events, baseline_p99_ns=1 * MS, end_ns=3000 * MS)
+    assert quiet.recovery_ms == 0.0 and quiet.recovered
+    assert stuck.recovery_ms is None and not stuck.recovered
+
+
+def test_contention_result_splits_baseline_and_churn():
+    samples = steady(0, 1000, 1) + steady(1000, 1100, 10) + steady(1100, 2000, 1)
+    events = [ChurnEvent("create", "idx", 1000 * MS, 0)]
+    result = ContentionResult("churn", 4, samples, events, {}, killed=2, elapsed_s=2.0)
+    assert result.baseline.total == 200 and result.during.total == 200
+    assert result.max_recovery_ms == 100.0
+    summary = result.summary()
+    assert summary["killed"] == 2 and summary["churn_events"] == 1 and summary["replans"] is None
+    assert "recovery=100ms" in result.format()
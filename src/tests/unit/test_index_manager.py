@@ -0,0 +1,119 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from src.framework.database.indexes import (
+    IndexManager, add_index_listener, default_index_name, normalize_keys, owned_indexes,
+    remove_index_listener
+)
+
+# =============================================================================
+# In-memory stand-in for a collection's index catalog
+# =============================================================================
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def command(self, name, target, index=None):
+        assert name == "collMod" and target == self.collection.name
+        entry = self.collection.indexes[index["name"]]
+        entry["hidden"] = index["hidden"]
+
+
+class FakeCollection:
+    name = "movies"
+    full_name = "sample_mflix.movies"
+
+    def __init__(self):
+        self.indexes = {"_id_": {"name": "_id_", "key": {"_id": 1}}}
+        self.builds = 0
+        self.database = FakeDatabase(self)
+
+    def list_indexes(self):
+        return [dict(index) for index in self.indexes.values()]
+
+    def create_index(self, keys, name, **options):
+        self.builds += 1
+        self.indexes[name] = dict({"name": name, "key": dict(keys)}, **options)
+
+    def drop_index(self, name):
+        if name not in self.indexes:
+            raise OperationFailure("index not found", code=27)
+        del self.indexes[name]
+
+# =============================================================================
+# Key normalisation
+# =============================================================================
+
+def test_normalize_keys_and_default_name():
+    assert normalize_keys("year") == [("year", 1)]
+    assert normalize_keys({"year": 1, "genres": -1}) == [("year", 1), ("genres", -1)]
+    assert normalize_keys([["imdb.rating", 1]]) == [("imdb.rating", 1)]
+    assert default_index_name([("year", 1), ("genres", -1)]) == "year_1_genres_-1"
+
+# =============================================================================
+# Lifecycle
+# =============================================================================
+
+def test_ensure_is_idempotent_and_teardown_drops_created_indexes():
+    collection = FakeCollection()
+    with IndexManager(collection) as indexes:
+        assert indexes.ensure([("year", 1)]) == "year_1"
+        assert indexes.ensure([("year", 1)]) == "year_1"
+        assert collection.builds == 1
+        assert "year_1" in owned_indexes(collection.full_name)[collection.full_name]
+        with pytest.raises(ValueError):
+            indexes.ensure([("genres", 1)], name="year_1")
+    assert "year_1" not in collection.indexes
+    assert owned_indexes(collection.full_name)[collection.full_name] == {}
+
+
+def test_ensure_reuses_same_key_index_under_another_name():
+    collection = FakeCollection()
+    collection.indexes["by_year"] = {"name": "by_year", "key": {"year": 1}, "hidden": True}
+    collection.indexes["year_unique"] = {"name": "year_unique", "key": {"year": -1}, "unique": True}
+    with IndexManager(collection) as indexes:
+        assert indexes.ensure([("year", 1)], name="test_year_idx") == "by_year"
+        assert not collection.indexes["by_year"]["hidden"]
+        assert indexes.ensure([("year", -1)]) == "year_-1"
+        assert collection.builds == 1 and indexes.created == ["year_-1"]
+    # Teardown leaves the reused index alone, apart from restoring its hidden flag
+    assert set(collection.indexes) == {"_id_", "by_year", "year_unique"}
+    assert collection.indexes["by_year"]["hidden"]
+
+
+def test_hidden_block_restores_visibility_without_rebuild():
+    collection = FakeCollection()
+    with IndexManager(collection) as indexes:
+        indexes.ensure([("year", 1)], name="test_year_idx")
+        with indexes.hidden("test_year_idx"):
+            assert collection.indexes["test_year_idx"]["hidden"] is True
+        assert indexes.is_hidden("test_year_idx") is False
+    assert collection.builds == 1
+
+
+def test_teardown_runs_when_the_block_fails_and_restores_preexisting_indexes():
+    collection = FakeCollection()
+    collection.indexes["genres_1"] = {"name": "genres_1", "key": {"genres": 1}}
+    with pytest.raises(AssertionError):
+        with IndexManager(collection) as indexes:
+            indexes.ensure("cast")
+            indexes.hide("genres_1")
+            raise AssertionError("test failed")
+    assert "cast_1" not in collection.indexes
+    assert collection.indexes["genres_1"]["hidden"] is False
+
+
+def test_listeners_see_catalog_changes():
+    events = []
+    listener = lambda event, collection, name: events.append((event, name))
+    add_index_listener(listener)
+    try:
+        with IndexManager(FakeCollection()) as indexes:
+            indexes.ensure("year")
+            with indexes.hidden("year_1"):
+                pass
+    finally:
+        remove_index_listener(listener)
+    assert events == [("created", "year_1"), ("hidden", "year_1"), ("unhidden", "year_1"),
+                      ("dropped", "year_1")]
@@ -0,0 +1,51 @@
+from src.framework.load.histogram import LatencyHistogram, ThroughputTimeline
+from src.framework.load.generator import _arrival_offsets_ns, Workload
+from src.framework.benchmark.stats import percentile
+import random
+import pytest
+
+
+def test_percentiles_within_relative_precision():
+    rng = random.Random(7)
+    values = [int(rng.lognormvariate(14, 1)) for _ in range(50000)]
+    histogram = LatencyHistogram(significant_digits=3)
+    for value in values:
+        histogram.record(value)
+    for q in (50, 90, 99, 99.9):
+        exact = percentile(values, q)
+        assert abs(histogram.value_at_percentile(q) - exact) / exact < 0.01
+    assert histogram.value_at_percentile(100) == max(values)
+    assert len(histogram.counts) < 5000
+
+
+def test_merge_combines_counts():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for v in range(1000):
+        a.record(v * 1000)
+        b.record(v * 1000 + 500_000)
+    merged = LatencyHistogram().merge(a).merge(b)
+    assert merged.total == 2000
+    assert merged.min_ns == 0 and merged.max_ns == 999_000 + 500_000
+    with pytest.raises(ValueError):
+        a.merge(LatencyHistogram(significant_digits=2))
+
+
+def test_timeline_buckets_per_second():
+    timeline = ThroughputTimeline(start_ns=0)
+    for i in range(10):
+        timeline.record(int(i * 0.25e9))
+    timeline.record(int(2.5e9), error=True)
+    assert timeline.rows() == [(0.0, 4.0, 0.0), (1.0, 4.0, 0.0), (2.0, 2.0, 1.0)]
+
+
+def test_open_loop_schedule_is_independent_of_completion():
+    offsets = list(_arrival_offsets_ns(100, 2.0, poisson=False, rng=random.Random(0)))
+    assert len(offsets) == 199
+    assert offsets[1] - offsets[0] == 10_000_000
+    poisson = list(_arrival_offsets_ns(1000, 5.0, poisson=True, rng=random.Random(0)))
+    assert 4700 < len(poisson) < 5300
+
+
+def test_workload_kind_validated():
+    with pytest.raises(ValueError):
+        Workload("bad", "update", {})
@@ -0,0 +1,62 @@
+from collections import Counter
+
+from src.framework.data import movies
+from src.framework.data.movies import GENRES, MovieSpec, object_id
+
+# =============================================================================
+# Determinism
+# =============================================================================
+
+def test_same_seed_generates_identical_documents():
+    assert list(MovieSpec(2500, seed=7, batch_size=1000).generate()) == \
+        list(MovieSpec(2500, seed=7, batch_size=1000).generate())
+
+
+def test_different_seed_generates_different_documents():
+    first = MovieSpec(500, seed=1).generate_batch(0)
+    second = MovieSpec(500, seed=2).generate_batch(0)
+    assert [d["imdb"]["rating"] for d in first] != [d["imdb"]["rating"] for d in second]
+
+
+def test_batches_regenerate_independently():
+    spec = MovieSpec(2500, seed=3, batch_size=1000)
+    documents = list(spec.generate())
+    assert spec.generate_batch(2) == documents[2000:]
+    assert [len(spec.generate_batch(b)) for b in range(spec.batches)] == [1000, 1000, 500]
+
+
+def test_worker_initializer_rebuilds_the_spec_from_its_arguments(monkeypatch):
+    spec = MovieSpec(3000, seed=4, skew=1.3, batch_size=1000)
+    monkeypatch.setattr(movies, "_worker_spec", None)
+    movies._init_worker(spec.count, spec.seed, spec.skew, spec.batch_size)
+    assert movies._worker_spec.generate_batch(2) == spec.generate_batch(2)
+
+
+def test_object_ids_are_unique_and_ordered():
+    ids = [d["_id"] for d in MovieSpec(3000, seed=5, batch_size=700).generate()]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 3000
+    assert ids[42] == object_id(5, 42)
+
+# =============================================================================
+# Shape and skew
+# =============================================================================
+
+def test_documents_have_movies_shape():
+    for document in MovieSpec(200, seed=0).generate_batch(0):
+        assert isinstance(document["year"], int)
+        assert 1 <= len(document["genres"]) <= 3 and set(document["genres"]) <= set(GENRES)
+        assert document["cast"] and 1.0 <= document["imdb"]["rating"] <= 10.0
+        assert 0 <= document["awards"]["wins"] <= document["awards"]["nominations"]
+        assert 0.0 <= document["tomatoes"]["viewer"]["rating"] <= 5.0
+
+
+def test_skew_controls_genre_distribution():
+    def top_genre_share(skew):
+        counts = Counter(g for d in MovieSpec(5000, seed=0, skew=skew, batch_size=5000).generate_batch(0)
+                         for g in d["genres"])
+        return counts.most_common(1)[0][1] / sum(counts.values())
+
+    assert top_genre_share(2.0) > top_genre_share(1.0) > top_genre_share(0.0)
+    counts = Counter(g for d in MovieSpec(5000, seed=0, skew=1.5).generate_batch(0) for g in d["genres"])
+    assert counts.most_common(1)[0][0] == "Drama"
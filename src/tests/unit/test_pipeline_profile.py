@@ -0,0 +1,118 @@
+from pymongo.errors import OperationFailure
+
+from src.framework.queries.explain import ExplainResult
+from src.framework.queries.pipeline_profile import (
+    DiskUseComparison, PipelineProfile, absorbed_stages, normalize_stage_name
+)
+
+PIPELINE = [
+    {"$match": {"year": {"$gte": 2000}}},
+    {"$group": {"_id": "$year", "avgRating": {"$avg": "$imdb.rating"}}},
+    {"$sort": {"avgRating": -1}},
+    {"$limit": 3},
+]
+
+# =============================================================================
+# Sample explain("executionStats") output
+# =============================================================================
+
+def classic_explain(used_disk=False):
+    """Classic engine: $match pushed into $cursor, $group and $sort (with $limit) in the pipeline"""
+    return {
+        "explainVersion": "1",
+        "stages": [
+            {"$cursor": {
+                "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {
+                    "stage": "IXSCAN", "indexName": "year_1", "keyPattern": {"year": 1}}}},
+                "executionStats": {"nReturned": 500, "executionTimeMillis": 9, "executionStages": {
+                    "stage": "FETCH", "nReturned": 500, "executionTimeMillisEstimate": 8, "docsExamined": 500,
+                    "inputStage": {"stage": "IXSCAN", "nReturned": 500, "executionTimeMillisEstimate": 3,
+                                   "keysExamined": 501}}},
+            }, "nReturned": 500, "executionTimeMillisEstimate": 8},
+            {"$group": {"_id": "$year"}, "maxAccumulatorMemoryUsageBytes": {"avgRating": 2048},
+             "usedDisk": used_disk, "spills": 3 if used_disk else 0,
+             "spilledDataStorageSize": 4096 if used_disk else 0,
+             "nReturned": 20, "executionTimeMillisEstimate": 12},
+            {"$sort": {"sortKey": {"avgRating": -1}, "limit": 3}, "totalDataSizeSortedBytesEstimate": 900,
+             "usedDisk": False, "nReturned": 3, "executionTimeMillisEstimate": 13},
+        ],
+    }
+
+
+def sbe_explain():
+    """SBE: the whole pipeline was pushed down into the find layer"""
+    return {
+        "explainVersion": "2",
+        "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "SORT", "inputStage": {
+            "stage": "GROUP", "inputStage": {"stage": "COLLSCAN"}}}, "slotBasedPlan": {}}},
+        "executionStats": {"nReturned": 3, "executionTimeMillis": 15, "executionStages": {
+            "stage": "sort", "nReturned": 3, "executionTimeMillisEstimate": 15, "memLimit": 104857600,
+            "totalDataSizeSorted": 700, "usedDisk": False,
+            "inputStage": {"stage": "group", "nReturned": 20, "executionTimeMillisEstimate": 14,
+                           "usedDisk": True, "spills": 2, "spilledRecords": 40, "spilledDataStorageSize": 512,
+                           "peakTrackedMemBytes": 1500,
+                           "inputStage": {"stage": "scan", "nReturned": 500, "executionTimeMillisEstimate": 5,
+                                          "docsExamined": 21000}}}},
+    }
+
+# =============================================================================
+# Per-stage statistics
+# =============================================================================
+
+def test_classic_pipeline_stages_have_exclusive_times_and_memory():
+    profile = PipelineProfile(PIPELINE, ExplainResult(classic_explain()), allow_disk_use=False)
+    assert [s.name for s in profile.stages] == ["FETCH", "IXSCAN", "$group", "$sort"]
+    group = profile.stage("group")
+    assert (group.docs_in, group.docs_out, group.time_ms) == (500, 20, 4)
+    assert group.memory_bytes == 2048
+    assert profile.stage("$sort").time_ms == 1 and profile.stage("$sort").memory_bytes == 900
+    fetch = profile.stage("FETCH")
+    assert (fetch.docs_in, fetch.time_ms) == (500, 5)
+    assert profile.total_time_ms == 13 and profile.docs_returned == 3
+    assert profile.peak_memory_bytes == 2048
+    assert not profile.used_disk and not profile.is_sbe
+
+
+def test_classic_pushdown_detection():
+    profile = PipelineProfile(PIPELINE, ExplainResult(classic_explain()))
+    assert profile.absorbed == ["$match", "$limit"]
+    assert profile.match_pushed_down
+    assert not profile.sort_pushed_down and not profile.group_pushed_down
+
+
+def test_spills_are_reported_per_stage():
+    profile = PipelineProfile(PIPELINE, ExplainResult(classic_explain(used_disk=True)), allow_disk_use=True)
+    group = profile.stage("$group")
+    assert group.used_disk and group.spills == 3 and group.spilled_bytes == 4096
+    assert profile.used_disk and profile.spills == 3
+    assert "SPILLED" in profile.format()
+
+
+def test_sbe_pushed_down_pipeline():
+    profile = PipelineProfile(PIPELINE, ExplainResult(sbe_explain()))
+    assert profile.is_sbe
+    assert profile.group_pushed_down and profile.sort_pushed_down and profile.match_pushed_down
+    assert not profile.sort_uses_index
+    group = profile.stage("$group")
+    assert group.layer == "find" and (group.docs_in, group.docs_out, group.time_ms) == (500, 20, 9)
+    assert group.spills == 2 and group.memory_bytes == 1500
+    assert profile.stage("scan").docs_in == 21000
+    assert profile.total_time_ms == 15 and profile.docs_returned == 3
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def test_absorbed_stages_counts_repeated_stages():
+    pipeline = [{"$match": {}}, {"$unwind": "$genres"}, {"$match": {}}, {"$group": {}}]
+    assert absorbed_stages(pipeline, ["$unwind", "$match", "$group"]) == ["$match"]
+    assert normalize_stage_name("$sortByCount") == normalize_stage_name("SORTBYCOUNT")
+
+
+def test_disk_use_comparison_records_memory_limit_failures():
+    profile = PipelineProfile(PIPELINE, ExplainResult(classic_explain(used_disk=True)), allow_disk_use=True)
+    error = OperationFailure("Exceeded memory limit for $group", code=292)
+    comparison = DiskUseComparison(PIPELINE, {True: profile}, {False: error})
+    assert not comparison.fits_in_memory
+    assert comparison.with_disk is profile and comparison.without_disk is None
+    assert "allowDiskUse=False: failed with code 292" in comparison.format()
@@ -0,0 +1,54 @@
+from src.framework.queries.plan_cache import PlanCacheReport, diff_entries, shape_hit_rates
+
+# =============================================================================
+# Sample cache snapshots and profiler entries
+# =============================================================================
+
+def entry(key, is_active, works):
+    return {"query_hash": "H" + key, "plan_cache_key": key, "is_active": is_active, "works": works,
+            "version": "1", "estimated_size_bytes": 1024, "shape": None}
+
+# =============================================================================
+# $planCacheStats snapshot diffs
+# =============================================================================
+
+def test_diff_classifies_created_evicted_and_activated():
+    before = {"A": entry("A", False, 40), "B": entry("B", True, 12), "C": entry("C", True, 5)}
+    after = {"A": entry("A", True, 20), "B": entry("B", True, 12), "D": entry("D", False, 8)}
+    diff = diff_entries(before, after)
+    assert [e["plan_cache_key"] for e in diff["created"]] == ["D"]
+    assert [e["plan_cache_key"] for e in diff["evicted"]] == ["C"]
+    assert [e["plan_cache_key"] for e in diff["activated"]] == ["A"]
+    assert diff["deactivated"] == []
+    assert diff["works_changed"] == [{"plan_cache_key": "A", "before": 40, "after": 20}]
+
+
+def test_diff_detects_deactivation():
+    diff = diff_entries({"A": entry("A", True, 10)}, {"A": entry("A", False, 100)})
+    assert [e["plan_cache_key"] for e in diff["deactivated"]] == ["A"]
+
+# =============================================================================
+# Profiler hit rates
+# =============================================================================
+
+def test_shape_hit_rates_and_replans():
+    entries = [
+        {"queryHash": "X", "fromPlanCache": False, "planSummary": "IXSCAN { genres: 1 }"},
+        {"queryHash": "X", "fromPlanCache": True, "planSummary": "IXSCAN { genres: 1 }"},
+        {"queryHash": "X", "fromPlanCache": True, "replanned": True,
+         "replanReason": "cached plan was less efficient than expected", "planSummary": "IXSCAN { year: 1 }"},
+        {"queryHash": "X", "fromPlanCache": True, "planSummary": "IXSCAN { year: 1 }"},
+        {"queryHash": "Y", "planSummary": "COLLSCAN"},
+        {"op": "command"},
+    ]
+    shapes = shape_hit_rates(entries)
+    assert shapes["X"]["executions"] == 4
+    assert shapes["X"]["hit_rate"] == 0.75
+    assert shapes["X"]["replans"] == 1
+    assert shapes["X"]["plans"] == ["IXSCAN { genres: 1 }", "IXSCAN { year: 1 }"]
+    assert shapes["Y"]["hit_rate"] == 0.0
+
+    report = PlanCacheReport(diff_entries({}, {}), {"planCache.hits": 3}, shapes)
+    assert report.replans == 1
+    assert report.hit_rate() == 3 / 5
+    assert "shape X: executions=4 hits=3" in report.format()
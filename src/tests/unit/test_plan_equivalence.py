@@ -0,0 +1,34 @@
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from src.framework.queries.equivalence import filter_fields, stream_digest
+
+# =============================================================================
+# Filter fields
+# =============================================================================
+
+def test_filter_fields_include_logical_branches():
+    query = {"genres": "Drama", "$or": [{"year": {"$gte": 2000}}, {"$and": [{"imdb.rating": {"$gt": 8}}]}],
+             "$expr": {"$gt": ["$runtime", 90]}}
+    assert sorted(filter_fields(query)) == ["genres", "imdb.rating", "year"]
+
+# =============================================================================
+# Streaming digests
+# =============================================================================
+
+def raw(document):
+    return RawBSONDocument(bson.encode(document))
+
+
+def test_digest_is_order_insensitive_but_counts_duplicates():
+    docs = [raw({"_id": i, "year": 2000 + i}) for i in range(5)]
+    assert stream_digest(docs) == stream_digest(list(reversed(docs)))
+    assert stream_digest(docs) != stream_digest(docs + docs[:1])
+    assert stream_digest(docs)[1] != stream_digest(docs[:4] + [raw({"_id": 4, "year": 2005.5})])[1]
+
+
+def test_canonical_digest_ignores_field_order():
+    a = [raw({"_id": 1, "title": "Alpha", "year": 1999})]
+    b = [raw({"year": 1999, "_id": 1, "title": "Alpha"})]
+    assert stream_digest(a) != stream_digest(b)
+    assert stream_digest(a, canonical=True) == stream_digest(b, canonical=True)
@@ -0,0 +1,131 @@
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from src.framework.fuzz.grammar import MOVIES_FIELDS, FuzzCase, QueryGrammar
+from src.framework.fuzz import runner
+from src.framework.fuzz.runner import (
+    ACCEPTED_INVALID, CRASH, UNEXPECTED_ERROR, FuzzFinding, classify, error_signature, shrink_finding
+)
+from src.framework.fuzz.shrink import shrink
+from src.framework.queries.batch import QueryOutcome
+
+# =============================================================================
+# Grammar
+# =============================================================================
+
+def fields_in(spec):
+    if isinstance(spec, dict):
+        for key, value in spec.items():
+            if not key.startswith("$"):
+                yield key
+            yield from fields_in(value)
+    elif isinstance(spec, list):
+        for value in spec:
+            yield from fields_in(value)
+
+
+def test_same_seed_generates_same_cases():
+    first = [c.to_dict() for c in QueryGrammar(seed=11).cases(200)]
+    second = [c.to_dict() for c in QueryGrammar(seed=11).cases(200)]
+    assert first == second
+    assert first != [c.to_dict() for c in QueryGrammar(seed=12).cases(200)]
+
+
+def test_filters_use_schema_fields_and_cover_operator_families():
+    grammar = QueryGrammar(seed=3)
+    filters = [grammar.filter() for _ in range(500)]
+    assert set(fields_in(filters)) <= set(MOVIES_FIELDS) | {"nested"}
+    text = str(filters)
+    for operator in ("$and", "$or", "$nor", "$in", "$elemMatch", "$all", "$size", "$expr",
+                     "$not", "$regex", "$type", "$exists"):
+        assert operator in text, f"{operator} never generated"
+
+
+def test_invalid_cases_carry_their_defect():
+    cases = [c for c in QueryGrammar(seed=5).cases(400, invalid_ratio=0.5) if not c.valid]
+    assert cases and all(c.defect for c in cases)
+    assert {c.kind for c in cases} == {"find", "aggregate"}
+
+
+def test_pipelines_end_at_count():
+    grammar = QueryGrammar(seed=8)
+    for _ in range(200):
+        pipeline = grammar.pipeline()
+        assert all("$count" not in stage for stage in pipeline[:-1])
+
+
+def test_sort_specs_have_at_most_one_array_field():
+    grammar = QueryGrammar(seed=13)
+    sorts = [stage["$sort"] for _ in range(500) for stage in grammar.pipeline() if "$sort" in stage]
+    assert sorts
+    for spec in sorts:
+        assert sum(MOVIES_FIELDS[field][0].startswith("array") for field in spec) <= 1
+
+# =============================================================================
+# Classification and shrinking
+# =============================================================================
+
+def outcome(error=None):
+    return QueryOutcome(0, "find", {}, error is None, 0, 1.0, error)
+
+
+def test_classify_outcomes():
+    valid = FuzzCase("find", {"year": 1})
+    invalid = FuzzCase("find", {"year": {"$fuzzUnknown": 1}}, valid=False, defect="unknown_operator")
+    assert classify(valid, outcome()) is None
+    assert classify(valid, outcome(OperationFailure("bad"))) == UNEXPECTED_ERROR
+    assert classify(valid, outcome(AutoReconnect("gone"))) == CRASH
+    assert classify(invalid, outcome(OperationFailure("unknown operator"))) is None
+    assert classify(invalid, outcome(AssertionError("succeeded but was expected to fail"))) == ACCEPTED_INVALID
+
+
+def test_shrink_finds_minimal_reproducer():
+    spec = {
+        "year": {"$gte": 1990, "$lt": 2000},
+        "$or": [{"genres": "Drama"}, {"cast": {"$size": -2}}, {"rated": {"$in": ["R", "PG"]}}],
+        "title": "Casablanca",
+    }
+    minimal, attempts = shrink(spec, lambda s: "'$size': -2" in str(s))
+    assert minimal in ({"$or": [{"$size": -2}]}, {"$or": [{"cast": {"$size": -2}}]}, {"cast": {"$size": -2}},
+                       {"$size": -2})
+    assert 0 < attempts < 2000
+
+
+def test_shrink_keeps_spec_when_nothing_smaller_fails():
+    spec = {"year": 2000}
+    minimal, attempts = shrink(spec, lambda s: s == spec)
+    assert minimal == spec
+    assert attempts == 4  # drop the key, then 0, "" and None for the value
+
+
+def test_shrinking_keeps_the_server_error_code(monkeypatch):
+    # Dropping the $group accumulator turns the original error (code 15952) into another one
+    def execute(collection, cases, max_workers, max_docs):
+        group = next((stage["$group"] for stage in cases[0].spec
+                      if isinstance(stage, dict) and "$group" in stage), None)
+        if group is None:
+            return [outcome()]
+        code = 15952 if "value" in group else 40234
+        return [outcome(OperationFailure("rejected", code=code))]
+
+    monkeypatch.setattr(runner, "_execute", execute)
+    case = FuzzCase("aggregate", [{"$match": {"year": 2000}}, {"$group": {"_id": None, "value": {"$sum": 1}}}])
+    error = OperationFailure("rejected", code=15952)
+    finding = FuzzFinding(case, UNEXPECTED_ERROR, str(error), 1.0, error_signature(error))
+    shrink_finding(None, finding)
+    assert finding.minimal == [{"$group": {"value": {}}}]
+    # Matching on category alone shrinks to the other error's spec
+    finding = FuzzFinding(case, UNEXPECTED_ERROR, str(error), 1.0)
+    shrink_finding(None, finding)
+    assert finding.minimal == [{"$group": {}}]
+
+
+def test_accepted_invalid_shrinking_keeps_the_defect(monkeypatch):
+    # The server accepts everything here, so only the defect check stops a shrink to {}
+    monkeypatch.setattr(runner, "_execute", lambda collection, cases, max_workers, max_docs:
+                        [outcome(AssertionError("succeeded but was expected to fail"))])
+    case = FuzzCase("find", {"year": 2000, "genres": {"$size": -2}}, valid=False, defect="size_negative",
+                    fragment={"genres": {"$size": -2}})
+    finding = FuzzFinding(case, ACCEPTED_INVALID, "accepted", 1.0,
+                          error_signature(AssertionError("accepted")))
+    shrink_finding(None, finding)
+    assert finding.minimal == {"genres": {"$size": -2}}
@@ -0,0 +1,168 @@
+import datetime
+
+from bson import ObjectId
+
+from src.framework.database.indexes import IndexManager
+from src.framework.load.workload import shape_key
+from src.framework.queries.explain_cache import ExplainCache, catalog_fingerprint
+from src.framework.queries.shape import (
+    aggregate_shape, filter_shape, find_shape, group_by_shape, literal, shape_hash
+)
+
+# =============================================================================
+# Canonicalization
+# =============================================================================
+
+def test_literals_become_typed_placeholders():
+    assert literal("Drama") == "?string"
+    assert literal(7.5) == "?number"
+    assert literal(True) == "?bool"
+    assert literal(None) == "?null"
+    assert literal(datetime.datetime(2000, 1, 1)) == "?date"
+    assert literal(ObjectId()) == "?objectId"
+    assert literal(["a", "b"]) == "?array<?string>"
+    assert literal([1, "a"]) == "?array<>"
+    assert literal([]) == "?array<>"
+
+
+def test_filters_differing_only_in_literals_share_a_shape():
+    drama = filter_shape({"genres": "Drama", "year": {"$gte": 1990, "$lt": 2000}})
+    action = filter_shape({"genres": "Action", "year": {"$gte": 2005, "$lt": 2010}})
+    assert drama == action == {"genres": {"$eq": "?string"},
+                               "year": {"$gte": "?number", "$lt": "?number"}}
+    assert filter_shape({"genres": {"$in": ["Drama"]}}) == \
+        filter_shape({"genres": {"$in": ["Action", "Comedy", "Crime"]}})
+    # Different types, operators or field order are different shapes
+    assert filter_shape({"year": 1999}) != filter_shape({"year": "1999"})
+    assert filter_shape({"year": {"$gt": 1}}) != filter_shape({"year": {"$gte": 1}})
+    assert shape_hash(filter_shape({"a": 1, "b": 1})) != shape_hash(filter_shape({"b": 1, "a": 1}))
+
+
+def test_nested_logical_elem_match_and_expr_shapes():
+    query = {
+        "$or": [{"imdb.rating": {"$not": {"$lt": 5}}}, {"awards.wins": {"$exists": True}}],
+        "cast": {"$elemMatch": {"$eq": "Tom Hanks"}},
+        "$expr": {"$gt": ["$imdb.rating", {"$multiply": ["$tomatoes.viewer.rating", 2]}]},
+        "$comment": "ignored",
+    }
+    assert filter_shape(query) == {
+        "$or": [{"imdb.rating": {"$not": {"$lt": "?number"}}},
+                {"awards.wins": {"$exists": "?bool"}}],
+        "cast": {"$elemMatch": {"$eq": "?string"}},
+        "$expr": {"$gt": ["$imdb.rating", {"$multiply": ["$tomatoes.viewer.rating", "?number"]}]},
+    }
+
+
+def test_find_and_pipeline_shapes_keep_specs_and_drop_values():
+    a = find_shape({"year": 1999}, {"title": 1, "_id": 0}, [("year", -1)], limit=10)
+    b = find_shape({"year": 2004}, {"title": True, "_id": False}, {"year": -1}, limit=3)
+    assert a == b
+    assert a["sort"] == {"year": -1} and a["limit"] == "?number"
+    assert shape_hash(a) == shape_hash(b)
+    assert shape_hash(a) != shape_hash(find_shape({"year": 1999}, sort={"year": 1}, limit=10))
+
+    pipeline = [{"$match": {"genres": "Drama"}}, {"$unwind": "$cast"},
+                {"$group": {"_id": "$cast", "n": {"$sum": 1}}}, {"$sort": {"n": -1}}, {"$limit": 5}]
+    assert aggregate_shape(pipeline)["pipeline"] == [
+        {"$match": {"genres": {"$eq": "?string"}}}, {"$unwind": "$cast"},
+        {"$group": {"_id": "$cast", "n": {"$sum": "?number"}}}, {"$sort": {"n": -1}},
+        {"$limit": "?number"},
+    ]
+
+# =============================================================================
+# Offline grouping
+# =============================================================================
+
+def test_workload_operations_group_by_shape():
+    ops = [
+        {"ns": "db.movies", "op": "find", "command": {"filter": {"genres": genre}}, "duration_ms": 2.0}
+        for genre in ("Drama", "Action", "Comedy")
+    ] + [{"ns": "db.movies", "op": "aggregate", "command": {"pipeline": [{"$limit": 1}]},
+          "duration_ms": 5.0, "query_hash": "ABC"}]
+    groups = group_by_shape(ops)
+    counts = [group["count"] for group in groups.values()]
+    assert counts == [3, 1]
+    first = next(iter(groups.values()))
+    assert first["total_ms"] == 6.0 and first["namespaces"] == ["db.movies"]
+    assert len({shape_key(op) for op in ops[:3]}) == 1
+
+# =============================================================================
+# Explain cache
+# =============================================================================
+
+class FakeClient:
+    def server_info(self):
+        return {"version": "7.0.0"}
+
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.collection = collection
+        self.client = FakeClient()
+        self.explains = 0
+
+    def command(self, name, target, verbosity=None, index=None):
+        if name == "collMod":
+            self.collection.indexes[index["name"]]["hidden"] = index["hidden"]
+            return {}
+        assert name == "explain"
+        self.explains += 1
+        names = [n for n in self.collection.indexes if n != "_id_"]
+        stage = {"stage": "IXSCAN", "indexName": names[0]} if names else {"stage": "COLLSCAN"}
+        return {"queryPlanner": {"winningPlan": stage, "rejectedPlans": []}}
+
+
+class FakeCollection:
+    name = "movies"
+    full_name = "sample_mflix.movies"
+
+    def __init__(self):
+        self.indexes = {"_id_": {"v": 2, "name": "_id_", "key": {"_id": 1}}}
+        self.database = FakeDatabase(self)
+
+    def list_indexes(self):
+        return [dict(index) for index in self.indexes.values()]
+
+    def create_index(self, keys, name, **options):
+        self.indexes[name] = dict({"v": 2, "name": name, "key": dict(keys)}, **options)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+
+def test_same_shape_is_explained_once():
+    collection = FakeCollection()
+    with ExplainCache() as cache:
+        plans = [cache.explain_find(collection, {"genres": g}) for g in ("Drama", "Action", "Comedy")]
+        assert collection.database.explains == 1
+        assert plans[0] is plans[2]
+        cache.explain_find(collection, {"genres": "Drama"}, sort={"year": 1})
+        assert collection.database.explains == 2
+        cache.explain_find(collection, {"genres": "Drama"}, verbosity="executionStats")
+        assert collection.database.explains == 3
+        assert cache.stats()["hits"] == 2 and cache.stats()["bypassed"] == 1
+
+
+def test_index_changes_invalidate_entries():
+    collection = FakeCollection()
+    with ExplainCache(verify_catalog=False) as cache:
+        assert cache.explain_find(collection, {"year": 1}).is_collscan()
+        with IndexManager(collection) as indexes:
+            indexes.ensure([("year", 1)], name="year_1")
+            assert len(cache) == 0
+            assert cache.explain_find(collection, {"year": 2}).indexes_used() == ["year_1"]
+            with indexes.hidden("year_1"):
+                assert len(cache) == 0
+        assert cache.invalidations >= 2
+        assert collection.database.explains == 2
+
+
+def test_catalog_changes_outside_the_manager_change_the_key():
+    collection = FakeCollection()
+    before = catalog_fingerprint(collection)
+    with ExplainCache() as cache:
+        cache.explain_find(collection, {"year": 1})
+        collection.create_index([("year", 1)], name="year_1")
+        assert catalog_fingerprint(collection) != before
+        assert cache.explain_find(collection, {"year": 2}).indexes_used() == ["year_1"]
+        assert collection.database.explains == 2
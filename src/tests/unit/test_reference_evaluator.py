@@ -0,0 +1,253 @@
+import pytest
+from bson import ObjectId
+from bson.int64 import Int64
+
+from src.framework.queries.evaluator import (
+    MISSING, aggregate, canonical, compare_values, compile_filter, diff_results, find, path_values
+)
+
+# =============================================================================
+# Sample documents
+# =============================================================================
+
+MOVIES = [
+    {"_id": 1, "title": "Alpha", "year": 1999, "genres": ["Drama", "Crime"], "imdb": {"rating": 8.1, "votes": 1200},
+     "cast": ["Ann", "Bob"], "awards": {"wins": 3}},
+    {"_id": 2, "title": "Beta", "year": 2005, "genres": ["Comedy"], "imdb": {"rating": 6.4, "votes": 300},
+     "cast": [], "awards": {"wins": 0}},
+    {"_id": 3, "title": "Gamma", "year": 2012, "genres": ["Drama"], "imdb": {"rating": Int64(7)},
+     "tomatoes": {"viewer": {"rating": 4.0}}},
+    {"_id": 4, "title": "delta", "year": None, "genres": "Drama", "imdb": {"rating": "n/a"}},
+    {"_id": 5, "title": "Epsilon", "year": 2012.0, "genres": ["Action", "Drama", "Sci-Fi"],
+     "reviews": [{"user": "x", "score": 5}, {"user": "y", "score": 2}], "imdb": {"rating": 9.0, "votes": 5000}},
+]
+
+# =============================================================================
+# Filters: (filter, expected _ids)
+# =============================================================================
+
+FILTER_CASES = [
+    # Equality, including array membership, numeric cross-type and null/missing
+    ({"year": 2012}, [3, 5]),
+    ({"genres": "Drama"}, [1, 3, 4, 5]),
+    ({"genres": ["Drama"]}, [3]),
+    ({"imdb.rating": 7}, [3]),
+    ({"year": None}, [4]),
+    ({"tomatoes": None}, [1, 2, 4, 5]),
+    ({"tomatoes.viewer.rating": 4}, [3]),
+    ({"cast": []}, [2]),
+    ({"imdb": {"rating": 6.4, "votes": 300}}, [2]),
+    ({"imdb": {"votes": 300, "rating": 6.4}}, []),
+    # Comparison with type bracketing
+    ({"year": {"$gt": 2000}}, [2, 3, 5]),
+    ({"year": {"$gte": 1999, "$lt": 2012}}, [1, 2]),
+    ({"imdb.rating": {"$gte": 7}}, [1, 3, 5]),
+    ({"title": {"$lt": "Beta"}}, [1]),
+    ({"title": {"$gt": "Z"}}, [4]),
+    ({"year": {"$gte": None}}, [4]),
+    ({"year": {"$gt": None}}, []),
+    ({"year": {"$ne": 2012}}, [1, 2, 4]),
+    ({"genres": {"$ne": "Drama"}}, [2]),
+    # $in / $nin, with regexes and null
+    ({"genres": {"$in": ["Comedy", "Action"]}}, [2, 5]),
+    ({"tomatoes": {"$in": [None]}}, [1, 2, 4, 5]),
+    ({"genres": {"$nin": ["Drama"]}}, [2]),
+    ({"title": {"$in": [ObjectId(b"123456789012"), "Beta"]}}, [2]),
+    # Element operators
+    ({"tomatoes": {"$exists": True}}, [3]),
+    ({"awards.wins": {"$exists": False}}, [3, 4, 5]),
+    ({"year": {"$type": "int"}}, [1, 2, 3]),
+    ({"year": {"$type": "double"}}, [5]),
+    ({"year": {"$type": "null"}}, [4]),
+    ({"imdb.rating": {"$type": "number"}}, [1, 2, 3, 5]),
+    ({"imdb.rating": {"$type": "long"}}, [3]),
+    ({"genres": {"$type": "array"}}, [1, 2, 3, 5]),
+    ({"genres": {"$type": "string"}}, [1, 2, 3, 4, 5]),
+    # Evaluation operators
+    ({"title": {"$regex": "^[A-D]"}}, [1, 2]),
+    ({"title": {"$regex": "^d", "$options": "i"}}, [4]),
+    ({"genres": {"$regex": "^Sci"}}, [5]),
+    ({"awards.wins": {"$mod": [3, 0]}}, [1, 2]),
+    ({"$expr": {"$gt": ["$imdb.votes", 1000]}}, [1, 5]),
+    ({"$expr": {"$eq": ["$year", 2012]}}, [3, 5]),
+    # Array operators
+    ({"genres": {"$all": ["Drama", "Crime"]}}, [1]),
+    ({"genres": {"$all": []}}, []),
+    ({"genres": {"$size": 1}}, [2, 3]),
+    ({"cast": {"$size": 0}}, [2]),
+    ({"reviews": {"$elemMatch": {"user": "y", "score": {"$lt": 3}}}}, [5]),
+    ({"reviews": {"$elemMatch": {"user": "x", "score": {"$lt": 3}}}}, []),
+    ({"reviews.user": "x", "reviews.score": 2}, [5]),
+    ({"reviews.score": {"$gt": 4}}, [5]),
+    ({"reviews.0.user": "x"}, [5]),
+    ({"genres.1": "Drama"}, [5]),
+    ({"genres": {"$elemMatch": {"$in": ["Crime", "Sci-Fi"]}}}, [1, 5]),
+    # Logical operators
+    ({"$or": [{"year": 1999}, {"genres": "Comedy"}]}, [1, 2]),
+    ({"$and": [{"genres": "Drama"}, {"year": {"$gte": 2000}}]}, [3, 5]),
+    ({"$nor": [{"genres": "Drama"}, {"year": 2005}]}, []),
+    ({"year": {"$not": {"$gte": 2000}}}, [1, 4]),
+    ({"title": {"$not": {"$regex": "a$"}}}, [5]),
+    ({"genres": "Drama", "$or": [{"imdb.rating": {"$gt": 8.5}}, {"year": 1999}]}, [1, 5]),
+]
+
+
+@pytest.mark.parametrize("query, expected", FILTER_CASES, ids=[str(q) for q, _ in FILTER_CASES])
+def test_filter_semantics(query, expected):
+    assert [doc["_id"] for doc in find(MOVIES, query)] == expected
+
+
+@pytest.mark.parametrize("query", [
+    {"year": {"$fuzzUnknown": 1}},
+    {"$fuzzTop": []},
+    {"genres": {"$in": "Drama"}},
+    {"genres": {"$size": -1}},
+    {"genres": {"$size": "two"}},
+    {"reviews": {"$elemMatch": 5}},
+    {"year": {"$not": 5}},
+    {"$and": []},
+    {"$or": {"year": 1}},
+    {"title": {"$regex": "("}},
+    {"year": {"$type": "fuzzType"}},
+    {"awards.wins": {"$mod": [0, 1]}},
+])
+def test_invalid_filters_are_rejected(query):
+    with pytest.raises(ValueError):
+        compile_filter(query)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ({"$expr": {"$eq": ["$a", None]}}, [2]),
+    ({"$expr": {"$ne": ["$a", None]}}, [1, 3]),
+    ({"$expr": {"$lt": ["$a", None]}}, [1]),
+    ({"$expr": {"$gt": ["$a", None]}}, [3]),
+    ({"$expr": {"$eq": ["$a", "$b"]}}, [1]),
+    ({"a": None}, [1, 2]),
+])
+def test_expr_orders_missing_below_null(query, expected):
+    documents = [{"_id": 1}, {"_id": 2, "a": None}, {"_id": 3, "a": 0}]
+    assert [doc["_id"] for doc in find(documents, query)] == expected
+
+
+def test_filter_is_compiled_once():
+    predicate = compile_filter({"genres": "Drama", "imdb.rating": {"$gt": 7.5}})
+    assert [doc["_id"] for doc in MOVIES if predicate(doc)] == [1, 5]
+
+# =============================================================================
+# Paths and ordering
+# =============================================================================
+
+def test_path_values_traverse_arrays():
+    assert path_values(MOVIES[4], "reviews.score") == [5, 2]
+    assert path_values(MOVIES[0], "imdb.rating") == [8.1]
+    assert path_values(MOVIES[1], "tomatoes.viewer") == [MISSING]
+
+
+def test_bson_type_order():
+    ordered = [None, -1, 2.5, Int64(3), "a", "b", {"a": 1}, [1], ObjectId(b"123456789012"), False, True]
+    for smaller, larger in zip(ordered, ordered[1:]):
+        assert compare_values(smaller, larger) == -1, (smaller, larger)
+    assert compare_values(1, 1.0) == 0
+    assert compare_values(Int64(5), 5) == 0
+
+# =============================================================================
+# Find options
+# =============================================================================
+
+def test_sort_projection_skip_limit():
+    results = find(MOVIES, {"genres": "Drama"}, projection={"title": 1, "_id": 0},
+                   sort={"year": -1, "title": 1}, skip=1, limit=2)
+    assert results == [{"title": "Gamma"}, {"title": "Alpha"}]
+
+
+def test_sort_places_null_first_and_uses_array_extremes():
+    assert [d["_id"] for d in find(MOVIES, sort={"year": 1, "_id": 1})] == [4, 1, 2, 3, 5]
+    assert [d["_id"] for d in find(MOVIES, {"cast": {"$exists": True}}, sort={"cast": 1})] == [2, 1]
+
+
+def test_projection_modes():
+    doc = MOVIES[4]
+    assert find([doc], projection={"imdb.rating": 1}) == [{"_id": 5, "imdb": {"rating": 9.0}}]
+    assert find([doc], projection={"reviews.user": 1, "_id": 0}) == [{"reviews": [{"user": "x"}, {"user": "y"}]}]
+    assert "reviews" not in find([doc], projection={"reviews": 0})[0]
+    assert find([doc], projection={"_id": 1}) == [{"_id": 5}]
+    assert find([doc], projection={"_id": 0, "t": "$title"}) == [{"t": "Epsilon"}]
+    with pytest.raises(ValueError):
+        find([doc], projection={"title": 1, "year": 0})
+
+# =============================================================================
+# Pipelines
+# =============================================================================
+
+def test_match_group_sort_pipeline():
+    pipeline = [
+        {"$match": {"year": {"$type": "number"}}},
+        {"$group": {"_id": "$year", "count": {"$sum": 1}, "avgRating": {"$avg": "$imdb.rating"},
+                    "titles": {"$push": "$title"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    assert aggregate(MOVIES, pipeline) == [
+        {"_id": 1999, "count": 1, "avgRating": 8.1, "titles": ["Alpha"]},
+        {"_id": 2005, "count": 1, "avgRating": 6.4, "titles": ["Beta"]},
+        {"_id": 2012, "count": 2, "avgRating": 8.0, "titles": ["Gamma", "Epsilon"]},
+    ]
+
+
+def test_group_accumulators():
+    [result] = aggregate(MOVIES, [{"$group": {
+        "_id": None, "n": {"$sum": 1}, "maxYear": {"$max": "$year"}, "minYear": {"$min": "$year"},
+        "first": {"$first": "$title"}, "last": {"$last": "$title"}, "wins": {"$sum": "$awards.wins"},
+        "ratingTypes": {"$addToSet": {"$cond": [{"$gt": ["$imdb.votes", 1000]}, "big", "small"]}},
+    }}])
+    assert result == {"_id": None, "n": 5, "maxYear": 2012, "minYear": 1999, "first": "Alpha",
+                      "last": "Epsilon", "wins": 3, "ratingTypes": ["big", "small"]}
+
+
+def test_unwind_count_limit_skip():
+    assert aggregate(MOVIES, [{"$unwind": "$genres"}, {"$count": "total"}]) == [{"total": 8}]
+    preserved = aggregate(MOVIES, [{"$unwind": {"path": "$cast", "preserveNullAndEmptyArrays": True}}])
+    assert len(preserved) == 6
+    assert [d["_id"] for d in aggregate(MOVIES, [{"$skip": 1}, {"$limit": 2}])] == [2, 3]
+    assert aggregate(MOVIES, [{"$match": {"year": 1800}}, {"$count": "n"}]) == []
+
+
+def test_project_expressions_and_add_fields():
+    [doc] = aggregate(MOVIES[:1], [
+        {"$addFields": {"decade": {"$subtract": ["$year", {"$mod": ["$year", 10]}]}, "imdb.scaled": {"$multiply": ["$imdb.rating", 10]}}},
+        {"$project": {"_id": 0, "title": {"$toUpper": "$title"}, "decade": 1, "castSize": {"$size": "$cast"},
+                      "label": {"$concat": ["$title", " (", {"$literal": "film"}, ")"]},
+                      "rating": {"$round": ["$imdb.rating", 0]}, "scaled": "$imdb.scaled"}},
+    ])
+    assert doc == {"decade": 1990, "title": "ALPHA", "castSize": 2, "label": "Alpha (film)",
+                   "rating": 8.0, "scaled": 81.0}
+
+
+@pytest.mark.parametrize("pipeline", [
+    [{"$limit": 0}],
+    [{"$skip": -1}],
+    [{"$group": {"total": {"$sum": 1}}}],
+    [{"$group": {"_id": "$year", "x": {"$fuzz": 1}}}],
+    [{"$sort": {}}],
+    [{"$unwind": "genres"}],
+    [{"$project": {}}],
+    [{"$count": "$bad"}],
+    [{"invalidStage": {}}],
+])
+def test_invalid_pipelines_are_rejected(pipeline):
+    with pytest.raises(ValueError):
+        aggregate(MOVIES, pipeline)
+
+
+def test_unsupported_stage_is_not_silently_accepted():
+    with pytest.raises(NotImplementedError):
+        aggregate(MOVIES, [{"$lookup": {"from": "comments"}}])
+
+# =============================================================================
+# Result comparison
+# =============================================================================
+
+def test_canonical_and_diff_ignore_order_and_numeric_type():
+    assert canonical({"a": 1, "b": [1.0]}) == canonical({"b": [Int64(1)], "a": 1.0})
+    missing, unexpected = diff_results([{"_id": 1}, {"_id": 2}, {"_id": 2}], [{"_id": 2}, {"_id": 3}])
+    assert missing == [{"_id": 1}, {"_id": 2}]
+    assert unexpected == [{"_id": 3}]
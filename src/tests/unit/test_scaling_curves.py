@@ -0,0 +1,122 @@
+import math
+
+import pytest
+
+from src.framework.assertions.utils import assert_index_bounded
+from src.framework.benchmark.scaling import (
+    ScalingCurve, ScalingPoint, classify_growth, geometric_sizes, loglog_slope
+)
+from src.framework.data.movies import GrowingDataset
+
+SIZES = geometric_sizes(1000, factor=4, steps=5)
+
+# =============================================================================
+# Growth classification
+# =============================================================================
+
+def test_geometric_sizes():
+    assert SIZES == [1000, 4000, 16000, 64000, 256000]
+    with pytest.raises(ValueError):
+        geometric_sizes(1000, factor=1)
+
+
+@pytest.mark.parametrize("model, f", [
+    ("O(1)", lambda n: 5),
+    ("O(log n)", lambda n: 3 + 2 * math.log(n)),
+    ("O(n)", lambda n: 10 + 0.5 * n),
+    ("O(n log n)", lambda n: n * math.log(n) / 100),
+    ("O(n^2)", lambda n: n * n / 1e6),
+])
+def test_classifies_synthetic_series(model, f):
+    assert classify_growth(SIZES, [f(n) for n in SIZES]).model == model
+
+
+def test_noisy_constant_and_zero_series_are_constant():
+    assert classify_growth(SIZES, [1.00, 1.04, 0.97, 1.02, 0.99]).model == "O(1)"
+    assert classify_growth(SIZES, [0, 0, 0, 0, 0]).model == "O(1)"
+
+
+def test_small_integer_jitter_is_constant_under_a_noise_floor():
+    sizes = [1000, 4000, 16000, 64000]
+    assert classify_growth(sizes, [0, 0, 0, 1]).model == "O(n^2)"
+    assert classify_growth(sizes, [0, 0, 0, 1], noise=1).model == "O(1)"
+    assert classify_growth(sizes, [1, 1, 1, 2], noise=1).model == "O(1)"
+    assert classify_growth(sizes, [0, 4000, 16000, 64000], noise=1).model == "O(n)"
+
+
+def test_loglog_slope_tracks_exponent():
+    assert loglog_slope(SIZES, [n for n in SIZES]) == pytest.approx(1.0, abs=0.01)
+    assert abs(loglog_slope(SIZES, [7] * len(SIZES))) < 1e-9
+
+
+def test_classify_needs_three_points():
+    with pytest.raises(ValueError):
+        classify_growth([1, 2], [1, 2])
+
+# =============================================================================
+# Curves and the index-bounded assertion
+# =============================================================================
+
+def curve(examined, returned=None):
+    returned = returned or [n // 10 for n in SIZES]
+    points = [ScalingPoint(n, None, keys, keys, r, "IXSCAN { year: 1 }")
+              for n, keys, r in zip(SIZES, examined, returned)]
+    return ScalingCurve("year range", points)
+
+
+def test_index_bounded_curve_passes():
+    # Keys examined grow with the result, the waste (one key past the range) does not
+    bounded = curve([n // 10 + 1 for n in SIZES])
+    assert bounded.classify("keys_examined").model == "O(n)"
+    assert assert_index_bounded(bounded).model == "O(1)"
+
+
+@pytest.mark.parametrize("overhead", [[0, 0, 0, 0, 1], [1, 1, 1, 1, 2], [0, 1, 0, 1, 1]])
+def test_one_key_of_jitter_is_index_bounded(overhead):
+    returned = [n // 10 for n in SIZES]
+    jittery = curve([r + extra for r, extra in zip(returned, overhead)], returned)
+    assert assert_index_bounded(jittery).model == "O(1)"
+
+
+def test_linear_overhead_fails():
+    scan = curve(list(SIZES))
+    with pytest.raises(AssertionError, match="O\\(n\\)"):
+        assert_index_bounded(scan)
+
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(ValueError):
+        curve(list(SIZES)).values("bytes")
+
+# =============================================================================
+# GrowingDataset
+# =============================================================================
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+        self.dropped = False
+
+    def drop(self):
+        self.dropped = True
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+
+def test_growing_dataset_inserts_only_missing_documents():
+    collection = FakeCollection()
+    grow = GrowingDataset(collection, 250, batch_size=100)
+    assert collection.dropped
+    assert grow(30) == 30
+    assert grow(220) == 220
+    assert grow(100) == 220
+    ids = [doc["_id"] for doc in collection.documents]
+    assert len(ids) == len(set(ids)) == 220
+
+    # Same documents as generating the full dataset at once
+    full = FakeCollection()
+    GrowingDataset(full, 250, batch_size=100)(220)
+    assert ids == [doc["_id"] for doc in full.documents]
+    with pytest.raises(ValueError):
+        grow(251)
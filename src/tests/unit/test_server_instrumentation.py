@@ -0,0 +1,124 @@
+from src.framework.database.instrumentation import (
+    ResourceReport, ServerInstrumentation, server_metrics, storage_deltas, summarize_profile
+)
+
+MB = 1024 * 1024
+
+# =============================================================================
+# Sample serverStatus, $collStats and profiler documents
+# =============================================================================
+
+def server_status(queries, cache_reads, disk_reads, lock_wait, read_available=127):
+    return {
+        "opcounters": {"query": queries, "insert": 0},
+        "wiredTiger": {
+            "cache": {"bytes read into cache": cache_reads, "bytes currently in the cache": 10 * MB},
+            "block-manager": {"bytes read": disk_reads},
+        },
+        "queues": {"execution": {"read": {"out": 1, "available": read_available}}},
+        "locks": {"Global": {"timeAcquiringMicros": {"r": lock_wait}, "acquireWaitCount": {"r": 2}},
+                  "Collection": {"timeAcquiringMicros": {"w": lock_wait}}},
+    }
+
+
+def coll_stats(cache_reads, index_reads, count=100):
+    return {"storageStats": {
+        "count": count, "size": 1000, "storageSize": 4096, "totalIndexSize": 2048,
+        "wiredTiger": {"cache": {"bytes read into cache": cache_reads}},
+        "indexDetails": {"_id_": {"cache": {"bytes read into cache": 0}},
+                         "year_1": {"cache": {"bytes read into cache": index_reads}}},
+    }}
+
+
+class FakeCollection:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def aggregate(self, pipeline):
+        assert pipeline == [{"$collStats": {"storageStats": {}}}]
+        return iter([self.stats.pop(0)])
+
+
+class FakeDatabase:
+    name = "sample_mflix"
+
+    def __init__(self, statuses, stats):
+        self.statuses = statuses
+        self.movies = FakeCollection(stats)
+
+    def command(self, name):
+        if name == "serverStatus":
+            return self.statuses.pop(0)
+        assert name == "dbStats"
+        return {"objects": 100, "dataSize": 1000, "storageSize": 4096, "indexSize": 2048}
+
+    def __getitem__(self, name):
+        assert name == "movies"
+        return self.movies
+
+# =============================================================================
+# Metric extraction and deltas
+# =============================================================================
+
+def test_server_metrics_split_counters_and_gauges():
+    counters, gauges = server_metrics(server_status(5, MB, 0, 300))
+    assert counters["opcounters.query"] == 5
+    assert counters["cache.bytes_read_into"] == MB
+    assert counters["locks.wait_micros"] == 600 and counters["locks.wait_count"] == 2
+    assert gauges == {"cache.bytes_in_cache": 10 * MB, "tickets.read_out": 1, "tickets.read_available": 127}
+
+
+def test_storage_deltas_report_per_index_cache_reads():
+    def stats(cache, index, count):
+        entry = coll_stats(cache, index, count)["storageStats"]
+        return {"db": {"objects": count}, "collections": {"movies": {
+            "count": entry["count"], "size": entry["size"], "storageSize": entry["storageSize"],
+            "totalIndexSize": entry["totalIndexSize"], "bytes_read_into_cache": cache,
+            "index_bytes_read_into_cache": {"_id_": 0, "year_1": index}}}}
+    deltas = storage_deltas(stats(0, 0, 100), stats(MB, 3 * MB, 101))
+    assert deltas["db"] == {"objects": 1}
+    assert deltas["collections"]["movies"]["index_bytes_read_into_cache"] == {"year_1": 3 * MB}
+    assert deltas["collections"]["movies"]["count"] == 1
+
+
+def test_profile_summary_totals_storage_and_lock_waits():
+    entries = [
+        {"op": "query", "ns": "db.movies", "millis": 12, "keysExamined": 50, "docsExamined": 50,
+         "nreturned": 50, "planSummary": "IXSCAN { year: 1 }", "numYield": 1,
+         "locks": {"Global": {"timeAcquiringMicros": {"r": 700}}},
+         "storage": {"data": {"bytesRead": 2 * MB, "timeReadingMicros": 4000}}},
+        {"op": "query", "ns": "db.movies", "millis": 1, "planSummary": "COLLSCAN"},
+    ]
+    totals, operations = summarize_profile(entries)
+    assert totals["operations"] == 2 and totals["millis"] == 13
+    assert totals["storage_bytes_read"] == 2 * MB and totals["lock_wait_micros"] == 700
+    assert totals["plans"] == ["COLLSCAN", "IXSCAN { year: 1 }"]
+    assert operations[0]["bytes_read"] == 2 * MB
+
+# =============================================================================
+# Reports
+# =============================================================================
+
+def test_instrumentation_diagnoses_cold_cache_disk_io_and_lock_waits():
+    db = FakeDatabase([server_status(5, 0, 0, 0), server_status(9, 4 * MB, 2 * MB, 5000, read_available=0)],
+                      [coll_stats(0, 0), coll_stats(MB, 3 * MB)])
+    with ServerInstrumentation(db, ["movies"], profile=False) as instrumentation:
+        pass
+    report = instrumentation.report
+    assert report.counters["opcounters.query"] == 4
+    findings = report.diagnosis()
+    assert findings[0] == "cold cache: 4.0 MB read into cache"
+    assert "cold index movies.year_1: 3.0 MB read into cache" in findings
+    assert "disk I/O: 2.0 MB read" in findings
+    assert "lock waits: 10.0 ms (0 waits)" in findings
+    assert "read tickets exhausted" in findings
+    text = report.format()
+    assert "opcounters.query=+4" in text and text.endswith("read tickets exhausted")
+    assert report.as_dict()["gauges"]["tickets.read_available"] == {"before": 127, "after": 0}
+
+
+def test_quiet_block_reports_nothing_notable():
+    storage = {"db": {}, "collections": {}}
+    report = ResourceReport({"opcounters.query": 1}, {}, {}, storage, {}, [])
+    assert report.diagnosis() == []
+    assert report.format().endswith("diagnosis: nothing notable")
@@ -0,0 +1,140 @@
+from src.framework.database.cluster import shard_collection, topology_config
+from src.framework.queries.explain import ExplainResult
+from src.framework.queries.routing import AGGREGATE, ShardedExplain
+
+# =============================================================================
+# Sample mongos explain("executionStats") output
+# =============================================================================
+
+def shard_find(name, returned, keys, index="genres_1"):
+    planned = {"shardName": name, "winningPlan": {"stage": "FETCH", "inputStage": {
+        "stage": "SHARDING_FILTER", "inputStage": {"stage": "IXSCAN", "indexName": index,
+                                                   "keyPattern": {"genres": 1}}}}}
+    executed = {"shardName": name, "executionSuccess": True, "nReturned": returned,
+                "executionTimeMillis": 4, "totalKeysExamined": keys, "totalDocsExamined": keys,
+                "executionStages": {"stage": "FETCH", "nReturned": returned}}
+    return planned, executed
+
+
+def mongos_find(stage, shards, returned):
+    planned, executed = zip(*shards)
+    return {
+        "queryPlanner": {"mongosPlannerVersion": 1,
+                         "winningPlan": {"stage": stage, "shards": list(planned)}},
+        "executionStats": {"nReturned": returned, "executionTimeMillis": 6,
+                           "executionStages": {"stage": stage, "nReturned": returned,
+                                               "shards": list(executed)}},
+    }
+
+
+def mongos_aggregate():
+    shard = {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+             "executionStats": {"nReturned": 18, "totalKeysExamined": 0, "totalDocsExamined": 11000,
+                                "executionTimeMillis": 20}}
+    return {
+        "mergeType": "anyShard",
+        "splitPipeline": {
+            "shardsPart": [{"$unwind": {"path": "$genres"}},
+                           {"$group": {"_id": "$genres", "count": {"$sum": {"$const": 1}}}}],
+            "mergerPart": [{"$mergeCursors": {}},
+                           {"$group": {"_id": "$$ROOT._id", "count": {"$sum": "$$ROOT.count"}, "$doingMerge": True}},
+                           {"$sort": {"sortKey": {"count": -1}}}],
+        },
+        "shards": {"shard0": dict(shard), "shard1": dict(shard)},
+    }
+
+# =============================================================================
+# Routing, per-shard plans and merge-side work
+# =============================================================================
+
+def test_single_shard_find():
+    explain = ShardedExplain(mongos_find("SINGLE_SHARD", [shard_find("shard1", 40, 41)], 40))
+    assert explain.is_single_shard and not explain.is_scatter_gather
+    assert explain.targeted_shards == ["shard1"] and explain.merge_docs_in == 0
+    assert explain.shards[0].plan.indexes_used() == ["genres_1"]
+    assert (explain.keys_examined, explain.n_returned) == (41, 40)
+
+
+def test_merge_sort_find_reports_merge_work():
+    raw = mongos_find("SHARD_MERGE_SORT", [shard_find("shard0", 10, 12), shard_find("shard1", 10, 15)], 10)
+    explain = ShardedExplain(raw)
+    assert explain.is_scatter_gather and explain.shard_count == 2
+    assert explain.merge_work() == {"stage": "SHARD_MERGE_SORT", "merge_type": None, "docs_in": 20,
+                                    "docs_out": 10, "merger_stages": []}
+    assert explain.keys_examined == 27 and explain.indexes_used() == ["genres_1"]
+    # The plain explain model sees through mongos to the shards' plans
+    plan = ExplainResult(raw)
+    assert plan.has_stage("IXSCAN") and plan.indexes_used() == ["genres_1"]
+    assert plan.winning_plan.stages()[0] == "SHARD_MERGE_SORT"
+
+
+def test_split_aggregate_pipeline():
+    explain = ShardedExplain(mongos_aggregate(), AGGREGATE)
+    assert explain.stage == "SHARD_MERGE" and explain.shard_count == 2
+    work = explain.merge_work()
+    assert work["merger_stages"] == ["$mergeCursors", "$group", "$sort"]
+    assert work["merge_type"] == "anyShard" and work["docs_in"] == 36
+    assert explain.docs_examined == 22000
+
+
+def test_single_shard_aggregate_has_no_merger():
+    raw = mongos_aggregate()
+    raw["splitPipeline"] = None
+    raw["shards"].pop("shard0")
+    explain = ShardedExplain(raw, AGGREGATE)
+    assert explain.is_single_shard and explain.merger_part == []
+
+# =============================================================================
+# Cluster setup helpers
+# =============================================================================
+
+class FakeAdmin:
+    def __init__(self):
+        self.commands = []
+
+    def command(self, name, value=None, **options):
+        self.commands.append((name, value, options))
+        if name == "listShards":
+            return {"shards": [{"_id": "shard0"}, {"_id": "shard1"}]}
+        return {"ok": 1}
+
+
+class FakeConfigDatabases:
+    def __init__(self, primary):
+        self.primary = primary
+
+    def find_one(self, query):
+        return {"_id": query["_id"], "primary": self.primary}
+
+
+class FakeClient:
+    def __init__(self, primary="shard0"):
+        self.admin = FakeAdmin()
+        self.config = {"databases": FakeConfigDatabases(primary)}
+
+    def __getitem__(self, name):
+        assert name == "config"
+        return self.config
+
+
+def test_shard_collection_spreads_chunks():
+    client = FakeClient()
+    shard_collection(client, "db_sharded.movies", {"year": 1}, split_points=[{"year": 1995}])
+    names = [name for name, _, _ in client.admin.commands]
+    assert names == ["enableSharding", "shardCollection", "listShards", "split", "moveChunk"]
+    _, namespace, options = client.admin.commands[-1]
+    assert namespace == "db_sharded.movies" and options["to"] == "shard1"
+
+
+def test_shard_collection_moves_chunks_off_the_primary_shard():
+    client = FakeClient(primary="shard1")
+    shard_collection(client, "db_sharded.movies", {"year": 1}, split_points=[{"year": 1995}])
+    _, _, options = client.admin.commands[-1]
+    assert options["to"] == "shard0"
+
+
+def test_topology_config_defaults(monkeypatch):
+    monkeypatch.setenv("SHARDED_MONGOS_URI", "mongodb://mongos:27017")
+    config = topology_config()
+    assert config["mongos_uri"] == "mongodb://mongos:27017"
+    assert config["shards"] == 2 and "key" in config["collections"]["movies"]
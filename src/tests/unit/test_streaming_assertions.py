@@ -0,0 +1,65 @@
+from src.framework.assertions.utils import (
+    stream_documents, consume, assert_query_result_structure, assert_data_types_correct
+)
+from bson import encode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+import pytest
+
+
+class FakeCursor:
+    """Iterable that records how far it was consumed and whether it was closed"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.produced = 0
+        self.closed = False
+
+    def __iter__(self):
+        for doc in self.docs:
+            self.produced += 1
+            yield doc
+
+    def close(self):
+        self.closed = True
+
+
+def raw(doc):
+    return RawBSONDocument(encode(doc), CodecOptions(document_class=RawBSONDocument))
+
+
+def test_consume_counts_and_closes_cursor():
+    cursor = FakeCursor([{"a": i} for i in range(10)])
+    assert consume(cursor) == 10
+    assert cursor.closed
+
+
+def test_max_docs_stops_early():
+    cursor = FakeCursor(({"a": i} for i in range(10**9)))
+    assert consume(cursor, max_docs=5) == 5
+    assert cursor.produced == 6 and cursor.closed
+
+
+def test_structure_validation_stops_at_first_violation():
+    docs = [{"title": "a"}, {"other": 1}] + [{"title": "b"}] * 100
+    cursor = FakeCursor(docs)
+    with pytest.raises(AssertionError, match="Missing field 'title'"):
+        assert_query_result_structure(cursor, ["title"])
+    assert cursor.produced == 2
+
+
+def test_empty_stream_fails_validation():
+    with pytest.raises(AssertionError, match="No documents"):
+        assert_query_result_structure(iter([]), ["title"])
+
+
+def test_raw_documents_validate_nested_types():
+    docs = [raw({"title": "x", "imdb": {"rating": 8.1}, "genres": ["Drama"]})]
+    assert_query_result_structure(iter(docs), ["title", "imdb"])
+    assert_data_types_correct(iter(docs), {"title": str, "imdb": dict, "genres": list})
+    with pytest.raises(AssertionError, match="should be"):
+        assert_data_types_correct(iter(docs), {"imdb": list})
+
+
+def test_stream_documents_accepts_lists():
+    assert list(stream_documents([1, 2, 3], max_docs=2)) == [1, 2]
@@ -0,0 +1,88 @@
+from src.framework.load.workload import (
+    operation_from_profile_entry, capture_from_jsonl, write_workload, read_workload,
+    replay_schedule_ms, shape_key, compare_replay, ReplayResult
+)
+from src.framework.queries.explain import parse_plan
+from bson import ObjectId, json_util
+from datetime import datetime, timedelta
+import pytest
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def profile_entry(offset_ms, command, millis=3, plan="IXSCAN { year: 1 }", query_hash="AAAA1111"):
+    return {"op": "query", "ns": "sample_mflix.movies", "ts": T0 + timedelta(milliseconds=offset_ms),
+            "command": dict(command, **{"$db": "sample_mflix", "lsid": {"id": 1}}),
+            "millis": millis, "planSummary": plan, "queryHash": query_hash, "nreturned": 5}
+
+
+def test_profile_entry_keeps_only_replayable_fields():
+    op = operation_from_profile_entry(profile_entry(0, {"find": "movies", "filter": {"year": 2000},
+                                                        "sort": {"year": 1}, "limit": 5}))
+    assert op["op"] == "find"
+    assert op["command"] == {"filter": {"year": 2000}, "sort": {"year": 1}, "limit": 5}
+    assert op["plan_summary"] == "IXSCAN { year: 1 }"
+    assert operation_from_profile_entry({"ns": "x.y", "command": {"insert": "y"}}) is None
+
+
+def test_jsonl_capture_round_trips_through_workload_file(tmp_path):
+    source = tmp_path / "capture.jsonl"
+    oid = ObjectId()
+    lines = [
+        profile_entry(250, {"find": "movies", "filter": {"_id": oid}}),
+        profile_entry(0, {"aggregate": "movies", "pipeline": [{"$match": {"year": 2000}}], "cursor": {}}),
+        {"t": {"$date": "2026-01-01T12:00:01.000Z"}, "msg": "Slow query",
+         "attr": {"ns": "sample_mflix.movies", "command": {"find": "movies", "filter": {"genres": "Drama"}},
+                  "durationMillis": 120, "planSummary": "COLLSCAN", "queryHash": "BBBB2222"}},
+    ]
+    source.write_text("\n".join(json_util.dumps(line) for line in lines))
+
+    operations = capture_from_jsonl(str(source))
+    assert [op["offset_ms"] for op in operations] == [0.0, 250.0, 1000.0]
+    assert operations[0]["op"] == "aggregate"
+    assert operations[2]["duration_ms"] == 120
+
+    path = str(tmp_path / "workload.jsonl")
+    write_workload(path, operations, source="test")
+    header, loaded = read_workload(path)
+    assert header["operations"] == 3
+    assert loaded[1]["command"]["filter"]["_id"] == oid
+
+
+def test_read_rejects_foreign_files(tmp_path):
+    path = tmp_path / "other.jsonl"
+    path.write_text('{"hello": 1}\n')
+    with pytest.raises(ValueError):
+        read_workload(str(path))
+
+
+def test_replay_schedule_speed_and_unpaced():
+    ops = [{"offset_ms": 0.0}, {"offset_ms": 100.0}, {"offset_ms": 1000.0}]
+    assert replay_schedule_ms(ops, speed=4) == [0.0, 25.0, 250.0]
+    assert replay_schedule_ms(ops, preserve_timing=False) == [0.0, 0.0, 0.0]
+
+
+def test_shape_key_falls_back_to_structure():
+    a = {"ns": "d.c", "op": "find", "command": {"filter": {"genres": "Drama"}}}
+    b = {"ns": "d.c", "op": "find", "command": {"filter": {"genres": "Action"}}}
+    assert shape_key(a) == shape_key(b)
+    assert shape_key(dict(a, query_hash="ABC")) == "ABC"
+
+
+def test_compare_flags_plan_changes_and_slowdowns():
+    ops = [operation_from_profile_entry(profile_entry(i, {"find": "movies", "filter": {"year": i}}, millis=2))
+           for i in range(4)]
+    result = ReplayResult(ops)
+    result.server = {i: {"duration_ms": 9, "plan_summary": "COLLSCAN"} for i in range(4)}
+    (row,) = compare_replay(result)
+    assert row["count"] == 4
+    assert row["plan_changed"] and row["slower"]
+    assert row["plan_capture"] == "IXSCAN { year: 1 }" and row["plan_replay"] == "COLLSCAN"
+
+
+def test_plan_summary_matches_server_format():
+    node = parse_plan({"stage": "FETCH", "inputStage": {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN", "keyPattern": {"genres": 1, "year": -1}},
+        {"stage": "IXSCAN", "keyPattern": {"imdb.rating": 1}}]}})
+    assert node.plan_summary() == "IXSCAN { genres: 1, year: -1 }, IXSCAN { imdb.rating: 1 }"
+    assert parse_plan({"stage": "COLLSCAN"}).plan_summary() == "COLLSCAN"
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.framework.benchmark.writes import (
+    SECONDARY_INDEXES, WRITE_OPERATIONS, WriteResult, format_matrix, index_levels,
+    run_write_benchmark, write_matrix
+)
+
+MS = 1_000_000
+
+# =============================================================================
+# A collection that records writes instead of sending them
+# =============================================================================
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.indexes = []
+        self.write_concern = None
+        self.bulk_orders = []
+
+    def drop(self):
+        self.documents = {}
+        self.indexes = []
+
+    def with_options(self, write_concern=None):
+        self.write_concern = write_concern
+        return self
+
+    def create_indexes(self, models):
+        self.indexes.extend(model.document["name"] for model in models)
+
+    def insert_many(self, documents, ordered=True):
+        for doc in documents:
+            self.documents[doc["_id"]] = doc
+
+    def update_many(self, filter, update):
+        matched = [i for i in filter["_id"]["$in"] if i in self.documents]
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched))
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_orders.append(ordered)
+        inserted = matched = upserted = 0
+        for request in requests:
+            kind = type(request).__name__
+            document = request._doc
+            if kind == "InsertOne":
+                self.documents[document["_id"]] = document
+                inserted += 1
+            elif request._filter["_id"] in self.documents:
+                matched += 1
+            else:
+                self.documents[request._filter["_id"]] = document["$set"]
+                upserted += 1
+        return SimpleNamespace(inserted_count=inserted, matched_count=matched, upserted_count=upserted)
+
+# =============================================================================
+# Benchmark runs
+# =============================================================================
+
+@pytest.mark.parametrize("operation", list(WRITE_OPERATIONS))
+def test_every_operation_writes_one_document_per_batch_slot(operation):
+    collection = FakeCollection()
+    result = run_write_benchmark(collection, operation, SECONDARY_INDEXES[:2], write_concern="majority",
+                                 batch_size=20, batches=3, seed_docs=100)
+    assert result.docs_written == 60 and len(result.samples_ns) == 3
+    assert collection.indexes == ["year_1", "imdb.rating_-1"]
+    assert collection.write_concern.document == {"w": "majority"}
+    assert result.name == f"{operation} 2idx majority"
+
+
+def test_bulk_write_order_and_new_documents():
+    collection = FakeCollection()
+    run_write_benchmark(collection, "bulk_write_unordered", batch_size=20, batches=2, warmup=1, seed_docs=100)
+    assert collection.bulk_orders == [False] * 3
+    # Half of every batch (warm-up included) inserts new documents
+    assert len(collection.documents) == 100 + 3 * 10
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        run_write_benchmark(FakeCollection(), "delete_many")
+    with pytest.raises(ValueError):
+        run_write_benchmark(FakeCollection(), "insert_many", batch_size=200, seed_docs=100)
+
+# =============================================================================
+# Results and reporting
+# =============================================================================
+
+def test_index_levels_add_one_index_at_a_time():
+    levels = index_levels()
+    assert list(levels)[:3] == ["0 indexes", "1 index", "2 indexes"]
+    assert [len(indexes) for indexes in levels.values()] == list(range(len(SECONDARY_INDEXES) + 1))
+
+
+def test_write_result_throughput_and_summary():
+    result = WriteResult("insert_many 5idx w1", "insert_many", ["year_1", "genres_1", "cast_1"], "w1",
+                         500, [100 * MS, 100 * MS, 300 * MS], 1500)
+    assert result.docs_per_sec == pytest.approx(3000)
+    assert result.multikey_indexes == ["genres_1", "cast_1"]
+    summary = result.summary()
+    assert summary["multikey_indexes"] == 2 and summary["batches"] == 3
+    assert summary["max_ms"] == pytest.approx(300, rel=0.01)
+    assert result.as_benchmark().p50_ms == pytest.approx(100)
+
+
+def test_matrix_reports_slowdown_against_no_indexes():
+    results = write_matrix(FakeCollection(), ["insert_many"], levels={"none": (), "all": SECONDARY_INDEXES},
+                           write_concerns=("w1", "journaled"), batch_size=10, batches=2, seed_docs=50)
+    assert [(len(r.indexes), r.write_concern) for r in results] == [(0, "w1"), (5, "w1"), (0, "journaled"),
+                                                                    (5, "journaled")]
+    table = format_matrix(results).splitlines()
+    assert len(table) == 5 and "x1.00" in table[1]
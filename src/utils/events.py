@@ -0,0 +1,274 @@
+# Structured test events
+#
+# Helpers used to print f-strings of whole queries, pipelines and reports,
+# which made report.html grow with every test. emit() records an event
+# instead: a name, a level and named fields.
+#   - Below the configured level it returns before looking at its arguments,
+#     and values wrapped in lazy() are only computed for events that are kept.
+#   - Field values are summarized before output: long strings are truncated,
+#     long lists and documents keep their first items plus a count, deep
+#     nesting is collapsed. Neither the report nor the log grows with the size
+#     of a query or an explain document.
+#   - Every kept event is appended to a JSONL sink (logs/events.jsonl, one file
+#     per xdist worker, rotated at max_bytes); events at or above console_level
+#     are also printed as a one-line "Log: ..." summary, which pytest and
+#     pytest-html capture into the report.
+#
+#   events.emit("query.executed", "Query returned {count} documents", query=query, count=count)
+#
+# Nothing is formatted inside timed sections: helpers emit before or after the
+# work they measure, and the sink is buffered (flushed on errors and at exit).
+import atexit
+import json
+import os
+import threading
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+from src.framework.database.client import PROJECT_ROOT, load_config
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+DEFAULTS = {
+    "level": "INFO",
+    "console_level": "INFO",
+    "path": "logs/events.jsonl",
+    # Limits applied to field values in the JSONL sink
+    "max_chars": 1000,
+    "max_items": 20,
+    "max_depth": 6,
+    # Tighter limits for the one-line console summary
+    "console_max_chars": 160,
+    "console_max_items": 5,
+    "console_max_depth": 3,
+    "console_max_line": 400,
+    "max_bytes": 50 * 1024 * 1024,
+}
+
+_lock = threading.Lock()
+_settings = None
+_sink = None
+_sink_bytes = 0
+
+
+class lazy:
+    """A field value computed only if the event is kept: lazy(lambda: plan.raw)"""
+
+    __slots__ = ("function",)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self):
+        return self.function()
+
+
+def level_value(level):
+    """Numeric level for a name ("INFO") or a number"""
+    if isinstance(level, int):
+        return level
+    for value, name in LEVEL_NAMES.items():
+        if name == str(level).upper():
+            return value
+    raise ValueError(f"Unknown event level: {level}")
+
+
+def settings():
+    """The `events:` config section with defaults and EVENTS_* environment overrides"""
+    global _settings
+    if _settings is None:
+        section = dict(DEFAULTS)
+        section.update(load_config().get("events") or {})
+        if os.environ.get("EVENTS_LEVEL"):
+            section["level"] = os.environ["EVENTS_LEVEL"]
+        if os.environ.get("EVENTS_CONSOLE_LEVEL"):
+            section["console_level"] = os.environ["EVENTS_CONSOLE_LEVEL"]
+        if os.environ.get("EVENTS_PATH"):
+            section["path"] = os.environ["EVENTS_PATH"]
+        section["level"] = level_value(section["level"])
+        section["console_level"] = level_value(section["console_level"])
+        _settings = section
+    return _settings
+
+
+def configure(**overrides):
+    """Override settings (e.g. level=DEBUG, path=None to disable the sink); reopens the sink"""
+    close()
+    global _settings
+    current = dict(settings())
+    current.update(overrides)
+    for key in ("level", "console_level"):
+        current[key] = level_value(current[key])
+    _settings = current
+    return current
+
+
+def reset():
+    """Forget configured settings; the next event re-reads config and environment"""
+    global _settings
+    close()
+    _settings = None
+
+
+def enabled(level=INFO):
+    """True when events at `level` are kept; use it to guard expensive preparation"""
+    return level_value(level) >= settings()["level"]
+
+
+def summarize(value, max_chars=1000, max_items=20, max_depth=6):
+    """JSON-safe, size-bounded copy of `value`"""
+    def walk(item, depth):
+        if isinstance(item, lazy):
+            item = item()
+        if isinstance(item, Mapping):
+            if depth >= max_depth:
+                return f"{{...{len(item)} fields}}"
+            pairs = list(item.items())
+            result = {str(key): walk(val, depth + 1) for key, val in pairs[:max_items]}
+            if len(pairs) > max_items:
+                result["..."] = f"{len(pairs) - max_items} more fields"
+            return result
+        if isinstance(item, (list, tuple)):
+            if depth >= max_depth:
+                return f"[...{len(item)} items]"
+            result = [walk(val, depth + 1) for val in item[:max_items]]
+            if len(item) > max_items:
+                result.append(f"... {len(item) - max_items} more items")
+            return result
+        if item is None or isinstance(item, (bool, int, float)):
+            return item
+        text = item if isinstance(item, str) else str(item)
+        if len(text) > max_chars:
+            text = text[:max_chars] + f"...(+{len(text) - max_chars} chars)"
+        return text
+    return walk(value, 0)
+
+
+def _compact(value, config):
+    summary = summarize(value, config["console_max_chars"], config["console_max_items"],
+                        config["console_max_depth"])
+    if isinstance(summary, str) or (isinstance(summary, (int, float)) and not isinstance(summary, bool)):
+        return summary
+    return json.dumps(summary, default=str)
+
+
+def format_event(name, message, fields, config=None):
+    """One-line human-readable rendering of an event"""
+    config = config or settings()
+    compact = {key: _compact(value, config) for key, value in fields.items()}
+    if message:
+        try:
+            line = message.format(**compact)
+        except (KeyError, IndexError, ValueError):
+            line = message
+    else:
+        line = name + (" " if compact else "") + " ".join(f"{k}={v}" for k, v in compact.items())
+    limit = config["console_max_line"]
+    if len(line) > limit:
+        line = line[:limit] + f"...(+{len(line) - limit} chars)"
+    return line
+
+
+def sink_path(config=None):
+    """JSONL path for this process (per xdist worker), or None when the sink is disabled"""
+    config = config or settings()
+    path = config.get("path")
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        path = os.path.join(PROJECT_ROOT, path)
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{worker}{ext}"
+    return path
+
+
+def _write(line, flush, config):
+    global _sink, _sink_bytes
+    path = sink_path(config)
+    if path is None:
+        return
+    with _lock:
+        if _sink is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _sink = open(path, "a", encoding="utf-8")
+            _sink_bytes = _sink.tell()
+        _sink.write(line + "\n")
+        _sink_bytes += len(line) + 1
+        if _sink_bytes > config["max_bytes"]:
+            # Keep one previous file; the sink never holds more than twice max_bytes
+            _sink.close()
+            os.replace(path, path + ".1")
+            _sink = open(path, "a", encoding="utf-8")
+            _sink_bytes = 0
+        elif flush:
+            _sink.flush()
+
+
+def close():
+    """Flush and close the JSONL sink"""
+    global _sink
+    with _lock:
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+
+
+atexit.register(close)
+
+
+def _current_test():
+    current = os.environ.get("PYTEST_CURRENT_TEST")
+    return current.rsplit(" ", 1)[0] if current else None
+
+
+def emit(name, message=None, level=INFO, **fields):
+    """Record event `name`; `message` is a str.format template over the (summarized) fields"""
+    config = settings()
+    level = level_value(level)
+    if level < config["level"]:
+        return None
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "level": LEVEL_NAMES.get(level, str(level)),
+        "event": name,
+        "test": _current_test(),
+        "run_id": os.environ.get("BENCHMARK_RUN_ID"),
+    }
+    resolved = {key: (value() if isinstance(value, lazy) else value) for key, value in fields.items()}
+    line = format_event(name, message, resolved, config)
+    record["message"] = line
+    record["fields"] = summarize(resolved, config["max_chars"], config["max_items"], config["max_depth"])
+    _write(json.dumps(record, default=str), level >= ERROR, config)
+    if level >= config["console_level"]:
+        print(f"Log: {line}")
+    return record
+
+
+def debug(name, message=None, **fields):
+    return emit(name, message, DEBUG, **fields)
+
+
+def info(name, message=None, **fields):
+    return emit(name, message, INFO, **fields)
+
+
+def warning(name, message=None, **fields):
+    return emit(name, message, WARNING, **fields)
+
+
+def error(name, message=None, **fields):
+    return emit(name, message, ERROR, **fields)
+
+
+def read_events(path=None):
+    """Events from a JSONL sink file (this process's sink by default)"""
+    path = path or sink_path()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]